@@ -1,17 +1,147 @@
 LOAD_BALANCER_ADDRESS = ("localhost", 8080)
 REQUEST_TIMEOUT = 5
 SERVER_CAPACITY = 5
+SERVER_WEIGHT = 1 # default weight of backend server, used by weighted algorithms when config entry has no "weight"
 
 BACKEND_SERVERS_CONFIG = [
                             {
                                 "url" : "http://localhost:8003",
-                                "health_check_url" : "http://localhost:8003/health"
+                                "health_check_url" : "http://localhost:8003/health",
+                                "weight" : 1
                             },
                             {
                                 "url" : "http://localhost:8002",
-                                "health_check_url" : "http://localhost:8002/health"
+                                "health_check_url" : "http://localhost:8002/health",
+                                "weight" : 1
                             }
                         ]
 
 HEALTH_CHECK_PERIOD = 10
-UNHEALTHY_RECHECK_INTERVAL = 15 # interval (in seconds) for checking unhealthy servers
\ No newline at end of file
+UNHEALTHY_RECHECK_INTERVAL = 15 # interval (in seconds) for checking unhealthy servers
+
+# server modes LoadBalancer can run in
+SERVER_MODE_THREADED = "threaded" # fixed pool of WORKER_POOL_SIZE worker threads taking accepted connections from bounded accept queue, shedding them with 503 when it is full
+SERVER_MODE_ASYNCIO = "asyncio" # single asyncio event loop serving every client connection
+SERVER_MODE = SERVER_MODE_THREADED
+
+MAX_REQUEST_HEAD_SIZE = 65536 # maximum size (in bytes) of request line plus headers accepted from client
+
+# hop-by-hop headers which are only meaningful for single connection and must not be forwarded as is
+HOP_BY_HOP_HEADERS = {"connection", "keep-alive", "proxy-connection", "transfer-encoding", "te", "trailer", "upgrade"}
+
+# keep-alive connections to each backend server
+CONNECTION_POOL_SIZE = 10 # maximum number of idle connections kept open per backend server
+CONNECTION_POOL_IDLE_TIMEOUT = 30 # seconds idle connection is kept before it is closed
+CONNECTION_POOL_MAX_LIFETIME = 300 # seconds after which connection is closed instead of being reused
+
+RELAY_CHUNK_SIZE = 65536 # size (in bytes) of buffer request and response bodies are relayed through
+CLIENT_KEEP_ALIVE_TIMEOUT = 15 # seconds idle client connection is kept open waiting for next request
+
+# worker pool of threaded server mode
+WORKER_POOL_SIZE = 64 # number of worker threads handling client connections
+ACCEPT_QUEUE_SIZE = 128 # maximum number of accepted connections waiting for free worker
+MAX_QUEUE_WAIT = 1.0 # seconds connection may wait for worker before it is answered with 503
+IDLE_CONNECTION_POLL_INTERVAL = 0.1 # seconds between checks whether worker of idle keep-alive connection is needed elsewhere
+
+# latency tracking of each backend server
+LATENCY_EWMA_ALPHA = 0.2 # weight of newest sample in exponentially weighted moving average of latency
+LATENCY_WINDOW_SIZE = 512 # number of most recent latency samples percentiles are computed over
+
+# consistent hashing algorithm
+CONSISTENT_HASH_KEY = "client_ip" # request attribute requests are hashed by: "path", "client_ip" or "header:<name>"
+CONSISTENT_HASH_VIRTUAL_NODES = 160 # points each backend server (of weight 1) gets on hash ring
+
+# health check scheduler shared by all backend servers
+HEALTH_CHECK_TIMEOUT = 2 # seconds health check may take before server is considered unhealthy
+HEALTH_CHECK_CONCURRENCY = 16 # maximum number of health checks running at same time
+HEALTH_CHECK_JITTER = 0.1 # fraction by which each health check period is randomly stretched or shrunk
+
+# passive health checking of backend servers from outcomes of proxied requests
+OUTLIER_CONSECUTIVE_ERRORS = 5 # consecutive failed requests after which server is ejected
+OUTLIER_ERROR_RATE = 0.5 # fraction of failed requests in window after which server is ejected
+OUTLIER_WINDOW_SIZE = 100 # number of most recent requests error rate is computed over
+OUTLIER_MIN_REQUESTS = 20 # requests needed in window before error rate or latency of server is judged
+OUTLIER_LATENCY_FACTOR = 3.0 # server whose average latency exceeds this multiple of median of all servers is ejected
+OUTLIER_SWEEP_INTERVAL = 1.0 # seconds between checks for ejected servers due for readmission and for latency outliers
+OUTLIER_BASE_EJECTION_TIME = 10 # seconds server is ejected for the first time, doubled with every ejection in a row
+OUTLIER_MAX_EJECTION_TIME = 300 # maximum seconds server is ejected for, also time in service after which doubling starts over
+OUTLIER_MAX_EJECTION_PERCENT = 50 # maximum percentage of backend servers ejected at same time (at least one server can always be ejected)
+
+# slow start of backend servers which recover from being unhealthy or ejected
+SLOW_START_DURATION = 30 # seconds over which recovering server's share of requests ramps up to full
+SLOW_START_MIN_FACTOR = 0.1 # share of its normal requests recovering server takes right away
+
+# retries and hedging of idempotent requests without body
+MAX_RETRIES = 2 # times failed request is sent again, each time to different backend server
+RETRY_METHODS = {"GET", "PUT", "DELETE"} # idempotent methods which are retried and hedged
+RETRY_STATUS_CODES = {502, 503, 504} # backend server responses which are retried, besides connection errors
+RETRY_BUDGET_PERCENT = 20 # retries and hedges allowed as percentage of requests
+RETRY_BUDGET_MIN_PER_SECOND = 10 # retries and hedges allowed per second regardless of traffic
+RETRY_BUDGET_MAX_TOKENS = 100 # maximum number of retries budget saves up for burst of failures
+HEDGE_REQUESTS = False # whether slow request is sent to second backend server, first response wins
+HEDGE_PERCENTILE = 95 # percentile of backend server latency after which request is hedged
+HEDGE_MIN_SAMPLES = 20 # latency samples backend server needs before its requests are hedged
+HEDGE_MIN_DELAY = 0.005 # minimum seconds before request is hedged
+
+# circuit breaker of each backend server
+CIRCUIT_BREAKER_WINDOW_SIZE = 50 # number of most recent requests error and slow request rates are computed over
+CIRCUIT_BREAKER_MIN_REQUESTS = 10 # requests needed in window before circuit can open
+CIRCUIT_BREAKER_ERROR_RATE = 0.5 # fraction of failed requests in window which opens circuit
+CIRCUIT_BREAKER_SLOW_REQUEST_TIME = 2.0 # seconds after which request counts as slow
+CIRCUIT_BREAKER_SLOW_REQUEST_RATE = 0.8 # fraction of slow requests in window which opens circuit
+CIRCUIT_BREAKER_OPEN_TIME = 5 # seconds circuit stays open before trial requests are let through
+CIRCUIT_BREAKER_HALF_OPEN_REQUESTS = 3 # trial requests which all have to succeed for circuit to close
+
+# multi-process mode, where supervisor runs several load balancer processes sharing address through SO_REUSEPORT
+LB_PROCESSES = 1 # number of load balancer processes, 1 runs single process without supervisor, 0 runs one per CPU core
+SUPERVISOR_POLL_INTERVAL = 0.5 # seconds between checks of supervisor whether worker processes are alive
+WORKER_RESTART_BACKOFF = 1.0 # seconds supervisor waits before restarting worker process which died right after start, doubled while it keeps dying
+WORKER_RESTART_MAX_BACKOFF = 30 # maximum seconds supervisor waits before restarting worker process
+
+# metrics and administrative endpoints
+ADMIN_ADDRESS = ("localhost", 9090) # address of admin server serving /metrics, away from proxied traffic
+ADMIN_TOKEN = None # shared secret admin clients must send as "Authorization: Bearer <token>" to change backend servers, None leaves routes changing them disabled
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0) # upper bounds (in seconds) of backend latency histogram buckets
+
+# backend servers configuration file, reloaded while load balancer runs
+BACKEND_CONFIG_FILE = None # path of JSON, TOML or YAML file with backend servers, None uses BACKEND_SERVERS_CONFIG and disables reloading
+CONFIG_POLL_INTERVAL = 2.0 # seconds between checks whether backend servers configuration file changed
+
+# cache of responses to GET requests
+RESPONSE_CACHE = False # whether responses which backend servers allow to cache are served from memory
+CACHE_MAX_SIZE = 64 * 1024 * 1024 # maximum total size (in bytes) of cached response bodies
+CACHE_MAX_OBJECT_SIZE = 1024 * 1024 # maximum size (in bytes) of single cached response body
+CACHE_LOCK_TIMEOUT = REQUEST_TIMEOUT # maximum seconds request waits for concurrent request fetching same response
+CACHEABLE_STATUS_CODES = {200, 203, 204, 300, 301, 308} # statuses of successful responses which may be cached
+
+# TLS termination on load balancer address
+TLS_CERT_FILE = None # path of PEM certificate chain served to clients, None serves plain HTTP
+TLS_KEY_FILE = None # path of PEM private key of TLS_CERT_FILE
+TLS_SNI_CERTS = {} # hostname -> (certificate file, key file) served to clients asking for that hostname through SNI
+TLS_HANDSHAKE_TIMEOUT = 5.0 # seconds client has to complete TLS handshake
+TLS_SESSION_TICKETS = 2 # session tickets sent to client after full TLS 1.3 handshake, each lets it resume one connection
+TLS_HANDSHAKE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0) # upper bounds (in seconds) of TLS handshake duration histogram buckets
+
+# HTTP/2 to backend servers with "http2": True in their configuration (needs h2 installed)
+HTTP2_MAX_CONNECTIONS = 2 # HTTP/2 connections opened at most to single backend server, each carrying many concurrent requests
+HTTP2_MAX_CONCURRENT_STREAMS = 100 # requests carried at once by single HTTP/2 connection, lower limit sent by backend server in SETTINGS wins
+HTTP2_STREAM_WINDOW_SIZE = 256 * 1024 # bytes of response body backend server may send on single stream before load balancer relays them to client
+HTTP2_CONNECTION_WINDOW_SIZE = 16 * 1024 * 1024 # bytes of response bodies backend server may send on single connection before load balancer relays them
+
+# proxy modes LoadBalancer can run in
+PROXY_MODE_HTTP = "http" # requests are parsed and each one is proxied to backend server chosen for it
+PROXY_MODE_TCP = "tcp" # bytes of client connection are relayed as they are to backend server chosen when client connects
+PROXY_MODE = PROXY_MODE_HTTP
+TCP_CONNECT_TIMEOUT = REQUEST_TIMEOUT # seconds connecting to backend server may take in tcp proxy mode before next server is tried
+TCP_RELAY_BUFFER_SIZE = 256 * 1024 # bytes read from one side of relayed TCP connection and not yet written to other side, per direction
+
+# per-client rate limiting, applied before requests reach worker threads or backend servers
+RATE_LIMIT_RATE = 0 # requests per second each client may send on average, 0 disables rate limiting
+RATE_LIMIT_BURST = 20 # requests client may send at once after being idle
+RATE_LIMIT_KEY = "client_ip" # what identifies client: "client_ip" or "header:<name>", clients without header are limited by IP
+RATE_LIMIT_MAX_CLIENTS = 100000 # clients whose token buckets are remembered, least recently seen ones are forgotten beyond that
+
+# timing of request handling phases, access log and W3C trace context propagation
+REQUEST_TRACING = True # whether phases of every request are timed and traceparent header is sent to backend servers
+ACCESS_LOG_SAMPLE_RATE = 0.01 # fraction of requests written to "lb.access" logger as JSON lines, besides those client's traceparent marks as sampled
+REQUEST_PHASE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0) # upper bounds (in seconds) of request phase duration histogram buckets
@@ -0,0 +1,138 @@
+import hmac
+import json
+import logging
+import threading
+from urllib.parse import urlsplit, parse_qsl
+from typing import Tuple, Optional, Dict, Any, Callable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from implementations.metrics import MetricsRegistry
+
+# handler of admin route, called with query parameters and JSON body of request (None if it has none),
+# returning status code and payload of response: str is sent as plain text, anything else as JSON
+AdminRouteHandler = Callable[[Dict[str, str], Any], Tuple[int, Any]]
+
+
+class AdminRequestHandler(BaseHTTPRequestHandler):
+    """
+    Handles requests sent to AdminServer by dispatching them to its routes.
+
+    Exceptions raised by route handlers become error responses: ValueError 400, KeyError 404
+    and RuntimeError 409. Protected routes answer 401 unless request carries admin token.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+    def log_message(self, format, *args):
+        logging.debug(f"Admin request from {self.client_address[0]}: {format % args}")
+
+    def _handle(self, method: str) -> None:
+        url_parts = urlsplit(self.path)
+        routes = self.server.routes.get(url_parts.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        if routes is None:
+            self._send(404, {"error": f"Unknown path {url_parts.path}"})
+            return
+        if method not in routes:
+            self._send(405, {"error": f"Method {method} is not allowed on {url_parts.path}"})
+            return
+        if (method, url_parts.path) in self.server.protected_routes and not self._is_authorized():
+            self._send(401, {"error": "Admin token is missing or invalid"}, {"WWW-Authenticate": "Bearer"})
+            return
+
+        try:
+            status_code, payload = routes[method](dict(parse_qsl(url_parts.query)), json.loads(body) if body else None)
+        except ValueError as e:
+            # also covers request body which is not valid JSON
+            status_code, payload = 400, {"error": str(e)}
+        except KeyError as e:
+            status_code, payload = 404, {"error": e.args[0] if e.args else "Not found"}
+        except RuntimeError as e:
+            status_code, payload = 409, {"error": str(e)}
+        self._send(status_code, payload)
+
+    def _is_authorized(self) -> bool:
+        token = self.server.token
+        authorization = self.headers.get("Authorization", "")
+        # compared in constant time, so token cannot be guessed from how long comparison takes
+        return token is not None and hmac.compare_digest(authorization.encode(), f"Bearer {token}".encode())
+
+    def _send(self, status_code: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        if isinstance(payload, str):
+            body, content_type = payload.encode(), "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body, content_type = json.dumps(payload).encode(), "application/json"
+        self.send_response(status_code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class AdminServer:
+    """
+    Serves administrative endpoints of load balancer on address of its own, so scraping
+    metrics or reconfiguring load balancer neither competes with proxied traffic for workers
+    nor is exposed to its clients.
+
+    GET /metrics returns metrics of load balancer in Prometheus text format; other routes
+    are added by load balancer with add_route(). Routes added as protected, e.g. those
+    changing backend servers, need "Authorization: Bearer <token>" header with token, and
+    are refused to everyone when there is no token.
+
+    :param address: address admin server listens on.
+    :param metrics_registry: registry whose metrics are served on /metrics.
+    :param token: shared secret clients of protected routes must send.
+    """
+
+    def __init__(self, address: Tuple[str, int], metrics_registry: MetricsRegistry, token: Optional[str] = None) -> None:
+        self.address = address
+        self.metrics_registry = metrics_registry
+        self.token = token
+        self.routes = {} # path -> {method -> handler}
+        self.protected_routes = set() # (method, path) of routes which need token
+        self.httpd = None
+        self.add_route("GET", "/metrics", lambda query, body: (200, self.metrics_registry.render()))
+
+    def add_route(self, method: str, path: str, handler: AdminRouteHandler, protected: bool = False) -> None:
+        self.routes.setdefault(path, {})[method] = handler
+        if protected:
+            self.protected_routes.add((method, path))
+
+    def start(self) -> None:
+        self.httpd = ThreadingHTTPServer(self.address, AdminRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.routes = self.routes
+        self.httpd.protected_routes = self.protected_routes
+        self.httpd.token = self.token
+        threading.Thread(target=self.httpd.serve_forever, kwargs={"poll_interval": 0.1}, name="lb-admin", daemon=True).start()
+        logging.info(f"Admin server listening on {self.address[0]}:{self.address[1]}")
+
+    def stop(self) -> None:
+        httpd, self.httpd = self.httpd, None
+        if httpd is not None:
+            httpd.shutdown()
+            httpd.server_close()
+
+    def get_port(self) -> Optional[int]:
+        """
+        Returns port admin server listens on, useful when it was started on port 0.
+        """
+        return self.httpd.server_address[1] if self.httpd is not None else None
@@ -0,0 +1,326 @@
+import time
+import datetime
+import asyncio
+import logging
+import requests
+from urllib.parse import urlsplit
+from urllib3 import HTTPHeaderDict
+from typing import Optional, Dict, Union, Tuple, Any, List, AsyncIterator, Callable
+
+from utils.utility import Utils
+from utils.http_parser import HttpRequestParser, NEED_DATA, END_OF_MESSAGE
+from constants.app_constants import REQUEST_TIMEOUT, HOP_BY_HOP_HEADERS, RELAY_CHUNK_SIZE
+from interfaces.backend_server import IBackendServer
+from interfaces.async_communicator import IAsyncCommunicator
+from implementations.response_cache import CachedResponse
+from implementations.async_connection_pool import AsyncBackendConnectionPool, AsyncPooledConnection
+
+
+class AsyncBackendStream:
+    """
+    Body of backend server response which has not been read yet.
+
+    Used as raw attribute of response objects returned by AsyncBackendServerCommunicator,
+    iterating over it yields body bytes exactly as backend server framed them. Closing stream
+    returns backend server connection to its pool if body was read completely and connection
+    can carry further requests, otherwise connection is closed.
+
+    :param body: async iterator yielding body bytes.
+    :param pooled_conn: backend server connection body is read from.
+    :param connection_pool: pool connection was acquired from.
+    :param chunked: whether yielded bytes include chunk framing.
+    :param close_delimited: whether body ends only when connection is closed.
+    :param reusable: whether backend server keeps connection open after response.
+    """
+
+    def __init__(self, body: AsyncIterator[bytes], pooled_conn: AsyncPooledConnection, connection_pool: AsyncBackendConnectionPool,
+                 chunked: bool, close_delimited: bool, reusable: bool):
+        self.body = body
+        self.pooled_conn = pooled_conn
+        self.connection_pool = connection_pool
+        self.chunked = chunked
+        self.close_delimited = close_delimited
+        self.reusable = reusable
+        self.complete = False # whether body was read to its end
+        self.released = False
+
+    def __aiter__(self) -> AsyncIterator[bytes]:
+        return self._iterate()
+
+    def close(self) -> None:
+        if self.released:
+            return
+        self.released = True
+        # connection whose response was not read to its end is in unknown state, so it is not reused
+        self.connection_pool.release(self.pooled_conn, reusable=self.reusable and self.complete)
+
+
+    # Private methods from here
+
+    async def _iterate(self) -> AsyncIterator[bytes]:
+        async for data in self.body:
+            yield data
+        self.complete = True
+
+
+class AsyncBackendServerCommunicator(IAsyncCommunicator):
+    """
+    Communicator used by asyncio server mode.
+
+    Requests are proxied to backend servers over asyncio streams, so waiting for
+    backend server never blocks event loop serving other clients, and streams are
+    kept alive in asyncio connection pool of each backend server between requests. Request and response
+    bodies are relayed in pieces of at most RELAY_CHUNK_SIZE bytes instead of being
+    buffered whole. Requests are read with HttpRequestParser, so one client connection
+    can carry many requests.
+    """
+
+    async def read_request(self, reader: asyncio.StreamReader, parser: HttpRequestParser) -> Optional[Dict[str, Any]]:
+        # time spent waiting for idle keep-alive connection to carry next request is not part of it
+        received_at = None if parser.is_idle() else time.monotonic()
+        while True:
+            event = parser.next_event()
+            if event is NEED_DATA:
+                if not await self._receive(reader, parser):
+                    return None
+                if received_at is None:
+                    received_at = time.monotonic()
+            elif isinstance(event, dict):
+                incoming_req_details = event
+                incoming_req_details['received_at'] = received_at or time.monotonic()
+                has_body = incoming_req_details['chunked'] or incoming_req_details['content_length'] > 0
+                incoming_req_details['request_data'] = self._iter_request_body(reader, parser) if has_body else None
+                return incoming_req_details
+
+    def get_client_ip(self, writer: asyncio.StreamWriter) -> Optional[str]:
+        peername = writer.get_extra_info("peername")
+        return peername[0] if peername else None
+
+    async def send_request_to_backend_server(self, incoming_req_details: Dict[str, Any], backend_server: IBackendServer) -> Tuple[bool, Optional[requests.Response]]:
+        logging.debug(f"Data received from client: data - {incoming_req_details['raw_request_data']}")
+        start_time = time.monotonic()
+        try:
+            response = await self.make_request(backend_server, incoming_req_details)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+            logging.error(f"Failed to connect to backend server: {e!r}")
+            return True, None
+        end_time = time.monotonic()
+        if response is not None:
+            # latency is only recorded for successful responses, once their status is known
+            response.elapsed = datetime.timedelta(seconds=end_time - start_time)
+        return False, response
+
+    async def send_success_response(self, writer: asyncio.StreamWriter, response: requests.Response, incoming_req_details: Dict[str, Any],
+                                    body_listener: Optional[Callable[[bytes], None]] = None) -> bool:
+        """
+        Relays response of backend server to client stream piece by piece, waiting for
+        client to drain each piece, so memory used per connection stays bounded. Every piece
+        is also passed to body_listener, if given; pieces of chunked body keep their framing.
+        """
+        backend_stream = response.raw
+        keep_alive = incoming_req_details['keep_alive'] and not backend_stream.close_delimited
+        try:
+            writer.write(Utils.generate_response_head(response, keep_alive, backend_stream.chunked))
+            async for data in backend_stream:
+                if body_listener is not None:
+                    body_listener(data)
+                writer.write(data)
+                await writer.drain()
+            await writer.drain()
+        finally:
+            response.close()
+        return keep_alive
+
+    async def send_cached_response(self, writer: asyncio.StreamWriter, cached: CachedResponse, incoming_req_details: Dict[str, Any]) -> bool:
+        keep_alive = incoming_req_details['keep_alive']
+        writer.write(Utils.generate_cached_response(cached, keep_alive, cached.get_age(time.monotonic())))
+        await writer.drain()
+        return keep_alive
+
+    async def send_error_response(self, writer: asyncio.StreamWriter, reason: str, message: str, status_code: int = 400, headers: Optional[Dict[str, str]] = None) -> None:
+        writer.write(Utils.generate_error_response(reason, message, status_code, headers))
+        await writer.drain()
+
+    async def make_request(self, backend_server: IBackendServer, incoming_req_details: Dict[str, Any]) -> Union[requests.Response, None]:
+        """
+        Sends HTTP request to specified backend server over pooled asyncio connection and reads response head.
+
+        :param backend_server: backend server request is sent to, whose asyncio connection pool is used.
+        :param incoming_req_details: dict containing details of incoming HTTP request.
+        :return: response object whose body is streamed from backend server, or None if HTTP method is unsupported.
+        """
+        method = incoming_req_details['method']
+        if method not in ["GET", "POST", "PUT", "DELETE"]:
+            return None
+
+        connection_pool = backend_server.async_connection_pool
+        request_head = self._build_request_head(incoming_req_details)
+        while True:
+            pooled_conn = await connection_pool.acquire()
+            reader, writer = pooled_conn.reader, pooled_conn.writer
+            try:
+                # every step waiting on backend server is bounded by REQUEST_TIMEOUT on its own, so large bodies are not cut off
+                writer.write(request_head)
+                await self._relay_request_body(incoming_req_details, writer)
+
+                head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), REQUEST_TIMEOUT)
+                response_lines = head[:-4].split(b"\r\n")
+                version, status_code, reason = (response_lines[0].decode("latin-1").split(" ", 2) + [""])[:3]
+                headers = self._parse_headers(response_lines[1:])
+            except (ConnectionResetError, BrokenPipeError, asyncio.IncompleteReadError) as e:
+                connection_pool.discard(pooled_conn)
+                # backend server may close idle keep-alive connection just as it gets reused, in that
+                # case request never reached it, so it is safe to send it again on fresh connection
+                # as long as there is no body which was already consumed from client
+                closed_before_response = not isinstance(e, asyncio.IncompleteReadError) or not e.partial
+                if pooled_conn.reused and closed_before_response and incoming_req_details['request_data'] is None:
+                    continue
+                raise
+            except BaseException:
+                connection_pool.discard(pooled_conn)
+                raise
+
+            # HTTP/1.1 connections stay open unless backend server says otherwise
+            reusable = version == "HTTP/1.1" and "close" not in headers.get("Connection", "").lower()
+            return Utils.build_response(backend_server.url + incoming_req_details['path'], int(status_code), reason, headers.items(),
+                                        raw=self._open_response_body(reader, pooled_conn, connection_pool, incoming_req_details, int(status_code), headers, reusable))
+
+
+    # Private methods from here
+
+    def _build_request_head(self, incoming_req_details: Dict[str, Any]) -> bytes:
+        """
+        Builds request line and headers forwarded to backend server.
+
+        Hop-by-hop headers of client connection are dropped, and chunked body is chunked again
+        when relayed. Connection to backend server is kept alive, as HTTP/1.1 does by default.
+        """
+        lines = [f"{incoming_req_details['method']} {incoming_req_details['path']} HTTP/1.1"]
+        for key, value in incoming_req_details['headers'].items():
+            if key.lower() not in HOP_BY_HOP_HEADERS:
+                lines.append(f"{key}: {value}")
+        if incoming_req_details['chunked']:
+            lines.append("Transfer-Encoding: chunked")
+        elif "Content-Length" not in incoming_req_details['headers'] and incoming_req_details['method'] in ["POST", "PUT"]:
+            lines.append("Content-Length: 0")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def _relay_request_body(self, incoming_req_details: Dict[str, Any], writer: asyncio.StreamWriter) -> None:
+        request_data = incoming_req_details['request_data']
+        if request_data is None:
+            await asyncio.wait_for(writer.drain(), REQUEST_TIMEOUT)
+            return
+        chunked = incoming_req_details['chunked']
+        async for chunk in request_data:
+            if chunked:
+                writer.write(b"%x\r\n" % len(chunk))
+            writer.write(chunk)
+            if chunked:
+                writer.write(b"\r\n")
+            await asyncio.wait_for(writer.drain(), REQUEST_TIMEOUT)
+        if chunked:
+            writer.write(b"0\r\n\r\n")
+        await asyncio.wait_for(writer.drain(), REQUEST_TIMEOUT)
+
+    def _parse_headers(self, header_lines: List[bytes]) -> HTTPHeaderDict:
+        headers = HTTPHeaderDict()
+        for line in header_lines:
+            if not line:
+                break
+            key, value = line.split(b":", 1)
+            # repeated headers, like Set-Cookie, keep all their values
+            headers.add(key.decode("latin-1").strip(), value.decode("latin-1").strip())
+        return headers
+
+    def _open_response_body(self, reader: asyncio.StreamReader, pooled_conn: AsyncPooledConnection, connection_pool: AsyncBackendConnectionPool,
+                            incoming_req_details: Dict[str, Any], status_code: int, headers: HTTPHeaderDict, reusable: bool) -> "AsyncBackendStream":
+        """
+        Creates stream yielding body of backend server response.
+
+        Responses to HEAD requests and 1xx, 204 and 304 responses never have body. Chunked
+        bodies are passed through with their chunk framing, unless client only speaks HTTP/1.0,
+        and bodies without length are read until backend server closes connection.
+        """
+        if incoming_req_details['method'] == "HEAD" or status_code < 200 or status_code in (204, 304):
+            return AsyncBackendStream(self._iter_nothing(), pooled_conn, connection_pool, chunked=False, close_delimited=False, reusable=reusable)
+        if Utils.is_chunked(headers):
+            dechunk = incoming_req_details['protocol'] == "HTTP/1.0"
+            # de-chunked body ends client connection, but backend server connection still carries complete chunked body
+            return AsyncBackendStream(self._iter_chunked_body(reader, dechunk=dechunk), pooled_conn, connection_pool, chunked=not dechunk, close_delimited=dechunk, reusable=reusable)
+        if "Content-Length" in headers:
+            return AsyncBackendStream(self._iter_body(reader, int(headers["Content-Length"])), pooled_conn, connection_pool, chunked=False, close_delimited=False, reusable=reusable)
+        return AsyncBackendStream(self._iter_until_closed(reader), pooled_conn, connection_pool, chunked=False, close_delimited=True, reusable=False)
+
+    async def _iter_nothing(self) -> AsyncIterator[bytes]:
+        return
+        yield
+
+    async def _iter_until_closed(self, reader: asyncio.StreamReader) -> AsyncIterator[bytes]:
+        while True:
+            data = await asyncio.wait_for(reader.read(RELAY_CHUNK_SIZE), REQUEST_TIMEOUT)
+            if not data:
+                return
+            yield data
+
+    async def _receive(self, reader: asyncio.StreamReader, parser: HttpRequestParser) -> bool:
+        """
+        Feeds next bytes received from client to parser.
+
+        :return: False if client closed connection between requests.
+        :raises ConnectionError: if client closed connection in middle of request.
+        """
+        data = await reader.read(RELAY_CHUNK_SIZE)
+        if not data:
+            if parser.is_idle():
+                return False
+            raise ConnectionError("Client closed connection in middle of request")
+        parser.feed(data)
+        return True
+
+    async def _iter_request_body(self, reader: asyncio.StreamReader, parser: HttpRequestParser) -> AsyncIterator[bytes]:
+        """
+        Yields de-chunked request body as it is received from client.
+        """
+        while True:
+            event = parser.next_event()
+            if event is END_OF_MESSAGE:
+                return
+            if event is NEED_DATA:
+                await asyncio.wait_for(self._receive(reader, parser), REQUEST_TIMEOUT)
+            else:
+                yield event
+
+    async def _iter_body(self, reader: asyncio.StreamReader, content_length: int) -> AsyncIterator[bytes]:
+        """
+        Yields body of given length in pieces of at most RELAY_CHUNK_SIZE bytes.
+        """
+        remaining = content_length
+        while remaining > 0:
+            data = await asyncio.wait_for(reader.read(min(RELAY_CHUNK_SIZE, remaining)), REQUEST_TIMEOUT)
+            if not data:
+                raise asyncio.IncompleteReadError(b"", remaining)
+            remaining -= len(data)
+            yield data
+
+    async def _iter_chunked_body(self, reader: asyncio.StreamReader, dechunk: bool) -> AsyncIterator[bytes]:
+        """
+        Yields chunked body either de-chunked, or as is including chunk sizes and trailers.
+        """
+        while True:
+            size_line = await asyncio.wait_for(reader.readuntil(b"\r\n"), REQUEST_TIMEOUT)
+            chunk_size = int(size_line.split(b";", 1)[0].strip(), 16)
+            if not dechunk:
+                yield size_line
+            if chunk_size == 0:
+                # optional trailer headers end with empty line, which also ends chunked body
+                while True:
+                    trailer_line = await asyncio.wait_for(reader.readuntil(b"\r\n"), REQUEST_TIMEOUT)
+                    if not dechunk:
+                        yield trailer_line
+                    if trailer_line == b"\r\n":
+                        return
+            async for data in self._iter_body(reader, chunk_size):
+                yield data
+            chunk_end = await reader.readexactly(2)
+            if not dechunk:
+                yield chunk_end
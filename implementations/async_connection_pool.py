@@ -0,0 +1,161 @@
+import ssl
+import time
+import asyncio
+import logging
+from collections import deque
+from urllib.parse import urlsplit
+
+from constants.app_constants import REQUEST_TIMEOUT, CONNECTION_POOL_SIZE, CONNECTION_POOL_IDLE_TIMEOUT, CONNECTION_POOL_MAX_LIFETIME
+
+
+class AsyncPooledConnection:
+    """
+    asyncio connection to backend server together with bookkeeping needed by AsyncBackendConnectionPool.
+
+    :param reader: stream reader of connection.
+    :param writer: stream writer of connection.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.created_at = time.monotonic()
+        self.released_at = self.created_at
+        self.reused = False # whether connection already carried earlier request
+
+
+class AsyncBackendConnectionPool:
+    """
+    Pool of keep-alive asyncio connections to single backend server, used by asyncio server mode
+    the way BackendConnectionPool is used by threaded server mode, with same limits and eviction.
+
+    Pool is only used from event loop of load balancer, so it needs no lock. Connections are
+    bound to that loop, so close() called from other thread (e.g. when backend server is
+    removed by configuration reload) closes idle connections on the loop.
+
+    :param url: base URL of backend server.
+    :param max_size: maximum number of idle connections kept open.
+    :param idle_timeout: seconds idle connection is kept before it is closed.
+    :param max_lifetime: seconds after which connection is closed instead of being reused.
+    :param timeout: seconds opening connection may take.
+    """
+
+    def __init__(self, url: str, max_size: int = CONNECTION_POOL_SIZE, idle_timeout: float = CONNECTION_POOL_IDLE_TIMEOUT, max_lifetime: float = CONNECTION_POOL_MAX_LIFETIME, timeout: float = REQUEST_TIMEOUT) -> None:
+        self.url_parts = urlsplit(url)
+        self.netloc = self.url_parts.netloc
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+
+        self.idle_connections = deque()
+        self.open_count = 0
+        self.hits = 0 # requests served by reused idle connection
+        self.misses = 0 # requests for which new connection had to be opened
+        self.closed = False
+        self.loop = None # event loop connections belong to, known once first one is opened
+
+    async def acquire(self) -> AsyncPooledConnection:
+        """
+        Returns idle connection which is still usable, or opens new connection if there is none.
+        """
+        while self.idle_connections:
+            pooled_conn = self.idle_connections.pop()
+            if self._is_usable(pooled_conn):
+                pooled_conn.reused = True
+                self.hits += 1
+                return pooled_conn
+            self._close(pooled_conn)
+        self.misses += 1
+        self.loop = asyncio.get_running_loop()
+        self.open_count += 1
+        try:
+            # address is taken from URL only here, so invalid backend server URL surfaces as request error rather than earlier
+            https = self.url_parts.scheme == "https"
+            port = self.url_parts.port or (443 if https else 80)
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(self.url_parts.hostname, port, ssl=ssl.create_default_context() if https else None), self.timeout)
+        except BaseException:
+            self.open_count -= 1
+            raise
+        return AsyncPooledConnection(reader, writer)
+
+    def release(self, pooled_conn: AsyncPooledConnection, reusable: bool = True) -> None:
+        """
+        Returns connection to pool once response has been read completely.
+
+        :param pooled_conn: connection returned by acquire().
+        :param reusable: False if connection must not carry further requests, e.g. backend server asked to close it.
+        """
+        pooled_conn.released_at = time.monotonic()
+        if reusable and not self.closed and len(self.idle_connections) < self.max_size and not self._is_expired(pooled_conn, pooled_conn.released_at):
+            self.idle_connections.append(pooled_conn)
+        else:
+            self._close(pooled_conn)
+
+    def discard(self, pooled_conn: AsyncPooledConnection) -> None:
+        """
+        Closes connection which failed while in use, instead of returning it to pool.
+        """
+        self._close(pooled_conn)
+
+    def close(self) -> None:
+        """
+        Closes every idle connection. Connections currently in use are closed when released.
+        """
+        self.closed = True
+        loop = self.loop
+        if loop is None or loop.is_closed():
+            self._close_idle()
+            return
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is loop:
+            self._close_idle()
+        else:
+            loop.call_soon_threadsafe(self._close_idle)
+
+    def get_stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "open": self.open_count,
+            "idle": len(self.idle_connections),
+        }
+
+
+    # Private methods from here
+
+    def _is_expired(self, pooled_conn: AsyncPooledConnection, now: float) -> bool:
+        return now - pooled_conn.created_at > self.max_lifetime
+
+    def _is_usable(self, pooled_conn: AsyncPooledConnection) -> bool:
+        """
+        Checks whether idle connection can carry another request.
+
+        Connection is evicted when it sat idle for too long, outlived its max lifetime, or was
+        closed by backend server meanwhile. Event loop reads idle connection in background, so
+        backend server closing it shows as end of stream on its reader, and anything received
+        while idle is unexpected data which means it is broken.
+        """
+        now = time.monotonic()
+        if now - pooled_conn.released_at > self.idle_timeout or self._is_expired(pooled_conn, now):
+            return False
+        reader = pooled_conn.reader
+        # StreamReader has no public way to tell whether it buffered data
+        return not (pooled_conn.writer.is_closing() or reader.at_eof() or reader.exception() is not None or len(reader._buffer))
+
+    def _close_idle(self) -> None:
+        while self.idle_connections:
+            self._close(self.idle_connections.pop())
+
+    def _close(self, pooled_conn: AsyncPooledConnection) -> None:
+        """
+        Closes connection and stops counting it as open.
+        """
+        try:
+            pooled_conn.writer.close()
+        except (OSError, RuntimeError) as e:
+            logging.debug(f"Error while closing connection to {self.netloc}: {e}")
+        self.open_count -= 1
@@ -1,41 +1,115 @@
+import ssl
 import socket
 from typing import Optional
 import time
+import datetime
 import socket
 import logging
 import requests
-from typing import Dict, Union,Tuple, Any
+import http.client
+from typing import Dict, Union, Tuple, Any, Iterator, Callable
 
-from constants.app_constants import REQUEST_TIMEOUT
+from utils.utility import Utils
+from utils.http_parser import HttpRequestParser, NEED_DATA, END_OF_MESSAGE
+from constants.app_constants import HOP_BY_HOP_HEADERS, RELAY_CHUNK_SIZE
 from interfaces.backend_server import IBackendServer
 from interfaces.communicator import ICommunicator
+from implementations.response_cache import CachedResponse
+from implementations.http2_connection_pool import Http2NotSupportedError
 
 
 class BackendServerCommunicator(ICommunicator):
-    
-    def send_request_to_backend_server(self, client_sock: socket.socket, backend_server: IBackendServer) -> Tuple[bool, Optional[str]]:
-        incoming_req_details = self._extract_incoming_req_details(client_sock)
-        logging.debug(f"Data received from client: data - {incoming_req_details}")
+
+    def read_request(self, client_sock: socket.socket, parser: HttpRequestParser) -> Optional[Dict[str, Any]]:
+        """
+        Reads next request sent over client connection.
+
+        Whatever part of previous request's body was not read is discarded first,
+        so pipelined requests are picked up in order.
+
+        :param client_sock: socket object representing client connection.
+        :param parser: parser holding state of client connection between requests.
+        :return: dictionary containing raw request head, HTTP method, protocol, URL path, request headers, request body iterator (None if there is no body) and time (monotonic) its first bytes were received of incoming request, or None if client closed connection.
+        """
+        # pipelined request may be buffered already, otherwise its time starts once its first bytes arrive
+        received_at = None if parser.is_idle() else time.monotonic()
+        while True:
+            event = parser.next_event()
+            if event is NEED_DATA:
+                if not self._receive(client_sock, parser):
+                    return None
+                if received_at is None:
+                    received_at = time.monotonic()
+            elif isinstance(event, dict):
+                incoming_req_details = event
+                incoming_req_details['received_at'] = received_at or time.monotonic()
+                has_body = incoming_req_details['chunked'] or incoming_req_details['content_length'] > 0
+                incoming_req_details['request_data'] = self._iter_body(client_sock, parser) if has_body else None
+                return incoming_req_details
+
+    def get_client_ip(self, client_sock: socket.socket) -> Optional[str]:
+        try:
+            return client_sock.getpeername()[0]
+        except OSError:
+            return None
+
+    def send_request_to_backend_server(self, incoming_req_details: Dict[str, Any], backend_server: IBackendServer) -> Tuple[bool, Optional[requests.Response]]:
+        logging.debug(f"Data received from client: data - {incoming_req_details['raw_request_data']}")
         start_time = time.monotonic()
         try:
-            response = self.make_request(backend_server.url, incoming_req_details)
-        except requests.exceptions.ConnectionError as e:
+            response = self.make_request(backend_server, incoming_req_details)
+        except (OSError, http.client.HTTPException) as e:
             logging.error(f"Failed to connect to backend server: {e}")
             return True, None
         end_time = time.monotonic()
-        backend_server.add_latency(end_time - start_time)
+        if response is not None:
+            # latency is only recorded for successful responses, once their status is known
+            response.elapsed = datetime.timedelta(seconds=end_time - start_time)
         return False, response
-    
-    
-    def send_success_response(self, client_sock: socket.socket, response_str: str) -> None:
-        client_sock.sendall(response_str.encode())
-        # Check if socket is still connected before shutting down and closing
-        if client_sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE) == 0:
-            return
-        client_sock.shutdown(socket.SHUT_RDWR)
-        client_sock.close()
 
-    def send_error_response(self, client_sock: socket.socket, reason: str, message: str) -> None:
+
+    def send_success_response(self, client_sock: socket.socket, response: requests.Response, incoming_req_details: Dict[str, Any],
+                              body_listener: Optional[Callable[[memoryview], None]] = None) -> bool:
+        """
+        Relays response of backend server to client socket.
+
+        Body is piped from backend server connection to client through single fixed-size
+        buffer, so memory used per connection is bounded regardless of body size. Chunked
+        bodies are de-chunked while read from backend server, so they are chunked again,
+        unless client only speaks HTTP/1.0. Every de-chunked piece of body is also passed
+        to body_listener, if given, before buffer is reused.
+        """
+        backend_response = response.raw
+        chunked = backend_response.chunked and incoming_req_details['protocol'] != "HTTP/1.0"
+        # without chunking or known length, body can only end by closing client connection
+        keep_alive = incoming_req_details['keep_alive'] and (chunked or backend_response.length is not None)
+        try:
+            client_sock.sendall(Utils.generate_response_head(response, keep_alive, chunked))
+            buffer = memoryview(bytearray(RELAY_CHUNK_SIZE))
+            while True:
+                size = backend_response.readinto(buffer)
+                if not size:
+                    break
+                if body_listener is not None:
+                    body_listener(buffer[:size])
+                if chunked:
+                    self._send_chunk(client_sock, buffer[:size])
+                else:
+                    client_sock.sendall(buffer[:size])
+            if chunked:
+                client_sock.sendall(b"0\r\n\r\n")
+            # marks body as read completely, so closing response returns backend connection to pool
+            response._content_consumed = True
+        finally:
+            response.close()
+        return keep_alive
+
+    def send_cached_response(self, client_sock: socket.socket, cached: CachedResponse, incoming_req_details: Dict[str, Any]) -> bool:
+        keep_alive = incoming_req_details['keep_alive']
+        client_sock.sendall(Utils.generate_cached_response(cached, keep_alive, cached.get_age(time.monotonic())))
+        return keep_alive
+
+    def send_error_response(self, client_sock: socket.socket, reason: str, message: str, status_code: int = 400, headers: Optional[Dict[str, str]] = None) -> None:
         """
         Sends  error HTTP response to client socket.
 
@@ -43,60 +117,99 @@ class BackendServerCommunicator(ICommunicator):
         :param client_sock (socket.socket): socket object representing client connection.
         :param reason (str): reason for error.
         :param message (str): message explaining error.
+        :param status_code (int): HTTP status code of response.
+        :param headers (dict): extra headers of response.
 
         :return : None
         """
-        response_str = f"HTTP/1.1 400 {reason}\r\n\r\n{message}"
-        client_sock.sendall(response_str.encode())
-        # Check if socket is still connected before shutting down and closing
-        if client_sock.fileno() != -1:
-            client_sock.shutdown(socket.SHUT_RDWR)
-            client_sock.close()
-
-    def make_request(self, host_url: str, incoming_req_details: Dict[str, Any]) -> Union[requests.Response, None]:
+        client_sock.sendall(Utils.generate_error_response(reason, message, status_code, headers))
+
+    def make_request(self, backend_server: IBackendServer, incoming_req_details: Dict[str, Any]) -> Union[requests.Response, None]:
         method = incoming_req_details['method']
         if method in ["GET", "POST", "PUT", "DELETE"]:
             data = incoming_req_details['request_data']
-            headers = incoming_req_details['headers']
+            headers = {key: value for key, value in incoming_req_details['headers'].items() if key.lower() not in HOP_BY_HOP_HEADERS}
             url_path = incoming_req_details['path']
-            url = host_url + url_path
-            return requests.request(method, url, data=data, timeout=REQUEST_TIMEOUT, headers=headers)
+
+            # many requests share few HTTP/2 connections when backend server has http2 enabled and speaks it
+            http2_pool = backend_server.http2_pool
+            if http2_pool is not None and http2_pool.is_supported():
+                try:
+                    stream = http2_pool.request(method, url_path, headers, data)
+                    return Utils.build_response(backend_server.url + url_path, stream.status, stream.reason, stream.headers, raw=stream)
+                except Http2NotSupportedError:
+                    # request was not sent, so it goes over HTTP/1.1 below
+                    pass
+
+            connection_pool = backend_server.connection_pool
+
+            while True:
+                pooled_conn = connection_pool.acquire()
+                try:
+                    # body iterator is sent as is when Content-Length is known, otherwise http.client chunks it
+                    pooled_conn.connection.request(method, url_path, body=data, headers=headers)
+                    backend_response = pooled_conn.connection.getresponse()
+                except (ConnectionResetError, BrokenPipeError, http.client.RemoteDisconnected):
+                    connection_pool.discard(pooled_conn)
+                    # backend server may close idle keep-alive connection just as it gets reused, in that
+                    # case request never reached it, so it is safe to send it again on fresh connection
+                    # as long as there is no body which was already consumed from client
+                    if pooled_conn.reused and data is None:
+                        continue
+                    raise
+                except (OSError, http.client.HTTPException):
+                    connection_pool.discard(pooled_conn)
+                    raise
+
+                # connection goes back to pool once body is read completely and response closed,
+                # response closed before that leaves connection in unknown state, so it is discarded
+                backend_response.release_conn = lambda pooled_conn=pooled_conn, backend_response=backend_response: connection_pool.release(
+                    pooled_conn, reusable=backend_response.isclosed() and not backend_response.closed and not backend_response.will_close)
+                return Utils.build_response(backend_server.url + url_path, backend_response.status, backend_response.reason, backend_response.getheaders(), raw=backend_response)
         else:
             return None
 
 
-    def _extract_incoming_req_details(self, client_sock: socket.socket) -> Dict[str, Any]:
+    # Private methods from here
+
+    def _receive(self, client_sock: socket.socket, parser: HttpRequestParser) -> bool:
         """
-        Extract details of incoming HTTP request from client socket.
+        Feeds next bytes received from client to parser.
 
-        :param client_sock: socket object representing client connection.
-        :type client_sock: socket.socket
-        :return: tuple containing raw request data, HTTP method, protocol, URL path, request headers, and request data of incoming request.
-        :return: dictionary containing raw request data, HTTP method, protocol, URL path, request headers, and request data of incoming request.
-        :rtype: dict[str, Any]
+        :return: False if client closed connection between requests.
+        :raises ConnectionError: if client closed connection in middle of request.
+        """
+        data = client_sock.recv(RELAY_CHUNK_SIZE)
+        if not data:
+            if parser.is_idle():
+                return False
+            raise ConnectionError("Client closed connection in middle of request")
+        parser.feed(data)
+        return True
+
+    def _iter_body(self, client_sock: socket.socket, parser: HttpRequestParser) -> Iterator[bytes]:
+        """
+        Yields de-chunked request body as it is received from client, in pieces of at most RELAY_CHUNK_SIZE bytes.
         """
-        # Check if socket is still connected before shutting down and closing
-        data = client_sock.recv(1024)
-        request_lines = data.split(b"\r\n")
-        request_line = request_lines[0].decode("utf-8")
-        method, path, protocol = request_line.split()
-        headers = {}
-        for line in request_lines[1:]:
-            if not line:
-                break
-            key, value = line.split(b': ', 1)
-            headers[key.decode()] = value.decode()
-        headers_end = request_lines.index(b'')
-        request_data = b'\r\n'.join(request_lines[headers_end+1:])
-        return {
-            'raw_request_data': data,
-            'method': method,
-            'protocol': protocol,
-            'path' : path,
-            'headers' : headers,
-            'request_data' : request_data
-        }
-        
-
-    
+        while True:
+            event = parser.next_event()
+            if event is END_OF_MESSAGE:
+                return
+            if event is NEED_DATA:
+                self._receive(client_sock, parser)
+            else:
+                yield event
 
+    def _send_chunk(self, client_sock: socket.socket, data: memoryview) -> None:
+        """
+        Sends data to client as single chunk of chunked body, without copying data.
+        """
+        parts = [b"%x\r\n" % len(data), data, b"\r\n"]
+        if isinstance(client_sock, ssl.SSLSocket):
+            # TLS socket has no sendmsg, and copies data into encrypted record anyway
+            client_sock.sendall(b"".join(parts))
+            return
+        sent = client_sock.sendmsg(parts)
+        if sent < sum(len(part) for part in parts):
+            # partial write is rare, so copying rest of chunk in that case is fine
+            client_sock.sendall(b"".join(parts)[sent:])
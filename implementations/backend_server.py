@@ -1,25 +1,77 @@
 import time
 import logging
-import requests
 import threading
-from typing import Optional
-from constants.app_constants import HEALTH_CHECK_PERIOD, SERVER_CAPACITY, UNHEALTHY_RECHECK_INTERVAL
+import http.client
+from urllib.parse import urlsplit
+from typing import Optional, Callable
+from constants.app_constants import HEALTH_CHECK_PERIOD, HEALTH_CHECK_TIMEOUT, SERVER_CAPACITY, SERVER_WEIGHT, UNHEALTHY_RECHECK_INTERVAL, SLOW_START_DURATION, SLOW_START_MIN_FACTOR
 from interfaces.backend_server import IBackendServer
+from implementations.latency_tracker import LatencyTracker
+from implementations.metrics import ShardedCounter, Histogram
+from implementations.outlier_detector import OutlierDetector
+from implementations.circuit_breaker import CircuitBreaker
+from implementations.connection_pool import BackendConnectionPool
+from implementations.async_connection_pool import AsyncBackendConnectionPool
+from implementations.http2_connection_pool import Http2ConnectionPool
+from implementations.health_check_scheduler import HealthCheckScheduler
 
 
 class BackendServer(IBackendServer):
-    def __init__(self, url: str, health_check_url: Optional[str], capacity: float = SERVER_CAPACITY,health_check_period: float = HEALTH_CHECK_PERIOD) -> None:
+    def __init__(self, url: str, health_check_url: Optional[str], capacity: float = SERVER_CAPACITY,health_check_period: float = HEALTH_CHECK_PERIOD, weight: int = SERVER_WEIGHT,
+                 health_check_scheduler: Optional[HealthCheckScheduler] = None, health_check_timeout: float = HEALTH_CHECK_TIMEOUT,
+                 unhealthy_recheck_interval: float = UNHEALTHY_RECHECK_INTERVAL, outlier_detector: Optional[OutlierDetector] = None,
+                 slow_start_duration: float = SLOW_START_DURATION, circuit_breaker: Optional[CircuitBreaker] = None, is_healthy: bool = True, http2: bool = False) -> None:
         self.url = url
         self.capacity = capacity #maximum number of concurrent requests that server can handle at given time.
-        self.request_count = 0
-        self.success_count = 0
-        self.error_count = 0
-        self.total_latency = 0
+        self.state_listeners = [] # called with server whenever its health or weight changes
+        self.set_weight(weight)
+
+        # counters are updated by many handler threads at once, so they are sharded per thread to not lose updates
+        self.request_counter = ShardedCounter()
+        self.success_counter = ShardedCounter()
+        self.error_counter = ShardedCounter()
+        self.latency_histogram = Histogram() # latency of successful requests, also holding their total latency
+
+        # recent latency of successful requests, which unlike lifetime average follows changes of server speed
+        self.latency_tracker = LatencyTracker()
+
+        # passive health checking, which ejects server as soon as requests proxied to it start failing
+        self.outlier_detector = outlier_detector or OutlierDetector()
+
+        # circuit breaker stops requests to server which fails or is slow, and lets them back gradually
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+
+        # server recovering from being unhealthy or ejected gets only part of its requests at first
+        self.slow_start_duration = slow_start_duration
+        self.slow_start_time = None # monotonic time slow start began, None when server takes full share
+
+        # requests currently in flight on this server, from sending request until response is relayed
+        self.active_requests = 0
+        self.active_requests_listeners = [] # called with server whenever active_requests changes
+        self.response_time_listeners = [] # called with server whenever its latency average or capacity changes
+
+        # keep-alive connections reused by communicator for requests proxied to this server
+        self.connection_pool = BackendConnectionPool(url)
+        # same for asyncio server mode, whose connections belong to its event loop
+        self.async_connection_pool = AsyncBackendConnectionPool(url)
+        # server with http2 enabled gets requests multiplexed over few HTTP/2 connections, falling back to connection pool above
+        self.http2 = http2
+        self.http2_pool = Http2ConnectionPool(url) if http2 else None
 
         self.stop_health_check_flag = False
         self.health_check_url = health_check_url
         self.health_check_period = health_check_period
-        self.is_healthy = True
+        self.health_check_timeout = health_check_timeout
+        self.unhealthy_recheck_interval = unhealthy_recheck_interval
+        # server added to running load balancer starts unhealthy, so it gets traffic only once health check passes
+        self._is_healthy = is_healthy
+
+        # draining server gets no new requests, while requests already in flight on it finish
+        self.draining = False
+
+        # health checks of all servers are run by shared scheduler, over keep-alive connection reused between checks
+        self.health_check_scheduler = health_check_scheduler or HealthCheckScheduler.get_default()
+        self.health_check_connection = None
 
         #ensures that only one thread can modify is_healthy attribute at time, preventing race conditions and other synchronization issues.
         self.lock = threading.Lock()
@@ -28,84 +80,315 @@ class BackendServer(IBackendServer):
             self.start_health_check()
 
     def increment_request_count(self) -> None:
-        self.request_count += 1
+        self.request_counter.add()
 
     def increment_success_count(self) -> None:
-        self.success_count += 1
+        self.success_counter.add()
 
     def increment_error_count(self) -> None:
-        self.error_count += 1
+        self.error_counter.add()
 
     def add_latency(self, latency: float) -> None:
-        self.total_latency += latency
+        self.latency_histogram.observe(latency)
+        self.latency_tracker.add(latency)
+        for listener in self.response_time_listeners:
+            listener(self)
+
+    @property
+    def request_count(self) -> int:
+        return self.request_counter.get()
+
+    @property
+    def success_count(self) -> int:
+        return self.success_counter.get()
+
+    @property
+    def error_count(self) -> int:
+        return self.error_counter.get()
+
+    @property
+    def total_latency(self) -> float:
+        return self.latency_histogram.get()[1]
+
+    def start_request(self, enforce_capacity: bool = False) -> bool:
+        """
+        Counts request as in flight on server.
+
+        :param enforce_capacity: whether request is refused when server already handles as many requests as its capacity.
+        :return: False if request was refused.
+        """
+        with self.lock:
+            if enforce_capacity and self.active_requests >= self.capacity:
+                return False
+            # half-open circuit lets through only limited number of trial requests
+            if not self.circuit_breaker.allow_request():
+                return False
+            # server may start draining after request handler took snapshot of servers it was still in
+            if self.draining:
+                return False
+            self.active_requests += 1
+        self._notify_active_requests_listeners()
+        return True
+
+    def finish_request(self) -> None:
+        with self.lock:
+            self.active_requests -= 1
+        self._notify_active_requests_listeners()
+
+    def get_active_requests(self) -> int:
+        return self.active_requests
+
+    def add_active_requests_listener(self, listener: Callable[[IBackendServer], None]) -> None:
+        self.active_requests_listeners.append(listener)
+
+    def add_response_time_listener(self, listener: Callable[[IBackendServer], None]) -> None:
+        self.response_time_listeners.append(listener)
 
     def get_capacity(self) -> int:
         return self.capacity
     
     def get_latency(self) -> float:
-        return self.total_latency / self.success_count if self.success_count > 0 else 0
+        return self.latency_tracker.get_ewma()
+
+    def get_latency_percentile(self, percent: float) -> float:
+        return self.latency_tracker.get_percentile(percent)
     
     def set_capacity(self, capacity: int) -> None:
         self.capacity = capacity
+        for listener in self.response_time_listeners:
+            listener(self)
+
+    def get_weight(self) -> int:
+        return self.weight
+
+    def set_weight(self, weight: int) -> None:
+        # share of requests weighted algorithms send to server, relative to weights of other servers
+        if not isinstance(weight, int) or weight < 0:
+            raise ValueError(f"Weight of server {self.url} must be non-negative integer, got {weight!r}")
+        changed = getattr(self, "weight", weight) != weight
+        self.weight = weight
+        if changed:
+            self._notify_state_listeners()
+
+    def set_draining(self, draining: bool) -> None:
+        changed = self.draining != draining
+        self.draining = draining
+        if changed:
+            logging.info(f"Server {self.url} {'is draining' if draining else 'stopped draining'}")
+            self._notify_state_listeners()
+
+    def is_draining(self) -> bool:
+        return self.draining
+
+    @property
+    def is_healthy(self) -> bool:
+        return self._is_healthy
+
+    @is_healthy.setter
+    def is_healthy(self, is_healthy: bool) -> None:
+        # listeners only hear about transitions, not about every health check confirming current state
+        with self.lock:
+            changed = self._is_healthy != is_healthy
+            self._is_healthy = is_healthy
+        if changed:
+            if is_healthy:
+                self.start_slow_start()
+            self._notify_state_listeners()
+
+    def is_ejected(self) -> bool:
+        return self.outlier_detector.is_ejected()
+
+    def is_available(self) -> bool:
+        """
+        Returns True if server is healthy, not ejected, not draining and its circuit is not open, so requests can be sent to it.
+        """
+        return self._is_healthy and not self.draining and not self.outlier_detector.is_ejected() and self.circuit_breaker.state != CircuitBreaker.OPEN
+
+    def record_outcome(self, success: bool, latency: Optional[float] = None) -> Optional[str]:
+        """
+        Records whether request proxied to server succeeded, and how long it took if it got response.
+
+        :return: reason server should be ejected for, or None if it should stay in service.
+        """
+        self._on_circuit_changed(self.circuit_breaker.record(success, latency))
+        return self.outlier_detector.record(success)
+
+    def update_circuit_breaker(self) -> None:
+        """
+        Lets open circuit go half-open once its open time is over.
+        """
+        self._on_circuit_changed(self.circuit_breaker.update())
+
+    def eject(self, reason: str) -> None:
+        """
+        Takes server out of service until it is readmitted, without waiting for health check to fail.
+        """
+        ejection_time = self.outlier_detector.eject()
+        logging.warning(f"Ejected server {self.url} for {ejection_time:.0f} seconds: {reason}")
+        self._notify_state_listeners()
+
+    def readmit(self) -> None:
+        """
+        Puts ejected server back in service, with slow start.
+        """
+        self.outlier_detector.readmit()
+        self.start_slow_start()
+        logging.info(f"Readmitted server {self.url}")
+        self._notify_state_listeners()
+
+    def start_slow_start(self) -> None:
+        if self.slow_start_duration > 0:
+            self.slow_start_time = time.monotonic()
+
+    def get_slow_start_factor(self) -> float:
+        """
+        Returns share of its normal requests server takes, which ramps up from SLOW_START_MIN_FACTOR
+        to 1 over slow start duration after server recovers.
+        """
+        if self.slow_start_time is None:
+            return 1.0
+        elapsed = time.monotonic() - self.slow_start_time
+        if elapsed >= self.slow_start_duration:
+            self.slow_start_time = None
+            return 1.0
+        return max(SLOW_START_MIN_FACTOR, elapsed / self.slow_start_duration)
+
+    def add_state_listener(self, listener: Callable[[IBackendServer], None]) -> None:
+        self.state_listeners.append(listener)
 
     def stop_health_check(self) -> None:
         self.stop_health_check_flag = True
+        self.health_check_scheduler.cancel(self)
 
     def get_stats(self) -> dict:
+        success_count = self.success_count
         return {
             "server_url" : self.url,
             "server_capacity" : self.capacity,
+            "server_weight" : self.weight,
+            "is_healthy": self._is_healthy,
+            "draining": self.draining,
             "request_count": self.request_count,
-            "success_count": self.success_count,
+            "success_count": success_count,
             "error_count": self.error_count,
-            "avg_latency": self.get_latency(),
+            "avg_latency": self.total_latency / success_count if success_count > 0 else 0,
+            "latency": self.latency_tracker.get_stats(),
+            "active_requests": self.active_requests,
+            "connection_pool": self.connection_pool.get_stats(),
+            "async_connection_pool": self.async_connection_pool.get_stats(),
+            "http2_pool": self.http2_pool.get_stats() if self.http2_pool is not None else None,
+            "outlier_detection": self.outlier_detector.get_stats(),
+            "slow_start_factor": self.get_slow_start_factor(),
+            "circuit_breaker": self.circuit_breaker.get_stats(),
         }
     
-    def start_health_check(self) -> None:
+    def close_connections(self) -> None:
         """
-        Starts new thread to execute health check function
+        Closes pooled HTTP/1.1 and HTTP/2 connections to server.
         """
-        thread = threading.Thread(target=self._health_check, daemon=True)
-        thread.start()
-
+        self.connection_pool.close()
+        self.async_connection_pool.close()
+        if self.http2_pool is not None:
+            self.http2_pool.close()
 
-    # Private methods from here
+    def start_health_check(self) -> None:
+        """
+        Schedules periodic health checks of server with health check scheduler. Unhealthy server
+        is checked right away, so server added to running load balancer goes in service soon.
+        """
+        self.stop_health_check_flag = False
+        self.health_check_scheduler.schedule(self, None if self._is_healthy else 0)
 
-    def _health_check(self) -> None:
+    def check_health(self) -> None:
         """
-        Checks health of server by sending GET request to health check URL at regular intervals
+        Runs single health check of server, called by health check scheduler.
         """
-        last_health_check_time = time.time()
-        
-        while not self.stop_health_check_flag:
+        if not self.stop_health_check_flag:
             self._check_server_health()
-            last_health_check_time = self._wait_for_health_check_period(last_health_check_time)
-            
+
+    def get_health_check_interval(self) -> float:
+        """
+        Returns seconds until next health check of server is due.
+        """
+        return self.health_check_period if self._is_healthy else self.unhealthy_recheck_interval
+
+
+    # Private methods from here
+
+    def _notify_state_listeners(self) -> None:
+        for listener in self.state_listeners:
+            listener(self)
+
+    def _on_circuit_changed(self, state: Optional[str]) -> None:
+        if state is None:
+            return
+        logging.warning(f"Circuit of server {self.url} is now {state}")
+        if state == CircuitBreaker.CLOSED:
+            self.start_slow_start()
+        self._notify_state_listeners()
+
+    def _notify_active_requests_listeners(self) -> None:
+        # listeners are called outside of lock, so they may take locks of their own
+        for listener in self.active_requests_listeners:
+            listener(self)
+
     def _check_server_health(self) -> None:
         """
         Checks health of server by making GET request to health check URL.
 
         If server responds with status code of 200, it is considered healthy and the
         _set_server_healthy() method is called. Otherwise, _set_server_unhealthy() method
-        is called, followed by _try_to_recover_server_health() method.
+        is called. Server which is already unhealthy is checked by _try_to_recover_server_health()
+        method instead.
         """
+        if not self._is_healthy:
+            self._try_to_recover_server_health()
+            return
         try:
-            response = requests.get(self.health_check_url)
-            if response.status_code == 200:
+            status_code = self._probe_health()
+            if status_code == 200:
                 self._set_server_healthy()
             else:
                 self._set_server_unhealthy()
-                self._try_to_recover_server_health()
-        except requests.exceptions.RequestException as e:
+        except (OSError, http.client.HTTPException) as e:
+            logging.debug(f"Health check of server {self.url} failed: {e!r}")
             self._set_server_unhealthy()
 
+    def _probe_health(self) -> int:
+        """
+        Sends GET request to health check URL and returns status code of response.
+
+        Connection is kept open for next check, unless server closes it or request fails.
+        Whole check is bounded by health_check_timeout, so hung health endpoint cannot block
+        probe thread for long.
+        """
+        url_parts = urlsplit(self.health_check_url)
+        if self.health_check_connection is None:
+            connection_class = http.client.HTTPSConnection if url_parts.scheme == "https" else http.client.HTTPConnection
+            self.health_check_connection = connection_class(url_parts.netloc, timeout=self.health_check_timeout)
+        path = url_parts.path or "/"
+        if url_parts.query:
+            path += "?" + url_parts.query
+        try:
+            self.health_check_connection.request("GET", path)
+            response = self.health_check_connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            self.health_check_connection.close()
+            self.health_check_connection = None
+            raise
+        if response.will_close:
+            self.health_check_connection.close()
+            self.health_check_connection = None
+        return response.status
+
     def _set_server_healthy(self) -> None:
         """
         Sets is_healthy attribute to True and logs message indicating that server
         is healthy.
         """
         self.is_healthy = True
-        logging.info(f"Server {self.url} is healthy. Current thread: {threading.current_thread().name}")
+        logging.debug(f"Server {self.url} is healthy. Current thread: {threading.current_thread().name}")
         
     def _set_server_unhealthy(self) -> None:
         """
@@ -117,32 +400,18 @@ class BackendServer(IBackendServer):
         
     def _try_to_recover_server_health(self) -> None:
         """
-        Attempts to recover health of server by checking its health periodically.
-
-        If server is still unhealthy after certain number of checks, it is assumed to be
-        permanently down and no further recovery attempts are made.
-        """
-        last_health_check_time = time.time()
-        if (time.time() - last_health_check_time) > UNHEALTHY_RECHECK_INTERVAL:
-            logging.info(f"Checking health of unhealthy server {self.url}")
-            try:
-                response = requests.get(self.health_check_url)
-                if response.status_code == 200:
-                    self._set_server_healthy()
-                    logging.info(f"Server {self.url} is healthy again. Current thread: {threading.current_thread().name}")
-                else:
-                    logging.debug(f"Server {self.url} is still unhealthy. Current thread: {threading.current_thread().name}")
-            except requests.exceptions.RequestException as e:
-                logging.debug(f"Unable to check health of server {self.url} due to error: {e}. Current thread: {threading.current_thread().name}")
-        
-    def _wait_for_health_check_period(self, last_health_check_time) -> float:
-        """
-        Sleeps for period of time equal to difference between current time and last health check time
-        plus configured health check period. 
-        If time since last health check is greater than or equal
-        to health check period, function immediately returns current time.
+        Attempts to recover health of unhealthy server by checking its health again.
+
+        Unhealthy server is checked every unhealthy_recheck_interval seconds instead of every
+        health check period (see get_health_check_interval), until it responds with 200 and
+        goes back in service with slow start.
         """
-        time_since_last_health_check = time.time() - last_health_check_time
-        time_to_sleep = max(0, self.health_check_period - time_since_last_health_check)
-        time.sleep(time_to_sleep)
-        return time.time()
\ No newline at end of file
+        logging.info(f"Checking health of unhealthy server {self.url}")
+        try:
+            if self._probe_health() == 200:
+                self._set_server_healthy()
+                logging.info(f"Server {self.url} is healthy again. Current thread: {threading.current_thread().name}")
+            else:
+                logging.debug(f"Server {self.url} is still unhealthy. Current thread: {threading.current_thread().name}")
+        except (OSError, http.client.HTTPException) as e:
+            logging.debug(f"Unable to check health of server {self.url} due to error: {e}. Current thread: {threading.current_thread().name}")
@@ -0,0 +1,138 @@
+import time
+import threading
+from collections import deque
+from typing import Dict, Any, Optional
+
+from constants.app_constants import CIRCUIT_BREAKER_WINDOW_SIZE, CIRCUIT_BREAKER_MIN_REQUESTS, CIRCUIT_BREAKER_ERROR_RATE, CIRCUIT_BREAKER_SLOW_REQUEST_TIME, \
+    CIRCUIT_BREAKER_SLOW_REQUEST_RATE, CIRCUIT_BREAKER_OPEN_TIME, CIRCUIT_BREAKER_HALF_OPEN_REQUESTS
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker of single backend server.
+
+    While circuit is closed, requests flow normally and their outcomes are recorded over
+    window of recent requests. Once too many of them fail or are slow, circuit opens and
+    server gets no requests at all, so overloaded server is relieved at once instead of at
+    its next health check. After open_time circuit goes half-open and lets through only
+    half_open_requests trial requests: if all of them succeed circuit closes, if any of
+    them fails circuit opens again. Trials are limited, so recovering server is not hit by
+    all waiting traffic at once.
+
+    :param window_size: number of most recent requests rates are computed over.
+    :param min_requests: requests needed in window before circuit can open.
+    :param error_rate: fraction of failed requests in window which opens circuit.
+    :param slow_request_time: seconds after which request counts as slow.
+    :param slow_request_rate: fraction of slow requests in window which opens circuit.
+    :param open_time: seconds circuit stays open before it goes half-open.
+    :param half_open_requests: trial requests which all have to succeed for circuit to close.
+    """
+
+    # circuit states
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, window_size: int = CIRCUIT_BREAKER_WINDOW_SIZE, min_requests: int = CIRCUIT_BREAKER_MIN_REQUESTS, error_rate: float = CIRCUIT_BREAKER_ERROR_RATE,
+                 slow_request_time: float = CIRCUIT_BREAKER_SLOW_REQUEST_TIME, slow_request_rate: float = CIRCUIT_BREAKER_SLOW_REQUEST_RATE,
+                 open_time: float = CIRCUIT_BREAKER_OPEN_TIME, half_open_requests: int = CIRCUIT_BREAKER_HALF_OPEN_REQUESTS) -> None:
+        self.min_requests = min_requests
+        self.error_rate = error_rate
+        self.slow_request_time = slow_request_time
+        self.slow_request_rate = slow_request_rate
+        self.open_time = open_time
+        self.half_open_requests = half_open_requests
+
+        self.state = self.CLOSED
+        self.state_since = time.monotonic()
+        self.window = deque(maxlen=window_size) # (failed, slow) of every request in window
+        self.failures = 0 # failed requests in window
+        self.slow_requests = 0 # slow requests in window
+        self.trials_started = 0 # trial requests let through since circuit went half-open
+        self.trials_succeeded = 0
+        self.transitions = {self.OPEN: 0, self.HALF_OPEN: 0, self.CLOSED: 0} # times circuit entered each state
+        self.lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """
+        Tells whether request may be sent to server, counting it as trial while circuit is half-open.
+        """
+        if self.state == self.CLOSED:
+            return True
+        with self.lock:
+            if self.state == self.HALF_OPEN and self.trials_started < self.half_open_requests:
+                self.trials_started += 1
+                return True
+            return self.state == self.CLOSED
+
+    def record(self, success: bool, latency: Optional[float] = None) -> Optional[str]:
+        """
+        Records outcome of request sent to server.
+
+        :return: state circuit moved to because of this request, or None if it did not change.
+        """
+        slow = latency is not None and latency >= self.slow_request_time
+        with self.lock:
+            if self.state == self.CLOSED:
+                if len(self.window) == self.window.maxlen:
+                    old_failed, old_slow = self.window[0]
+                    self.failures -= old_failed
+                    self.slow_requests -= old_slow
+                self.window.append((not success, slow))
+                self.failures += not success
+                self.slow_requests += slow
+                if len(self.window) >= self.min_requests and (self.failures >= self.error_rate * len(self.window) or self.slow_requests >= self.slow_request_rate * len(self.window)):
+                    return self._move_to(self.OPEN)
+            elif self.state == self.HALF_OPEN:
+                if not success or slow:
+                    return self._move_to(self.OPEN)
+                self.trials_succeeded += 1
+                if self.trials_succeeded >= self.half_open_requests:
+                    return self._move_to(self.CLOSED)
+            return None
+
+    def update(self, now: Optional[float] = None) -> Optional[str]:
+        """
+        Moves open circuit to half-open once open_time is over.
+
+        Half-open circuit whose trials did not all report back within open_time (request may
+        end without outcome, e.g. when client goes away) gets new round of trials.
+
+        :return: state circuit moved to, or None if it did not change.
+        """
+        now = time.monotonic() if now is None else now
+        if self.state == self.CLOSED or now - self.state_since < self.open_time:
+            return None
+        with self.lock:
+            if self.state == self.OPEN:
+                return self._move_to(self.HALF_OPEN, now)
+            if self.state == self.HALF_OPEN:
+                self.trials_started = self.trials_succeeded = 0
+                self.state_since = now
+            return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "state_duration": time.monotonic() - self.state_since,
+            "transitions": dict(self.transitions),
+            "window_error_rate": self.failures / len(self.window) if self.window else 0,
+            "window_slow_rate": self.slow_requests / len(self.window) if self.window else 0,
+        }
+
+
+    # Private methods from here
+
+    def _move_to(self, state: str, now: Optional[float] = None) -> str:
+        """
+        Changes state of circuit, must be called with lock held.
+        """
+        self.state = state
+        self.state_since = time.monotonic() if now is None else now
+        self.transitions[state] += 1
+        self.trials_started = self.trials_succeeded = 0
+        if state == self.CLOSED:
+            # closed circuit judges server by requests it gets from now on
+            self.window.clear()
+            self.failures = self.slow_requests = 0
+        return state
@@ -0,0 +1,135 @@
+import os
+import json
+import logging
+import threading
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+from constants.app_constants import CONFIG_POLL_INTERVAL
+
+
+def load_backend_servers_config(path: str) -> List[Dict[str, Any]]:
+    """
+    Loads backend servers configuration from JSON, TOML or YAML file, chosen by file extension.
+
+    File holds list of backend servers under "backend_servers" key, each with url and optional
+    health_check_url, weight and draining, same as BACKEND_SERVERS_CONFIG. JSON and YAML file
+    may also hold the list alone.
+
+    :raises ValueError: if file cannot be parsed or does not hold valid configuration.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, "rb") as file:
+        content = file.read()
+    if extension == ".toml":
+        # tomllib is part of standard library since Python 3.11
+        try:
+            import tomllib
+        except ImportError:
+            raise ValueError(f"Python 3.11 or newer is needed to load {path}")
+        config = tomllib.loads(content.decode())
+    elif extension in (".yaml", ".yml"):
+        # PyYAML is optional dependency, needed only for YAML configuration files
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError(f"PyYAML has to be installed to load {path}")
+        try:
+            config = yaml.safe_load(content)
+        except yaml.YAMLError as e:
+            raise ValueError(f"Invalid YAML in {path}: {e}")
+    else:
+        config = json.loads(content)
+
+    if isinstance(config, dict):
+        config = config.get("backend_servers")
+    validate_backend_servers_config(config)
+    return config
+
+
+def validate_backend_servers_config(config: Any) -> None:
+    """
+    Checks that configuration is list of backend servers with unique urls, valid weights and http2 flags.
+
+    :raises ValueError: if it is not.
+    """
+    if not isinstance(config, list):
+        raise ValueError("Backend servers configuration must be list of backend servers")
+    urls = set()
+    for server in config:
+        if not isinstance(server, dict) or not isinstance(server.get("url"), str) or not server["url"]:
+            raise ValueError(f"Backend server must have url, got {server!r}")
+        if server["url"] in urls:
+            raise ValueError(f"Backend server {server['url']} is configured twice")
+        urls.add(server["url"])
+        weight = server.get("weight")
+        if weight is not None and (not isinstance(weight, int) or isinstance(weight, bool) or weight < 0):
+            raise ValueError(f"Weight of server {server['url']} must be non-negative integer, got {weight!r}")
+        if not isinstance(server.get("http2", False), bool):
+            raise ValueError(f"http2 of server {server['url']} must be true or false, got {server['http2']!r}")
+
+
+class ConfigWatcher:
+    """
+    Watches backend servers configuration file and hands its content to callback whenever it changes.
+
+    File is polled for change of its modification time or size, which needs no platform
+    specific file notification API. Configuration which fails to load is logged and ignored,
+    so load balancer keeps running with last valid one.
+
+    :param path: path of configuration file.
+    :param on_change: called with loaded configuration after file changed.
+    :param poll_interval: seconds between checks of file.
+    """
+
+    def __init__(self, path: str, on_change: Callable[[List[Dict[str, Any]]], None], poll_interval: float = CONFIG_POLL_INTERVAL) -> None:
+        self.path = path
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self.last_signature = self._get_signature() # file state configuration was last loaded from
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self) -> None:
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="lb-config-watcher", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stop_event.set()
+
+    def check(self) -> bool:
+        """
+        Reloads configuration if file changed since last check.
+
+        :return: True if changed configuration was loaded and handed to callback.
+        """
+        signature = self._get_signature()
+        if signature == self.last_signature or signature is None:
+            return False
+        self.last_signature = signature
+        try:
+            config = load_backend_servers_config(self.path)
+        except (OSError, ValueError) as e:
+            logging.error(f"Keeping current backend servers, configuration in {self.path} is invalid: {e}")
+            return False
+        logging.info(f"Reloading backend servers from {self.path}")
+        self.on_change(config)
+        return True
+
+
+    # Private methods from here
+
+    def _run(self) -> None:
+        while not self.stop_event.wait(self.poll_interval):
+            try:
+                self.check()
+            except Exception as e:
+                # watcher thread must keep running whatever goes wrong with single reload
+                logging.exception(f"Failed to reload backend servers from {self.path}: {e!r}")
+
+    def _get_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
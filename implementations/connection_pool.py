@@ -0,0 +1,154 @@
+import time
+import select
+import logging
+import threading
+import http.client
+from collections import deque
+from urllib.parse import urlsplit
+
+from constants.app_constants import REQUEST_TIMEOUT, CONNECTION_POOL_SIZE, CONNECTION_POOL_IDLE_TIMEOUT, CONNECTION_POOL_MAX_LIFETIME
+
+
+class PooledConnection:
+    """
+    HTTP connection to backend server together with bookkeeping needed by BackendConnectionPool.
+
+    :param connection: underlying http.client connection.
+    """
+
+    def __init__(self, connection: http.client.HTTPConnection):
+        self.connection = connection
+        self.created_at = time.monotonic()
+        self.released_at = self.created_at
+        self.reused = False # whether connection already carried earlier request
+
+
+class BackendConnectionPool:
+    """
+    Pool of keep-alive HTTP connections to single backend server.
+
+    Idle connections are reused most recently released first, so surplus connections
+    stay idle long enough to hit idle timeout and get closed. When no idle connection
+    is available new one is opened, and at most max_size connections are kept idle
+    once released - surplus ones are closed.
+
+    :param url: base URL of backend server.
+    :param max_size: maximum number of idle connections kept open.
+    :param idle_timeout: seconds idle connection is kept before it is closed.
+    :param max_lifetime: seconds after which connection is closed instead of being reused.
+    :param timeout: socket timeout (in seconds) of each connection.
+    """
+
+    def __init__(self, url: str, max_size: int = CONNECTION_POOL_SIZE, idle_timeout: float = CONNECTION_POOL_IDLE_TIMEOUT, max_lifetime: float = CONNECTION_POOL_MAX_LIFETIME, timeout: float = REQUEST_TIMEOUT) -> None:
+        url_parts = urlsplit(url)
+        self.netloc = url_parts.netloc
+        self.connection_class = http.client.HTTPSConnection if url_parts.scheme == "https" else http.client.HTTPConnection
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+
+        self.idle_connections = deque()
+        self.open_count = 0
+        self.hits = 0 # requests served by reused idle connection
+        self.misses = 0 # requests for which new connection had to be opened
+        self.closed = False
+        self.lock = threading.Lock()
+
+    def acquire(self) -> PooledConnection:
+        """
+        Returns idle connection which is still usable, or opens new connection if there is none.
+        """
+        with self.lock:
+            while self.idle_connections:
+                pooled_conn = self.idle_connections.pop()
+                if self._is_usable(pooled_conn):
+                    pooled_conn.reused = True
+                    self.hits += 1
+                    return pooled_conn
+                self._close(pooled_conn)
+            self.misses += 1
+            self.open_count += 1
+
+        # connection is established lazily by http.client on first request, so nothing blocks while holding lock
+        # and invalid backend server URL surfaces as request error rather than here
+        return PooledConnection(self.connection_class(self.netloc, timeout=self.timeout))
+
+    def release(self, pooled_conn: PooledConnection, reusable: bool = True) -> None:
+        """
+        Returns connection to pool once response has been read completely.
+
+        :param pooled_conn: connection returned by acquire().
+        :param reusable: False if connection must not carry further requests, e.g. backend server asked to close it.
+        """
+        pooled_conn.released_at = time.monotonic()
+        with self.lock:
+            if reusable and not self.closed and len(self.idle_connections) < self.max_size and not self._is_expired(pooled_conn, pooled_conn.released_at):
+                self.idle_connections.append(pooled_conn)
+            else:
+                self._close(pooled_conn)
+
+    def discard(self, pooled_conn: PooledConnection) -> None:
+        """
+        Closes connection which failed while in use, instead of returning it to pool.
+        """
+        with self.lock:
+            self._close(pooled_conn)
+
+    def close(self) -> None:
+        """
+        Closes every idle connection. Connections currently in use are closed when released.
+        """
+        with self.lock:
+            while self.idle_connections:
+                self._close(self.idle_connections.pop())
+            self.closed = True
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "open": self.open_count,
+                "idle": len(self.idle_connections),
+            }
+
+
+    # Private methods from here
+
+    def _is_expired(self, pooled_conn: PooledConnection, now: float) -> bool:
+        return now - pooled_conn.created_at > self.max_lifetime
+
+    def _is_usable(self, pooled_conn: PooledConnection) -> bool:
+        """
+        Checks whether idle connection can carry another request.
+
+        Connection is evicted when it sat idle for too long, outlived its max lifetime, or was
+        closed by backend server meanwhile. Closed connection is detected by polling socket without
+        waiting: idle keep-alive connection must have nothing to read, so readable socket (EOF or
+        unexpected data) means it is broken.
+        """
+        now = time.monotonic()
+        if now - pooled_conn.released_at > self.idle_timeout or self._is_expired(pooled_conn, now):
+            return False
+        sock = pooled_conn.connection.sock
+        if sock is None:
+            return False
+        try:
+            if hasattr(select, "poll"):
+                poller = select.poll()
+                poller.register(sock, select.POLLIN)
+                return not poller.poll(0)
+            return not select.select([sock], [], [], 0)[0]
+        except (OSError, ValueError):
+            return False
+
+    def _close(self, pooled_conn: PooledConnection) -> None:
+        """
+        Closes connection and stops counting it as open. Must be called while holding lock.
+        """
+        try:
+            pooled_conn.connection.close()
+        except OSError as e:
+            logging.debug(f"Error while closing connection to {self.netloc}: {e}")
+        self.open_count -= 1
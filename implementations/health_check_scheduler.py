@@ -0,0 +1,140 @@
+import time
+import heapq
+import random
+import logging
+import threading
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from interfaces.backend_server import IBackendServer
+from constants.app_constants import HEALTH_CHECK_CONCURRENCY, HEALTH_CHECK_JITTER
+
+
+class HealthCheckScheduler:
+    """
+    Runs health checks of any number of backend servers from single scheduler thread and
+    small pool of probe threads.
+
+    Next check of every server is kept in min-heap ordered by due time, and scheduler thread
+    sleeps until earliest one is due, so idle servers cost nothing but heap entry. Due checks
+    run in pool of at most max_concurrency threads, so slow or hung health endpoint (bounded
+    by server's health check timeout) delays only its own checks. Every period is randomly
+    stretched or shrunk by jitter, so checks of many servers do not bunch up.
+
+    :param max_concurrency: maximum number of health checks running at same time.
+    :param jitter: fraction by which each health check period is randomly stretched or shrunk.
+    """
+
+    default_scheduler = None # shared by backend servers created without scheduler of their own
+    default_scheduler_lock = threading.Lock()
+
+    def __init__(self, max_concurrency: int = HEALTH_CHECK_CONCURRENCY, jitter: float = HEALTH_CHECK_JITTER) -> None:
+        self.max_concurrency = max_concurrency
+        self.jitter = jitter
+        self.heap = [] # entries (due time, token, server)
+        self.tokens = {} # token of current schedule of each server, entries with other tokens are stale
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.executor = None
+        self.thread = None
+        self.stopped = False
+        self.checks_run = 0
+
+    @classmethod
+    def get_default(cls) -> "HealthCheckScheduler":
+        with cls.default_scheduler_lock:
+            if cls.default_scheduler is None:
+                cls.default_scheduler = cls()
+            return cls.default_scheduler
+
+    def schedule(self, server: IBackendServer, delay: Optional[float] = None) -> None:
+        """
+        Schedules periodic health checks of server, replacing its previous schedule.
+
+        :param server: backend server to check.
+        :param delay: seconds until first check, random fraction of jitter by default, so servers added together are not checked at once.
+        """
+        if delay is None:
+            delay = random.uniform(0, self.jitter * server.health_check_period)
+        with self.condition:
+            if self.stopped:
+                return
+            token = next(self.sequence)
+            self.tokens[server] = token
+            heapq.heappush(self.heap, (time.monotonic() + delay, token, server))
+            self._start()
+            self.condition.notify()
+
+    def cancel(self, server: IBackendServer) -> None:
+        """
+        Stops health checks of server. Check already running finishes, but is not rescheduled.
+        """
+        with self.condition:
+            self.tokens.pop(server, None)
+
+    def stop(self) -> None:
+        """
+        Cancels health checks of every server and stops scheduler thread and probe threads.
+        """
+        with self.condition:
+            self.stopped = True
+            self.tokens.clear()
+            self.heap.clear()
+            self.condition.notify()
+            thread, executor = self.thread, self.executor
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        if executor is not None:
+            # running checks are bounded by their timeout, nothing waits for them here
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self) -> dict:
+        with self.condition:
+            return {
+                "scheduled_servers": len(self.tokens),
+                "checks_run": self.checks_run,
+                "max_concurrency": self.max_concurrency,
+            }
+
+
+    # Private methods from here
+
+    def _start(self) -> None:
+        # threads are started on first schedule, so scheduler which checks nothing costs no threads
+        if self.thread is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="health-check")
+            self.thread = threading.Thread(target=self._run, name="health-check-scheduler", daemon=True)
+            self.thread.start()
+
+    def _run(self) -> None:
+        with self.condition:
+            while not self.stopped:
+                if not self.heap:
+                    self.condition.wait()
+                    continue
+                due_time, token, server = self.heap[0]
+                if self.tokens.get(server) != token:
+                    # server was cancelled or rescheduled meanwhile
+                    heapq.heappop(self.heap)
+                    continue
+                wait_time = due_time - time.monotonic()
+                if wait_time > 0:
+                    self.condition.wait(wait_time)
+                    continue
+                heapq.heappop(self.heap)
+                self.executor.submit(self._check, server, token)
+
+    def _check(self, server: IBackendServer, token: int) -> None:
+        try:
+            server.check_health()
+        except Exception as e:
+            # probe thread must survive whatever single check throws
+            logging.exception(f"Health check of server {server.url} failed unexpectedly: {e}")
+        with self.condition:
+            self.checks_run += 1
+            # next check is scheduled only once this one finished, so checks of one server never overlap
+            if not self.stopped and self.tokens.get(server) == token:
+                period = server.get_health_check_interval() * random.uniform(1 - self.jitter, 1 + self.jitter)
+                heapq.heappush(self.heap, (time.monotonic() + period, token, server))
+                self.condition.notify()
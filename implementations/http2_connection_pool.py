@@ -0,0 +1,574 @@
+import time
+import socket
+import logging
+import threading
+from http import HTTPStatus
+from collections import deque
+from urllib.parse import urlsplit
+from typing import List, Tuple, Dict, Optional, Iterable, Callable
+
+from constants.app_constants import REQUEST_TIMEOUT, CONNECTION_POOL_IDLE_TIMEOUT, HOP_BY_HOP_HEADERS
+from constants.app_constants import HTTP2_MAX_CONNECTIONS, HTTP2_MAX_CONCURRENT_STREAMS, HTTP2_STREAM_WINDOW_SIZE, HTTP2_CONNECTION_WINDOW_SIZE
+
+try:
+    # h2 is optional dependency, needed only when some backend server has http2 enabled
+    import h2.config
+    import h2.events
+    import h2.settings
+    import h2.errors
+    import h2.exceptions
+    import h2.connection
+except ImportError:
+    h2 = None
+
+
+class Http2NotSupportedError(Exception):
+    """
+    Raised when backend server does not speak HTTP/2, before request was sent to it, so request can go over HTTP/1.1 instead.
+    """
+
+
+class Http2ResponseStream:
+    """
+    Response of backend server arriving on single HTTP/2 stream.
+
+    Used as raw attribute of response objects, like http.client response is for HTTP/1.1,
+    so response is relayed to client same way. Received body is acknowledged to backend
+    server, which reopens its flow control window, only once it is read from stream, so
+    client which reads slowly holds back only its own stream and memory buffered per stream
+    is bounded by stream window.
+
+    :param connection: connection stream belongs to.
+    :param stream_id: HTTP/2 stream identifier.
+    """
+
+    def __init__(self, connection: "Http2Connection", stream_id: int) -> None:
+        self.connection = connection
+        self.stream_id = stream_id
+        self.status = None # status code, once response head arrived
+        self.reason = ""
+        self.headers = None # response headers as (name, value) pairs, once response head arrived
+        self.length = None # body length announced by Content-Length, None if body ends only with stream
+        self.chunked = False # whether body has to be chunked again for HTTP/1.1 client, as its length is unknown
+        self.data = deque() # [received bytes not read yet, flow controlled length to acknowledge once they are read]
+        self.ended = False # whether backend server finished sending response
+        self.error = None # exception raised to reader of stream once backend server reset it or connection broke
+        self.closed = False
+
+    def wait_for_head(self) -> None:
+        """
+        Waits until response status and headers arrive.
+        """
+        with self.connection.condition:
+            self.connection.wait_for(lambda: self.headers is not None, f"Timed out waiting for HTTP/2 response on stream {self.stream_id}", self)
+            length = next((value for name, value in self.headers if name == "content-length"), None)
+            if length is not None:
+                self.length = int(length)
+            elif self.status in (204, 304):
+                self.length = 0
+            elif self.ended and not self.data:
+                # response without body, HTTP/1.1 client needs its length anyway to reuse connection
+                self.length = 0
+                self.headers.append(("content-length", "0"))
+            self.chunked = self.length is None
+
+    def readinto(self, buffer: memoryview) -> int:
+        """
+        Reads next piece of body into buffer, waiting for it to arrive.
+
+        :return: number of bytes read, 0 once body ended.
+        """
+        with self.connection.condition:
+            self.connection.wait_for(lambda: self.data or self.ended, f"Timed out reading HTTP/2 response body on stream {self.stream_id}", self)
+            if not self.data:
+                return 0
+            entry = self.data[0]
+            size = min(len(buffer), len(entry[0]))
+            buffer[:size] = entry[0][:size]
+            if size < len(entry[0]):
+                entry[0] = entry[0][size:]
+            else:
+                self.data.popleft()
+                self.connection.acknowledge(self.stream_id, entry[1])
+            return size
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        """
+        Reads at most amt bytes of body, or all of it, as requests does to load response content.
+        """
+        pieces = []
+        buffer = memoryview(bytearray(min(amt, 65536) if amt else 65536))
+        remaining = amt
+        while remaining is None or remaining > 0:
+            size = self.readinto(buffer if remaining is None else buffer[:remaining])
+            if not size:
+                break
+            pieces.append(bytes(buffer[:size]))
+            if remaining is not None:
+                remaining -= size
+        return b"".join(pieces)
+
+    def close(self) -> None:
+        """
+        Ends stream, cancelling it if backend server is still sending response.
+        """
+        self.connection.close_stream(self)
+
+    def release_conn(self) -> None:
+        # requests calls this when response is closed after its body was read, instead of close()
+        self.close()
+
+
+class Http2Connection:
+    """
+    Single HTTP/2 connection to backend server, in cleartext with prior knowledge (h2c).
+
+    Frames sent by backend server are read by thread of connection, which hands them to
+    streams waiting for them. All state of connection is guarded by single lock, shared by
+    condition streams wait on.
+
+    :param host: host of backend server.
+    :param port: port of backend server.
+    :param timeout: seconds after which waiting for backend server fails.
+    :param max_concurrent_streams: upper limit of streams open at once, lower limit from SETTINGS of backend server wins.
+    :param on_stream_closed: called whenever stream is closed or connection breaks, so waiting requests can take their place.
+    :raises Http2NotSupportedError: if backend server does not answer connection preface with SETTINGS.
+    """
+
+    def __init__(self, host: str, port: int, timeout: float = REQUEST_TIMEOUT, max_concurrent_streams: int = HTTP2_MAX_CONCURRENT_STREAMS,
+                 idle_timeout: float = CONNECTION_POOL_IDLE_TIMEOUT, on_stream_closed: Optional[Callable[[], None]] = None) -> None:
+        self.timeout = timeout
+        self.max_concurrent_streams = max_concurrent_streams
+        self.idle_timeout = idle_timeout
+        self.on_stream_closed = on_stream_closed
+        self.streams = {} # stream id -> Http2ResponseStream of streams open on connection
+        self.reserved = 0 # streams reserved by requests which did not open them yet
+        self.total_streams = 0
+        self.closed = False
+        self.going_away = False # whether backend server sent GOAWAY, so no new streams may be opened
+        self.last_active = time.monotonic()
+        self.lock = threading.Lock()
+        self.condition = threading.Condition(self.lock)
+
+        config = h2.config.H2Configuration(client_side=True, header_encoding="utf-8")
+        self.conn = h2.connection.H2Connection(config)
+        self.conn.local_settings = h2.settings.Settings(client=True, initial_values={
+            h2.settings.SettingCodes.ENABLE_PUSH: 0,
+            h2.settings.SettingCodes.INITIAL_WINDOW_SIZE: HTTP2_STREAM_WINDOW_SIZE,
+        })
+        self.sock = socket.create_connection((host, port), timeout)
+        try:
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.conn.initiate_connection()
+            self.conn.increment_flow_control_window(HTTP2_CONNECTION_WINDOW_SIZE - self.conn.inbound_flow_control_window)
+            self.sock.sendall(self.conn.data_to_send())
+            self._wait_for_settings()
+        except BaseException:
+            self.sock.close()
+            raise
+        threading.Thread(target=self._read_frames, name=f"lb-http2-{host}:{port}", daemon=True).start()
+
+    def reserve_stream(self) -> bool:
+        """
+        Reserves place for new stream, if connection is usable and below its concurrency limit.
+        """
+        with self.lock:
+            if self.closed or self.going_away or len(self.streams) + self.reserved >= self.get_max_streams():
+                return False
+            self.reserved += 1
+            return True
+
+    def is_usable(self) -> bool:
+        return not self.closed and not self.going_away
+
+    def get_max_streams(self) -> int:
+        return min(self.conn.remote_settings.max_concurrent_streams, self.max_concurrent_streams)
+
+    def get_active_streams(self) -> int:
+        return len(self.streams)
+
+    def request(self, headers: List[Tuple[str, str]], body: Optional[Iterable[bytes]]) -> Http2ResponseStream:
+        """
+        Sends request on new stream reserved with reserve_stream(), and waits for response head.
+        """
+        with self.lock:
+            self.reserved -= 1
+            if self.closed:
+                raise ConnectionError("HTTP/2 connection to backend server is closed")
+            try:
+                stream = Http2ResponseStream(self, self.conn.get_next_available_stream_id())
+                self.conn.send_headers(stream.stream_id, headers, end_stream=body is None)
+            except h2.exceptions.ProtocolError as e:
+                # backend server sent GOAWAY or lowered its concurrency limit meanwhile
+                raise ConnectionError(f"Cannot open HTTP/2 stream to backend server: {e!r}")
+            self.streams[stream.stream_id] = stream
+            self.total_streams += 1
+            self._flush()
+        try:
+            if body is not None:
+                for chunk in body:
+                    self._send_data(stream, chunk)
+                with self.lock:
+                    if not stream.ended and stream.error is None:
+                        self.conn.end_stream(stream.stream_id)
+                        self._flush()
+            stream.wait_for_head()
+        except h2.exceptions.ProtocolError as e:
+            self.close_stream(stream)
+            raise ConnectionError(f"HTTP/2 stream {stream.stream_id} to backend server failed: {e!r}")
+        except BaseException:
+            self.close_stream(stream)
+            raise
+        return stream
+
+    def wait_for(self, predicate: Callable[[], bool], timeout_message: str, stream: Optional[Http2ResponseStream] = None) -> None:
+        """
+        Waits until predicate holds, or raises error of stream or connection. Must be called while holding lock.
+        """
+        deadline = time.monotonic() + self.timeout
+        while not predicate():
+            if stream is not None and stream.error is not None:
+                raise stream.error
+            if self.closed:
+                raise ConnectionError("HTTP/2 connection to backend server was closed")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise socket.timeout(timeout_message)
+            self.condition.wait(remaining)
+
+    def acknowledge(self, stream_id: int, length: int) -> None:
+        """
+        Lets backend server send length more bytes, once that much of body was read. Must be called while holding lock.
+        """
+        if length and not self.closed:
+            self.conn.acknowledge_received_data(length, stream_id)
+            self._flush_quietly()
+
+    def close_stream(self, stream: Http2ResponseStream) -> None:
+        with self.lock:
+            if stream.closed:
+                return
+            stream.closed = True
+            self.streams.pop(stream.stream_id, None)
+            self.last_active = time.monotonic()
+            if not self.closed:
+                if not stream.ended and stream.error is None:
+                    try:
+                        self.conn.reset_stream(stream.stream_id, h2.errors.ErrorCodes.CANCEL)
+                    except h2.exceptions.StreamClosedError:
+                        pass
+                # body left unread still counts against window of connection
+                for _, length in stream.data:
+                    if length:
+                        self.conn.acknowledge_received_data(length, stream.stream_id)
+                self._flush_quietly()
+                if self.going_away and not self.streams:
+                    self._close()
+            stream.data.clear()
+        if self.on_stream_closed is not None:
+            self.on_stream_closed()
+
+    def close(self) -> None:
+        """
+        Closes connection, failing streams still open on it.
+        """
+        with self.lock:
+            if not self.closed:
+                try:
+                    self.conn.close_connection()
+                    self.sock.sendall(self.conn.data_to_send())
+                except (OSError, h2.exceptions.ProtocolError):
+                    pass
+            self._close()
+        if self.on_stream_closed is not None:
+            self.on_stream_closed()
+
+
+    # Private methods from here
+
+    def _wait_for_settings(self) -> None:
+        """
+        Reads frames until backend server sends its SETTINGS, which is first thing HTTP/2 server sends.
+        """
+        while True:
+            data = self.sock.recv(65536)
+            if not data:
+                raise Http2NotSupportedError("Backend server closed connection instead of answering HTTP/2 preface")
+            try:
+                events = self.conn.receive_data(data)
+            except h2.exceptions.ProtocolError as e:
+                raise Http2NotSupportedError(f"Backend server does not speak HTTP/2: {e}")
+            self.sock.sendall(self.conn.data_to_send())
+            if any(isinstance(event, h2.events.RemoteSettingsChanged) for event in events):
+                return
+
+    def _send_data(self, stream: Http2ResponseStream, chunk: bytes) -> None:
+        """
+        Sends piece of request body, as fast as flow control windows of stream and connection allow.
+        """
+        view = memoryview(chunk)
+        while view:
+            with self.lock:
+                self.wait_for(lambda: stream.ended or self.conn.local_flow_control_window(stream.stream_id) > 0,
+                              f"Timed out waiting for flow control window of HTTP/2 stream {stream.stream_id}", stream)
+                if stream.ended:
+                    # backend server answered without waiting for rest of body
+                    return
+                size = min(len(view), self.conn.local_flow_control_window(stream.stream_id), self.conn.max_outbound_frame_size)
+                self.conn.send_data(stream.stream_id, view[:size].tobytes())
+                self._flush()
+            view = view[size:]
+
+    def _read_frames(self) -> None:
+        """
+        Runs in thread of connection, reading frames from backend server until connection closes.
+        """
+        while True:
+            try:
+                data = self.sock.recv(65536)
+            except socket.timeout:
+                with self.lock:
+                    if self.closed:
+                        return
+                    # idle connection is closed, so backend server does not keep it open for nothing
+                    if not self.streams and not self.reserved and time.monotonic() - self.last_active > self.idle_timeout:
+                        self._close()
+                        return
+                continue
+            except OSError as e:
+                data = b""
+                logging.debug(f"HTTP/2 connection to backend server failed: {e}")
+
+            with self.lock:
+                if self.closed:
+                    return
+                if not data:
+                    self._close()
+                    break
+                try:
+                    capacity_changed = self._handle_events(self.conn.receive_data(data))
+                    self._flush()
+                except (h2.exceptions.ProtocolError, OSError) as e:
+                    logging.warning(f"HTTP/2 connection to backend server broke: {e!r}")
+                    self._close()
+                    break
+                self.condition.notify_all()
+            # pool is notified without holding lock of connection, as pool takes its own lock first
+            if capacity_changed and self.on_stream_closed is not None:
+                self.on_stream_closed()
+        if self.on_stream_closed is not None:
+            self.on_stream_closed()
+
+    def _handle_events(self, events: list) -> bool:
+        """
+        Hands events of received frames to their streams.
+
+        :return: whether number of streams connection can carry changed.
+        """
+        capacity_changed = False
+        for event in events:
+            stream = self.streams.get(getattr(event, "stream_id", None))
+            if isinstance(event, h2.events.ResponseReceived) and stream is not None:
+                stream.headers = [(name, value) for name, value in event.headers if not name.startswith(":")]
+                stream.status = int(dict(event.headers)[":status"])
+                try:
+                    stream.reason = HTTPStatus(stream.status).phrase
+                except ValueError:
+                    stream.reason = ""
+            elif isinstance(event, h2.events.DataReceived):
+                if stream is not None:
+                    stream.data.append([event.data, event.flow_controlled_length])
+                elif event.flow_controlled_length:
+                    # data of stream nobody reads anymore must not shrink window of connection
+                    self.conn.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+            elif isinstance(event, h2.events.StreamEnded) and stream is not None:
+                stream.ended = True
+            elif isinstance(event, h2.events.StreamReset) and stream is not None:
+                if not stream.ended:
+                    stream.error = ConnectionResetError(f"Backend server reset HTTP/2 stream {event.stream_id} with error {event.error_code!r}")
+            elif isinstance(event, h2.events.ConnectionTerminated):
+                self.going_away = True
+                # streams backend server did not process can be retried elsewhere, the rest still complete
+                for stream_id, unprocessed in self.streams.items():
+                    if event.last_stream_id is not None and stream_id > event.last_stream_id and not unprocessed.ended:
+                        unprocessed.error = ConnectionError(f"Backend server closed HTTP/2 connection before processing stream {stream_id}")
+                if not self.streams:
+                    self._close()
+                capacity_changed = True
+            elif isinstance(event, h2.events.RemoteSettingsChanged):
+                # concurrency limit may have grown, which frees places for waiting requests
+                capacity_changed = True
+        return capacity_changed
+
+    def _flush(self) -> None:
+        data = self.conn.data_to_send()
+        if data:
+            self.sock.sendall(data)
+
+    def _flush_quietly(self) -> None:
+        """
+        Sends pending frames, leaving failure to be noticed by thread reading frames.
+        """
+        try:
+            self._flush()
+        except OSError as e:
+            logging.debug(f"Failed to send HTTP/2 frames to backend server: {e}")
+
+    def _close(self) -> None:
+        """
+        Closes socket and fails streams still open. Must be called while holding lock.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        for stream in self.streams.values():
+            if not stream.ended and stream.error is None:
+                stream.error = ConnectionError("HTTP/2 connection to backend server was closed")
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+        self.condition.notify_all()
+
+
+class Http2ConnectionPool:
+    """
+    HTTP/2 connections to single backend server, multiplexing concurrent requests proxied
+    to it over few long-lived connections instead of connection per request.
+
+    Request opens stream on first connection with place for it; new connection is opened
+    only when all connections carry as many streams as backend server allows in SETTINGS,
+    up to max_connections, after which requests wait for stream to close. Backend server
+    which does not answer HTTP/2 preface is marked as not supporting HTTP/2, and requests
+    to it fall back to HTTP/1.1. Only cleartext HTTP/2 with prior knowledge is spoken, as
+    https backend servers would need ALPN; they use HTTP/1.1.
+
+    :param url: base URL of backend server.
+    :param max_connections: connections opened at most.
+    :param max_concurrent_streams: upper limit of streams per connection.
+    :param timeout: seconds after which waiting for backend server or for free stream fails.
+    """
+
+    def __init__(self, url: str, max_connections: int = HTTP2_MAX_CONNECTIONS, max_concurrent_streams: int = HTTP2_MAX_CONCURRENT_STREAMS,
+                 timeout: float = REQUEST_TIMEOUT) -> None:
+        url_parts = urlsplit(url)
+        self.url = url
+        self.host = url_parts.hostname
+        self.port = url_parts.port or 80
+        self.authority = url_parts.netloc
+        self.max_connections = max_connections
+        self.max_concurrent_streams = max_concurrent_streams
+        self.timeout = timeout
+
+        self.supported = h2 is not None and url_parts.scheme == "http"
+        if h2 is None:
+            logging.warning(f"h2 is not installed, requests to {url} use HTTP/1.1 instead of HTTP/2")
+        elif url_parts.scheme != "http":
+            logging.warning(f"HTTP/2 is spoken only to http backend servers, requests to {url} use HTTP/1.1")
+
+        self.connections = []
+        self.connecting = 0 # connections being opened
+        self.opened = 0 # connections opened in total
+        self.waits = 0 # requests which had to wait for free stream
+        self.closed = False
+        self.lock = threading.Lock()
+        self.condition = threading.Condition(self.lock)
+
+    def is_supported(self) -> bool:
+        return self.supported
+
+    def request(self, method: str, path: str, headers: Dict[str, str], body: Optional[Iterable[bytes]]) -> Http2ResponseStream:
+        """
+        Sends request to backend server on stream of pooled connection, and waits for response head.
+
+        :param method: HTTP method of request.
+        :param path: path of request, with query.
+        :param headers: headers of request, hop-by-hop ones are dropped.
+        :param body: iterator of request body pieces, None if request has no body.
+        :raises Http2NotSupportedError: if backend server turned out not to speak HTTP/2, in which case request was not sent.
+        """
+        request_headers = [(":method", method), (":scheme", "http"), (":authority", headers.get("Host", self.authority)), (":path", path)]
+        request_headers += [(name.lower(), value) for name, value in headers.items() if name.lower() not in HOP_BY_HOP_HEADERS and name.lower() != "host"]
+        connection = self._acquire()
+        return connection.request(request_headers, body)
+
+    def close(self) -> None:
+        with self.lock:
+            self.closed = True
+            connections, self.connections = self.connections, []
+            self.condition.notify_all()
+        for connection in connections:
+            connection.close()
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            connections = list(self.connections)
+        return {
+            "supported": self.supported,
+            "connections": len(connections),
+            "opened": self.opened,
+            "active_streams": sum(connection.get_active_streams() for connection in connections),
+            "max_concurrent_streams": [connection.get_max_streams() for connection in connections],
+            "streams": sum(connection.total_streams for connection in connections),
+            "waits": self.waits,
+        }
+
+
+    # Private methods from here
+
+    def _acquire(self) -> Http2Connection:
+        """
+        Returns connection with stream reserved for request, opening new connection or waiting for free stream if needed.
+        """
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        while True:
+            with self.lock:
+                while True:
+                    if self.closed:
+                        raise ConnectionError(f"HTTP/2 connections to {self.url} are closed")
+                    if not self.supported:
+                        raise Http2NotSupportedError(f"Backend server {self.url} does not speak HTTP/2")
+                    self.connections = [connection for connection in self.connections if connection.is_usable()]
+                    for connection in self.connections:
+                        if connection.reserve_stream():
+                            return connection
+                    # while connection is being opened, requests wait for it rather than open more of them
+                    if not self.connecting and len(self.connections) < self.max_connections:
+                        self.connecting += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise socket.timeout(f"No HTTP/2 stream to {self.url} became free in time")
+                    if not waited:
+                        waited = True
+                        self.waits += 1
+                    self.condition.wait(remaining)
+
+            # connecting blocks on network, so it is done without holding lock
+            try:
+                connection = Http2Connection(self.host, self.port, self.timeout, self.max_concurrent_streams, on_stream_closed=self._notify)
+            except Http2NotSupportedError as e:
+                logging.warning(f"{e}, requests to {self.url} fall back to HTTP/1.1")
+                with self.lock:
+                    self.supported = False
+                raise
+            finally:
+                with self.lock:
+                    self.connecting -= 1
+                    self.condition.notify_all()
+            with self.lock:
+                self.opened += 1
+                closed = self.closed
+                if not closed:
+                    self.connections.append(connection)
+                    self.condition.notify_all()
+                    if connection.reserve_stream():
+                        return connection
+            if closed:
+                connection.close()
+
+    def _notify(self) -> None:
+        with self.lock:
+            self.condition.notify_all()
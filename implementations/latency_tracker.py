@@ -0,0 +1,82 @@
+import math
+import threading
+from array import array
+from typing import Dict
+
+from constants.app_constants import LATENCY_EWMA_ALPHA, LATENCY_WINDOW_SIZE
+
+
+class LatencyTracker:
+    """
+    Tracks recent latency of single backend server in fixed memory.
+
+    Exponentially weighted moving average reacts to changes within few requests and can be
+    read in O(1) time, which makes it suitable for algorithms choosing server on every
+    request. Percentiles are computed over ring buffer of most recent samples, sorted
+    lazily on first query after new samples arrived.
+
+    :param alpha: weight of newest sample in moving average, between 0 and 1.
+    :param window_size: number of most recent samples percentiles are computed over.
+    """
+
+    def __init__(self, alpha: float = LATENCY_EWMA_ALPHA, window_size: int = LATENCY_WINDOW_SIZE) -> None:
+        if not 0 < alpha <= 1:
+            raise ValueError("alpha must be between 0 and 1")
+        self.alpha = alpha
+        self.ewma = 0.0
+        self.samples = array("d", bytes(8 * window_size)) # ring buffer of latencies, in seconds
+        self.next_index = 0
+        self.count = 0 # samples added in total
+        self.sorted_window = None # sorted copy of samples in window, None when outdated
+        self.lock = threading.Lock()
+
+    def add(self, latency: float) -> None:
+        """
+        Records latency (in seconds) of single request.
+        """
+        with self.lock:
+            # first sample seeds average, otherwise it would start biased towards 0
+            self.ewma = latency if self.count == 0 else self.alpha * latency + (1 - self.alpha) * self.ewma
+            self.samples[self.next_index] = latency
+            self.next_index = (self.next_index + 1) % len(self.samples)
+            self.count += 1
+            self.sorted_window = None
+
+    def get_ewma(self) -> float:
+        """
+        Returns moving average of latency, or 0 if nothing was recorded yet.
+        """
+        return self.ewma
+
+    def get_percentile(self, percent: float) -> float:
+        """
+        Returns given percentile (nearest rank) of latencies in window, or 0 if nothing was recorded yet.
+        """
+        with self.lock:
+            window = self._get_sorted_window()
+        return self._percentile(window, percent)
+
+    def get_stats(self) -> Dict[str, float]:
+        with self.lock:
+            window = self._get_sorted_window()
+            count = self.count
+        stats = {"ewma": self.ewma, "samples": count}
+        for percent in (50, 95, 99):
+            stats[f"p{percent}"] = self._percentile(window, percent)
+        return stats
+
+
+    # Private methods from here
+
+    def _get_sorted_window(self) -> list:
+        if self.sorted_window is None:
+            filled = min(self.count, len(self.samples))
+            self.sorted_window = sorted(self.samples[:filled])
+        return self.sorted_window
+
+    @staticmethod
+    def _percentile(window: list, percent: float) -> float:
+        if not window:
+            return 0.0
+        rank = max(1, math.ceil(percent / 100 * len(window)))
+        return window[rank - 1]
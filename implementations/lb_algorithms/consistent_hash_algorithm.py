@@ -0,0 +1,111 @@
+import bisect
+import hashlib
+import logging
+import threading
+from typing import List, Optional, Dict, Any, Sequence
+from interfaces.backend_server import IBackendServer
+from interfaces.load_balancer_algorithm import ILoadBalancerAlgorithm
+from constants.app_constants import CONSISTENT_HASH_KEY, CONSISTENT_HASH_VIRTUAL_NODES
+
+HASH_KEY_PATH = "path"
+HASH_KEY_CLIENT_IP = "client_ip"
+HASH_KEY_HEADER_PREFIX = "header:"
+
+
+class ConsistentHashAlgorithm(ILoadBalancerAlgorithm):
+    """
+    This class implements consistent hashing load balancing algorithm.
+
+    algorithm hashes configured attribute of request (path, client IP or header) onto ring
+    of points, where each backend server owns virtual_nodes points per unit of its weight,
+    and selects server owning first point clockwise from hash. Requests with same key keep
+    going to same server, and when server leaves or joins, only keys of points next to its
+    own move, so caches of other servers stay warm.
+
+    Ring is rebuilt only when load balancer reports that healthy servers or their weights
+    changed, selection is binary search over ring, taking O(log n) time.
+
+    Requests lacking header they are hashed by are hashed by client IP instead.
+
+    :param self: instance of ConsistentHashAlgorithm class.
+    """
+
+    def __init__(self, hash_key: str = CONSISTENT_HASH_KEY, virtual_nodes: int = CONSISTENT_HASH_VIRTUAL_NODES):
+        """
+        Initialize ConsistentHashAlgorithm instance.
+
+        :param self: instance of ConsistentHashAlgorithm class.
+        :param hash_key: request attribute requests are hashed by: "path", "client_ip" or "header:<name>".
+        :param virtual_nodes: points each server of weight 1 gets on ring, more points spread keys more evenly.
+        """
+        if hash_key not in (HASH_KEY_PATH, HASH_KEY_CLIENT_IP) and not hash_key.startswith(HASH_KEY_HEADER_PREFIX):
+            raise ValueError(f"Unknown consistent hash key: {hash_key}")
+        self.hash_key = hash_key
+        self.header = hash_key[len(HASH_KEY_HEADER_PREFIX):] if hash_key.startswith(HASH_KEY_HEADER_PREFIX) else None
+        self.virtual_nodes = virtual_nodes
+
+        self.servers = None # sequence of servers ring was built for
+        self.ring_hashes = [] # sorted hashes of points on ring
+        self.ring_servers = [] # server owning each point in ring_hashes
+        self.lock = threading.Lock()
+
+    def on_servers_changed(self, servers: Sequence[IBackendServer]) -> None:
+        with self.lock:
+            self._build_ring(servers)
+
+    def get_next_server(self, servers: List[IBackendServer], request_context: Optional[Dict[str, Any]] = None) -> Optional[IBackendServer]:
+        """
+        Select backend server owning hash of request key on ring.
+
+        :param self: instance of ConsistentHashAlgorithm class.
+        :param servers: list of available backend servers.
+        :param request_context: details of request server is chosen for, which key is taken from.
+        :return: instance of IBackendServer interface, or None if no server has positive weight.
+        """
+        if not servers:
+            return None
+
+        with self.lock:
+            # servers passed by load balancer are same snapshot until it reports change
+            if servers is not self.servers:
+                self._build_ring(servers)
+            ring_hashes, ring_servers = self.ring_hashes, self.ring_servers
+        if not ring_hashes:
+            return None
+
+        # first point clockwise from hash of key, wrapping around past end of ring
+        index = bisect.bisect(ring_hashes, self._hash(self._get_request_key(request_context)))
+        return ring_servers[index % len(ring_servers)]
+
+
+    # Private methods from here
+
+    def _get_request_key(self, request_context: Optional[Dict[str, Any]]) -> str:
+        if not request_context:
+            return ""
+        if self.header is not None:
+            value = request_context['headers'].get(self.header)
+            if value is not None:
+                return value
+        elif self.hash_key == HASH_KEY_PATH:
+            return request_context['path']
+        return request_context.get('client_ip') or ""
+
+    def _build_ring(self, servers: Sequence[IBackendServer]) -> None:
+        points = []
+        for server in servers:
+            # points are derived from server URL only, so server gets same points whenever it rejoins
+            for i in range(self.virtual_nodes * server.get_weight()):
+                points.append((self._hash(f"{server.url}#{i}"), server))
+        points.sort(key=lambda point: point[0])
+
+        # new lists are swapped in whole, so lookups in progress keep using consistent old ones
+        self.ring_hashes = [point[0] for point in points]
+        self.ring_servers = [point[1] for point in points]
+        self.servers = servers
+        logging.debug(f"Built consistent hash ring of {len(points)} points for {len(servers)} servers")
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        # blake2b spreads similar keys (URLs differing in last digit) evenly, unlike built-in hash()
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
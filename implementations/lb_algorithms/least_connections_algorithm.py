@@ -0,0 +1,116 @@
+import heapq
+import threading
+import itertools
+from typing import List, Optional, Dict, Any, Sequence
+from interfaces.backend_server import IBackendServer
+from interfaces.load_balancer_algorithm import ILoadBalancerAlgorithm
+
+
+class LeastConnectionsAlgorithm(ILoadBalancerAlgorithm):
+    """
+    This class implements least connections load balancing algorithm.
+
+    algorithm selects backend server with fewest requests in flight, skipping servers
+    which already handle as many requests as their capacity.
+
+    Servers are kept in min-heap ordered by number of active requests, which is updated
+    whenever server reports that number changed, instead of scanning every server on each
+    call. Outdated heap entries are fixed lazily when they reach top of heap, so both
+    selection and update take O(log n) time.
+
+    :param self: instance of LeastConnectionsAlgorithm class.
+    """
+
+    enforces_capacity = True
+
+    def __init__(self):
+        """
+        Initialize LeastConnectionsAlgorithm instance.
+
+        :param self: instance of LeastConnectionsAlgorithm class.
+        """
+        self.heap = [] # entries [active requests, sequence number, server]
+        self.members = set() # servers selection is currently made from
+        self.servers = None # list members were taken from, so unchanged list is not synced again
+        self.listened_servers = set() # servers whose active request count changes are tracked
+
+        # entries pushed later lose ties, so servers with equal load take turns
+        self.sequence = itertools.count()
+        self.lock = threading.Lock()
+
+    def on_servers_changed(self, servers: Sequence[IBackendServer]) -> None:
+        with self.lock:
+            self._sync_members(servers)
+
+    def get_next_server(self, servers: List[IBackendServer], request_context: Optional[Dict[str, Any]] = None) -> Optional[IBackendServer]:
+        """
+        Select backend server with fewest active requests, which is below its capacity.
+
+        :param self: instance of LeastConnectionsAlgorithm class.
+        :param servers: list of available backend servers.
+        :param request_context: details of request server is chosen for, not used by this algorithm.
+        :return: instance of IBackendServer interface, or None if every server is at capacity.
+        """
+        if not servers:
+            return None
+
+        with self.lock:
+            self._sync_members(servers)
+
+            # servers at capacity are set aside, as server with more active requests but higher capacity may still take request
+            full_entries = []
+            selected = None
+            while self.heap:
+                entry = self.heap[0]
+                server = entry[2]
+                if server not in self.members:
+                    heapq.heappop(self.heap)
+                elif entry[0] != server.get_active_requests():
+                    heapq.heapreplace(self.heap, [server.get_active_requests(), next(self.sequence), server])
+                elif entry[0] >= server.get_capacity():
+                    full_entries.append(heapq.heappop(self.heap))
+                else:
+                    selected = server
+                    # moving selected server behind others with same load
+                    entry[1] = next(self.sequence)
+                    heapq.heapreplace(self.heap, entry)
+                    break
+            for entry in full_entries:
+                heapq.heappush(self.heap, entry)
+            return selected
+
+
+    # Private methods from here
+
+    def _sync_members(self, servers: Sequence[IBackendServer]) -> None:
+        """
+        Updates set of servers selection is made from, when list of available servers changed.
+        """
+        if servers is self.servers:
+            return
+        self.servers = servers
+        members = set(servers)
+        if members == self.members:
+            return
+
+        for server in members - self.members:
+            if server not in self.listened_servers:
+                self.listened_servers.add(server)
+                server.add_active_requests_listener(self._on_active_requests_changed)
+            heapq.heappush(self.heap, [server.get_active_requests(), next(self.sequence), server])
+        self.members = members
+        self._compact()
+
+    def _on_active_requests_changed(self, server: IBackendServer) -> None:
+        with self.lock:
+            if server in self.members:
+                heapq.heappush(self.heap, [server.get_active_requests(), next(self.sequence), server])
+                self._compact()
+
+    def _compact(self) -> None:
+        """
+        Rebuilds heap with single entry per server once outdated entries outnumber current ones.
+        """
+        if len(self.heap) > 2 * len(self.members) + 16:
+            self.heap = [[server.get_active_requests(), next(self.sequence), server] for server in self.members]
+            heapq.heapify(self.heap)
@@ -0,0 +1,64 @@
+import random
+from typing import List, Optional, Dict, Any
+from interfaces.backend_server import IBackendServer
+from interfaces.load_balancer_algorithm import ILoadBalancerAlgorithm
+
+MAX_RANDOM_PAIRS = 3 # pairs sampled before falling back to scanning every server, when sampled servers are at capacity
+
+
+class PowerOfTwoChoicesAlgorithm(ILoadBalancerAlgorithm):
+    """
+    This class implements power of two choices load balancing algorithm.
+
+    algorithm picks two backend servers at random and selects the one with fewer
+    requests in flight. Comparing just two random servers avoids herding every request
+    onto single least loaded server, yet keeps load almost as even as least connections,
+    in O(1) time regardless of number of servers.
+
+    Servers which already handle as many requests as their capacity are never selected.
+
+    :param self: instance of PowerOfTwoChoicesAlgorithm class.
+    """
+
+    enforces_capacity = True
+
+    def __init__(self, rng: Optional[random.Random] = None):
+        """
+        Initialize PowerOfTwoChoicesAlgorithm instance.
+
+        :param self: instance of PowerOfTwoChoicesAlgorithm class.
+        :param rng: random number generator, seeded one can be passed to make selection repeatable.
+        """
+        self.rng = rng or random.Random()
+
+    def get_next_server(self, servers: List[IBackendServer], request_context: Optional[Dict[str, Any]] = None) -> Optional[IBackendServer]:
+        """
+        Select less loaded of two random backend servers which are below their capacity.
+
+        :param self: instance of PowerOfTwoChoicesAlgorithm class.
+        :param servers: list of available backend servers.
+        :param request_context: details of request server is chosen for, not used by this algorithm.
+        :return: instance of IBackendServer interface, or None if every server is at capacity.
+        """
+        if not servers:
+            return None
+        if len(servers) == 1:
+            return servers[0] if self._has_free_capacity(servers[0]) else None
+
+        for _ in range(MAX_RANDOM_PAIRS):
+            first, second = self.rng.sample(servers, 2)
+            candidates = [server for server in (first, second) if self._has_free_capacity(server)]
+            if candidates:
+                return min(candidates, key=lambda server: server.get_active_requests())
+
+        # sampled servers keep being full, so most servers probably are, scan finds any which is not
+        candidates = [server for server in servers if self._has_free_capacity(server)]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda server: server.get_active_requests())
+
+
+    # Private methods from here
+
+    def _has_free_capacity(self, server: IBackendServer) -> bool:
+        return server.get_active_requests() < server.get_capacity()
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional, Dict, Any, Sequence
 from interfaces.backend_server import IBackendServer
 from interfaces.load_balancer_algorithm import ILoadBalancerAlgorithm
 
@@ -19,13 +19,26 @@ class RoundRobinAlgorithm(ILoadBalancerAlgorithm):
         :param self: instance of RoundRobinAlgorithm class.
         """
         self.current_server_index = 0
+        self.last_server = None # server selected last, rotation continues after it when servers change
         
-    def get_next_server(self, servers: List[IBackendServer]) -> IBackendServer:
+    def on_servers_changed(self, servers: Sequence[IBackendServer]) -> None:
+        """
+        Keep rotation going from server selected last, so servers joining or leaving
+        do not make any server get picked twice in row or skipped.
+
+        :param self: instance of RoundRobinAlgorithm class.
+        :param servers: new list of available backend servers.
+        """
+        if self.last_server in servers:
+            self.current_server_index = (servers.index(self.last_server) + 1) % len(servers)
+
+    def get_next_server(self, servers: List[IBackendServer], request_context: Optional[Dict[str, Any]] = None) -> IBackendServer:
         """
         Select next available backend server in rotating order.
         
         :param self: instance of RoundRobinAlgorithm class.
         :param servers: list of available backend servers.
+        :param request_context: details of request server is chosen for, not used by this algorithm.
         :return: instance of IBackendServer interface.
         """
         if not servers:
@@ -39,4 +52,5 @@ class RoundRobinAlgorithm(ILoadBalancerAlgorithm):
         # This ensures that self.current_server_index value is always within range of valid indices for servers list, 
         # which enables algorithm to cycle through available servers in round-robin fashion.
         self.current_server_index = (self.current_server_index + 1) % len(servers)
+        self.last_server = server
         return server
@@ -1,4 +1,7 @@
-from typing import List
+import heapq
+import threading
+import itertools
+from typing import List, Optional, Dict, Any, Sequence
 from interfaces.backend_server import IBackendServer
 from interfaces.load_balancer_algorithm import ILoadBalancerAlgorithm
 
@@ -6,48 +9,105 @@ from interfaces.load_balancer_algorithm import ILoadBalancerAlgorithm
 class WeightedResponseTimeAlgorithm(ILoadBalancerAlgorithm):
     """
     This class implements weighted response time load balancing algorithm.
-    
+
     algorithm selects backend server with lowest weighted response time,
     where weighted response time is calculated as average latency divided
     by remaining capacity of server.
-    
+
+    Servers are kept in min-heap ordered by weighted response time, which is updated
+    whenever server reports that its latency average or capacity changed, instead of
+    computing it for every server on each call. Outdated heap entries are fixed lazily
+    when they reach top of heap, so selection takes O(1) time when no latency arrived
+    since last one, and each latency sample costs O(log n).
+
     :param self: instance of WeightedResponseTimeAlgorithm class.
     """
-    
+
     def __init__(self):
         """
         Initialize WeightedResponseTimeAlgorithm instance.
-        
+
         :param self: instance of WeightedResponseTimeAlgorithm class.
         """
-        pass
-        
-    def get_next_server(self, servers: List[IBackendServer]) -> IBackendServer:
+        self.heap = [] # entries [weighted response time, sequence number, server]
+        self.members = set() # servers selection is currently made from
+        self.servers = None # list members were taken from, so unchanged list is not synced again
+        self.listened_servers = set() # servers whose latency changes are tracked
+
+        # among servers with equal weighted response time, one added to heap first wins
+        self.sequence = itertools.count()
+        self.lock = threading.Lock()
+
+    def on_servers_changed(self, servers: Sequence[IBackendServer]) -> None:
+        with self.lock:
+            self._sync_members(servers)
+
+    def get_next_server(self, servers: List[IBackendServer], request_context: Optional[Dict[str, Any]] = None) -> IBackendServer:
         """
         Select backend server with lowest weighted response time.
-        
+
         :param self: instance of WeightedResponseTimeAlgorithm class.
         :param servers: list of available backend servers.
+        :param request_context: details of request server is chosen for, not used by this algorithm.
         :return: instance of IBackendServer interface.
         """
         if not servers:
             return None
-        # Compute weighted response time for each server
-        weighted_response_times = [] # each element corresponds to weighted response time of server in servers list
+
+        with self.lock:
+            self._sync_members(servers)
+            while self.heap:
+                entry = self.heap[0]
+                server = entry[2]
+                if server not in self.members:
+                    heapq.heappop(self.heap)
+                elif entry[0] != self._get_weighted_response_time(server):
+                    heapq.heapreplace(self.heap, [self._get_weighted_response_time(server), next(self.sequence), server])
+                else:
+                    return server
+            return None
+
+
+    # Private methods from here
+
+    @staticmethod
+    def _get_weighted_response_time(server: IBackendServer) -> float:
+        capacity = server.get_capacity()
+        # if capacity is 0, then server is considered "out of service" and is selected only when all others are too
+        return float('inf') if capacity == 0 else server.get_latency() / capacity
+
+    def _sync_members(self, servers: Sequence[IBackendServer]) -> None:
+        """
+        Updates set of servers selection is made from, when list of available servers changed.
+        """
+        if servers is self.servers:
+            return
+        self.servers = servers
+        members = set(servers)
+        if members == self.members:
+            return
+
+        # servers are pushed in list order, so among equal ones first in list is selected
         for server in servers:
-            capacity = server.get_capacity()
-    
-            # if capacity is 0, then corresponding server is considered "out of service"
-            # and float('inf') value is added to weighted_response_times list. 
-            if capacity == 0:
-                weighted_response_times.append(float('inf'))
-            else:
-                weighted_response_times.append(server.get_latency() / server.get_capacity())
-
-        try:
-            # Select server with lowest weighted response time
-            min_index = weighted_response_times.index(min(weighted_response_times))
-            return servers[min_index]
-        except ValueError:
-            # If no server is found with lowest weighted response time, return None
-            return None
\ No newline at end of file
+            if server in self.members:
+                continue
+            if server not in self.listened_servers:
+                self.listened_servers.add(server)
+                server.add_response_time_listener(self._on_response_time_changed)
+            heapq.heappush(self.heap, [self._get_weighted_response_time(server), next(self.sequence), server])
+        self.members = members
+        self._compact()
+
+    def _on_response_time_changed(self, server: IBackendServer) -> None:
+        with self.lock:
+            if server in self.members:
+                heapq.heappush(self.heap, [self._get_weighted_response_time(server), next(self.sequence), server])
+                self._compact()
+
+    def _compact(self) -> None:
+        """
+        Rebuilds heap with single entry per server once outdated entries outnumber current ones.
+        """
+        if len(self.heap) > 2 * len(self.members) + 16:
+            self.heap = [[self._get_weighted_response_time(server), next(self.sequence), server] for server in self.members]
+            heapq.heapify(self.heap)
@@ -1,15 +1,22 @@
 import logging
-from typing import List
+import threading
+from typing import List, Optional, Dict, Any, Sequence
 from interfaces.backend_server import IBackendServer
 from interfaces.load_balancer_algorithm import ILoadBalancerAlgorithm
 
 class WeightedRoundRobinAlgorithm(ILoadBalancerAlgorithm):
     """
-    Implements weighted round robin load balancing algorithm.
+    Implements smooth weighted round robin load balancing algorithm, as used by nginx.
 
-    Algorithm selects backend server using weighted round robin method,
-    where weight of each server is calculated as ratio of its remaining
-    capacity to maximum capacity among all servers.
+    Each server gets share of requests proportional to its configured weight, and picks
+    of heavier servers are spread evenly across cycle instead of coming in bursts: weights
+    5, 1, 1 give a a b a c a a rather than a a a a a b c.
+
+    Every pick updates current weight of each server, which costs time linear in number of
+    servers but needs no precomputed cycle, whose length grows with sum of weights. When load
+    balancer reports that healthy servers or their weights changed, servers which stay keep
+    their current weights, so frequent changes (e.g. flapping health) do not restart cycle at
+    heaviest server every time. Servers with weight 0 are never selected.
 
     :param self: instance of WeightedRoundRobinAlgorithm class.
     """
@@ -20,38 +27,59 @@ class WeightedRoundRobinAlgorithm(ILoadBalancerAlgorithm):
 
         :param self: instance of WeightedRoundRobinAlgorithm class.
         """
-        self.index = -1 #index of last server used
+        self.servers = None # sequence of servers weights were taken from
+        self.weighted_servers = [] # (server, weight) of servers with positive weight
+        self.total_weight = 0
+        self.current_weights = {} # server -> its current weight
+        self.lock = threading.Lock()
+
+    def on_servers_changed(self, servers: Sequence[IBackendServer]) -> None:
+        with self.lock:
+            self._update_servers(servers)
 
-    def get_next_server(self, servers: List[IBackendServer]) -> IBackendServer:
+    def get_next_server(self, servers: List[IBackendServer], request_context: Optional[Dict[str, Any]] = None) -> Optional[IBackendServer]:
         """
-        Select next backend server using weighted round robin method.
+        Select next backend server using smooth weighted round robin method.
+
+        On every pick each server's current weight grows by its weight, server with highest
+        current weight is picked and its current weight drops by sum of all weights. After
+        sum of weights picks every current weight is back where it started, so picks repeat.
 
         :param self: instance of WeightedRoundRobinAlgorithm class.
         :param servers: list of available backend servers.
-        :return: instance of IBackendServer interface.
+        :param request_context: details of request server is chosen for, not used by this algorithm.
+        :return: instance of IBackendServer interface, or None if no server has positive weight.
         """
         if not servers:
             return None
 
-        # weights calculated every time func is called because it depends on 
-        # current status of each server's capacity which can changes between calls
-        weights = []
+        with self.lock:
+            # servers passed by load balancer are same snapshot until it reports change, other sequences are
+            # taken on first use
+            if servers is not self.servers:
+                self._update_servers(servers)
+            if not self.weighted_servers:
+                return None
 
-        # total capacity of all available backend servers
-        total_capacity = sum(server.get_capacity() for server in servers)
-        for server in servers:
+            current_weights = self.current_weights
+            best, best_weight = None, None
+            for server, weight in self.weighted_servers:
+                current_weight = current_weights[server] + weight
+                current_weights[server] = current_weight
+                if best is None or current_weight > best_weight:
+                    best, best_weight = server, current_weight
+            current_weights[best] -= self.total_weight
+            return best
 
-            # Calculating weight as ratio of server capacity to total capacity
-            weight = server.get_capacity() / total_capacity
-            weights.append(weight)
-            logging.info(f"Weight for server {server.url}: {weight}")
 
-        # selects next server to use
-        # algo cycles through server list in circular fashion, selecting each server in turn
-        # modulo ensures that index value wraps around to 0 when reaching end of servers ist, allowing algo to keep cycling through list indefinitely.
-        self.index = (self.index + 1) % len(servers)
+    # Private methods from here
 
-        # If server weight is very small, skippiing it and moving to next server
-        while weights and self.index < len(servers) and weights[self.index] < 1e-6:
-            self.index = (self.index + 1) % len(servers)
-        return servers[self.index]
\ No newline at end of file
+    def _update_servers(self, servers: Sequence[IBackendServer]) -> None:
+        """
+        Takes weights of servers, keeping current weights of servers which were there before.
+        """
+        self.servers = servers
+        self.weighted_servers = [(server, server.get_weight()) for server in servers if server.get_weight() > 0]
+        self.total_weight = sum(weight for _, weight in self.weighted_servers)
+        self.current_weights = {server: self.current_weights.get(server, 0) for server, _ in self.weighted_servers}
+        logging.debug(f"Weighted round robin updated for {len(self.weighted_servers)} servers")
@@ -1,89 +1,1306 @@
+import ssl
+import time
+import random
 import socket
+import select
+import asyncio
 import logging
 import threading
-from typing import List,Dict
+import requests
+import concurrent.futures
+import statistics
+from urllib.parse import urlsplit
+from typing import List,Dict,Tuple,Any,Optional,NamedTuple,Sequence
 
-from utils.utility import Utils
 from interfaces.load_balancer import ILoadBalancer
+from utils.http_parser import HttpRequestParser, HttpParseError
+from implementations.worker_pool import WorkerPool
 from implementations.backend_server import BackendServer
-from constants.app_constants import LOAD_BALANCER_ADDRESS
+from implementations.retry_budget import RetryBudget
+from implementations.response_cache import ResponseCache, CacheFill
+from implementations.admin_server import AdminServer
+from implementations.tls_terminator import TlsTerminator
+from implementations.tcp_relay import TcpRelay
+from implementations.rate_limiter import RateLimiter
+from implementations.request_tracer import RequestTracer, PHASE_SELECT, PHASE_BACKEND, OUTCOME_RELAYED, OUTCOME_CACHED, OUTCOME_THROTTLED
+from implementations.config_watcher import ConfigWatcher, validate_backend_servers_config
+from implementations.circuit_breaker import CircuitBreaker
+from implementations.metrics import MetricsRegistry, MetricFamily
+from implementations.shared_state import SharedBackendState, CUMULATIVE_STATS_FIELDS
+from implementations.health_check_scheduler import HealthCheckScheduler
 from interfaces.load_balancer_algorithm import ILoadBalancerAlgorithm
 from implementations.backend_communicator import BackendServerCommunicator
+from implementations.async_backend_communicator import AsyncBackendServerCommunicator
+from constants.app_constants import LOAD_BALANCER_ADDRESS, SERVER_WEIGHT, SERVER_MODE, SERVER_MODE_THREADED, SERVER_MODE_ASYNCIO, CLIENT_KEEP_ALIVE_TIMEOUT, WORKER_POOL_SIZE, ACCEPT_QUEUE_SIZE, MAX_QUEUE_WAIT, IDLE_CONNECTION_POLL_INTERVAL
+from constants.app_constants import OUTLIER_LATENCY_FACTOR, OUTLIER_SWEEP_INTERVAL, OUTLIER_MAX_EJECTION_PERCENT
+from constants.app_constants import MAX_RETRIES, RETRY_METHODS, RETRY_STATUS_CODES, HEDGE_REQUESTS, HEDGE_PERCENTILE, HEDGE_MIN_SAMPLES, HEDGE_MIN_DELAY, ADMIN_ADDRESS, ADMIN_TOKEN, BACKEND_CONFIG_FILE, RESPONSE_CACHE
+from constants.app_constants import TLS_CERT_FILE, TLS_KEY_FILE, TLS_SNI_CERTS, PROXY_MODE, PROXY_MODE_HTTP, PROXY_MODE_TCP, TCP_CONNECT_TIMEOUT, TCP_RELAY_BUFFER_SIZE
+from constants.app_constants import RATE_LIMIT_RATE, RATE_LIMIT_BURST, RATE_LIMIT_KEY, REQUEST_TRACING
+
+class HealthyServersSnapshot(NamedTuple):
+    """
+    Immutable view of backend servers which are healthy and not ejected, replaced whole
+    whenever health, ejection or weight of any server changes, so request handlers read it
+    without locking.
+    """
+    version: int
+    servers: Tuple[BackendServer, ...]
+
 
 class LoadBalancer(ILoadBalancer):
-    
-    def __init__(self, backend_servers_config: List[Dict[str, str]], algorithm: ILoadBalancerAlgorithm):
-        self.backend_servers = [BackendServer(url=server.get("url"),health_check_url=server.get("health_check_url")) for server in backend_servers_config]
+
+    def __init__(self, backend_servers_config: List[Dict[str, str]], algorithm: ILoadBalancerAlgorithm, server_mode: str = SERVER_MODE, address: Tuple[str, int] = LOAD_BALANCER_ADDRESS,
+                 worker_pool_size: int = WORKER_POOL_SIZE, accept_queue_size: int = ACCEPT_QUEUE_SIZE, max_queue_wait: float = MAX_QUEUE_WAIT,
+                 max_retries: int = MAX_RETRIES, hedge_requests: bool = HEDGE_REQUESTS, reuse_port: bool = False,
+                 shared_state: Optional[SharedBackendState] = None, worker_index: int = 0, admin_address: Optional[Tuple[str, int]] = ADMIN_ADDRESS,
+                 config_file: Optional[str] = BACKEND_CONFIG_FILE, response_cache: bool = RESPONSE_CACHE, tls_cert_file: Optional[str] = TLS_CERT_FILE,
+                 tls_key_file: Optional[str] = TLS_KEY_FILE, tls_sni_certs: Dict[str, Tuple[str, str]] = TLS_SNI_CERTS, proxy_mode: str = PROXY_MODE,
+                 rate_limit: float = RATE_LIMIT_RATE, rate_limit_burst: int = RATE_LIMIT_BURST, rate_limit_key: str = RATE_LIMIT_KEY,
+                 request_tracing: bool = REQUEST_TRACING, admin_token: Optional[str] = ADMIN_TOKEN):
+        if server_mode not in (SERVER_MODE_THREADED, SERVER_MODE_ASYNCIO):
+            raise ValueError(f"Unknown server mode: {server_mode}")
+        if proxy_mode not in (PROXY_MODE_HTTP, PROXY_MODE_TCP):
+            raise ValueError(f"Unknown proxy mode: {proxy_mode}")
+        if proxy_mode == PROXY_MODE_TCP and tls_cert_file is not None:
+            # TLS of relayed connections is left to backend servers, bytes are passed through untouched
+            raise ValueError("TLS termination is not supported in tcp proxy mode")
+
+        # load balancer running as one of worker processes of supervisor gets health of backend servers
+        # from supervisor through shared state, and publishes its counters of them there
+        self.shared_state = shared_state
+        self.worker_index = worker_index
+        self.shared_state_version = None # version of shared health last applied to backend servers
+
+        # single scheduler runs health checks of all backend servers
+        self.health_check_scheduler = HealthCheckScheduler()
+        self.backend_servers = [BackendServer(url=server.get("url"),health_check_url=None if shared_state else server.get("health_check_url"),weight=server.get("weight", SERVER_WEIGHT),
+                                              health_check_scheduler=self.health_check_scheduler, http2=server.get("http2", False)) for server in backend_servers_config]
         self.algorithm = algorithm
+
+        # backend servers can be added, removed and reweighted while load balancer runs; list is replaced
+        # whole on every change, so threads iterating over it never see it change under them
+        self.backend_servers_lock = threading.Lock()
+        self.draining_servers = [] # removed servers which still finish requests in flight on them
+        # configuration file is watched for changes only once load balancer starts
+        self.config_watcher = ConfigWatcher(config_file, self.apply_backend_servers_config) if config_file is not None else None
+
+        # counters published by worker process which previously ran in same slot, so restarted worker carries them on
+        self.shared_stats_baseline = [[shared_state.read_stats(worker_index, i)[field] for field in CUMULATIVE_STATS_FIELDS] for i in range(len(self.backend_servers))] if shared_state else None
+        self._sync_shared_state()
+
+        # snapshot of healthy servers, rebuilt by health check threads only when server changes state
+        self.healthy_servers_lock = threading.Lock()
+        self.healthy_servers = HealthyServersSnapshot(0, ())
+        for server in self.backend_servers:
+            server.add_state_listener(self._on_server_state_changed)
+        self._update_healthy_servers()
+
+        # servers are ejected right when requests to them fail, and readmitted by sweep which runs
+        # on request path at most every OUTLIER_SWEEP_INTERVAL seconds, and also moves open circuits to half-open
+        self.outlier_lock = threading.Lock()
+        self.next_outlier_sweep = time.monotonic() + OUTLIER_SWEEP_INTERVAL
+
+        # failed idempotent requests are retried on other servers and slow ones hedged, within budget shared by all requests
+        self.max_retries = max_retries
+        self.hedge_requests = hedge_requests
+        self.retry_budget = RetryBudget()
+        # threaded server mode waits for hedged attempts running in threads of their own
+        self.hedge_executor = concurrent.futures.ThreadPoolExecutor(max_workers=2 * worker_pool_size, thread_name_prefix="lb-hedge") if hedge_requests else None
+
+        # responses backend servers allow to cache are served from memory, concurrent misses share single backend request
+        self.response_cache = ResponseCache() if response_cache else None
+        # each client gets token bucket of rate_limit requests per second, requests beyond it are answered with 429
+        self.rate_limiter = RateLimiter(rate_limit, rate_limit_burst, rate_limit_key) if rate_limit > 0 else None
+
+        self.server_mode = server_mode
+        self.address = address
+        # in tcp proxy mode each client connection is paired with backend server connection when it is accepted,
+        # and threaded server mode relays bytes between them from single relay thread instead of workers
+        self.proxy_mode = proxy_mode
+        self.tcp_relay = TcpRelay() if proxy_mode == PROXY_MODE_TCP and server_mode == SERVER_MODE_THREADED else None
+        # phases of every proxied request are timed, and requests are sent to backend servers with traceparent header
+        self.request_tracer = RequestTracer() if request_tracing and proxy_mode == PROXY_MODE_HTTP else None
+        # several load balancer processes can listen on same address, kernel spreads connections between them
+        self.reuse_port = reuse_port
+        # clients connect over TLS when certificate is configured, plain HTTP otherwise
+        self.tls_terminator = TlsTerminator(tls_cert_file, tls_key_file, tls_sni_certs) if tls_cert_file is not None else None
         self.backend_server_communicator = BackendServerCommunicator()
+        self.async_backend_server_communicator = AsyncBackendServerCommunicator()
         self.server_sock = None
 
+        # threaded server mode hands accepted connections to bounded pool of workers,
+        # connections it cannot take are answered with 503 instead of piling up
+        connection_handler = self.handle_tcp_connection if proxy_mode == PROXY_MODE_TCP else self.handle_request
+        self.worker_pool = WorkerPool(connection_handler, self._reject_client, worker_pool_size, accept_queue_size, max_queue_wait)
+
+        # metrics are collected only when admin server is scraped, request handling just updates counters
+        self.metrics_registry = MetricsRegistry()
+        self.metrics_registry.register(self._collect_metrics)
+        self.admin_server = AdminServer(admin_address, self.metrics_registry, admin_token) if admin_address is not None else None
+        if self.admin_server is not None:
+            self.admin_server.add_route("GET", "/backends", lambda query, body: (200, [server.get_stats() for server in self.backend_servers]))
+            # any local process can reach admin server, so backend servers can be changed through it only with admin token
+            if admin_token is not None:
+                self.admin_server.add_route("POST", "/backends", lambda query, body: (201, self.add_backend_server(body).get_stats()), protected=True)
+                self.admin_server.add_route("PUT", "/backends", self._admin_apply_config, protected=True)
+                self.admin_server.add_route("PATCH", "/backends", self._admin_update_backend_server, protected=True)
+                self.admin_server.add_route("DELETE", "/backends", self._admin_remove_backend_server, protected=True)
+            if self.tls_terminator is not None:
+                self.admin_server.add_route("GET", "/tls", lambda query, body: (200, self.tls_terminator.get_stats()))
+            if self.request_tracer is not None:
+                self.admin_server.add_route("GET", "/phases", lambda query, body: (200, self.request_tracer.get_stats()))
+            if self.rate_limiter is not None:
+                self.admin_server.add_route("GET", "/rate-limit", lambda query, body: (200, self.rate_limiter.get_stats()))
+            if self.tcp_relay is not None:
+                self.admin_server.add_route("GET", "/tcp", lambda query, body: (200, self.tcp_relay.get_stats()))
+
+        # set once load balancer is bound to its address and accepting connections
+        self.ready = threading.Event()
+
+        # event loop and stop event of asyncio server mode, set only while it is running
+        self.loop = None
+        self.stop_event = None
+
     def start(self) -> None:
+        if self.admin_server is not None:
+            self.admin_server.start()
+        if self.config_watcher is not None:
+            self.config_watcher.start()
+
+        if self.server_mode == SERVER_MODE_ASYNCIO:
+            try:
+                asyncio.run(self._serve_async())
+            except KeyboardInterrupt:
+                self.stop()
+            return
+
         # created new socket object with IPv4 addressing and TCP protocol
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server_sock:
             self.server_sock = server_sock
-            server_sock.bind(LOAD_BALANCER_ADDRESS)
+            server_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if self.reuse_port:
+                server_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            server_sock.bind(self.address)
 
             # listening for incoming connections on bound address and port
             server_sock.listen()
+            self.ready.set()
 
-            logging.info(f"Load balancer listening on {LOAD_BALANCER_ADDRESS[0]}:{LOAD_BALANCER_ADDRESS[1]}")
+            logging.info(f"Load balancer listening on {self.address[0]}:{self.address[1]}")
+            if self.tcp_relay is not None:
+                self.tcp_relay.start()
+            self.worker_pool.start()
             try:
 
-                # continuously accept incoming connections and spawn new threads to handle them
+                # continuously accept incoming connections and queue them for worker threads
                 while True:
 
                     # accept incoming connection and return new socket object representing connection, along with address of client
                     client_sock, client_addr = server_sock.accept()
 
-                    logging.info(f"Received request on LB from client {client_addr[0]}:{client_addr[1]} using thread {threading.current_thread().name}")
+                    logging.debug(f"Received request on LB from client {client_addr[0]}:{client_addr[1]}")
+
+                    # client which used up its rate limit is answered right here, without taking worker
+                    if self._is_connection_throttled(client_addr[0]):
+                        self._shed_client(client_sock, *self._get_throttled_response(client_addr[0]))
+                        continue
 
-                    # spawn new thread to handle request
-                    threading.Thread(target=self.handle_request, args=(client_sock,)).start()
+                    # queue connection for worker, or shed it right away if queue is full
+                    self.worker_pool.submit(client_sock)
             except KeyboardInterrupt:
-                # if Ctrl+C is received then stop 
+                # if Ctrl+C is received then stop
                 self.stop()
-    
+            except OSError:
+                # accept() fails once stop() has shut down listening socket
+                if self.server_sock is not None:
+                    raise
+
     def stop(self) -> None:
         if self.server_sock:
-            logging.info(f"......Shutting down load balancer listening on {LOAD_BALANCER_ADDRESS[0]}:{LOAD_BALANCER_ADDRESS[1]}")
-            self.server_sock.close()
+            logging.info(f"......Shutting down load balancer listening on {self.address[0]}:{self.address[1]}")
+            server_sock, self.server_sock = self.server_sock, None
+
+            # shutdown wakes up thread blocked in accept(), close alone does not
+            try:
+                server_sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            server_sock.close()
+            self.worker_pool.stop()
+            if self.tcp_relay is not None:
+                self.tcp_relay.stop()
+
+        if self.loop is not None and self.stop_event is not None:
+            logging.info(f"......Shutting down load balancer listening on {self.address[0]}:{self.address[1]}")
+            self.loop.call_soon_threadsafe(self.stop_event.set)
+
+        if self.config_watcher is not None:
+            self.config_watcher.stop()
+
+        # stopping health check and closing pooled connections of each backend server
+        for server in self.backend_servers + self.draining_servers:
+            server.stop_health_check()
+            server.close_connections()
+        self.health_check_scheduler.stop()
+        if self.hedge_executor is not None:
+            self.hedge_executor.shutdown(wait=False)
+        if self.admin_server is not None:
+            self.admin_server.stop()
+
+
+    def get_backend_server(self, url: str) -> BackendServer:
+        """
+        Returns backend server with given url.
+
+        :raises KeyError: if load balancer has no such server.
+        """
+        for server in self.backend_servers:
+            if server.url == url:
+                return server
+        raise KeyError(f"Unknown backend server {url}")
 
-            # stopping health check of each backend server
-            for server in self.backend_servers:
-                server.stop_health_check()
+    def add_backend_server(self, server_config: Dict[str, Any]) -> BackendServer:
+        """
+        Adds backend server while load balancer runs.
 
+        Server with health check url gets no traffic until its first health check passes, which
+        runs right away; either way it then goes in service with slow start.
+
+        :param server_config: dict with url, health_check_url and weight of server, like entries of BACKEND_SERVERS_CONFIG.
+        :raises ValueError: if configuration is invalid or server with same url is already there.
+        """
+        self._check_reconfigurable()
+        validate_backend_servers_config([server_config])
+        with self.backend_servers_lock:
+            if any(server.url == server_config["url"] for server in self.backend_servers):
+                raise ValueError(f"Backend server {server_config['url']} already exists")
+            health_check_url = server_config.get("health_check_url")
+            server = BackendServer(url=server_config["url"], health_check_url=health_check_url, weight=server_config.get("weight", SERVER_WEIGHT),
+                                   health_check_scheduler=self.health_check_scheduler, is_healthy=health_check_url is None, http2=server_config.get("http2", False))
+            if health_check_url is None:
+                server.start_slow_start()
+            server.add_state_listener(self._on_server_state_changed)
+            self.backend_servers = self.backend_servers + [server]
+        logging.info(f"Added backend server {server.url}")
+        self._update_healthy_servers()
+        return server
+
+    def remove_backend_server(self, url: str) -> BackendServer:
+        """
+        Removes backend server while load balancer runs.
+
+        Server gets no new requests right away, while requests already in flight on it finish;
+        its connections are closed once last of them is done.
+
+        :raises KeyError: if load balancer has no such server.
+        """
+        self._check_reconfigurable()
+        with self.backend_servers_lock:
+            server = self.get_backend_server(url)
+            self.backend_servers = [other for other in self.backend_servers if other is not server]
+            self.draining_servers = self.draining_servers + [server]
+        server.stop_health_check()
+        server.set_draining(True)
+        logging.info(f"Removing backend server {url}, waiting for {server.get_active_requests()} requests in flight")
+        self._update_healthy_servers()
+        server.add_active_requests_listener(self._on_draining_server_active_requests_changed)
+        # last request may have finished before listener was added
+        self._on_draining_server_active_requests_changed(server)
+        return server
+
+    def update_backend_server(self, url: str, weight: Optional[int] = None, draining: Optional[bool] = None) -> BackendServer:
+        """
+        Changes weight of backend server, or starts or stops draining it while keeping it in load balancer.
+
+        :raises KeyError: if load balancer has no such server.
+        :raises ValueError: if weight is invalid.
+        """
+        self._check_reconfigurable()
+        server = self.get_backend_server(url)
+        if weight is not None:
+            server.set_weight(weight)
+        if draining is not None:
+            server.set_draining(draining)
+        return server
+
+    def apply_backend_servers_config(self, backend_servers_config: List[Dict[str, Any]]) -> None:
+        """
+        Makes backend servers match configuration: servers missing from it are removed (with
+        draining), new ones are added and weights of the rest are updated. Server whose health
+        check url or http2 flag changed is replaced.
+
+        :raises ValueError: if configuration is invalid, in which case nothing is changed.
+        """
+        self._check_reconfigurable()
+        validate_backend_servers_config(backend_servers_config)
+        current = {server.url: server for server in self.backend_servers}
+        configured = {server_config["url"]: server_config for server_config in backend_servers_config}
+
+        for url, server in current.items():
+            if url not in configured or configured[url].get("health_check_url") != server.health_check_url or configured[url].get("http2", False) != server.http2:
+                self.remove_backend_server(url)
+        for url, server_config in configured.items():
+            if url not in current or current[url] not in self.backend_servers:
+                self.add_backend_server(server_config)
+            else:
+                self.update_backend_server(url, server_config.get("weight", SERVER_WEIGHT), server_config.get("draining"))
 
     def handle_request(self, client_sock: socket.socket) -> None:
-        # Removed unhealthy servers from list of available servers
-        healthy_servers = [server for server in self.backend_servers if server.is_healthy]
+        # TLS handshake runs here in worker thread, never in thread accepting connections
+        if self.tls_terminator is not None:
+            client_sock = self.tls_terminator.wrap_socket(client_sock)
+            if client_sock is None:
+                return
 
-        # getting next server according to lb algo to handle request 
-        backend_server = self.algorithm.get_next_server(healthy_servers)
+        # parser keeps state of client connection between requests, so requests can be pipelined
+        parser = HttpRequestParser()
 
-        # no healthy backend server is available
+        # idle client connection is not kept open forever waiting for next request
+        client_sock.settimeout(CLIENT_KEEP_ALIVE_TIMEOUT)
+        client_ip = self.backend_server_communicator.get_client_ip(client_sock)
+        # only first request of connection waited for worker
+        queue_wait = self.worker_pool.get_queue_wait()
+        try:
+            while True:
+                try:
+                    incoming_req_details = self.backend_server_communicator.read_request(client_sock, parser)
+                except HttpParseError as e:
+                    self.backend_server_communicator.send_error_response(client_sock, "Bad Request", f"Malformed HTTP request: {e}")
+                    return
+                if incoming_req_details is None:
+                    return
+                incoming_req_details['client_ip'] = client_ip
+                trace = self.request_tracer.start(incoming_req_details, queue_wait) if self.request_tracer is not None else None
+                queue_wait = None
+                try:
+                    keep_alive = self._proxy_request(client_sock, incoming_req_details)
+                finally:
+                    if trace is not None:
+                        self.request_tracer.finish(trace, incoming_req_details)
+                if not keep_alive:
+                    return
+                if not self._wait_for_next_request(client_sock, parser):
+                    return
+        except OSError as e:
+            logging.debug(f"Client connection closed: {e}")
+        finally:
+            self._close_client_socket(client_sock)
+
+    async def handle_async_request(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Handles client connection accepted by asyncio server mode.
+
+        Same as handle_request, but client and backend server I/O is awaited on event loop
+        instead of blocking dedicated thread.
+        """
+        parser = HttpRequestParser()
+        communicator = self.async_backend_server_communicator
+        client_ip = communicator.get_client_ip(writer)
+        if self.tls_terminator is not None:
+            # event loop completed handshake before calling handler
+            self.tls_terminator.record_handshake(writer.get_extra_info("ssl_object"))
+        try:
+            if self._is_connection_throttled(client_ip):
+                await communicator.send_error_response(writer, *self._get_throttled_response(client_ip))
+                return
+            while True:
+                try:
+                    incoming_req_details = await asyncio.wait_for(communicator.read_request(reader, parser), CLIENT_KEEP_ALIVE_TIMEOUT)
+                except HttpParseError as e:
+                    await communicator.send_error_response(writer, "Bad Request", f"Malformed HTTP request: {e}")
+                    return
+                if incoming_req_details is None:
+                    return
+                incoming_req_details['client_ip'] = client_ip
+                trace = self.request_tracer.start(incoming_req_details) if self.request_tracer is not None else None
+                try:
+                    keep_alive = await self._proxy_async_request(writer, incoming_req_details)
+                finally:
+                    if trace is not None:
+                        self.request_tracer.finish(trace, incoming_req_details)
+                if not keep_alive:
+                    return
+        except (OSError, asyncio.TimeoutError) as e:
+            logging.debug(f"Client connection closed: {e!r}")
+        finally:
+            writer.close()
+
+    def handle_tcp_connection(self, client_sock: socket.socket) -> None:
+        """
+        Handles client connection in tcp proxy mode: connects it to backend server chosen by
+        algorithm and hands both connections over to TCP relay, so worker is free again as soon
+        as backend server accepted connection.
+        """
+        client_ip = self.backend_server_communicator.get_client_ip(client_sock)
+        backend_server, backend_sock = self._connect_to_backend_server(client_ip)
         if backend_server is None:
+            client_sock.close()
+            return
+        self.tcp_relay.relay(client_sock, backend_sock, lambda success: self._finish_tcp_connection(backend_server, success))
+
+    async def handle_async_tcp_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Handles client connection accepted by asyncio server mode in tcp proxy mode.
+
+        Same as handle_tcp_connection, but bytes are relayed by two coroutines, one per direction.
+        """
+        client_ip = self.async_backend_server_communicator.get_client_ip(writer)
+        if self._is_connection_throttled(client_ip):
+            writer.close()
+            return
+        backend_server, backend_reader, backend_writer = await self._connect_async_to_backend_server(client_ip)
+        if backend_server is None:
+            writer.close()
+            return
+        directions = [asyncio.ensure_future(self._relay_tcp_stream(reader, backend_writer)), asyncio.ensure_future(self._relay_tcp_stream(backend_reader, writer))]
+        success = False
+        try:
+            # directions finish one by one as each side ends its stream, failure of either ends both
+            done, _ = await asyncio.wait(directions, return_when=asyncio.FIRST_EXCEPTION)
+            errors = [direction.exception() for direction in done if direction.exception() is not None]
+            if errors:
+                logging.debug(f"Relayed connection failed: {errors[0]!r}")
+            success = not errors
+        finally:
+            for direction in directions:
+                direction.cancel()
+            writer.close()
+            backend_writer.close()
+            self._finish_tcp_connection(backend_server, success)
+
+
+    # Private methods from here
+
+    def _proxy_request(self, client_sock: socket.socket, incoming_req_details: Dict[str, Any]) -> bool:
+        """
+        Answers single request from response cache, or forwards it to backend server.
+
+        :return: whether client connection can carry further requests.
+        """
+        client_key = self._get_throttled_client_key(incoming_req_details)
+        if client_key is not None:
+            self._trace_outcome(incoming_req_details, OUTCOME_THROTTLED, 429)
+            self.backend_server_communicator.send_error_response(client_sock, *self._get_throttled_response(client_key))
+            return False
+        if self.response_cache is None or not self.response_cache.is_cacheable_request(incoming_req_details):
+            return self._forward_request(client_sock, incoming_req_details)
+        cached, cache_fill = self.response_cache.lookup(incoming_req_details)
+        if cached is not None:
+            self._trace_outcome(incoming_req_details, OUTCOME_CACHED, cached.status_code)
+            return self.backend_server_communicator.send_cached_response(client_sock, cached, incoming_req_details)
+        try:
+            return self._forward_request(client_sock, incoming_req_details, cache_fill)
+        finally:
+            if cache_fill is not None:
+                self.response_cache.finish(cache_fill)
+
+    def _forward_request(self, client_sock: socket.socket, incoming_req_details: Dict[str, Any], cache_fill: Optional[CacheFill] = None) -> bool:
+        """
+        Forwards single request to backend server chosen by algorithm and relays its response to client.
+
+        :param cache_fill: fill of response cache response is stored through, if it may be cached.
+        :return: whether client connection can carry further requests.
+        """
+        self._sweep_servers()
+
+        # snapshot holds only healthy servers which are not ejected
+        healthy_servers = self.healthy_servers.servers
+
+        # no healthy backend server is available
+        if not healthy_servers:
             logging.info("No healthy backend servers available")
             self.backend_server_communicator.send_error_response(client_sock, "Service Unavailable", "No healthy backend servers available")
-            return
+            return False
+
+        # getting next server according to lb algo to handle request
+        backend_server = self._start_request_on_next_server(healthy_servers, incoming_req_details)
+        self._trace_phase(incoming_req_details, PHASE_SELECT)
+        if backend_server is None:
+            logging.info("All backend servers are at capacity")
+            self.backend_server_communicator.send_error_response(client_sock, "Service Unavailable", "All backend servers are at capacity", 503)
+            return False
 
-        error_occurred, response = self.backend_server_communicator.send_request_to_backend_server(client_sock, backend_server)
+        # request counts as in flight on backend server until its response is relayed, retried or hedged
+        # request ends up in flight only on server whose response is relayed
+        backend_server, error_occurred, response = self._send_request(incoming_req_details, backend_server, healthy_servers)
+        self._trace_backend_response(incoming_req_details, backend_server, response)
+        try:
+            return self._relay_response(client_sock, incoming_req_details, backend_server, error_occurred, response, cache_fill)
+        finally:
+            backend_server.finish_request()
+
+    def _send_request(self, incoming_req_details: Dict[str, Any], backend_server: BackendServer, healthy_servers: Tuple[BackendServer, ...]) -> Tuple[BackendServer, bool, Optional[requests.Response]]:
+        """
+        Sends request to backend server, retrying it on different server when it fails and hedging it when it is slow.
+
+        Only requests with idempotent method and without body are retried or hedged, as body
+        streamed from client cannot be sent twice. Every retry and hedge is taken from retry
+        budget, so failing backend servers are not flooded with retries.
+
+        :return: backend server whose response is used, whether error occurred and response; request stays in flight on returned server only.
+        """
+        communicator = self.backend_server_communicator
+        self.retry_budget.deposit()
+        if not self._is_retryable(incoming_req_details):
+            return (backend_server,) + communicator.send_request_to_backend_server(incoming_req_details, backend_server)
+
+        tried = [backend_server]
+        while True:
+            if self.hedge_requests:
+                backend_server, error_occurred, response = self._send_hedged_request(incoming_req_details, backend_server, healthy_servers, tried)
+            else:
+                error_occurred, response = communicator.send_request_to_backend_server(incoming_req_details, backend_server)
+            if not self._should_retry(error_occurred, response) or len(tried) > self.max_retries:
+                return backend_server, error_occurred, response
+            next_server = self._start_retry(healthy_servers, incoming_req_details, tried)
+            if next_server is None:
+                return backend_server, error_occurred, response
+            logging.info(f"Request {incoming_req_details['method']} {incoming_req_details['path']} failed on server {backend_server.url}, retrying on server {next_server.url}")
+            self._record_failed_attempt(backend_server, response)
+            backend_server.finish_request()
+            backend_server = next_server
+
+    def _send_hedged_request(self, incoming_req_details: Dict[str, Any], backend_server: BackendServer, healthy_servers: Tuple[BackendServer, ...],
+                             tried: List[BackendServer]) -> Tuple[BackendServer, bool, Optional[requests.Response]]:
+        """
+        Sends request to backend server and, once it takes longer than HEDGE_PERCENTILE of server's
+        latency, to another server too. First successful response is used.
+
+        Blocking request cannot be interrupted, so both attempts run in hedge executor threads while
+        worker thread waits for them, and losing attempt is discarded once it finishes.
+        """
+        communicator = self.backend_server_communicator
+        hedge_delay = self._get_hedge_delay(backend_server)
+        if hedge_delay is None:
+            return (backend_server,) + communicator.send_request_to_backend_server(incoming_req_details, backend_server)
+
+        primary = self.hedge_executor.submit(communicator.send_request_to_backend_server, incoming_req_details, backend_server)
+        try:
+            return (backend_server,) + primary.result(timeout=hedge_delay)
+        except concurrent.futures.TimeoutError:
+            pass
+        hedge_server = self._start_retry(healthy_servers, incoming_req_details, tried)
+        if hedge_server is None:
+            return (backend_server,) + primary.result()
+        logging.debug(f"Request {incoming_req_details['method']} {incoming_req_details['path']} is slow on server {backend_server.url}, hedging it on server {hedge_server.url}")
+        hedge = self.hedge_executor.submit(communicator.send_request_to_backend_server, incoming_req_details, hedge_server)
+
+        attempts = {primary: backend_server, hedge: hedge_server}
+        done, _ = concurrent.futures.wait(attempts, return_when=concurrent.futures.FIRST_COMPLETED)
+        first, second = (primary, hedge) if primary in done else (hedge, primary)
+        error_occurred, response = first.result()
+        if self._should_retry(error_occurred, response):
+            # attempt which finished first failed, so other one is used, whatever its outcome
+            self._record_failed_attempt(attempts[first], response)
+            attempts[first].finish_request()
+            return (attempts[second],) + second.result()
+        second.cancel()
+        second.add_done_callback(lambda future, server=attempts[second]: self._discard_attempt(server, future))
+        return attempts[first], error_occurred, response
+
+    def _relay_response(self, client_sock: socket.socket, incoming_req_details: Dict[str, Any], backend_server: BackendServer, error_occurred: bool, response: Optional[requests.Response],
+                        cache_fill: Optional[CacheFill] = None) -> bool:
+        """
+        Relays response of given backend server to client, or error response if request to it failed.
+
+        :return: whether client connection can carry further requests.
+        """
 
         if error_occurred:
-            self.backend_server_communicator.send_error_response(client_sock,"Service Unavailable", "Failed to connect to backend server")
+            # server is ejected before client hears about failure, so client retrying right away is not sent to it again
             backend_server.increment_error_count()
             backend_server.increment_request_count()
-            logging.info(backend_server.get_stats())
-            return
+            self._record_outcome(backend_server, False)
+            self.backend_server_communicator.send_error_response(client_sock,"Service Unavailable", "Failed to connect to backend server")
+            return False
 
-        if response.status_code >= 400:
+        keep_alive = False
+        if response is None:
+            self.backend_server_communicator.send_error_response(client_sock, "Bad Request", "Unsupported HTTP method")
+        elif response.status_code >= 400:
+            response.close()
+            # client errors say nothing about health of server, server errors do
+            self._record_outcome(backend_server, response.status_code < 500, response.elapsed.total_seconds())
             error_message = f"Request failed with status code {response.status_code}"
             self.backend_server_communicator.send_error_response(client_sock, "Bad Request", error_message)
             backend_server.increment_error_count()
         else:
-            response_str = Utils.generate_response_string(response)
-            self.backend_server_communicator.send_success_response(client_sock, response_str)
+            backend_server.add_latency(response.elapsed.total_seconds())
+            self._record_outcome(backend_server, True, response.elapsed.total_seconds())
+            try:
+                keep_alive = self.backend_server_communicator.send_success_response(client_sock, response, incoming_req_details, cache_fill and cache_fill.add_chunk)
+                backend_server.increment_success_count()
+                if cache_fill is not None:
+                    self.response_cache.store(cache_fill, incoming_req_details, response)
+            except OSError as e:
+                logging.error(f"Failed to relay response of backend server {backend_server.url}: {e}")
+                backend_server.increment_error_count()
+
+        backend_server.increment_request_count()
+        return keep_alive
+
+    async def _proxy_async_request(self, writer: asyncio.StreamWriter, incoming_req_details: Dict[str, Any]) -> bool:
+        """
+        Same as _proxy_request, for asyncio server mode.
+        """
+        client_key = self._get_throttled_client_key(incoming_req_details)
+        if client_key is not None:
+            self._trace_outcome(incoming_req_details, OUTCOME_THROTTLED, 429)
+            await self.async_backend_server_communicator.send_error_response(writer, *self._get_throttled_response(client_key))
+            return False
+        if self.response_cache is None or not self.response_cache.is_cacheable_request(incoming_req_details):
+            return await self._forward_async_request(writer, incoming_req_details)
+        cached, cache_fill = await self.response_cache.lookup_async(incoming_req_details)
+        if cached is not None:
+            self._trace_outcome(incoming_req_details, OUTCOME_CACHED, cached.status_code)
+            return await self.async_backend_server_communicator.send_cached_response(writer, cached, incoming_req_details)
+        try:
+            return await self._forward_async_request(writer, incoming_req_details, cache_fill)
+        finally:
+            if cache_fill is not None:
+                self.response_cache.finish(cache_fill)
+
+    async def _forward_async_request(self, writer: asyncio.StreamWriter, incoming_req_details: Dict[str, Any], cache_fill: Optional[CacheFill] = None) -> bool:
+        """
+        Same as _forward_request, for asyncio server mode.
+        """
+        communicator = self.async_backend_server_communicator
+        self._sweep_servers()
+        healthy_servers = self.healthy_servers.servers
+
+        if not healthy_servers:
+            logging.info("No healthy backend servers available")
+            await communicator.send_error_response(writer, "Service Unavailable", "No healthy backend servers available")
+            return False
+
+        backend_server = self._start_request_on_next_server(healthy_servers, incoming_req_details)
+        self._trace_phase(incoming_req_details, PHASE_SELECT)
+        if backend_server is None:
+            logging.info("All backend servers are at capacity")
+            await communicator.send_error_response(writer, "Service Unavailable", "All backend servers are at capacity", 503)
+            return False
+
+        backend_server, error_occurred, response = await self._send_async_request(incoming_req_details, backend_server, healthy_servers)
+        self._trace_backend_response(incoming_req_details, backend_server, response)
+        try:
+            return await self._relay_async_response(writer, incoming_req_details, backend_server, error_occurred, response, cache_fill)
+        finally:
+            backend_server.finish_request()
+
+    async def _send_async_request(self, incoming_req_details: Dict[str, Any], backend_server: BackendServer, healthy_servers: Tuple[BackendServer, ...]) -> Tuple[BackendServer, bool, Optional[requests.Response]]:
+        """
+        Same as _send_request, for asyncio server mode.
+        """
+        communicator = self.async_backend_server_communicator
+        self.retry_budget.deposit()
+        if not self._is_retryable(incoming_req_details):
+            return (backend_server,) + await communicator.send_request_to_backend_server(incoming_req_details, backend_server)
+
+        tried = [backend_server]
+        while True:
+            if self.hedge_requests:
+                backend_server, error_occurred, response = await self._send_hedged_async_request(incoming_req_details, backend_server, healthy_servers, tried)
+            else:
+                error_occurred, response = await communicator.send_request_to_backend_server(incoming_req_details, backend_server)
+            if not self._should_retry(error_occurred, response) or len(tried) > self.max_retries:
+                return backend_server, error_occurred, response
+            next_server = self._start_retry(healthy_servers, incoming_req_details, tried)
+            if next_server is None:
+                return backend_server, error_occurred, response
+            logging.info(f"Request {incoming_req_details['method']} {incoming_req_details['path']} failed on server {backend_server.url}, retrying on server {next_server.url}")
+            self._record_failed_attempt(backend_server, response)
+            backend_server.finish_request()
+            backend_server = next_server
+
+    async def _send_hedged_async_request(self, incoming_req_details: Dict[str, Any], backend_server: BackendServer, healthy_servers: Tuple[BackendServer, ...],
+                                         tried: List[BackendServer]) -> Tuple[BackendServer, bool, Optional[requests.Response]]:
+        """
+        Same as _send_hedged_request, for asyncio server mode, where losing attempt is cancelled
+        right away, which closes its backend connection.
+        """
+        communicator = self.async_backend_server_communicator
+        hedge_delay = self._get_hedge_delay(backend_server)
+        if hedge_delay is None:
+            return (backend_server,) + await communicator.send_request_to_backend_server(incoming_req_details, backend_server)
+
+        primary = asyncio.ensure_future(communicator.send_request_to_backend_server(incoming_req_details, backend_server))
+        done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+        if done:
+            return (backend_server,) + primary.result()
+        hedge_server = self._start_retry(healthy_servers, incoming_req_details, tried)
+        if hedge_server is None:
+            return (backend_server,) + await primary
+        logging.debug(f"Request {incoming_req_details['method']} {incoming_req_details['path']} is slow on server {backend_server.url}, hedging it on server {hedge_server.url}")
+        hedge = asyncio.ensure_future(communicator.send_request_to_backend_server(incoming_req_details, hedge_server))
+
+        attempts = {primary: backend_server, hedge: hedge_server}
+        done, _ = await asyncio.wait(attempts, return_when=asyncio.FIRST_COMPLETED)
+        first, second = (primary, hedge) if primary in done else (hedge, primary)
+        error_occurred, response = first.result()
+        if self._should_retry(error_occurred, response):
+            self._record_failed_attempt(attempts[first], response)
+            attempts[first].finish_request()
+            return (attempts[second],) + await second
+        second.cancel()
+        second.add_done_callback(lambda task, server=attempts[second]: self._discard_attempt(server, task))
+        return attempts[first], error_occurred, response
+
+    async def _relay_async_response(self, writer: asyncio.StreamWriter, incoming_req_details: Dict[str, Any], backend_server: BackendServer, error_occurred: bool, response: Optional[requests.Response],
+                                    cache_fill: Optional[CacheFill] = None) -> bool:
+        """
+        Same as _relay_response, for asyncio server mode, where chunked responses are relayed
+        with their chunk framing and therefore not cached.
+        """
+        communicator = self.async_backend_server_communicator
+
+        if error_occurred:
+            # server is ejected before client hears about failure, so client retrying right away is not sent to it again
+            backend_server.increment_error_count()
+            backend_server.increment_request_count()
+            self._record_outcome(backend_server, False)
+            await communicator.send_error_response(writer, "Service Unavailable", "Failed to connect to backend server")
+            return False
+
+        keep_alive = False
+        if response is None:
+            await communicator.send_error_response(writer, "Bad Request", "Unsupported HTTP method")
+        elif response.status_code >= 400:
+            response.close()
+            # client errors say nothing about health of server, server errors do
+            self._record_outcome(backend_server, response.status_code < 500, response.elapsed.total_seconds())
+            error_message = f"Request failed with status code {response.status_code}"
+            await communicator.send_error_response(writer, "Bad Request", error_message)
+            backend_server.increment_error_count()
+        else:
+            backend_server.add_latency(response.elapsed.total_seconds())
+            self._record_outcome(backend_server, True, response.elapsed.total_seconds())
+            try:
+                if cache_fill is not None and response.raw.chunked:
+                    cache_fill = None
+                keep_alive = await communicator.send_success_response(writer, response, incoming_req_details, cache_fill and cache_fill.add_chunk)
+                backend_server.increment_success_count()
+                if cache_fill is not None:
+                    self.response_cache.store(cache_fill, incoming_req_details, response)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                logging.error(f"Failed to relay response of backend server {backend_server.url}: {e!r}")
+                backend_server.increment_error_count()
+
+        backend_server.increment_request_count()
+        return keep_alive
+
+    def _connect_to_backend_server(self, client_ip: str) -> Tuple[Optional[BackendServer], Optional[socket.socket]]:
+        """
+        Connects to backend server chosen by algorithm for client connection of tcp proxy mode,
+        trying other servers when connection fails, since nothing was sent to failed one yet.
+
+        :return: server connected to and connection to it, or (None, None) if no server could be connected to.
+        """
+        self._sweep_servers()
+        healthy_servers = self.healthy_servers.servers
+        # algorithms see client connection as request without method, path and headers
+        connection_context = {'client_ip': client_ip, 'method': None, 'path': "", 'headers': {}}
+        backend_server = self._start_request_on_next_server(healthy_servers, connection_context)
+        tried = [backend_server]
+        self.retry_budget.deposit()
+        while backend_server is not None:
+            start_time = time.monotonic()
+            try:
+                backend_sock = socket.create_connection(self._get_backend_address(backend_server), TCP_CONNECT_TIMEOUT)
+                backend_sock.settimeout(None)
+            except OSError as e:
+                logging.error(f"Failed to connect to backend server {backend_server.url}: {e}")
+                self._record_failed_attempt(backend_server, None)
+                backend_server.finish_request()
+                backend_server = self._start_retry(healthy_servers, connection_context, tried) if len(tried) <= self.max_retries else None
+                continue
+            self._record_connected(backend_server, time.monotonic() - start_time)
+            return backend_server, backend_sock
+        logging.error(f"No backend server accepted connection of client {client_ip}")
+        return None, None
+
+    async def _connect_async_to_backend_server(self, client_ip: str) -> Tuple[Optional[BackendServer], Optional[asyncio.StreamReader], Optional[asyncio.StreamWriter]]:
+        """
+        Same as _connect_to_backend_server, but connecting is awaited on event loop.
+        """
+        self._sweep_servers()
+        healthy_servers = self.healthy_servers.servers
+        connection_context = {'client_ip': client_ip, 'method': None, 'path': "", 'headers': {}}
+        backend_server = self._start_request_on_next_server(healthy_servers, connection_context)
+        tried = [backend_server]
+        self.retry_budget.deposit()
+        while backend_server is not None:
+            start_time = time.monotonic()
+            host, port = self._get_backend_address(backend_server)
+            try:
+                backend_reader, backend_writer = await asyncio.wait_for(asyncio.open_connection(host, port, limit=TCP_RELAY_BUFFER_SIZE), TCP_CONNECT_TIMEOUT)
+            except (OSError, asyncio.TimeoutError) as e:
+                logging.error(f"Failed to connect to backend server {backend_server.url}: {e!r}")
+                self._record_failed_attempt(backend_server, None)
+                backend_server.finish_request()
+                backend_server = self._start_retry(healthy_servers, connection_context, tried) if len(tried) <= self.max_retries else None
+                continue
+            self._record_connected(backend_server, time.monotonic() - start_time)
+            return backend_server, backend_reader, backend_writer
+        logging.error(f"No backend server accepted connection of client {client_ip}")
+        return None, None, None
+
+    @staticmethod
+    def _get_backend_address(backend_server: BackendServer) -> Tuple[str, int]:
+        url = urlsplit(backend_server.url)
+        return url.hostname, url.port or (443 if url.scheme == "https" else 80)
+
+    def _record_connected(self, backend_server: BackendServer, connect_time: float) -> None:
+        """
+        Counts connection of tcp proxy mode as request to server, with time connecting took as its latency.
+        """
+        backend_server.increment_request_count()
+        backend_server.add_latency(connect_time)
+        self._record_outcome(backend_server, True, connect_time)
+
+    def _finish_tcp_connection(self, backend_server: BackendServer, success: bool) -> None:
+        """
+        Counts relayed connection once it is closed; connection stays in flight on server until then,
+        so least connections algorithms balance open connections.
+        """
+        if success:
             backend_server.increment_success_count()
+        else:
+            # connection reset by client is counted too, so it is not fed to outlier detection
+            backend_server.increment_error_count()
+        backend_server.finish_request()
+
+    @staticmethod
+    async def _relay_tcp_stream(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Relays bytes from reader to writer until reader ends its stream, then passes end of stream on as half-close.
+        """
+        while True:
+            data = await reader.read(TCP_RELAY_BUFFER_SIZE)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+        if writer.can_write_eof():
+            writer.write_eof()
+
+    def _on_server_state_changed(self, server: BackendServer) -> None:
+        logging.info(f"Server {server.url} changed state: healthy={server.is_healthy}, ejected={server.is_ejected()}, circuit={server.circuit_breaker.state}, weight={server.get_weight()}")
+        self._update_healthy_servers()
+
+    def _on_draining_server_active_requests_changed(self, server: BackendServer) -> None:
+        """
+        Forgets removed server once last request in flight on it finished.
+        """
+        with self.backend_servers_lock:
+            if server.get_active_requests() > 0 or server not in self.draining_servers:
+                return
+            self.draining_servers = [other for other in self.draining_servers if other is not server]
+        server.close_connections()
+        logging.info(f"Removed backend server {server.url}")
+
+    def _check_reconfigurable(self) -> None:
+        # positions of backend servers in shared state are fixed when supervisor starts worker processes
+        if self.shared_state is not None:
+            raise RuntimeError("Backend servers of load balancer process run by supervisor cannot be changed")
+
+    def _admin_apply_config(self, query: Dict[str, str], body: Any) -> Tuple[int, Any]:
+        self.apply_backend_servers_config(body)
+        return 200, [server.get_stats() for server in self.backend_servers]
+
+    def _admin_update_backend_server(self, query: Dict[str, str], body: Any) -> Tuple[int, Any]:
+        if not isinstance(body, dict):
+            raise ValueError("Request body must be JSON object with weight or draining")
+        server = self.update_backend_server(self._get_url_param(query), body.get("weight"), body.get("draining"))
+        return 200, server.get_stats()
+
+    def _admin_remove_backend_server(self, query: Dict[str, str], body: Any) -> Tuple[int, Any]:
+        server = self.remove_backend_server(self._get_url_param(query))
+        return 202, {"server_url": server.url, "active_requests": server.get_active_requests()}
+
+    @staticmethod
+    def _get_url_param(query: Dict[str, str]) -> str:
+        if "url" not in query:
+            raise ValueError("Backend server has to be given by url query parameter")
+        return query["url"]
+
+    def _update_healthy_servers(self) -> None:
+        """
+        Replaces snapshot of healthy servers and lets algorithm precompute its selection structures for it.
+        """
+        with self.healthy_servers_lock:
+            servers = tuple(server for server in self.backend_servers if server.is_available())
+            self.healthy_servers = HealthyServersSnapshot(self.healthy_servers.version + 1, servers)
+            self.algorithm.on_servers_changed(servers)
+
+    def _start_request_on_next_server(self, healthy_servers: Tuple[BackendServer, ...], incoming_req_details: Dict[str, Any], exclude: Sequence[BackendServer] = ()) -> Optional[BackendServer]:
+        """
+        Selects backend server according to algorithm and counts request as in flight on it.
 
+        Selection and counting are separate steps, so server chosen by algorithm which enforces
+        capacity may be filled up by concurrent request meanwhile; selection is retried then.
+        Server in slow start takes request it was chosen for only with probability of its slow
+        start factor, otherwise selection is retried too.
+
+        Server in slow start which declined request is taken only when no other server can, so
+        slow start works with deterministic algorithms too, which keep choosing same server.
+
+        :param exclude: servers request must not go to, because it was already sent to them.
+        :return: selected backend server, or None if algorithm found every server at capacity or no server took request.
+        """
+        declined = [] # servers in slow start which declined request
+        for _ in range(len(healthy_servers)):
+            backend_server = self.algorithm.get_next_server(healthy_servers, incoming_req_details)
+            if backend_server is None:
+                return None
+            if backend_server in exclude or backend_server in declined:
+                continue
+            if random.random() >= backend_server.get_slow_start_factor():
+                declined.append(backend_server)
+                continue
+            if backend_server.start_request(self.algorithm.enforces_capacity):
+                return backend_server
+
+        # algorithm may keep choosing servers request was already sent to, or server which refuses
+        # request (consistent hashing always chooses same one, e.g. half-open with all its trial
+        # requests in flight), so any other server is taken instead; scan starts at random server,
+        # so requests algorithm could not place are spread evenly
+        offset = random.randrange(len(healthy_servers)) if healthy_servers else 0
+        candidates = [server for server in healthy_servers[offset:] + healthy_servers[:offset] if server not in exclude]
+        for backend_server in candidates:
+            if backend_server not in declined and random.random() < backend_server.get_slow_start_factor() and backend_server.start_request(self.algorithm.enforces_capacity):
+                return backend_server
+        # request is rather sent to server in slow start than refused
+        for backend_server in candidates:
+            if backend_server.get_slow_start_factor() < 1 and backend_server.start_request(self.algorithm.enforces_capacity):
+                return backend_server
+        return None
+
+    @staticmethod
+    def _trace_phase(incoming_req_details: Dict[str, Any], phase: str) -> None:
+        trace = incoming_req_details.get('trace')
+        if trace is not None:
+            trace.mark(phase)
+
+    @staticmethod
+    def _trace_outcome(incoming_req_details: Dict[str, Any], outcome: str, status: int) -> None:
+        trace = incoming_req_details.get('trace')
+        if trace is not None:
+            trace.outcome, trace.status = outcome, status
+
+    @staticmethod
+    def _trace_backend_response(incoming_req_details: Dict[str, Any], backend_server: BackendServer, response: Optional[requests.Response]) -> None:
+        """
+        Ends backend phase of traced request, noting server whose response is used and its status.
+        """
+        trace = incoming_req_details.get('trace')
+        if trace is None:
+            return
+        trace.mark(PHASE_BACKEND)
+        trace.backend = backend_server.url
+        if response is not None:
+            trace.outcome, trace.status = OUTCOME_RELAYED, response.status_code
+
+    def _is_retryable(self, incoming_req_details: Dict[str, Any]) -> bool:
+        return incoming_req_details['method'] in RETRY_METHODS and incoming_req_details['request_data'] is None
+
+    def _should_retry(self, error_occurred: bool, response: Optional[requests.Response]) -> bool:
+        return error_occurred or (response is not None and response.status_code in RETRY_STATUS_CODES)
+
+    def _start_retry(self, healthy_servers: Tuple[BackendServer, ...], incoming_req_details: Dict[str, Any], tried: List[BackendServer]) -> Optional[BackendServer]:
+        """
+        Selects server request was not sent to yet and counts request as in flight on it, if retry budget allows.
+        """
+        backend_server = self._start_request_on_next_server(healthy_servers, incoming_req_details, exclude=tried)
+        if backend_server is None:
+            return None
+        if not self.retry_budget.try_withdraw():
+            logging.info("Retry budget is exhausted, request is not retried")
+            backend_server.finish_request()
+            return None
+        tried.append(backend_server)
+        return backend_server
+
+    def _get_hedge_delay(self, backend_server: BackendServer) -> Optional[float]:
+        """
+        Returns seconds after which request to server is hedged, or None until server has enough latency samples.
+        """
+        if backend_server.latency_tracker.count < HEDGE_MIN_SAMPLES:
+            return None
+        return max(HEDGE_MIN_DELAY, backend_server.get_latency_percentile(HEDGE_PERCENTILE))
+
+    def _record_failed_attempt(self, backend_server: BackendServer, response: Optional[requests.Response]) -> None:
+        """
+        Counts failure of attempt which is retried instead of being relayed to client.
+        """
+        if response is not None:
+            response.close()
+        backend_server.increment_error_count()
         backend_server.increment_request_count()
-        logging.info(backend_server.get_stats())
+        self._record_outcome(backend_server, False)
+
+    def _discard_attempt(self, backend_server: BackendServer, future: Any) -> None:
+        """
+        Releases attempt which lost hedging race, once it finished or got cancelled.
+        """
+        if not future.cancelled() and future.exception() is None:
+            _, response = future.result()
+            if response is not None:
+                response.close()
+        backend_server.finish_request()
+
+    def _record_outcome(self, backend_server: BackendServer, success: bool, latency: Optional[float] = None) -> None:
+        """
+        Feeds outcome of request to outlier detection and circuit breaker of server, ejecting server right away if it asks for it.
+        """
+        reason = backend_server.record_outcome(success, latency)
+        if reason is not None:
+            self._eject_server(backend_server, reason)
+
+    def _eject_server(self, backend_server: BackendServer, reason: str) -> bool:
+        """
+        Ejects server, unless OUTLIER_MAX_EJECTION_PERCENT of servers are ejected already.
+
+        Cap keeps load balancer from ejecting most of its servers when failures are caused by
+        something they all share, which would only pile their traffic onto the rest.
+        """
+        with self.outlier_lock:
+            if backend_server.is_ejected():
+                return False
+            max_ejected = max(1, len(self.backend_servers) * OUTLIER_MAX_EJECTION_PERCENT // 100)
+            if sum(1 for server in self.backend_servers if server.is_ejected()) >= max_ejected:
+                logging.warning(f"Not ejecting server {backend_server.url} ({reason}), {max_ejected} servers are ejected already")
+                return False
+            backend_server.eject(reason)
+            return True
+
+    def _sweep_servers(self) -> None:
+        """
+        Readmits ejected servers whose ejection time is over, lets open circuits of servers go
+        half-open once their open time is over, and ejects servers which are latency outliers.
+
+        In worker process of supervisor, also applies health of backend servers published by
+        supervisor and publishes counters of this process.
+
+        Runs on request path, so it is skipped unless OUTLIER_SWEEP_INTERVAL passed since last
+        sweep, and only one thread sweeps at time.
+        """
+        now = time.monotonic()
+        if now < self.next_outlier_sweep or not self.outlier_lock.acquire(blocking=False):
+            return
+        try:
+            self.next_outlier_sweep = now + OUTLIER_SWEEP_INTERVAL
+            readmitted = [server for server in self.backend_servers if server.outlier_detector.is_due_for_readmission(now)]
+        finally:
+            self.outlier_lock.release()
+        for server in readmitted:
+            server.readmit()
+        for server in self.backend_servers:
+            server.update_circuit_breaker()
+        self._sync_shared_state()
+
+        # latency of server is compared to median of all servers in service, with enough recent requests
+        # to be judged, so servers which are all slow together are left alone
+        judged = [server for server in self.healthy_servers.servers if server.outlier_detector.has_enough_requests()]
+        if len(judged) < 3:
+            return
+        median_latency = statistics.median(server.get_latency() for server in judged)
+        for server in judged:
+            if median_latency > 0 and server.get_latency() > OUTLIER_LATENCY_FACTOR * median_latency:
+                self._eject_server(server, f"average latency {server.get_latency():.3f}s is over {OUTLIER_LATENCY_FACTOR} times median {median_latency:.3f}s")
+
+    def _sync_shared_state(self) -> None:
+        """
+        Applies health of backend servers from shared state when it changed, and publishes counters of this process.
+        """
+        if self.shared_state is None:
+            return
+        version = self.shared_state.get_version()
+        if version != self.shared_state_version:
+            self.shared_state_version = version
+            for server, is_healthy in zip(self.backend_servers, self.shared_state.get_health()):
+                server.is_healthy = is_healthy
+        for i, server in enumerate(self.backend_servers):
+            # same order as CUMULATIVE_STATS_FIELDS, followed by active requests
+            counters = (server.request_count, server.success_count, server.error_count, server.total_latency)
+            values = [baseline + value for baseline, value in zip(self.shared_stats_baseline[i], counters)]
+            self.shared_state.publish_stats(self.worker_index, i, values + [server.get_active_requests()])
+
+    def _collect_metrics(self) -> List[MetricFamily]:
+        """
+        Returns current metrics of load balancer and its backend servers.
+        """
+        servers = [(server, {"backend": server.url}) for server in self.backend_servers]
+        families = [
+            MetricFamily("lb_backend_requests_total", "counter", "Requests proxied to backend server.",
+                         [("", labels, server.request_count) for server, labels in servers]),
+            MetricFamily("lb_backend_successes_total", "counter", "Requests whose successful response was relayed to client.",
+                         [("", labels, server.success_count) for server, labels in servers]),
+            MetricFamily("lb_backend_errors_total", "counter", "Requests which failed or got error response from backend server.",
+                         [("", labels, server.error_count) for server, labels in servers]),
+            MetricFamily("lb_backend_request_duration_seconds", "histogram", "Latency of successful requests to backend server.",
+                         [sample for server, labels in servers for sample in MetricsRegistry.histogram_samples(server.latency_histogram, labels)]),
+            MetricFamily("lb_backend_active_requests", "gauge", "Requests currently in flight on backend server.",
+                         [("", labels, server.get_active_requests()) for server, labels in servers]),
+            MetricFamily("lb_backend_up", "gauge", "Whether backend server is healthy, not ejected and its circuit is not open.",
+                         [("", labels, server.is_available()) for server, labels in servers]),
+            MetricFamily("lb_backend_ejections_total", "counter", "Times backend server was ejected by outlier detection.",
+                         [("", labels, server.outlier_detector.total_ejections) for server, labels in servers]),
+            MetricFamily("lb_backend_circuit_state", "gauge", "State of circuit breaker of backend server, 1 for current state.",
+                         [("", dict(labels, state=state), server.circuit_breaker.state == state)
+                          for server, labels in servers for state in (CircuitBreaker.CLOSED, CircuitBreaker.OPEN, CircuitBreaker.HALF_OPEN)]),
+            MetricFamily("lb_retries_total", "counter", "Retries and hedged requests allowed by retry budget.", [("", {}, self.retry_budget.retries)]),
+            MetricFamily("lb_retries_refused_total", "counter", "Retries and hedged requests refused by retry budget.", [("", {}, self.retry_budget.refused)]),
+        ]
+        if self.response_cache is not None:
+            cache_stats = self.response_cache.get_stats()
+            families.extend([
+                MetricFamily("lb_cache_hits_total", "counter", "Requests answered from response cache.", [("", {}, cache_stats["hits"])]),
+                MetricFamily("lb_cache_misses_total", "counter", "Cacheable requests forwarded to backend server.", [("", {}, cache_stats["misses"])]),
+                MetricFamily("lb_cache_collapsed_total", "counter", "Requests which waited for concurrent request fetching same response.", [("", {}, cache_stats["collapsed"])]),
+                MetricFamily("lb_cache_evictions_total", "counter", "Responses evicted from full response cache.", [("", {}, cache_stats["evictions"])]),
+                MetricFamily("lb_cache_saved_bytes_total", "counter", "Body bytes sent from response cache instead of backend servers.", [("", {}, cache_stats["bytes_saved"])]),
+                MetricFamily("lb_cache_entries", "gauge", "Responses stored in response cache.", [("", {}, cache_stats["entries"])]),
+                MetricFamily("lb_cache_size_bytes", "gauge", "Total size of response bodies stored in response cache.", [("", {}, cache_stats["size"])]),
+            ])
+        if self.tls_terminator is not None:
+            tls_stats = self.tls_terminator.get_stats()
+            families.append(MetricFamily("lb_tls_handshakes_total", "counter", "TLS handshakes with clients, by whether session was resumed or handshake failed.",
+                                         [("", {"result": "full"}, tls_stats["full_handshakes"]), ("", {"result": "resumed"}, tls_stats["resumed_handshakes"]),
+                                          ("", {"result": "failed"}, tls_stats["failed_handshakes"])]))
+            families.append(MetricFamily("lb_tls_handshake_duration_seconds", "histogram", "Duration of successful TLS handshakes with clients (threaded server mode).",
+                                         MetricsRegistry.histogram_samples(self.tls_terminator.handshake_histogram, {})))
+        if self.request_tracer is not None:
+            families.append(MetricFamily("lb_request_phase_duration_seconds", "histogram", "Time spent in each phase of request handling, and in total.",
+                                         [sample for phase, histogram in self.request_tracer.histograms.items()
+                                          for sample in MetricsRegistry.histogram_samples(histogram, {"phase": phase})]))
+        if self.rate_limiter is not None:
+            rate_limit_stats = self.rate_limiter.get_stats()
+            families.append(MetricFamily("lb_rate_limited_total", "counter", "Requests answered with 429 and connections refused on accept because client exceeded its rate limit.",
+                                         [("", {"stage": "request"}, rate_limit_stats["throttled_requests"]), ("", {"stage": "connection"}, rate_limit_stats["throttled_connections"])]))
+            families.append(MetricFamily("lb_rate_limit_clients", "gauge", "Clients whose token buckets are remembered by rate limiter.", [("", {}, rate_limit_stats["clients"])]))
+        if self.tcp_relay is not None:
+            relay_stats = self.tcp_relay.get_stats()
+            families.append(MetricFamily("lb_tcp_connections_active", "gauge", "Client connections currently relayed to backend servers.", [("", {}, relay_stats["active_connections"])]))
+            families.append(MetricFamily("lb_tcp_relayed_bytes_total", "counter", "Bytes relayed between clients and backend servers, by direction.",
+                                         [("", {"direction": "upstream"}, relay_stats["bytes_upstream"]), ("", {"direction": "downstream"}, relay_stats["bytes_downstream"])]))
+        if self.server_mode == SERVER_MODE_THREADED:
+            pool_stats = self.worker_pool.get_stats()
+            families.append(MetricFamily("lb_accept_queue_length", "gauge", "Client connections waiting for worker thread.", [("", {}, pool_stats["queued"])]))
+            families.append(MetricFamily("lb_connections_shed_total", "counter", "Client connections answered with 503 because workers were busy.",
+                                         [("", {"reason": "queue_full"}, pool_stats["rejected_queue_full"]), ("", {"reason": "deadline"}, pool_stats["rejected_deadline"])]))
+        return families
+
+    def _wait_for_next_request(self, client_sock: socket.socket, parser: HttpRequestParser) -> bool:
+        """
+        Waits until client starts sending next request over keep-alive connection.
+
+        Worker waiting on idle keep-alive connection is wasted while other connections wait
+        in accept queue, so idle connection is given up as soon as there is backlog, as long
+        as client has not started sending next request yet.
+
+        :return: False if connection should be closed, because it stayed idle for CLIENT_KEEP_ALIVE_TIMEOUT or its worker is needed elsewhere.
+        """
+        if not parser.is_idle() or (isinstance(client_sock, ssl.SSLSocket) and client_sock.pending()):
+            # next pipelined request is already buffered, by parser or by TLS layer where poll cannot see it
+            return True
+        poller = select.poll()
+        poller.register(client_sock, select.POLLIN)
+        deadline = time.monotonic() + CLIENT_KEEP_ALIVE_TIMEOUT
+        while not self.worker_pool.has_backlog():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if poller.poll(min(remaining, IDLE_CONNECTION_POLL_INTERVAL) * 1000):
+                return True
+        return False
+
+    def _reject_client(self, client_sock: socket.socket, reason: str) -> None:
+        """
+        Sheds client connection load balancer has no capacity for, with fast 503 response.
+        """
+        logging.debug(f"Shedding client connection: {reason}")
+        self._shed_client(client_sock, "Service Unavailable", "Load balancer is overloaded, try again later", 503)
+
+    def _shed_client(self, client_sock: socket.socket, reason: str, message: str, status_code: int, headers: Optional[Dict[str, str]] = None) -> None:
+        """
+        Answers freshly accepted client connection with error response and closes it, without reading request from it.
+        """
+        if self.tls_terminator is not None or self.proxy_mode == PROXY_MODE_TCP:
+            # 503 could be sent only after TLS handshake, which costs more than serving request,
+            # and client of tcp proxy mode may not speak HTTP at all
+            client_sock.close()
+            return
+        try:
+            # response is tiny and socket is fresh, so it fits into send buffer without blocking for long
+            client_sock.settimeout(1)
+            self.backend_server_communicator.send_error_response(client_sock, reason, message, status_code, headers)
+            client_sock.shutdown(socket.SHUT_WR)
+
+            # closing socket with unread request in it resets connection, which may destroy 503
+            # before client reads it, so whatever part of request already arrived is discarded first
+            client_sock.setblocking(False)
+            while client_sock.recv(65536):
+                pass
+        except OSError as e:
+            logging.debug(f"Client connection closed while shedding it: {e}")
+        finally:
+            client_sock.close()
+
+    def _is_connection_throttled(self, client_ip: str) -> bool:
+        """
+        Checks rate limit of client whose connection was just accepted.
+
+        In tcp proxy mode connection takes token of its own. In http mode tokens are taken by
+        requests, and connection is refused only while client has none left, so client whose
+        every request would be answered with 429 does not take worker to be told so; clients
+        limited by header are not known until their request is read.
+        """
+        if self.rate_limiter is None:
+            return False
+        if self.proxy_mode == PROXY_MODE_TCP:
+            return not self.rate_limiter.try_acquire(client_ip, connection=True)
+        return self.rate_limiter.keys_by_client_ip and self.rate_limiter.is_throttled(client_ip)
+
+    def _get_throttled_client_key(self, incoming_req_details: Dict[str, Any]) -> Optional[str]:
+        """
+        Takes token for request from bucket of its client.
+
+        :return: key of client if its bucket was empty and request must be answered with 429, None otherwise.
+        """
+        if self.rate_limiter is None:
+            return None
+        client_key = self.rate_limiter.get_key(incoming_req_details['client_ip'], incoming_req_details['headers'])
+        return None if self.rate_limiter.try_acquire(client_key) else client_key
+
+    def _get_throttled_response(self, client_key: str) -> Tuple[str, str, int, Dict[str, str]]:
+        """
+        Returns reason, message, status code and headers of response to client which exceeded its rate limit.
+        """
+        return "Too Many Requests", "Rate limit exceeded, try again later", 429, {"Retry-After": str(self.rate_limiter.get_retry_after(client_key))}
+
+    def _close_client_socket(self, client_sock: socket.socket) -> None:
+        # Check if socket is still connected before shutting down and closing
+        if client_sock.fileno() != -1:
+            try:
+                client_sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                # client already went away
+                pass
+            client_sock.close()
+
+    async def _serve_async(self) -> None:
+        """
+        Runs asyncio server mode until stop() is called.
+        """
+        self.loop = asyncio.get_running_loop()
+        self.stop_event = asyncio.Event()
+        tls_options = {"ssl": self.tls_terminator.context, "ssl_handshake_timeout": self.tls_terminator.handshake_timeout} if self.tls_terminator is not None else {}
+        connection_handler = self.handle_async_tcp_connection if self.proxy_mode == PROXY_MODE_TCP else self.handle_async_request
+        server = await asyncio.start_server(connection_handler, self.address[0], self.address[1], reuse_address=True, reuse_port=self.reuse_port, **tls_options)
+        logging.info(f"Load balancer listening on {self.address[0]}:{self.address[1]} (asyncio mode)")
+        self.ready.set()
+        async with server:
+            await self.stop_event.wait()
+        self.loop = None
+        self.stop_event = None
+        self.ready.clear()
@@ -0,0 +1,156 @@
+import math
+import bisect
+import threading
+from typing import List, Dict, Tuple, Callable, Iterable, NamedTuple, Sequence
+
+from constants.app_constants import METRICS_LATENCY_BUCKETS
+
+
+class ShardedCounter:
+    """
+    Counter updated from many threads without lock and without losing updates.
+
+    Plain += on shared attribute is read-modify-write, so two threads incrementing it at
+    same time may lose one of the increments. Counter instead gives every thread cell of
+    its own, which only that thread writes, and sums cells when value is read. Reads are
+    rare (stats, metrics scrape) and writes frequent, so summing on read is cheap overall.
+    Cells of threads which exited are kept, so their counts are not lost.
+    """
+
+    def __init__(self) -> None:
+        self.local = threading.local()
+        self.shards = [] # cell of every thread which ever updated counter
+        self.lock = threading.Lock() # guards only registration of new cell
+
+    def add(self, amount: float = 1) -> None:
+        self._get_shard()[0] += amount
+
+    def get(self) -> float:
+        return sum(shard[0] for shard in self.shards)
+
+
+    # Private methods from here
+
+    def _get_shard(self) -> list:
+        shard = getattr(self.local, "shard", None)
+        if shard is None:
+            shard = self._new_shard()
+            self.local.shard = shard
+            with self.lock:
+                self.shards.append(shard)
+        return shard
+
+    def _new_shard(self) -> list:
+        return [0]
+
+
+class Histogram(ShardedCounter):
+    """
+    Histogram of observed values (e.g. latencies) with fixed buckets, sharded per thread like ShardedCounter.
+
+    :param buckets: upper bounds of buckets, value falls into first bucket whose bound is not below it.
+    """
+
+    def __init__(self, buckets: Sequence[float] = METRICS_LATENCY_BUCKETS) -> None:
+        super().__init__()
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float) -> None:
+        # shard holds count of every bucket, count of values above last bound, and sum of values
+        shard = self._get_shard()
+        shard[bisect.bisect_left(self.buckets, value)] += 1
+        shard[-1] += value
+
+    def get(self) -> Tuple[List[int], float]:
+        """
+        Returns cumulative count of values up to each bucket bound (last one being +Inf) and sum of values.
+        """
+        counts = [0] * (len(self.buckets) + 1)
+        total = 0.0
+        for shard in self.shards:
+            for i in range(len(counts)):
+                counts[i] += shard[i]
+            total += shard[-1]
+        for i in range(1, len(counts)):
+            counts[i] += counts[i - 1]
+        return counts, total
+
+
+    # Private methods from here
+
+    def _new_shard(self) -> list:
+        return [0] * (len(self.buckets) + 2)
+
+
+class MetricFamily(NamedTuple):
+    """
+    Metric with its samples, as exposed in Prometheus text format.
+
+    Every sample is (name suffix, labels, value), suffix being e.g. "_bucket" for histogram buckets.
+    """
+    name: str
+    type: str
+    help: str
+    samples: List[Tuple[str, Dict[str, str], float]]
+
+
+class MetricsRegistry:
+    """
+    Collects metrics from registered collectors and renders them in Prometheus text format.
+
+    Collectors are callables returning metric families with their current values, so
+    metrics are read (and sharded counters merged) only when they are scraped, and hot
+    path of request handling only updates counters.
+    """
+
+    def __init__(self) -> None:
+        self.collectors = []
+
+    def register(self, collector: Callable[[], Iterable[MetricFamily]]) -> None:
+        self.collectors.append(collector)
+
+    def collect(self) -> List[MetricFamily]:
+        return [family for collector in self.collectors for family in collector()]
+
+    def render(self) -> str:
+        lines = []
+        for family in self.collect():
+            lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.type}")
+            for suffix, labels, value in family.samples:
+                lines.append(f"{family.name}{suffix}{self._format_labels(labels)} {self._format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def histogram_samples(histogram: Histogram, labels: Dict[str, str]) -> List[Tuple[str, Dict[str, str], float]]:
+        """
+        Returns samples of histogram in form Prometheus expects: cumulative buckets, sum and count.
+        """
+        counts, total = histogram.get()
+        bounds = [str(bound) for bound in histogram.buckets] + ["+Inf"]
+        samples = [("_bucket", dict(labels, le=bound), count) for bound, count in zip(bounds, counts)]
+        samples.append(("_sum", labels, total))
+        samples.append(("_count", labels, counts[-1]))
+        return samples
+
+
+    # Private methods from here
+
+    @staticmethod
+    def _format_labels(labels: Dict[str, str]) -> str:
+        if not labels:
+            return ""
+        return "{" + ",".join(f'{key}="{MetricsRegistry._escape(value)}"' for key, value in labels.items()) + "}"
+
+    @staticmethod
+    def _escape(value: str) -> str:
+        # backslash, double quote and line feed have to be escaped in label values
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    @staticmethod
+    def _format_value(value: float) -> str:
+        if isinstance(value, bool):
+            return str(int(value))
+        if isinstance(value, float) and math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value) if isinstance(value, float) else str(value)
@@ -0,0 +1,121 @@
+import time
+import threading
+from collections import deque
+from typing import Dict, Any, Optional
+
+from constants.app_constants import OUTLIER_CONSECUTIVE_ERRORS, OUTLIER_ERROR_RATE, OUTLIER_WINDOW_SIZE, OUTLIER_MIN_REQUESTS, OUTLIER_BASE_EJECTION_TIME, OUTLIER_MAX_EJECTION_TIME
+
+
+class OutlierDetector:
+    """
+    Judges health of single backend server from outcomes of requests proxied to it.
+
+    Active health checks notice dead server only at their next period, while every request
+    sent to it meanwhile fails. Detector sees those failures as they happen and tells when
+    server should be ejected: after run of consecutive failures, or once failure rate over
+    window of recent requests gets too high.
+
+    Ejected server is readmitted after ejection time, which doubles with every ejection in
+    a row up to max_ejection_time, so server which keeps failing is tried less and less
+    often. Once server stays in service for max_ejection_time, doubling starts over.
+
+    :param consecutive_errors: consecutive failed requests after which server is ejected.
+    :param error_rate: fraction of failed requests in window after which server is ejected.
+    :param window_size: number of most recent requests error rate is computed over.
+    :param min_requests: requests needed in window before error rate is judged.
+    :param base_ejection_time: seconds server is ejected for the first time.
+    :param max_ejection_time: maximum seconds server is ejected for.
+    """
+
+    def __init__(self, consecutive_errors: int = OUTLIER_CONSECUTIVE_ERRORS, error_rate: float = OUTLIER_ERROR_RATE, window_size: int = OUTLIER_WINDOW_SIZE,
+                 min_requests: int = OUTLIER_MIN_REQUESTS, base_ejection_time: float = OUTLIER_BASE_EJECTION_TIME, max_ejection_time: float = OUTLIER_MAX_EJECTION_TIME) -> None:
+        self.consecutive_errors = consecutive_errors
+        self.error_rate = error_rate
+        self.min_requests = min_requests
+        self.base_ejection_time = base_ejection_time
+        self.max_ejection_time = max_ejection_time
+
+        self.outcomes = deque(maxlen=window_size) # True for every successful request in window, False for failed one
+        self.failures = 0 # failed requests in window
+        self.consecutive_failures = 0
+
+        self.ejected_until = None # monotonic time ejected server is due for readmission, None while server is in service
+        self.ejection_count = 0 # ejections in a row, ejection time doubles with each of them
+        self.total_ejections = 0
+        self.readmitted_at = None # monotonic time of last readmission
+        self.lock = threading.Lock()
+
+    def record(self, success: bool) -> Optional[str]:
+        """
+        Records outcome of request proxied to server.
+
+        :return: reason server should be ejected for, or None if it should stay in service.
+        """
+        with self.lock:
+            if len(self.outcomes) == self.outcomes.maxlen and not self.outcomes[0]:
+                self.failures -= 1
+            self.outcomes.append(success)
+            if success:
+                self.consecutive_failures = 0
+                return None
+            self.failures += 1
+            self.consecutive_failures += 1
+
+            if self.ejected_until is not None:
+                # requests already in flight when server got ejected keep finishing
+                return None
+            if self.consecutive_failures >= self.consecutive_errors:
+                return f"{self.consecutive_failures} consecutive failed requests"
+            if len(self.outcomes) >= self.min_requests and self.failures / len(self.outcomes) >= self.error_rate:
+                return f"{self.failures} of last {len(self.outcomes)} requests failed"
+            return None
+
+    def has_enough_requests(self) -> bool:
+        """
+        Returns True once enough requests were recorded since readmission to judge server.
+        """
+        return len(self.outcomes) >= self.min_requests
+
+    def eject(self, now: Optional[float] = None) -> float:
+        """
+        Marks server as ejected.
+
+        :return: seconds server is ejected for.
+        """
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            if self.readmitted_at is not None and now - self.readmitted_at >= self.max_ejection_time:
+                # server stayed in service long enough, so its earlier ejections are forgiven
+                self.ejection_count = 0
+            self.ejection_count += 1
+            self.total_ejections += 1
+            ejection_time = min(self.base_ejection_time * 2 ** (self.ejection_count - 1), self.max_ejection_time)
+            self.ejected_until = now + ejection_time
+            return ejection_time
+
+    def is_ejected(self) -> bool:
+        return self.ejected_until is not None
+
+    def is_due_for_readmission(self, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        return self.ejected_until is not None and now >= self.ejected_until
+
+    def readmit(self, now: Optional[float] = None) -> None:
+        """
+        Puts ejected server back in service, judging it only by requests it gets from now on.
+        """
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self.ejected_until = None
+            self.readmitted_at = now
+            self.outcomes.clear()
+            self.failures = 0
+            self.consecutive_failures = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "ejected": self.ejected_until is not None,
+            "ejections": self.total_ejections,
+            "consecutive_failures": self.consecutive_failures,
+            "window_error_rate": self.failures / len(self.outcomes) if self.outcomes else 0,
+        }
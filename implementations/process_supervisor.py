@@ -0,0 +1,203 @@
+import os
+import time
+import signal
+import logging
+import threading
+import multiprocessing
+from typing import List, Dict, Tuple, Any, Type, Optional
+
+from interfaces.load_balancer_algorithm import ILoadBalancerAlgorithm
+from implementations.load_balancer import LoadBalancer
+from implementations.backend_server import BackendServer
+from implementations.shared_state import SharedBackendState
+from implementations.admin_server import AdminServer
+from implementations.metrics import MetricsRegistry, MetricFamily
+from implementations.health_check_scheduler import HealthCheckScheduler
+from constants.app_constants import LOAD_BALANCER_ADDRESS, SERVER_MODE, SERVER_WEIGHT, LB_PROCESSES, SUPERVISOR_POLL_INTERVAL, WORKER_RESTART_BACKOFF, WORKER_RESTART_MAX_BACKOFF, ADMIN_ADDRESS
+
+
+def run_worker(worker_index: int, backend_servers_config: List[Dict[str, str]], algorithm_class: Type[ILoadBalancerAlgorithm], server_mode: str,
+               address: Tuple[str, int], shared_state: SharedBackendState, log_level: int) -> None:
+    """
+    Entry point of load balancer worker process started by ProcessSupervisor.
+    """
+    logging.basicConfig(level=log_level, format=f"%(levelname)s:worker-{worker_index}:%(message)s")
+    lb = LoadBalancer(backend_servers_config, algorithm_class(), server_mode=server_mode, address=address, reuse_port=True,
+                      shared_state=shared_state, worker_index=worker_index, admin_address=None, config_file=None)
+    # supervisor stops worker processes with SIGTERM
+    signal.signal(signal.SIGTERM, lambda signum, frame: lb.stop())
+    lb.start()
+
+
+class ProcessSupervisor:
+    """
+    Runs several load balancer processes on same address, so load balancer is not limited to
+    single CPU core by GIL.
+
+    Every worker process binds load balancer address with SO_REUSEPORT, and kernel spreads
+    incoming connections between them. Supervisor restarts worker process which dies, after
+    delay which grows while it keeps dying right after start. Supervisor is the only process
+    running health checks of backend servers: it publishes their health through shared
+    memory, and worker processes publish their counters of backend servers there in turn,
+    so get_stats() sums traffic of all workers. Metrics are served by supervisor alone, from
+    the same sums, as worker processes would otherwise compete for single admin port.
+
+    Worker processes are started with spawn method, so they do not inherit threads or locks
+    of supervisor; algorithm is therefore passed as class, and each worker creates its own.
+
+    :param backend_servers_config: list of dicts with url, health_check_url and weight of backend servers.
+    :param algorithm_class: class of load balancing algorithm, instantiated without arguments in every worker process.
+    :param processes: number of worker processes, 0 starts one per CPU core.
+    :param server_mode: server mode of worker processes.
+    :param address: address worker processes listen on.
+    :param admin_address: address metrics of all worker processes are served on, None disables it.
+    """
+
+    def __init__(self, backend_servers_config: List[Dict[str, str]], algorithm_class: Type[ILoadBalancerAlgorithm], processes: int = LB_PROCESSES,
+                 server_mode: str = SERVER_MODE, address: Tuple[str, int] = LOAD_BALANCER_ADDRESS, admin_address: Optional[Tuple[str, int]] = ADMIN_ADDRESS) -> None:
+        self.backend_servers_config = backend_servers_config
+        self.algorithm_class = algorithm_class
+        self.processes = processes or os.cpu_count()
+        self.server_mode = server_mode
+        self.address = address
+        self.shared_state = SharedBackendState(len(backend_servers_config), self.processes)
+        self.context = multiprocessing.get_context("spawn")
+
+        self.workers = [None] * self.processes # process running in each worker slot, None while it waits for restart
+        self.started_at = [0.0] * self.processes # monotonic time worker process in each slot was started
+        self.restart_backoff = [0.0] * self.processes # seconds restart of worker in each slot is delayed by
+        self.restart_at = [0.0] * self.processes # monotonic time dead worker in each slot is restarted at
+        self.restarts = 0
+
+        self.health_check_scheduler = None
+        self.backend_servers = []
+        # health checks run in several threads, while shared health has to have single writer at time
+        self.health_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.ready = threading.Event()
+
+        self.metrics_registry = MetricsRegistry()
+        self.metrics_registry.register(self._collect_metrics)
+        self.admin_server = AdminServer(admin_address, self.metrics_registry) if admin_address is not None else None
+
+    def start(self) -> None:
+        """
+        Starts worker processes and health checks, and supervises them until stop() is called.
+        """
+        for worker_index in range(self.processes):
+            self._start_worker(worker_index)
+
+        # health checks are started only after worker processes, and run in supervisor only
+        self.health_check_scheduler = HealthCheckScheduler()
+        self.backend_servers = [BackendServer(url=server.get("url"), health_check_url=server.get("health_check_url"), weight=server.get("weight", SERVER_WEIGHT),
+                                              health_check_scheduler=self.health_check_scheduler) for server in self.backend_servers_config]
+        for backend_index, server in enumerate(self.backend_servers):
+            server.add_state_listener(lambda server, backend_index=backend_index: self._publish_health(backend_index, server))
+            self._publish_health(backend_index, server)
+        if self.admin_server is not None:
+            self.admin_server.start()
+
+        logging.info(f"Supervisor started {self.processes} load balancer processes on {self.address[0]}:{self.address[1]}")
+        self.ready.set()
+        try:
+            while not self.stop_event.wait(SUPERVISOR_POLL_INTERVAL):
+                self._check_workers()
+        except KeyboardInterrupt:
+            # Ctrl+C reaches worker processes too, they stop on their own
+            pass
+        finally:
+            self._shutdown()
+
+    def stop(self) -> None:
+        self.stop_event.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Returns worker processes and counters of every backend server summed over all worker processes.
+        """
+        return {
+            "workers": [worker.pid for worker in self.workers if worker is not None and worker.is_alive()],
+            "restarts": self.restarts,
+            "backend_servers": [dict(server_url=server.get("url"), **self.shared_state.get_backend_stats(backend_index))
+                                for backend_index, server in enumerate(self.backend_servers_config)],
+        }
+
+
+    # Private methods from here
+
+    def _start_worker(self, worker_index: int) -> None:
+        worker = self.context.Process(target=run_worker, name=f"lb-process-{worker_index}", daemon=True,
+                                      args=(worker_index, self.backend_servers_config, self.algorithm_class, self.server_mode, self.address,
+                                            self.shared_state, logging.getLogger().getEffectiveLevel()))
+        worker.start()
+        self.workers[worker_index] = worker
+        self.started_at[worker_index] = time.monotonic()
+        logging.info(f"Started load balancer process {worker.pid} in slot {worker_index}")
+
+    def _check_workers(self) -> None:
+        """
+        Restarts worker processes which died, once their restart delay is over.
+        """
+        now = time.monotonic()
+        for worker_index, worker in enumerate(self.workers):
+            if worker is not None:
+                if worker.is_alive():
+                    continue
+                logging.warning(f"Load balancer process {worker.pid} in slot {worker_index} exited with code {worker.exitcode}")
+                self.workers[worker_index] = None
+                # worker which keeps dying right after start is restarted with growing delay, so crash loop does not burn CPU
+                if now - self.started_at[worker_index] >= WORKER_RESTART_MAX_BACKOFF:
+                    self.restart_backoff[worker_index] = 0.0
+                else:
+                    self.restart_backoff[worker_index] = min(max(2 * self.restart_backoff[worker_index], WORKER_RESTART_BACKOFF), WORKER_RESTART_MAX_BACKOFF)
+                self.restart_at[worker_index] = now + self.restart_backoff[worker_index]
+            if now >= self.restart_at[worker_index]:
+                self.restarts += 1
+                self._start_worker(worker_index)
+
+    def _collect_metrics(self) -> List[MetricFamily]:
+        """
+        Returns metrics of backend servers summed over all worker processes, and of worker processes themselves.
+        """
+        backends = [({"backend": server.get("url")}, self.shared_state.get_backend_stats(backend_index))
+                    for backend_index, server in enumerate(self.backend_servers_config)]
+        return [
+            MetricFamily("lb_backend_requests_total", "counter", "Requests proxied to backend server.",
+                         [("", labels, stats["request_count"]) for labels, stats in backends]),
+            MetricFamily("lb_backend_successes_total", "counter", "Requests whose successful response was relayed to client.",
+                         [("", labels, stats["success_count"]) for labels, stats in backends]),
+            MetricFamily("lb_backend_errors_total", "counter", "Requests which failed or got error response from backend server.",
+                         [("", labels, stats["error_count"]) for labels, stats in backends]),
+            MetricFamily("lb_backend_latency_seconds_total", "counter", "Summed latency of successful requests to backend server.",
+                         [("", labels, stats["total_latency"]) for labels, stats in backends]),
+            MetricFamily("lb_backend_active_requests", "gauge", "Requests currently in flight on backend server.",
+                         [("", labels, stats["active_requests"]) for labels, stats in backends]),
+            MetricFamily("lb_backend_up", "gauge", "Whether health checks of supervisor find backend server healthy.",
+                         [("", labels, stats["is_healthy"]) for labels, stats in backends]),
+            MetricFamily("lb_worker_processes", "gauge", "Load balancer worker processes alive.",
+                         [("", {}, sum(worker is not None and worker.is_alive() for worker in self.workers))]),
+            MetricFamily("lb_worker_restarts_total", "counter", "Load balancer worker processes restarted after they died.", [("", {}, self.restarts)]),
+        ]
+
+    def _publish_health(self, backend_index: int, server: BackendServer) -> None:
+        with self.health_lock:
+            self.shared_state.set_healthy(backend_index, server.is_healthy)
+
+    def _shutdown(self) -> None:
+        logging.info("......Shutting down load balancer processes")
+        if self.admin_server is not None:
+            self.admin_server.stop()
+        for worker in self.workers:
+            if worker is not None and worker.is_alive():
+                worker.terminate()
+        for worker in self.workers:
+            if worker is not None:
+                worker.join(5)
+                if worker.is_alive():
+                    worker.kill()
+                    worker.join()
+        for server in self.backend_servers:
+            server.stop_health_check()
+        if self.health_check_scheduler is not None:
+            self.health_check_scheduler.stop()
+        self.ready.clear()
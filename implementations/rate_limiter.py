@@ -0,0 +1,137 @@
+import math
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+from constants.app_constants import RATE_LIMIT_RATE, RATE_LIMIT_BURST, RATE_LIMIT_KEY, RATE_LIMIT_MAX_CLIENTS
+
+RATE_LIMIT_KEY_CLIENT_IP = "client_ip"
+RATE_LIMIT_KEY_HEADER_PREFIX = "header:"
+
+
+class RateLimiter:
+    """
+    Limits requests of each client with token bucket of its own, so single noisy client
+    cannot take every worker of load balancer.
+
+    Bucket of client holds up to burst tokens and refills by rate tokens every second, every
+    request takes one token, and request finding bucket empty is throttled. Buckets are
+    refilled lazily when client is seen, so idle clients cost nothing but their entry.
+    Entries are kept in LRU order and least recently seen client is forgotten once there are
+    max_clients of them; forgotten client starts again with full bucket, which only happens
+    with more distinct clients than max_clients sending at once.
+
+    :param rate: tokens added to each bucket per second.
+    :param burst: tokens bucket holds at most.
+    :param key: what identifies client: "client_ip" or "header:<name>"; requests without that header are keyed by client IP.
+    :param max_clients: maximum number of buckets remembered.
+    """
+
+    def __init__(self, rate: float = RATE_LIMIT_RATE, burst: int = RATE_LIMIT_BURST, key: str = RATE_LIMIT_KEY, max_clients: int = RATE_LIMIT_MAX_CLIENTS) -> None:
+        if rate <= 0 or burst < 1 or max_clients < 1:
+            raise ValueError("Rate limit needs positive rate, burst and max_clients")
+        if key != RATE_LIMIT_KEY_CLIENT_IP and not key.startswith(RATE_LIMIT_KEY_HEADER_PREFIX):
+            raise ValueError(f"Unknown rate limit key: {key}")
+        self.rate = rate
+        self.burst = burst
+        self.header = key[len(RATE_LIMIT_KEY_HEADER_PREFIX):] if key.startswith(RATE_LIMIT_KEY_HEADER_PREFIX) else None
+        self.max_clients = max_clients
+
+        # client key -> [tokens, time of last refill], most recently seen client last
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+        self.allowed = 0 # requests which took token
+        self.throttled_requests = 0 # requests refused because bucket of client was empty
+        self.throttled_connections = 0 # connections refused on accept because bucket of client was empty
+        self.evictions = 0 # buckets forgotten to make room for new clients
+
+    @property
+    def keys_by_client_ip(self) -> bool:
+        """
+        Whether client is known as soon as its connection is accepted, before its requests are read.
+        """
+        return self.header is None
+
+    def get_key(self, client_ip: str, headers: Optional[Dict[str, str]] = None) -> str:
+        """
+        Returns key client of request is limited by.
+        """
+        if self.header is not None and headers:
+            value = headers.get(self.header)
+            if value is not None:
+                return f"{RATE_LIMIT_KEY_HEADER_PREFIX}{value}"
+        return client_ip
+
+    def try_acquire(self, key: str, connection: bool = False) -> bool:
+        """
+        Takes token from bucket of client.
+
+        :param connection: whether token is taken by connection rather than request, as in tcp proxy mode, so its refusal is counted as throttled connection.
+        :return: False if bucket is empty and request must be throttled.
+        """
+        with self.lock:
+            bucket = self._refill(key)
+            if bucket[0] < 1:
+                if connection:
+                    self.throttled_connections += 1
+                else:
+                    self.throttled_requests += 1
+                return False
+            bucket[0] -= 1
+            self.allowed += 1
+            return True
+
+    def is_throttled(self, key: str) -> bool:
+        """
+        Checks, without taking token, whether bucket of client is empty, so connection of client
+        which would have all its requests throttled can be refused right when it is accepted.
+        """
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                return False
+            if self._refill(key)[0] >= 1:
+                return False
+            self.throttled_connections += 1
+            return True
+
+    def get_retry_after(self, key: str) -> int:
+        """
+        Returns whole seconds until bucket of client has token again.
+        """
+        with self.lock:
+            bucket = self.buckets.get(key)
+            tokens = bucket[0] if bucket is not None else self.burst
+        return max(1, math.ceil((1 - tokens) / self.rate))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "clients": len(self.buckets),
+            "allowed": self.allowed,
+            "throttled_requests": self.throttled_requests,
+            "throttled_connections": self.throttled_connections,
+            "evictions": self.evictions,
+        }
+
+
+    # Private methods from here
+
+    def _refill(self, key: str) -> list:
+        """
+        Returns bucket of client with tokens it earned since last seen, creating full one for new client.
+        """
+        now = time.monotonic()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if len(self.buckets) >= self.max_clients:
+                self.buckets.popitem(last=False)
+                self.evictions += 1
+            bucket = self.buckets[key] = [self.burst, now]
+            return bucket
+        self.buckets.move_to_end(key)
+        bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        return bucket
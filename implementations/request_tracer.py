@@ -0,0 +1,169 @@
+import re
+import json
+import time
+import random
+import logging
+from typing import Dict, Any, Optional, Tuple
+
+from implementations.metrics import Histogram
+from constants.app_constants import ACCESS_LOG_SAMPLE_RATE, REQUEST_PHASE_BUCKETS
+
+# phases of request handling, in order; requests skip phases which do not apply to them
+PHASE_QUEUE = "queue" # connection waiting in accept queue for worker, first request of connection only
+PHASE_READ = "read" # receiving and parsing request head, from its first bytes
+PHASE_SELECT = "select" # choosing backend server
+PHASE_BACKEND = "backend" # sending request to backend server until response head arrived, retries and hedges included
+PHASE_RESPOND = "respond" # sending response to client, relaying body from backend server
+PHASE_TOTAL = "total"
+PHASES = (PHASE_QUEUE, PHASE_READ, PHASE_SELECT, PHASE_BACKEND, PHASE_RESPOND, PHASE_TOTAL)
+
+# request handling outcomes written to access log
+OUTCOME_RELAYED = "relayed" # response of backend server relayed to client
+OUTCOME_CACHED = "cached" # answered from response cache
+OUTCOME_THROTTLED = "throttled" # answered with 429 by rate limiter
+OUTCOME_ERROR = "error" # answered with error by load balancer itself
+
+TRACEPARENT_HEADER = "traceparent"
+TRACEPARENT_PATTERN = re.compile(r"([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})")
+
+access_logger = logging.getLogger("lb.access")
+
+
+class RequestTrace:
+    """
+    Timing of single request through phases of its handling, and its place in W3C trace.
+
+    :param started_at: time (monotonic) request handling started at.
+    """
+    __slots__ = ("trace_id", "span_id", "sampled", "traceparent", "started_at", "last_mark", "phases", "backend", "status", "outcome")
+
+    def __init__(self, started_at: float) -> None:
+        self.trace_id = None
+        self.span_id = None # span of load balancer, parent of span of backend server
+        self.sampled = False
+        self.traceparent = None
+        self.started_at = started_at
+        self.last_mark = started_at
+        self.phases = [] # (phase, seconds) pairs in order phases ended
+        self.backend = None # url of backend server whose response was used
+        self.status = None # status code of response of backend server
+        self.outcome = OUTCOME_ERROR
+
+    def mark(self, phase: str) -> None:
+        """
+        Ends phase, which started when previous one ended.
+        """
+        now = time.monotonic()
+        self.phases.append((phase, now - self.last_mark))
+        self.last_mark = now
+
+
+class RequestTracer:
+    """
+    Measures how long each phase of request handling takes, so latency spikes can be
+    attributed to waiting for worker, parsing, server selection, backend server or
+    sending response.
+
+    Request handler starts trace once request head is read and marks end of each phase.
+    Durations are aggregated into histogram per phase, updated without locks, and
+    sample_rate of requests is written to "lb.access" logger as JSON lines with their
+    phases in milliseconds. Marking phase costs one clock read, so tracing can stay on.
+
+    Requests are sent to backend servers with W3C traceparent header: trace of client's
+    traceparent is continued when there is valid one, with load balancer's span as parent
+    of backend server's, otherwise new trace is started. Request whose client's
+    traceparent has sampled flag is always written to access log.
+
+    :param sample_rate: fraction of requests written to access log.
+    :param buckets: upper bounds (in seconds) of phase duration histogram buckets.
+    """
+
+    def __init__(self, sample_rate: float = ACCESS_LOG_SAMPLE_RATE, buckets: Tuple[float, ...] = REQUEST_PHASE_BUCKETS) -> None:
+        self.sample_rate = sample_rate
+        self.histograms = {phase: Histogram(buckets) for phase in PHASES}
+
+    def start(self, incoming_req_details: Dict[str, Any], queue_wait: Optional[float] = None) -> RequestTrace:
+        """
+        Starts trace of request whose head was just read, ending its read phase, and sets
+        traceparent header request is forwarded with.
+
+        :param queue_wait: seconds connection of request waited in accept queue, if request is first one of connection.
+        """
+        trace = RequestTrace(incoming_req_details['received_at'])
+        if queue_wait is not None:
+            trace.phases.append((PHASE_QUEUE, queue_wait))
+        trace.mark(PHASE_READ)
+
+        headers = incoming_req_details['headers']
+        parent = self._parse_traceparent(headers.get(TRACEPARENT_HEADER))
+        if parent is not None:
+            trace.trace_id, trace.sampled = parent
+        else:
+            trace.trace_id = f"{random.getrandbits(128) or 1:032x}"
+            trace.sampled = random.random() < self.sample_rate
+        trace.span_id = f"{random.getrandbits(64) or 1:016x}"
+        trace.traceparent = f"00-{trace.trace_id}-{trace.span_id}-{'01' if trace.sampled else '00'}"
+        # headers are case insensitive, so client's own traceparent is replaced whatever its case
+        headers[TRACEPARENT_HEADER] = trace.traceparent
+        incoming_req_details['trace'] = trace
+        return trace
+
+    def finish(self, trace: RequestTrace, incoming_req_details: Dict[str, Any]) -> None:
+        """
+        Ends respond phase of request once response was sent, or request handling failed, and records trace.
+        """
+        trace.mark(PHASE_RESPOND)
+        for phase, duration in trace.phases:
+            self.histograms[phase].observe(duration)
+        total = trace.last_mark - trace.started_at + (trace.phases[0][1] if trace.phases[0][0] == PHASE_QUEUE else 0.0)
+        self.histograms[PHASE_TOTAL].observe(total)
+        if trace.sampled:
+            self._log_access(trace, incoming_req_details, total)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Returns number of requests and average duration of each phase.
+        """
+        stats = {}
+        for phase, histogram in self.histograms.items():
+            counts, total_time = histogram.get()
+            stats[phase] = {"count": counts[-1], "avg": total_time / counts[-1] if counts[-1] else 0.0}
+        return stats
+
+
+    # Private methods from here
+
+    @staticmethod
+    def _parse_traceparent(value: Optional[str]) -> Optional[Tuple[str, bool]]:
+        """
+        Returns trace id and sampled flag of traceparent header, or None if it is missing or invalid.
+        """
+        if value is None:
+            return None
+        value = value.strip()
+        match = TRACEPARENT_PATTERN.match(value)
+        if match is None:
+            return None
+        version, trace_id, parent_id, flags = match.groups()
+        # version ff is invalid, and later versions may only append fields after those of version 00
+        if version == "ff" or (version == "00" and len(value) != 55) or (len(value) > 55 and value[55] != "-"):
+            return None
+        if trace_id == "0" * 32 or parent_id == "0" * 16:
+            return None
+        return trace_id, bool(int(flags, 16) & 1)
+
+    @staticmethod
+    def _log_access(trace: RequestTrace, incoming_req_details: Dict[str, Any], total: float) -> None:
+        access_logger.info(json.dumps({
+            "time": time.time(),
+            "client_ip": incoming_req_details.get('client_ip'),
+            "method": incoming_req_details['method'],
+            "path": incoming_req_details['path'],
+            "outcome": trace.outcome,
+            "status": trace.status,
+            "backend": trace.backend,
+            "trace_id": trace.trace_id,
+            "span_id": trace.span_id,
+            "phases_ms": {phase: round(duration * 1000, 3) for phase, duration in trace.phases},
+            "total_ms": round(total * 1000, 3),
+        }))
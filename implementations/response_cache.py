@@ -0,0 +1,319 @@
+import time
+import asyncio
+import logging
+import threading
+import email.utils
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple, List, NamedTuple
+
+import requests
+
+from constants.app_constants import CACHE_MAX_SIZE, CACHE_MAX_OBJECT_SIZE, CACHE_LOCK_TIMEOUT, CACHEABLE_STATUS_CODES, HOP_BY_HOP_HEADERS
+
+
+def parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    """
+    Parses Cache-Control header into dict of lowercase directives and their values (None for directives without value).
+    """
+    directives = {}
+    for directive in value.split(","):
+        name, sep, argument = directive.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') if sep else None
+    return directives
+
+
+class CachedResponse(NamedTuple):
+    """
+    Response stored in ResponseCache, with everything needed to send it to client again.
+    """
+    status_code: int
+    reason: str
+    headers: List[Tuple[str, str]] # end-to-end headers of response, without Content-Length
+    body: bytes
+    stored_at: float # monotonic time response was stored
+    initial_age: int # age of response when it was stored, from its Age header
+    expires_at: float # monotonic time response stops being fresh
+    vary_key: Tuple[Optional[str], ...] # values of request headers named by Vary, response is used only for requests which match them
+
+    def get_age(self, now: float) -> int:
+        return self.initial_age + int(now - self.stored_at)
+
+
+class CacheFill:
+    """
+    Response to cacheable request which is being fetched from backend server.
+
+    Request which fetches it collects body of response while relaying it to client, and
+    concurrent requests for same resource wait for it to finish instead of going to backend
+    server too. Body bigger than max_size stops being collected.
+    """
+
+    def __init__(self, key: Tuple[str, str], max_size: int) -> None:
+        self.key = key
+        self.max_size = max_size
+        self.chunks = []
+        self.size = 0
+        self.too_large = False
+        self.done = threading.Event()
+        self.async_waiters = [] # (event loop, future) of requests waiting for fill in asyncio server mode
+        self.lock = threading.Lock()
+
+    def add_chunk(self, chunk: bytes) -> None:
+        if self.too_large:
+            return
+        self.size += len(chunk)
+        if self.size > self.max_size:
+            self.too_large = True
+            self.chunks = []
+            return
+        self.chunks.append(bytes(chunk))
+
+    def wait(self, timeout: float) -> bool:
+        return self.done.wait(timeout)
+
+    async def wait_async(self, timeout: float) -> bool:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self.lock:
+            if self.done.is_set():
+                return True
+            self.async_waiters.append((loop, future))
+        try:
+            await asyncio.wait_for(future, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def finish(self) -> None:
+        with self.lock:
+            self.done.set()
+            waiters, self.async_waiters = self.async_waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(lambda future=future: future.done() or future.set_result(None))
+
+
+class ResponseCache:
+    """
+    In-memory cache of responses to GET requests, shared by all clients of load balancer.
+
+    Follows rules of shared HTTP cache (RFC 9111) for what it can do without revalidation:
+    response is stored only if its Cache-Control (s-maxage or max-age) or Expires header
+    makes it fresh for some time, and it is not marked no-store, no-cache or private, does
+    not set cookies and has no Vary: *. Response with Vary is used only for requests whose
+    varying headers match those of request it was stored for. Requests with Authorization,
+    or asking for no-cache, no-store or max-age=0, bypass cache.
+
+    Concurrent misses for same resource are collapsed: first request fetches response from
+    backend server, and the rest wait up to lock_timeout for it and then get it from cache
+    (or go to backend server themselves, if it could not be stored).
+
+    Memory is bounded by max_size bytes of bodies, least recently used responses being
+    evicted first; bodies bigger than max_object_size are not stored.
+
+    :param max_size: maximum total size (in bytes) of stored bodies.
+    :param max_object_size: maximum size (in bytes) of single stored body.
+    :param lock_timeout: maximum seconds request waits for concurrent request fetching same resource.
+    """
+
+    def __init__(self, max_size: int = CACHE_MAX_SIZE, max_object_size: int = CACHE_MAX_OBJECT_SIZE, lock_timeout: float = CACHE_LOCK_TIMEOUT) -> None:
+        self.max_size = max_size
+        self.max_object_size = max_object_size
+        self.lock_timeout = lock_timeout
+
+        self.entries = OrderedDict() # (key, vary key) -> CachedResponse, least recently used first
+        self.vary_headers = {} # key -> names of request headers responses stored for key vary by
+        self.variants = {} # key -> number of stored responses for key
+        self.fills = {} # key -> CacheFill of response being fetched for key
+        self.size = 0
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.collapsed = 0 # requests which waited for concurrent request instead of going to backend server
+        self.stores = 0
+        self.evictions = 0
+        self.bytes_saved = 0 # body bytes sent from cache instead of backend server
+
+    def is_cacheable_request(self, incoming_req_details: Dict[str, Any]) -> bool:
+        if incoming_req_details['method'] != "GET" or incoming_req_details['request_data'] is not None:
+            return False
+        headers = incoming_req_details['headers']
+        if "Authorization" in headers or "no-cache" in headers.get("Pragma", "").lower():
+            return False
+        directives = parse_cache_control(headers.get("Cache-Control", ""))
+        return "no-store" not in directives and "no-cache" not in directives and directives.get("max-age") != "0"
+
+    def lookup(self, incoming_req_details: Dict[str, Any]) -> Tuple[Optional[CachedResponse], Optional[CacheFill]]:
+        """
+        Looks up response to cacheable request, waiting for concurrent request fetching same resource.
+
+        :return: cached response, or None and fill which caller fetching response has to pass to store() and finish(),
+            or None and None if caller should fetch response without storing it.
+        """
+        cached, fill, leader = self._lookup_or_join(incoming_req_details)
+        if cached is not None or leader:
+            return cached, fill
+        fill.wait(self.lock_timeout)
+        return self._lookup_after_wait(incoming_req_details), None
+
+    async def lookup_async(self, incoming_req_details: Dict[str, Any]) -> Tuple[Optional[CachedResponse], Optional[CacheFill]]:
+        """
+        Same as lookup(), for asyncio server mode.
+        """
+        cached, fill, leader = self._lookup_or_join(incoming_req_details)
+        if cached is not None or leader:
+            return cached, fill
+        await fill.wait_async(self.lock_timeout)
+        return self._lookup_after_wait(incoming_req_details), None
+
+    def store(self, fill: CacheFill, incoming_req_details: Dict[str, Any], response: requests.Response) -> bool:
+        """
+        Stores response whose body was collected by fill, if response may be cached.
+
+        :return: whether response was stored.
+        """
+        if fill.too_large:
+            return False
+        lifetime = self._get_freshness_lifetime(response)
+        if not lifetime or response.status_code not in CACHEABLE_STATUS_CODES or "Set-Cookie" in response.headers:
+            return False
+        vary_headers = tuple(sorted(name.strip().lower() for name in response.headers.get("Vary", "").split(",") if name.strip()))
+        if "*" in vary_headers:
+            return False
+
+        try:
+            initial_age = int(response.headers.get("Age", "0"))
+        except ValueError:
+            initial_age = 0
+        now = time.monotonic()
+        headers = [(name, value) for name, value in response.headers.items() if name.lower() not in HOP_BY_HOP_HEADERS and name.lower() not in ("content-length", "age")]
+        body = b"".join(fill.chunks)
+        vary_key = tuple(incoming_req_details['headers'].get(name) for name in vary_headers)
+        cached = CachedResponse(response.status_code, response.reason, headers, body, now, initial_age, now + lifetime - initial_age, vary_key)
+
+        with self.lock:
+            if self.vary_headers.get(fill.key, vary_headers) != vary_headers:
+                # resource started varying by other headers, so responses stored for it before cannot be matched anymore
+                self._remove_key(fill.key)
+            self._remove((fill.key, vary_key))
+            self.vary_headers[fill.key] = vary_headers
+            self.entries[(fill.key, vary_key)] = cached
+            self.variants[fill.key] = self.variants.get(fill.key, 0) + 1
+            self.size += len(body)
+            self.stores += 1
+            while self.size > self.max_size:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+        logging.debug(f"Cached response to GET {fill.key[1]} for {lifetime} seconds")
+        return True
+
+    def finish(self, fill: CacheFill) -> None:
+        """
+        Ends fetch of response, letting requests waiting for it look it up in cache.
+        """
+        with self.lock:
+            if self.fills.get(fill.key) is fill:
+                del self.fills[fill.key]
+        fill.finish()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "size": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0,
+            "collapsed": self.collapsed,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "bytes_saved": self.bytes_saved,
+        }
+
+
+    # Private methods from here
+
+    def _get_key(self, incoming_req_details: Dict[str, Any]) -> Tuple[str, str]:
+        return incoming_req_details['headers'].get("Host", "").lower(), incoming_req_details['path']
+
+    def _lookup_or_join(self, incoming_req_details: Dict[str, Any]) -> Tuple[Optional[CachedResponse], Optional[CacheFill], bool]:
+        """
+        Returns fresh cached response, or fill of response to wait for together with whether caller is the one fetching it.
+        """
+        key = self._get_key(incoming_req_details)
+        with self.lock:
+            cached = self._get_fresh(key, incoming_req_details)
+            if cached is not None:
+                return cached, None, False
+            fill = self.fills.get(key)
+            if fill is not None:
+                self.collapsed += 1
+                return None, fill, False
+            self.misses += 1
+            fill = self.fills[key] = CacheFill(key, self.max_object_size)
+            return None, fill, True
+
+    def _lookup_after_wait(self, incoming_req_details: Dict[str, Any]) -> Optional[CachedResponse]:
+        with self.lock:
+            cached = self._get_fresh(self._get_key(incoming_req_details), incoming_req_details)
+            if cached is None:
+                self.misses += 1
+            return cached
+
+    def _get_fresh(self, key: Tuple[str, str], incoming_req_details: Dict[str, Any]) -> Optional[CachedResponse]:
+        """
+        Returns cached response matching request if it is still fresh, counting hit. Must be called with lock held.
+        """
+        vary_key = tuple(incoming_req_details['headers'].get(name) for name in self.vary_headers.get(key, ()))
+        cached = self.entries.get((key, vary_key))
+        if cached is None:
+            return None
+        if time.monotonic() >= cached.expires_at:
+            self._remove((key, vary_key))
+            return None
+        self.entries.move_to_end((key, vary_key))
+        self.hits += 1
+        self.bytes_saved += len(cached.body)
+        return cached
+
+    def _remove(self, entry_key: Tuple[Tuple[str, str], Tuple[Optional[str], ...]]) -> None:
+        cached = self.entries.pop(entry_key, None)
+        if cached is None:
+            return
+        self.size -= len(cached.body)
+        key = entry_key[0]
+        self.variants[key] -= 1
+        if not self.variants[key]:
+            del self.variants[key]
+            del self.vary_headers[key]
+
+    def _remove_key(self, key: Tuple[str, str]) -> None:
+        for entry_key in [entry_key for entry_key in self.entries if entry_key[0] == key]:
+            self._remove(entry_key)
+
+    def _get_freshness_lifetime(self, response: requests.Response) -> int:
+        """
+        Returns seconds response stays fresh for according to its headers, 0 if it must not be stored.
+        """
+        directives = parse_cache_control(response.headers.get("Cache-Control", ""))
+        if "no-store" in directives or "no-cache" in directives or "private" in directives:
+            return 0
+        for directive in ("s-maxage", "max-age"):
+            if directive in directives:
+                try:
+                    return max(0, int(directives[directive]))
+                except (TypeError, ValueError):
+                    return 0
+        if "Expires" in response.headers:
+            try:
+                expires = email.utils.parsedate_to_datetime(response.headers["Expires"])
+                date = email.utils.parsedate_to_datetime(response.headers["Date"]) if "Date" in response.headers else None
+            except (TypeError, ValueError):
+                return 0
+            if expires.tzinfo is None or (date is not None and date.tzinfo is None):
+                return 0
+            if date is None:
+                return max(0, int(expires.timestamp() - time.time()))
+            return max(0, int((expires - date).total_seconds()))
+        return 0
@@ -0,0 +1,66 @@
+import time
+import threading
+from typing import Dict, Any
+
+from constants.app_constants import RETRY_BUDGET_PERCENT, RETRY_BUDGET_MIN_PER_SECOND, RETRY_BUDGET_MAX_TOKENS
+
+
+class RetryBudget:
+    """
+    Limits retries (and hedged requests) to percentage of traffic.
+
+    When backend servers fail because they are overloaded, retrying every failed request
+    multiplies load on them and turns overload into outage. Budget is token bucket: every
+    request adds percent / 100 of token and every retry takes one, so retries stay at given
+    fraction of requests however many of them fail. Budget also refills by min_per_second
+    tokens every second, so retries are possible when there is little traffic.
+
+    :param percent: retries allowed as percentage of requests.
+    :param min_per_second: retries allowed per second regardless of traffic.
+    :param max_tokens: maximum number of retries budget saves up.
+    """
+
+    def __init__(self, percent: float = RETRY_BUDGET_PERCENT, min_per_second: float = RETRY_BUDGET_MIN_PER_SECOND, max_tokens: float = RETRY_BUDGET_MAX_TOKENS) -> None:
+        # tokens are counted in hundredths of retry, so whole percentages add up exactly
+        self.percent = percent
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens * 100
+        self.tokens = self.max_tokens
+        self.last_refill = time.monotonic()
+        self.requests = 0
+        self.retries = 0 # retries budget allowed
+        self.refused = 0 # retries budget refused
+        self.lock = threading.Lock()
+
+    def deposit(self) -> None:
+        """
+        Counts request towards budget.
+        """
+        with self.lock:
+            self.requests += 1
+            self.tokens = min(self.max_tokens, self.tokens + self.percent)
+
+    def try_withdraw(self) -> bool:
+        """
+        Takes one retry from budget.
+
+        :return: False if budget is exhausted and request must not be retried.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.max_tokens, self.tokens + (now - self.last_refill) * self.min_per_second * 100)
+            self.last_refill = now
+            if self.tokens < 100:
+                self.refused += 1
+                return False
+            self.tokens -= 100
+            self.retries += 1
+            return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "refused": self.refused,
+            "tokens": self.tokens / 100,
+        }
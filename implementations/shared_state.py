@@ -0,0 +1,78 @@
+import multiprocessing
+from typing import Dict, List, Sequence
+
+# counters of every backend server which load balancer processes publish, in order they are stored
+STATS_FIELDS = ("request_count", "success_count", "error_count", "total_latency", "active_requests")
+# counters which keep growing across restarts of worker process, unlike active_requests
+CUMULATIVE_STATS_FIELDS = STATS_FIELDS[:4]
+
+
+class SharedBackendState:
+    """
+    State of backend servers shared by load balancer processes through shared memory.
+
+    Supervisor process runs health checks of backend servers and writes their health here,
+    together with version number bumped on every change, so worker processes only compare
+    version to find out whether to read health, and none of them runs health checks itself.
+
+    Every worker process writes counters of every backend server into slot of its own, so
+    writes need no locking, and supervisor sums slots of all workers. Arrays are allocated
+    before worker processes are started and handed to them, which works with any start
+    method of multiprocessing.
+
+    :param backends: number of backend servers.
+    :param workers: number of worker processes.
+    """
+
+    def __init__(self, backends: int, workers: int) -> None:
+        self.backends = backends
+        self.workers = workers
+        self.version = multiprocessing.RawValue("Q", 0)
+        self.health = multiprocessing.RawArray("b", [1] * backends)
+        self.stats = multiprocessing.RawArray("d", workers * backends * len(STATS_FIELDS))
+
+    def set_healthy(self, backend_index: int, is_healthy: bool) -> None:
+        """
+        Publishes health of backend server, must only be called by single writer at time.
+        """
+        if bool(self.health[backend_index]) != is_healthy:
+            self.health[backend_index] = int(is_healthy)
+            self.version.value += 1
+
+    def get_version(self) -> int:
+        return self.version.value
+
+    def get_health(self) -> List[bool]:
+        return [bool(is_healthy) for is_healthy in self.health]
+
+    def publish_stats(self, worker_index: int, backend_index: int, values: Sequence[float]) -> None:
+        """
+        Writes counters of backend server, in order of STATS_FIELDS, into slot of worker process.
+        """
+        offset = self._offset(worker_index, backend_index)
+        self.stats[offset:offset + len(STATS_FIELDS)] = values
+
+    def read_stats(self, worker_index: int, backend_index: int) -> Dict[str, float]:
+        """
+        Returns counters of backend server last published by worker process.
+        """
+        offset = self._offset(worker_index, backend_index)
+        return dict(zip(STATS_FIELDS, self.stats[offset:offset + len(STATS_FIELDS)]))
+
+    def get_backend_stats(self, backend_index: int) -> Dict[str, float]:
+        """
+        Returns counters of backend server summed over all worker processes.
+        """
+        totals = dict.fromkeys(STATS_FIELDS, 0.0)
+        for worker_index in range(self.workers):
+            for field, value in self.read_stats(worker_index, backend_index).items():
+                totals[field] += value
+        stats = {field: value if field == "total_latency" else int(value) for field, value in totals.items()}
+        stats["is_healthy"] = bool(self.health[backend_index])
+        return stats
+
+
+    # Private methods from here
+
+    def _offset(self, worker_index: int, backend_index: int) -> int:
+        return (worker_index * self.backends + backend_index) * len(STATS_FIELDS)
@@ -0,0 +1,329 @@
+import os
+import errno
+import fcntl
+import socket
+import logging
+import selectors
+import threading
+from typing import Callable, Dict, Any
+
+from constants.app_constants import TCP_RELAY_BUFFER_SIZE
+
+
+class _Direction:
+    """
+    One direction of relayed connection: bytes read from source socket which wait to be written to destination socket.
+
+    Bytes go through pipe with splice, so they are moved between sockets by kernel without being copied into
+    Python, or through buffer when splice is not available.
+    """
+
+    def __init__(self, source: socket.socket, destination: socket.socket, buffer_size: int, use_splice: bool) -> None:
+        self.source = source
+        self.destination = destination
+        self.pending = 0 # bytes read from source and not yet written to destination
+        self.eof = False # source finished sending
+        self.done = False # end of stream was passed on to destination
+        self.pipe = None
+        self.buffer = None
+        if use_splice:
+            self.pipe = os.pipe2(os.O_NONBLOCK | os.O_CLOEXEC)
+            try:
+                # pipe holds 64KB unless it is grown
+                self.capacity = fcntl.fcntl(self.pipe[1], fcntl.F_SETPIPE_SZ, buffer_size)
+            except OSError:
+                # unprivileged process cannot grow pipe beyond /proc/sys/fs/pipe-max-size
+                self.capacity = fcntl.fcntl(self.pipe[1], fcntl.F_GETPIPE_SZ)
+        else:
+            self._use_buffer(buffer_size)
+
+    def wants_read(self) -> bool:
+        return not self.eof and self.pending < self.capacity
+
+    def wants_write(self) -> bool:
+        return self.pending > 0
+
+    def fill(self) -> int:
+        """
+        Reads from source as much as there is room for.
+
+        :return: number of bytes read, 0 also when reading would block.
+        """
+        try:
+            if self.pipe is not None:
+                try:
+                    read = os.splice(self.source.fileno(), self.pipe[1], self.capacity - self.pending, flags=os.SPLICE_F_MOVE | os.SPLICE_F_NONBLOCK)
+                except OSError as e:
+                    # some kernels and sandboxes cannot splice sockets, buffer is used from then on
+                    if e.errno not in (errno.EINVAL, errno.ENOSYS) or self.pending:
+                        raise
+                    logging.debug(f"Cannot splice relayed connection, falling back to buffer: {e}")
+                    self.close()
+                    self._use_buffer(self.capacity)
+                    return self.fill()
+            else:
+                if self.end == self.capacity:
+                    # data still waiting to be written is moved to start of buffer, to make room behind it
+                    self.buffer[:self.pending] = self.buffer[self.start:self.end]
+                    self.start, self.end = 0, self.pending
+                read = self.source.recv_into(self.view[self.end:])
+                self.end += read
+        except BlockingIOError:
+            return 0
+        if read == 0:
+            self.eof = True
+        self.pending += read
+        return read
+
+    def flush(self) -> int:
+        """
+        Writes to destination as much of pending bytes as it takes without blocking.
+
+        :return: number of bytes written.
+        """
+        try:
+            if self.pipe is not None:
+                written = os.splice(self.pipe[0], self.destination.fileno(), self.pending, flags=os.SPLICE_F_MOVE | os.SPLICE_F_NONBLOCK)
+            else:
+                written = self.destination.send(self.view[self.start:self.end])
+                self.start += written
+                if self.start == self.end:
+                    self.start = self.end = 0
+        except BlockingIOError:
+            return 0
+        self.pending -= written
+        return written
+
+    def close(self) -> None:
+        if self.pipe is not None:
+            os.close(self.pipe[0])
+            os.close(self.pipe[1])
+            self.pipe = None
+
+
+    # Private methods from here
+
+    def _use_buffer(self, buffer_size: int) -> None:
+        self.capacity = buffer_size
+        self.buffer = bytearray(buffer_size)
+        self.view = memoryview(self.buffer)
+        self.start = self.end = 0 # pending bytes are buffer[start:end]
+
+
+class _RelayedConnection:
+    """
+    Client connection and backend server connection bytes are relayed between.
+    """
+
+    def __init__(self, client_sock: socket.socket, backend_sock: socket.socket, on_closed: Callable[[bool], None], buffer_size: int, use_splice: bool) -> None:
+        self.upstream = _Direction(client_sock, backend_sock, buffer_size, use_splice)
+        self.downstream = _Direction(backend_sock, client_sock, buffer_size, use_splice)
+        self.on_closed = on_closed
+        self.events = {client_sock: 0, backend_sock: 0} # events each socket is registered with selector for
+        self.closed = False
+
+
+class TcpRelay:
+    """
+    Relays bytes between client connections and backend server connections they were paired
+    with, without looking at them, for TCP proxy mode of load balancer.
+
+    All relayed connections are served by single thread waiting on selector, so open
+    connections cost no thread each. On Linux bytes are moved with splice through pipe per
+    direction, so they are never copied into Python; elsewhere they go through buffer per
+    direction. At most buffer_size bytes of each direction wait to be written, and source is
+    not read while they do, so fast sender is slowed down to pace of slow receiver by TCP
+    flow control instead of filling memory.
+
+    When one side finishes sending, its end of stream is passed on to other side as
+    half-close once everything it sent is written, so protocols where client sends request,
+    shuts down writing and then reads response keep working. Connections are closed once
+    both sides finished sending, or right away when either side fails.
+
+    :param buffer_size: bytes each direction of relayed connection buffers at most.
+    :param use_splice: move bytes with splice, where os.splice is available.
+    """
+
+    def __init__(self, buffer_size: int = TCP_RELAY_BUFFER_SIZE, use_splice: bool = hasattr(os, "splice")) -> None:
+        self.buffer_size = buffer_size
+        self.use_splice = use_splice
+        self.selector = None
+        self.thread = None
+
+        # connections handed over by worker threads wait here until relay thread registers them,
+        # writing to wake socket interrupts its select
+        self.lock = threading.Lock()
+        self.new_connections = []
+        self.wake_reader, self.wake_writer = socket.socketpair()
+        self.wake_reader.setblocking(False)
+        self.wake_writer.setblocking(False)
+        self.stopping = False
+
+        # statistics, updated only by relay thread
+        self.connections = set()
+        self.total_connections = 0
+        self.bytes_upstream = 0 # bytes relayed from clients to backend servers
+        self.bytes_downstream = 0 # bytes relayed from backend servers to clients
+
+    def start(self) -> None:
+        """
+        Starts relay thread.
+        """
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.wake_reader, selectors.EVENT_READ)
+        self.thread = threading.Thread(target=self._run, name="lb-tcp-relay", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """
+        Closes every relayed connection and stops relay thread.
+        """
+        if self.thread is None:
+            return
+        with self.lock:
+            self.stopping = True
+        self._wake()
+        self.thread.join(5)
+        self.thread = None
+
+    def relay(self, client_sock: socket.socket, backend_sock: socket.socket, on_closed: Callable[[bool], None]) -> None:
+        """
+        Starts relaying bytes between client connection and connected backend server connection.
+
+        Relay takes both sockets over and closes them once done. Safe to call from any thread.
+
+        :param on_closed: called from relay thread once connections are closed, with True if both sides finished sending normally.
+        """
+        for sock in (client_sock, backend_sock):
+            sock.setblocking(False)
+            # relayed bytes are forwarded right away, and connections whose peer vanished are found eventually
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            if sock.family in (socket.AF_INET, socket.AF_INET6):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.lock:
+            if self.stopping:
+                stopped = True
+            else:
+                stopped = False
+                self.new_connections.append((client_sock, backend_sock, on_closed))
+        if stopped:
+            client_sock.close()
+            backend_sock.close()
+            on_closed(False)
+            return
+        self._wake()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "active_connections": len(self.connections),
+            "total_connections": self.total_connections,
+            "bytes_upstream": self.bytes_upstream,
+            "bytes_downstream": self.bytes_downstream,
+        }
+
+
+    # Private methods from here
+
+    def _wake(self) -> None:
+        try:
+            self.wake_writer.send(b"\0")
+        except BlockingIOError:
+            # relay thread has wake-ups pending already
+            pass
+
+    def _run(self) -> None:
+        while True:
+            for key, events in self.selector.select():
+                if key.fileobj is self.wake_reader:
+                    self._take_new_connections()
+                    continue
+                connection = key.data
+                if connection.closed:
+                    # other socket of same connection failed earlier in this round
+                    continue
+                try:
+                    self._service(connection, key.fileobj, events)
+                except OSError as e:
+                    logging.debug(f"Relayed connection failed: {e}")
+                    self._close(connection, False)
+            if self.stopping:
+                break
+        for connection in list(self.connections):
+            self._close(connection, False)
+        self.selector.close()
+
+    def _take_new_connections(self) -> None:
+        try:
+            while self.wake_reader.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+        with self.lock:
+            new_connections, self.new_connections = self.new_connections, []
+        for client_sock, backend_sock, on_closed in new_connections:
+            connection = _RelayedConnection(client_sock, backend_sock, on_closed, self.buffer_size, self.use_splice)
+            self.connections.add(connection)
+            self.total_connections += 1
+            self._update_events(connection)
+
+    def _service(self, connection: _RelayedConnection, sock: socket.socket, events: int) -> None:
+        """
+        Moves bytes of connection whose socket became ready, and passes on ends of stream.
+        """
+        upstream, downstream = connection.upstream, connection.downstream
+        if events & selectors.EVENT_READ:
+            direction = upstream if sock is upstream.source else downstream
+            if direction.fill() and direction.wants_write():
+                # destination usually has room, so data is written right away instead of after next select
+                self._flush(direction, upstream)
+        if events & selectors.EVENT_WRITE:
+            self._flush(upstream if sock is upstream.destination else downstream, upstream)
+
+        for direction in (upstream, downstream):
+            if direction.eof and not direction.pending and not direction.done:
+                direction.destination.shutdown(socket.SHUT_WR)
+                direction.done = True
+        if upstream.done and downstream.done:
+            self._close(connection, True)
+        else:
+            self._update_events(connection)
+
+    def _flush(self, direction: _Direction, upstream: _Direction) -> None:
+        written = direction.flush()
+        if direction is upstream:
+            self.bytes_upstream += written
+        else:
+            self.bytes_downstream += written
+
+    def _update_events(self, connection: _RelayedConnection) -> None:
+        """
+        Registers each socket of connection for events its directions are waiting for.
+        """
+        upstream, downstream = connection.upstream, connection.downstream
+        wanted = [(upstream.source, (selectors.EVENT_READ if upstream.wants_read() else 0) | (selectors.EVENT_WRITE if downstream.wants_write() else 0)),
+                  (downstream.source, (selectors.EVENT_READ if downstream.wants_read() else 0) | (selectors.EVENT_WRITE if upstream.wants_write() else 0))]
+        for sock, events in wanted:
+            registered = connection.events[sock]
+            if events == registered:
+                continue
+            if not registered:
+                self.selector.register(sock, events, connection)
+            elif not events:
+                self.selector.unregister(sock)
+            else:
+                self.selector.modify(sock, events, connection)
+            connection.events[sock] = events
+
+    def _close(self, connection: _RelayedConnection, success: bool) -> None:
+        connection.closed = True
+        self.connections.discard(connection)
+        for sock, registered in connection.events.items():
+            if registered:
+                self.selector.unregister(sock)
+            sock.close()
+        connection.upstream.close()
+        connection.downstream.close()
+        try:
+            connection.on_closed(success)
+        except Exception:
+            logging.exception("Callback of closed relayed connection failed")
@@ -0,0 +1,111 @@
+import ssl
+import time
+import socket
+import logging
+from typing import Dict, Any, Optional, Tuple
+
+from implementations.metrics import ShardedCounter, Histogram
+from constants.app_constants import TLS_SNI_CERTS, TLS_HANDSHAKE_TIMEOUT, TLS_SESSION_TICKETS, TLS_HANDSHAKE_BUCKETS
+
+
+class TlsTerminator:
+    """
+    Terminates TLS of client connections on load balancer address, so no separate TLS
+    terminator has to run in front of load balancer.
+
+    Certificate is chosen by hostname client asks for through SNI, falling back to default
+    certificate for unknown hostnames and clients not sending SNI. Clients can resume
+    earlier sessions with session tickets (and TLS 1.2 session IDs, cached by OpenSSL),
+    skipping expensive key exchange and certificate verification. Tickets are encrypted
+    with keys OpenSSL generates per process, so with several load balancer processes
+    session is resumed only when client reconnects to same process.
+
+    Handshake is never done by thread accepting connections: threaded server mode wraps
+    accepted socket in worker thread, which then runs handshake with handshake_timeout,
+    and asyncio server mode runs it on event loop.
+
+    :param cert_file: path of PEM certificate chain served by default.
+    :param key_file: path of PEM private key of cert_file.
+    :param sni_certs: hostname -> (certificate file, key file) served to clients asking for that hostname.
+    :param handshake_timeout: seconds client has to complete handshake.
+    :param session_tickets: session tickets sent to client after full TLS 1.3 handshake.
+    """
+
+    def __init__(self, cert_file: str, key_file: str, sni_certs: Dict[str, Tuple[str, str]] = TLS_SNI_CERTS,
+                 handshake_timeout: float = TLS_HANDSHAKE_TIMEOUT, session_tickets: int = TLS_SESSION_TICKETS) -> None:
+        self.handshake_timeout = handshake_timeout
+        self.context = self._create_context(cert_file, key_file, session_tickets)
+        self.sni_contexts = {hostname.lower(): self._create_context(sni_cert_file, sni_key_file, session_tickets)
+                             for hostname, (sni_cert_file, sni_key_file) in sni_certs.items()}
+        if self.sni_contexts:
+            self.context.sni_callback = self._select_context
+
+        # counters updated by every handshake, from many worker threads
+        self.full_handshakes = ShardedCounter()
+        self.resumed_handshakes = ShardedCounter()
+        self.failed_handshakes = ShardedCounter()
+        self.handshake_histogram = Histogram(TLS_HANDSHAKE_BUCKETS) # duration of successful handshakes, threaded server mode only
+        self.started_at = time.monotonic()
+
+    def wrap_socket(self, client_sock: socket.socket) -> Optional[ssl.SSLSocket]:
+        """
+        Runs TLS handshake on accepted client connection.
+
+        :return: TLS socket to read request from and send response to, or None if handshake failed, in which case connection is closed.
+        """
+        start_time = time.monotonic()
+        try:
+            client_sock.settimeout(self.handshake_timeout)
+            tls_sock = self.context.wrap_socket(client_sock, server_side=True, do_handshake_on_connect=False)
+            tls_sock.do_handshake()
+        except (ssl.SSLError, OSError) as e:
+            self.failed_handshakes.add()
+            logging.debug(f"TLS handshake with client failed: {e}")
+            client_sock.close()
+            return None
+        self.handshake_histogram.observe(time.monotonic() - start_time)
+        self.record_handshake(tls_sock)
+        return tls_sock
+
+    def record_handshake(self, ssl_object: Any) -> None:
+        """
+        Counts completed handshake of TLS socket or SSL object (asyncio server mode), as full or resumed one.
+        """
+        if ssl_object.session_reused:
+            self.resumed_handshakes.add()
+        else:
+            self.full_handshakes.add()
+
+    def get_stats(self) -> Dict[str, Any]:
+        full, resumed, failed = self.full_handshakes.get(), self.resumed_handshakes.get(), self.failed_handshakes.get()
+        counts, total_time = self.handshake_histogram.get()
+        completed = full + resumed
+        return {
+            "handshakes": completed,
+            "full_handshakes": full,
+            "resumed_handshakes": resumed,
+            "failed_handshakes": failed,
+            "resumption_ratio": resumed / completed if completed else 0,
+            # average since load balancer started, use lb_tls_handshakes_total metric for rate over recent window
+            "handshake_rate": completed / max(time.monotonic() - self.started_at, 1e-9),
+            "avg_handshake_time": total_time / counts[-1] if counts[-1] else 0,
+        }
+
+
+    # Private methods from here
+
+    @staticmethod
+    def _create_context(cert_file: str, key_file: str, session_tickets: int) -> ssl.SSLContext:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.minimum_version = ssl.TLSVersion.TLSv1_2
+        context.load_cert_chain(cert_file, key_file)
+        context.num_tickets = session_tickets
+        return context
+
+    def _select_context(self, ssl_object: ssl.SSLObject, server_name: Optional[str], context: ssl.SSLContext) -> None:
+        """
+        Switches connection to certificate of hostname client asked for, if there is one.
+        """
+        sni_context = self.sni_contexts.get(server_name.lower()) if server_name else None
+        if sni_context is not None:
+            ssl_object.context = sni_context
@@ -0,0 +1,140 @@
+import time
+import queue
+import socket
+import logging
+import threading
+from typing import Callable
+
+from constants.app_constants import WORKER_POOL_SIZE, ACCEPT_QUEUE_SIZE, MAX_QUEUE_WAIT
+
+
+class WorkerPool:
+    """
+    Fixed number of worker threads handling client connections accepted by load balancer.
+
+    Accepted connections wait in bounded queue until worker picks them up. Connection is
+    shed instead of queued when queue is full, and when it waited in queue longer than
+    max_queue_wait, since by then client is likely to have given up or to see latency
+    far beyond what is useful. Shed connections are passed to reject callback, which is
+    expected to send fast error response and close them.
+
+    :param handler: called by worker with each admitted client connection.
+    :param reject: called with each shed client connection and reason it was shed.
+    :param size: number of worker threads.
+    :param queue_size: maximum number of accepted connections waiting for worker.
+    :param max_queue_wait: seconds connection may wait in queue before it is shed.
+    """
+
+    def __init__(self, handler: Callable[[socket.socket], None], reject: Callable[[socket.socket, str], None], size: int = WORKER_POOL_SIZE, queue_size: int = ACCEPT_QUEUE_SIZE, max_queue_wait: float = MAX_QUEUE_WAIT) -> None:
+        if size < 1 or queue_size < 1:
+            raise ValueError("Worker pool needs at least one worker and one queue slot")
+        self.handler = handler
+        self.reject = reject
+        self.size = size
+        self.max_queue_wait = max_queue_wait
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.workers = []
+
+        # statistics of queue, updated by accept loop and workers
+        self.lock = threading.Lock()
+        self.admitted = 0 # connections handed to worker
+        self.rejected_queue_full = 0 # connections shed because queue was full
+        self.rejected_deadline = 0 # connections shed because they waited too long
+        self.total_queue_wait = 0.0 # seconds admitted connections spent in queue, in total
+        self.max_observed_queue_wait = 0.0
+        self.local = threading.local() # queue wait of connection each worker is handling
+
+    def start(self) -> None:
+        """
+        Starts worker threads.
+        """
+        for i in range(self.size):
+            worker = threading.Thread(target=self._work, name=f"lb-worker-{i}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def stop(self) -> None:
+        """
+        Sheds connections still waiting in queue and tells workers to exit once done with current connection.
+        """
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                self.reject(item[0], "Load balancer is shutting down")
+        # one None per worker, put without blocking so stop() never waits for busy workers
+        for _ in self.workers:
+            try:
+                self.queue.put_nowait(None)
+            except queue.Full:
+                break
+        self.workers = []
+
+    def submit(self, client_sock: socket.socket) -> bool:
+        """
+        Queues accepted client connection for worker, or sheds it straight away if queue is full.
+
+        :return: whether connection was queued.
+        """
+        try:
+            self.queue.put_nowait((client_sock, time.monotonic()))
+            return True
+        except queue.Full:
+            with self.lock:
+                self.rejected_queue_full += 1
+            self.reject(client_sock, "Accept queue is full")
+            return False
+
+    def get_queue_wait(self) -> float:
+        """
+        Returns seconds connection handled by calling worker thread waited in queue.
+        """
+        return getattr(self.local, "queue_wait", 0.0)
+
+    def has_backlog(self) -> bool:
+        """
+        Returns True while accepted connections are waiting for worker.
+        """
+        return not self.queue.empty()
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {
+                "workers": self.size,
+                "queued": self.queue.qsize(),
+                "queue_size": self.queue.maxsize,
+                "admitted": self.admitted,
+                "rejected_queue_full": self.rejected_queue_full,
+                "rejected_deadline": self.rejected_deadline,
+                "avg_queue_wait": self.total_queue_wait / self.admitted if self.admitted else 0.0,
+                "max_queue_wait": self.max_observed_queue_wait,
+            }
+
+
+    # Private methods from here
+
+    def _work(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            client_sock, queued_at = item
+            queue_wait = time.monotonic() - queued_at
+            if queue_wait > self.max_queue_wait:
+                with self.lock:
+                    self.rejected_deadline += 1
+                self.reject(client_sock, f"Request waited {queue_wait:.3f}s in accept queue")
+                continue
+
+            with self.lock:
+                self.admitted += 1
+                self.total_queue_wait += queue_wait
+                self.max_observed_queue_wait = max(self.max_observed_queue_wait, queue_wait)
+            self.local.queue_wait = queue_wait
+            try:
+                self.handler(client_sock)
+            except Exception as e:
+                # worker must survive whatever single connection throws at it
+                logging.exception(f"Unhandled error while handling client connection: {e}")
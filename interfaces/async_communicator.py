@@ -0,0 +1,78 @@
+import asyncio
+import requests
+from typing import Optional, Dict, Tuple, Any, Callable
+from utils.http_parser import HttpRequestParser
+from interfaces.backend_server import IBackendServer
+
+class IAsyncCommunicator:
+    """
+    Defines interface for communicator that handles communication with backend servers and LB app
+    from inside asyncio event loop, without blocking it.
+    """
+    async def read_request(self, reader: asyncio.StreamReader, parser: HttpRequestParser) -> Optional[Dict[str, Any]]:
+        """
+        Reads next HTTP request sent over client stream.
+
+        :param reader (asyncio.StreamReader): stream reader representing client connection.
+        :param parser (HttpRequestParser): parser holding state of client connection between requests.
+        :return: dict containing details of incoming HTTP request, or None if client closed connection before sending request.
+        """
+        pass
+
+    def get_client_ip(self, writer: asyncio.StreamWriter) -> Optional[str]:
+        """
+        Extracts IP address of client, which algorithms may route requests by.
+
+        :param writer (asyncio.StreamWriter): stream writer representing client connection.
+        :return: IP address of client, or None if it is not known.
+        """
+        pass
+
+    async def send_request_to_backend_server(self, incoming_req_details: Dict[str, Any], backend_server: IBackendServer) -> Tuple[bool, Optional[requests.Response]]:
+        """
+        Sends HTTP request to backend server.
+
+        :param incoming_req_details: dict containing details of incoming HTTP request.
+        :param backend_server: IBackendServer object representing backend server to send request to.
+        :return: tuple containing flag indicating whether error occurred, and response received from backend server, or None if error occurred
+        """
+        pass
+
+    async def send_success_response(self, writer: asyncio.StreamWriter, response: requests.Response, incoming_req_details: Dict[str, Any], body_listener: Optional[Callable[[bytes], None]] = None) -> bool:
+        """
+        Relays HTTP response of backend server to client stream, streaming its body
+        and closing response once done.
+
+        :param writer (asyncio.StreamWriter): stream writer representing client connection.
+        :param response (requests.Response): response whose body is read from its raw attribute.
+        :param incoming_req_details: dict containing details of request response belongs to.
+        :param body_listener: called with every piece of body relayed, e.g. to cache it.
+
+        :return: whether client connection can carry further requests.
+        """
+        pass
+
+    async def send_cached_response(self, writer: asyncio.StreamWriter, cached: Any, incoming_req_details: Dict[str, Any]) -> bool:
+        """
+        Sends response stored in response cache to client stream.
+
+        :param writer (asyncio.StreamWriter): stream writer representing client connection.
+        :param cached: CachedResponse taken from response cache.
+        :param incoming_req_details: dict containing details of request response is sent for.
+
+        :return: whether client connection can carry further requests.
+        """
+        pass
+
+    async def send_error_response(self, writer: asyncio.StreamWriter, reason: str, message: str, status_code: int = 400) -> None:
+        """
+        Sends error HTTP response to client stream.
+
+        :param writer (asyncio.StreamWriter): stream writer representing client connection.
+        :param reason (str): reason for error.
+        :param message (str): message explaining error.
+        :param status_code (int): HTTP status code of response.
+
+        :return: None
+        """
+        pass
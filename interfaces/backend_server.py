@@ -22,10 +22,40 @@ class IBackendServer:
     
     def add_latency(self, latency: float) -> None:
         """
-        adds given latency to total latency for server.
+        records latency of successful request to server.
         """
         pass
     
+    def start_request(self, enforce_capacity: bool = False) -> bool:
+        """
+        counts request as in flight on server, refusing it if enforce_capacity is set and server is at capacity.
+        """
+        pass
+
+    def finish_request(self) -> None:
+        """
+        counts in-flight request on server as finished.
+        """
+        pass
+
+    def get_active_requests(self) -> int:
+        """
+        returns number of requests currently in flight on server.
+        """
+        pass
+
+    def add_active_requests_listener(self, listener) -> None:
+        """
+        registers callable which is called with server whenever number of in-flight requests changes.
+        """
+        pass
+
+    def add_response_time_listener(self, listener) -> None:
+        """
+        registers callable which is called with server whenever its latency average or capacity changes.
+        """
+        pass
+
     def set_capacity(self, capacity: float) -> None:
         """
         sets maximum capacity for server.
@@ -34,7 +64,13 @@ class IBackendServer:
     
     def get_latency(self) -> float:
         """
-        returns average latency for server
+        returns moving average of recent latency for server
+        """
+        pass
+
+    def get_latency_percentile(self, percent: float) -> float:
+        """
+        returns given percentile of recent latency for server
         """
         pass
     
@@ -44,6 +80,72 @@ class IBackendServer:
         """
         pass
 
+    def get_weight(self) -> int:
+        """
+        returns weight of server, used by weighted algorithms
+        """
+        pass
+
+    def set_weight(self, weight: int) -> None:
+        """
+        sets weight of server, used by weighted algorithms
+        """
+        pass
+
+    def add_state_listener(self, listener) -> None:
+        """
+        registers callable which is called with server whenever its health or weight changes.
+        """
+        pass
+
+    def set_draining(self, draining: bool) -> None:
+        """
+        starts or stops draining server, which then gets no new requests while requests in flight on it finish.
+        """
+        pass
+
+    def is_draining(self) -> bool:
+        """
+        returns True if server is draining.
+        """
+        pass
+
+    def is_available(self) -> bool:
+        """
+        returns True if server is healthy and not ejected, so requests can be sent to it.
+        """
+        pass
+
+    def record_outcome(self, success: bool, latency: float = None):
+        """
+        records whether request proxied to server succeeded and its latency, returns reason server should be ejected for or None.
+        """
+        pass
+
+    def update_circuit_breaker(self) -> None:
+        """
+        lets open circuit of server go half-open once its open time is over.
+        """
+        pass
+
+    def eject(self, reason: str) -> None:
+        """
+        takes server out of service until it is readmitted.
+        """
+        pass
+
+    def readmit(self) -> None:
+        """
+        puts ejected server back in service.
+        """
+        pass
+
+    def get_slow_start_factor(self) -> float:
+        """
+        returns share of its normal requests server takes while it ramps up after recovering.
+        """
+        pass
+
     def stop_health_check(self) -> None:
         """
         stops health check for server
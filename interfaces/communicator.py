@@ -1,35 +1,69 @@
 import socket
 import requests
-from typing import Optional, Dict, Union,Tuple, Any
+from typing import Optional, Dict, Union,Tuple, Any, Callable
+from utils.http_parser import HttpRequestParser
 from interfaces.backend_server import IBackendServer
 
 class ICommunicator:
     """
     Defines interface for communicator that handles communication with backend servers and LB app.
     """
-    def send_request_to_backend_server(self, client_sock: socket.socket, backend_server: IBackendServer) -> Tuple[bool, Optional[str]]:
+    def read_request(self, client_sock: socket.socket, parser: HttpRequestParser) -> Optional[Dict[str, Any]]:
         """
-        Sends HTTP request to backend server, 
-        using provided client socket to extract request details.
+        Reads next HTTP request sent over client connection.
 
         :param client_sock (socket.socket): socket object representing connection to client.
+        :param parser (HttpRequestParser): parser holding state of client connection between requests.
+        :return: dict containing details of incoming HTTP request, or None if client closed connection.
+        """
+        pass
+
+    def get_client_ip(self, client_sock: socket.socket) -> Optional[str]:
+        """
+        Extracts IP address of client, which algorithms may route requests by.
+
+        :param client_sock (socket.socket): socket object representing connection to client.
+        :return: IP address of client, or None if it is not known.
+        """
+        pass
+
+    def send_request_to_backend_server(self, incoming_req_details: Dict[str, Any], backend_server: IBackendServer) -> Tuple[bool, Optional[requests.Response]]:
+        """
+        Sends HTTP request read from client to backend server.
+
+        :param incoming_req_details: dict containing details of incoming HTTP request.
         :param backend_server: IBackendServer object representing backend server to send request to.
         :return: tuple containing flag indicating whether error occurred, and response received from backend server, or None if error occurred
         """
         pass
-    
-    def send_success_response(self, client_sock: socket.socket, response_str: str) -> None:
+
+    def send_success_response(self, client_sock: socket.socket, response: requests.Response, incoming_req_details: Dict[str, Any], body_listener: Optional[Callable[[memoryview], None]] = None) -> bool:
         """
-        Sends HTTP response to client socket.
+        Relays HTTP response of backend server to client socket, streaming its body
+        and closing response once done.
 
         :param client_sock (socket.socket): socket object representing client connection.
-        :param response_str (str): HTTP response to send to client socket.
+        :param response (requests.Response): response whose body is read from its raw attribute.
+        :param incoming_req_details: dict containing details of request response belongs to.
+        :param body_listener: called with every piece of de-chunked body relayed, e.g. to cache it.
 
-        :return: None
+        :return: whether client connection can carry further requests.
+        """
+        pass
+
+    def send_cached_response(self, client_sock: socket.socket, cached: Any, incoming_req_details: Dict[str, Any]) -> bool:
+        """
+        Sends response stored in response cache to client socket.
+
+        :param client_sock (socket.socket): socket object representing client connection.
+        :param cached: CachedResponse taken from response cache.
+        :param incoming_req_details: dict containing details of request response is sent for.
+
+        :return: whether client connection can carry further requests.
         """
         pass
     
-    def send_error_response(self, client_sock: socket.socket, reason: str, message: str) -> None:
+    def send_error_response(self, client_sock: socket.socket, reason: str, message: str, status_code: int = 400, headers: Optional[Dict[str, str]] = None) -> None:
         """
         Sends error HTTP response to client socket.
 
@@ -37,18 +71,21 @@ class ICommunicator:
         :param client_sock (socket.socket): socket object representing client connection.
         :param reason (str): reason for error.
         :param message (str): message explaining error.
+        :param status_code (int): HTTP status code of response.
+        :param headers (dict): extra headers of response.
 
         :return : None
         """
         pass
 
-    def make_request(self, host_url: str, incoming_req_details: Dict[str, Any]) -> Union[requests.Response, None]:
+    def make_request(self, backend_server: IBackendServer, incoming_req_details: Dict[str, Any]) -> Union[requests.Response, None]:
         """
-        Sends HTTP request to specified backend server using provided details.
+        Sends HTTP request to specified backend server using provided details,
+        over connection taken from connection pool of backend server.
 
-        :param host_url: base URL of backend server.
+        :param backend_server: IBackendServer object representing backend server to send request to.
         :param incoming_req_details: dict containing details of incoming HTTP request.
-            It contains following keys: method (str), data (bytes), url_path (str), and headers (Dict[str, str]).
-        :return: response object returned by backend server, or None if HTTP method is unsupported.
+            It contains following keys: method (str), request_data (iterator of bytes, or None if there is no body), path (str), and headers (Dict[str, str]).
+        :return: response object whose body is not read yet and must be closed once done with, or None if HTTP method is unsupported.
         """
         pass
@@ -7,8 +7,8 @@ class ILoadBalancer:
     """
     def handle_request(self, client_sock: socket.socket) -> None:
         """
-        handles a client request by forwarding it to appropriate backend server 
-        and sending response back to client.
+        handles a client connection by forwarding each request it carries to appropriate
+        backend server and sending response back to client.
         """
         pass
     
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Dict, Any, Optional, Sequence
 from interfaces.backend_server import IBackendServer
 
 
@@ -6,8 +6,25 @@ class ILoadBalancerAlgorithm:
     """
     defines interface for load balancing algorithm.
     """
-    def get_next_server(self, servers: List[IBackendServer]) -> IBackendServer:
+
+    # whether algorithm never selects server which already handles as many requests as its capacity,
+    # load balancer then refuses to send more requests than that to server, even if selections race
+    enforces_capacity = False
+
+    def on_servers_changed(self, servers: Sequence[IBackendServer]) -> None:
+        """
+        called by load balancer whenever set of healthy servers or their weights change, with
+        new immutable sequence of healthy servers, which is then passed to get_next_server
+        until next change. Algorithms can precompute their selection structures here once,
+        instead of on every request.
+        """
+        pass
+
+    def get_next_server(self, servers: List[IBackendServer], request_context: Optional[Dict[str, Any]] = None) -> IBackendServer:
         """
         given list of backend servers, returns next server to use according to algo.
+
+        request_context holds details of request server is chosen for (method, path, headers,
+        client_ip, ...), for algorithms routing by request; it may be None.
         """
         pass
\ No newline at end of file
@@ -1,6 +1,8 @@
 import logging
-from constants.app_constants import BACKEND_SERVERS_CONFIG
+from constants.app_constants import BACKEND_SERVERS_CONFIG, BACKEND_CONFIG_FILE, LB_PROCESSES
+from implementations.config_watcher import load_backend_servers_config
 from implementations.load_balancer import LoadBalancer
+from implementations.process_supervisor import ProcessSupervisor
 from implementations.lb_algorithms.round_robin_algorithm import RoundRobinAlgorithm
 from implementations.lb_algorithms.weighted_response_time_algorithm import WeightedResponseTimeAlgorithm
 
@@ -8,8 +10,17 @@ from implementations.lb_algorithms.weighted_response_time_algorithm import Weigh
 logging.basicConfig(level=logging.INFO)
 
 if __name__ == "__main__":
-    algorithm = WeightedResponseTimeAlgorithm()
-    lb = LoadBalancer(
-        backend_servers_config = BACKEND_SERVERS_CONFIG,
-        algorithm=algorithm)
-    lb.start()
\ No newline at end of file
+    # backend servers from configuration file can be changed without restart, see BACKEND_CONFIG_FILE
+    backend_servers_config = load_backend_servers_config(BACKEND_CONFIG_FILE) if BACKEND_CONFIG_FILE else BACKEND_SERVERS_CONFIG
+    if LB_PROCESSES != 1:
+        # several load balancer processes sharing address, each creating its own algorithm instance
+        supervisor = ProcessSupervisor(
+            backend_servers_config = backend_servers_config,
+            algorithm_class=WeightedResponseTimeAlgorithm)
+        supervisor.start()
+    else:
+        algorithm = WeightedResponseTimeAlgorithm()
+        lb = LoadBalancer(
+            backend_servers_config = backend_servers_config,
+            algorithm=algorithm)
+        lb.start()
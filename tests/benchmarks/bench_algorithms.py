@@ -0,0 +1,79 @@
+"""
+Microbenchmark of server selection of WeightedResponseTimeAlgorithm on large backend fleets.
+
+Compares heap kept up to date by latency samples with linear scan computing weighted
+response time of every server on each call (how algorithm selected servers before), for
+fleets of different sizes. Between selections random servers record latency samples, as
+they do when responses arrive, so cost of updating heap is included in results.
+
+Reported per fleet size:
+  - scan sel/s   - selections per second of linear scan
+  - heap sel/s   - selections per second of heap
+  - speedup      - heap sel/s divided by scan sel/s
+
+Usage (from repository root):
+    python -m tests.benchmarks.bench_algorithms --selections 20000 --samples-per-selection 1
+"""
+import time
+import random
+import argparse
+from typing import List, Optional
+
+from interfaces.backend_server import IBackendServer
+from implementations.backend_server import BackendServer
+from implementations.lb_algorithms.weighted_response_time_algorithm import WeightedResponseTimeAlgorithm
+
+
+def scan_select(servers: List[IBackendServer]) -> Optional[IBackendServer]:
+    """
+    Linear scan WeightedResponseTimeAlgorithm used before, kept as baseline.
+    """
+    weighted_response_times = [float('inf') if server.get_capacity() == 0 else server.get_latency() / server.get_capacity() for server in servers]
+    return servers[weighted_response_times.index(min(weighted_response_times))]
+
+
+def create_servers(count: int, seed: int) -> List[BackendServer]:
+    rng = random.Random(seed)
+    servers = [BackendServer(f"http://backend-{index}:8000", health_check_url=None, capacity=rng.randint(1, 100)) for index in range(count)]
+    for server in servers:
+        server.add_latency(rng.uniform(0.001, 0.1))
+    return servers
+
+
+def run(select, servers: List[BackendServer], selections: int, samples_per_selection: float, seed: int) -> float:
+    rng = random.Random(seed)
+    # samples are drawn up front, so drawing them is not measured
+    samples = [(rng.choice(servers), rng.uniform(0.001, 0.1)) for _ in range(int(selections * samples_per_selection))]
+    samples_per_step = len(samples) / selections if selections else 0
+
+    next_sample = 0.0
+    start_time = time.perf_counter()
+    for step in range(selections):
+        next_sample += samples_per_step
+        while next_sample >= 1:
+            server, latency = samples.pop()
+            server.add_latency(latency)
+            next_sample -= 1
+        select(servers)
+    return selections / (time.perf_counter() - start_time)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="numbers of backend servers")
+    parser.add_argument("--selections", type=int, default=20000, help="selections per fleet size")
+    parser.add_argument("--samples-per-selection", type=float, default=1.0, help="latency samples recorded between two selections")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{'servers':>8} {'scan sel/s':>12} {'heap sel/s':>12} {'speedup':>8}")
+    for size in args.sizes:
+        # both runs get equal fleets and samples, each on its own copy of fleet
+        scan_rate = run(scan_select, create_servers(size, args.seed), args.selections, args.samples_per_selection, args.seed)
+        algorithm = WeightedResponseTimeAlgorithm()
+        heap_rate = run(algorithm.get_next_server, create_servers(size, args.seed), args.selections, args.samples_per_selection, args.seed)
+        print(f"{size:>8} {scan_rate:>12.0f} {heap_rate:>12.0f} {heap_rate / scan_rate:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Benchmark of health checking many backend servers.
+
+Compares HealthCheckScheduler against previous model of one sleeping thread per backend
+server issuing requests.get for every check. Health endpoints of all simulated backends
+are served by single asyncio server in separate process (distinct backends differ by
+query string); --hung makes given fraction of them accept requests and never answer.
+
+Reported per mode, over --duration seconds:
+  - threads   - peak number of threads in benchmark process
+  - cpu %     - CPU time of benchmark process divided by wall time
+  - checks/s  - health checks completed per second
+
+Usage (from repository root):
+    python -m tests.benchmarks.bench_health_checks --backends 1000 --period 2 --duration 10
+"""
+import time
+import random
+import asyncio
+import logging
+import argparse
+import threading
+import multiprocessing
+
+import requests
+
+from implementations.backend_server import BackendServer
+from implementations.health_check_scheduler import HealthCheckScheduler
+from tests.stub_backend import get_free_port
+
+
+def run_health_server(port: int, hung_fraction: float) -> None:
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                backend_id = int(head.split(b"id=", 1)[1].split(b" ", 1)[0])
+                if random.Random(backend_id).random() < hung_fraction:
+                    # hung health endpoint, connection stays open but answer never comes
+                    await asyncio.Event().wait()
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nOK")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    async def serve() -> None:
+        server = await asyncio.start_server(handle, "127.0.0.1", port, backlog=4096)
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+def health_check_url(port: int, backend_id: int) -> str:
+    return f"http://127.0.0.1:{port}/health?id={backend_id}"
+
+
+def measure(duration: float, count_checks) -> dict:
+    """
+    Samples thread count while health checks run for duration seconds.
+    """
+    start_wall, start_cpu, start_checks = time.monotonic(), time.process_time(), count_checks()
+    peak_threads = threading.active_count()
+    while time.monotonic() - start_wall < duration:
+        time.sleep(0.1)
+        peak_threads = max(peak_threads, threading.active_count())
+    wall = time.monotonic() - start_wall
+    return {
+        "threads": peak_threads,
+        "cpu_percent": (time.process_time() - start_cpu) / wall * 100,
+        "checks_per_sec": (count_checks() - start_checks) / wall,
+    }
+
+
+def bench_scheduler(port: int, backends: int, period: float, duration: float, timeout: float) -> dict:
+    scheduler = HealthCheckScheduler()
+    servers = [BackendServer(f"http://127.0.0.1:{port}", health_check_url=health_check_url(port, i), health_check_period=period,
+                             health_check_scheduler=scheduler, health_check_timeout=timeout) for i in range(backends)]
+    # first round of checks opens connections, steady state is measured after it
+    time.sleep(period)
+    result = measure(duration, lambda: scheduler.get_stats()["checks_run"])
+    scheduler.stop()
+    for server in servers:
+        if server.health_check_connection is not None:
+            server.health_check_connection.close()
+    return result
+
+
+def bench_thread_per_backend(port: int, backends: int, period: float, duration: float, timeout: float) -> dict:
+    stop = threading.Event()
+    checks = [0]
+    lock = threading.Lock()
+
+    def check_loop(url: str) -> None:
+        # same loop BackendServer ran in its own thread before, with timeout added so benchmark can end
+        while not stop.is_set():
+            try:
+                requests.get(url, timeout=timeout)
+            except requests.exceptions.RequestException:
+                pass
+            with lock:
+                checks[0] += 1
+            stop.wait(period)
+
+    threads = [threading.Thread(target=check_loop, args=(health_check_url(port, i),), daemon=True) for i in range(backends)]
+    for thread in threads:
+        thread.start()
+    time.sleep(period)
+    result = measure(duration, lambda: checks[0])
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", type=int, default=1000, help="number of simulated backend servers")
+    parser.add_argument("--period", type=float, default=2.0, help="seconds between health checks of each backend")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds each mode is measured for")
+    parser.add_argument("--timeout", type=float, default=1.0, help="health check timeout in seconds")
+    parser.add_argument("--hung", type=float, default=0.0, help="fraction of backends whose health endpoint never answers")
+    parser.add_argument("--modes", nargs="+", default=["scheduler", "thread-per-backend"], choices=["scheduler", "thread-per-backend"])
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    port = get_free_port()
+    health_server = multiprocessing.Process(target=run_health_server, args=(port, args.hung), daemon=True)
+    health_server.start()
+    time.sleep(0.5)
+
+    benches = {"scheduler": bench_scheduler, "thread-per-backend": bench_thread_per_backend}
+    print(f"{'mode':<20} {'backends':>9} {'threads':>8} {'cpu %':>7} {'checks/s':>9}")
+    for mode in args.modes:
+        result = benches[mode](port, args.backends, args.period, args.duration, args.timeout)
+        print(f"{mode:<20} {args.backends:>9} {result['threads']:>8} {result['cpu_percent']:>7.1f} {result['checks_per_sec']:>9.1f}")
+
+    health_server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Microbenchmark of HttpRequestParser.
+
+Parses batches of pipelined requests fed either whole or in small pieces, and reports
+requests parsed per second together with memory allocated per request. Memory is measured
+with tracemalloc in separate pass, as tracing slows parsing down considerably:
+  - peak bytes/req  - peak traced memory while parsing batch, divided by requests in batch
+  - blocks/req      - memory blocks still allocated per request while parsed events are kept,
+                      i.e. allocations each request leaves behind for its consumer
+
+Usage (from repository root):
+    python -m tests.benchmarks.bench_http_parser --requests 20000
+"""
+import sys
+import time
+import argparse
+import tracemalloc
+from typing import List
+
+from utils.http_parser import HttpRequestParser, NEED_DATA
+
+REQUESTS = {
+    "get": b"GET /api/v1/items?id=42 HTTP/1.1\r\nHost: localhost:8080\r\nUser-Agent: bench/1.0\r\nAccept: */*\r\nAccept-Encoding: gzip\r\n\r\n",
+    "post": b"POST /api/v1/items HTTP/1.1\r\nHost: localhost:8080\r\nContent-Type: application/json\r\nContent-Length: 62\r\n\r\n"
+            b'{"driver_name": "heavydriver","contact_number": "9000000000"}\n',
+    "chunked": b"PUT /api/v1/items/42 HTTP/1.1\r\nHost: localhost:8080\r\nTransfer-Encoding: chunked\r\n\r\n"
+               b"1e\r\n{\"driver_name\": \"heavydriver\",\r\n1f\r\n\"contact_number\": \"9000000000\"}\r\n0\r\n\r\n",
+}
+
+
+def parse(pieces: List[bytes]) -> list:
+    parser = HttpRequestParser()
+    events = []
+    for piece in pieces:
+        parser.feed(piece)
+        while True:
+            event = parser.next_event()
+            if event is NEED_DATA:
+                break
+            events.append(event)
+    return events
+
+
+def split(data: bytes, piece_size: int) -> List[bytes]:
+    if piece_size <= 0:
+        return [data]
+    return [data[start:start + piece_size] for start in range(0, len(data), piece_size)]
+
+
+def run(kind: str, count: int, piece_size: int) -> dict:
+    pieces = split(REQUESTS[kind] * count, piece_size)
+
+    start_time = time.perf_counter()
+    parse(pieces)
+    elapsed = time.perf_counter() - start_time
+
+    tracemalloc.start()
+    blocks_before = sys.getallocatedblocks()
+    events = parse(pieces)
+    blocks_after = sys.getallocatedblocks()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del events
+
+    return {
+        "req_per_sec": count / elapsed,
+        "peak_bytes_per_req": peak / count,
+        "blocks_per_req": (blocks_after - blocks_before) / count,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000, help="requests parsed per scenario")
+    args = parser.parse_args()
+
+    print(f"{'request':<8} {'feed':<10} {'req/s':>10} {'peak bytes/req':>15} {'blocks/req':>11}")
+    for kind in REQUESTS:
+        for piece_size, feed in ((0, "whole"), (4096, "4096 B"), (16, "16 B")):
+            result = run(kind, args.requests, piece_size)
+            print(f"{kind:<8} {feed:<10} {result['req_per_sec']:>10.0f} {result['peak_bytes_per_req']:>15.1f} {result['blocks_per_req']:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Load test of LoadBalancer across load balancing algorithms and server modes.
+
+Stub backends run in one process and load balancer in another, each started fresh for
+every combination of algorithm and server mode, so runs do not influence each other.
+Backends can be given fixed latency plus random jitter, error rate and slow health
+endpoint. Load is generated by concurrent clients in benchmark process.
+
+Reported per combination:
+  - rps          - requests completed per second
+  - p50/p95/p99  - client side latency in milliseconds
+  - errors       - requests which failed or were not answered with 200
+  - cpu %        - CPU time of load balancer process divided by wall time
+  - rss MB       - peak resident memory of load balancer process
+
+With --output results are saved as JSON, together with commit and machine they were
+measured on; --compare prints change against such file saved by earlier run.
+
+Usage (from repository root):
+    python -m tests.benchmarks.bench_load_balancer --requests 5000 --concurrency 50 --output after.json --compare before.json
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import resource
+import threading
+import subprocess
+import multiprocessing
+from typing import List, Dict, Any, Optional
+
+from constants.app_constants import SERVER_MODE_THREADED, SERVER_MODE_ASYNCIO
+from implementations.load_balancer import LoadBalancer
+from implementations.lb_algorithms.round_robin_algorithm import RoundRobinAlgorithm
+from implementations.lb_algorithms.weighted_round_robin_algorithm import WeightedRoundRobinAlgorithm
+from implementations.lb_algorithms.least_connections_algorithm import LeastConnectionsAlgorithm
+from implementations.lb_algorithms.power_of_two_choices_algorithm import PowerOfTwoChoicesAlgorithm
+from implementations.lb_algorithms.weighted_response_time_algorithm import WeightedResponseTimeAlgorithm
+from implementations.lb_algorithms.consistent_hash_algorithm import ConsistentHashAlgorithm
+from tests.stub_backend import StubBackend, get_free_port
+from tests.benchmarks.load_generator import generate_load
+
+ALGORITHMS = {
+    "round-robin": RoundRobinAlgorithm,
+    "weighted-round-robin": WeightedRoundRobinAlgorithm,
+    "least-connections": LeastConnectionsAlgorithm,
+    "power-of-two-choices": PowerOfTwoChoicesAlgorithm,
+    "weighted-response-time": WeightedResponseTimeAlgorithm,
+    "consistent-hash": ConsistentHashAlgorithm,
+}
+SERVER_MODES = [SERVER_MODE_THREADED, SERVER_MODE_ASYNCIO]
+
+
+def run_stub_backends(ports: List[int], latency: float, latency_jitter: float, error_rate: float, health_latency: float) -> None:
+    for port in ports:
+        StubBackend(latency=latency, port=port, latency_jitter=latency_jitter, error_rate=error_rate, health_latency=health_latency).start()
+    threading.Event().wait()
+
+
+def get_usage() -> Dict[str, float]:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    rss_bytes = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+    return {"cpu": usage.ru_utime + usage.ru_stime, "wall": time.monotonic(), "rss_bytes": rss_bytes}
+
+
+def run_load_balancer(algorithm: str, server_mode: str, port: int, backend_ports: List[int], health_checks: bool, ready, stop, usage_queue) -> None:
+    """
+    Runs load balancer until stop is set, reporting resource usage of its process once it is
+    ready and once load is over.
+    """
+    logging.basicConfig(level=logging.WARNING)
+    config = [{"url": f"http://localhost:{backend_port}", "health_check_url": f"http://localhost:{backend_port}/health" if health_checks else None}
+              for backend_port in backend_ports]
+    lb = LoadBalancer(config, ALGORITHMS[algorithm](), server_mode=server_mode, address=("localhost", port), admin_address=None)
+
+    def report_usage() -> None:
+        lb.ready.wait()
+        usage_queue.put(get_usage())
+        ready.set()
+        stop.wait()
+        usage_queue.put(get_usage())
+        lb.stop()
+
+    threading.Thread(target=report_usage, daemon=True).start()
+    lb.start()
+
+
+def bench(algorithm: str, server_mode: str, backend_ports: List[int], args: argparse.Namespace) -> Dict[str, Any]:
+    port = get_free_port()
+    ready, stop, usage_queue = multiprocessing.Event(), multiprocessing.Event(), multiprocessing.Queue()
+    lb = multiprocessing.Process(target=run_load_balancer, daemon=True,
+                                 args=(algorithm, server_mode, port, backend_ports, args.health_checks, ready, stop, usage_queue))
+    lb.start()
+    if not ready.wait(10):
+        lb.terminate()
+        raise RuntimeError(f"Load balancer with {algorithm} in {server_mode} mode did not start")
+
+    paths = [f"/item/{i}" for i in range(args.paths)]
+    start_usage = usage_queue.get()
+    result = generate_load(port, args.requests, args.concurrency, args.keep_alive, paths)
+    stop.set()
+    end_usage = usage_queue.get()
+    lb.join(10)
+    if lb.is_alive():
+        lb.terminate()
+
+    result.update({
+        "algorithm": algorithm,
+        "server_mode": server_mode,
+        "cpu_percent": (end_usage["cpu"] - start_usage["cpu"]) / (end_usage["wall"] - start_usage["wall"]) * 100,
+        "rss_mb": end_usage["rss_bytes"] / 2 ** 20,
+    })
+    return result
+
+
+def get_environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def print_results(results: List[Dict[str, Any]], baseline: Optional[Dict[str, Any]]) -> None:
+    baseline_results = {(result["algorithm"], result["server_mode"]): result for result in baseline["results"]} if baseline else {}
+    print(f"{'algorithm':<24} {'mode':<9} {'rps':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'cpu %':>7} {'rss MB':>7}")
+    for result in results:
+        print(f"{result['algorithm']:<24} {result['server_mode']:<9} {result['rps']:>9.1f} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+              f"{result['p99_ms']:>8.2f} {result['errors']:>7} {result['cpu_percent']:>7.1f} {result['rss_mb']:>7.1f}")
+        previous = baseline_results.get((result["algorithm"], result["server_mode"]))
+        if previous:
+            changes = [f"{key} {(result[key] - previous[key]) / previous[key] * 100:+.1f}%" for key in ("rps", "p50_ms", "p99_ms", "cpu_percent") if previous[key]]
+            print(f"{'':<24} {'':<9} vs {baseline['environment'].get('commit') or 'baseline'}: {', '.join(changes)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--algorithms", nargs="+", default=list(ALGORITHMS), choices=list(ALGORITHMS))
+    parser.add_argument("--modes", nargs="+", default=SERVER_MODES, choices=SERVER_MODES)
+    parser.add_argument("--requests", type=int, default=5000, help="total requests sent to each combination")
+    parser.add_argument("--concurrency", type=int, default=50, help="number of concurrent clients")
+    parser.add_argument("--keep-alive", action="store_true", help="reuse client connections to load balancer")
+    parser.add_argument("--paths", type=int, default=100, help="number of distinct request paths")
+    parser.add_argument("--backends", type=int, default=3, help="number of stub backends")
+    parser.add_argument("--backend-latency", type=float, default=0.005, help="seconds each stub backend request takes")
+    parser.add_argument("--backend-jitter", type=float, default=0.0, help="extra seconds up to which backend requests are randomly delayed")
+    parser.add_argument("--backend-error-rate", type=float, default=0.0, help="fraction of backend requests answered with 500")
+    parser.add_argument("--health-checks", action="store_true", help="run health checks of backends while load is generated")
+    parser.add_argument("--health-latency", type=float, default=0.0, help="seconds each backend health check takes")
+    parser.add_argument("--output", help="file results are saved to as JSON")
+    parser.add_argument("--compare", help="JSON file of earlier run results are compared with")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+
+    backend_ports = [get_free_port() for _ in range(args.backends)]
+    backends = multiprocessing.Process(target=run_stub_backends, daemon=True,
+                                       args=(backend_ports, args.backend_latency, args.backend_jitter, args.backend_error_rate, args.health_latency))
+    backends.start()
+    time.sleep(0.5)
+
+    results = []
+    for algorithm in args.algorithms:
+        for server_mode in args.modes:
+            results.append(bench(algorithm, server_mode, backend_ports, args))
+    backends.terminate()
+
+    print_results(results, baseline)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"environment": get_environment(), "parameters": vars(args), "results": results}, file, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
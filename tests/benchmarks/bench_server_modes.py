@@ -0,0 +1,69 @@
+"""
+Benchmark comparing threaded and asyncio server modes of LoadBalancer.
+
+Stub backends and load balancer each run in their own process, so load generator
+does not compete with them for GIL. By default every client request opens new
+connection to load balancer; with --keep-alive each client reuses single connection.
+
+Usage (from repository root):
+    python -m tests.benchmarks.bench_server_modes --requests 2000 --concurrency 50 [--keep-alive]
+"""
+import logging
+import argparse
+import threading
+import multiprocessing
+from typing import List
+
+from constants.app_constants import SERVER_MODE_THREADED, SERVER_MODE_ASYNCIO
+from implementations.load_balancer import LoadBalancer
+from implementations.lb_algorithms.round_robin_algorithm import RoundRobinAlgorithm
+from tests.stub_backend import StubBackend, get_free_port
+from tests.benchmarks.load_generator import generate_load
+
+
+def run_stub_backends(ports: List[int], latency: float) -> None:
+    for port in ports:
+        StubBackend(latency=latency, port=port).start()
+    threading.Event().wait()
+
+
+def run_load_balancer(server_mode: str, port: int, backend_ports: List[int], ready) -> None:
+    logging.basicConfig(level=logging.WARNING)
+    config = [{"url": f"http://localhost:{backend_port}", "health_check_url": None} for backend_port in backend_ports]
+    lb = LoadBalancer(config, RoundRobinAlgorithm(), server_mode=server_mode, address=("localhost", port), admin_address=None)
+    threading.Thread(target=lambda: lb.ready.wait() and ready.set(), daemon=True).start()
+    lb.start()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000, help="total requests sent to each server mode")
+    parser.add_argument("--concurrency", type=int, default=50, help="number of concurrent clients")
+    parser.add_argument("--backends", type=int, default=2, help="number of stub backends")
+    parser.add_argument("--backend-latency", type=float, default=0.0, help="seconds each stub backend request takes")
+    parser.add_argument("--keep-alive", action="store_true", help="reuse client connections to load balancer")
+    args = parser.parse_args()
+
+    backend_ports = [get_free_port() for _ in range(args.backends)]
+    backends = multiprocessing.Process(target=run_stub_backends, args=(backend_ports, args.backend_latency), daemon=True)
+    backends.start()
+
+    print(f"{'mode':<10} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for server_mode in (SERVER_MODE_THREADED, SERVER_MODE_ASYNCIO):
+        port = get_free_port()
+        ready = multiprocessing.Event()
+        lb = multiprocessing.Process(target=run_load_balancer, args=(server_mode, port, backend_ports, ready), daemon=True)
+        lb.start()
+        ready.wait(10)
+
+        result = generate_load(port, args.requests, args.concurrency, args.keep_alive)
+        print(f"{server_mode:<10} {result['requests']:>9} {result['errors']:>7} {result['rps']:>9.1f} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f}")
+
+        lb.terminate()
+        lb.join()
+
+    backends.terminate()
+
+
+if __name__ == "__main__":
+    main()
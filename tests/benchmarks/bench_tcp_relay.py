@@ -0,0 +1,82 @@
+"""
+Benchmark of TcpRelay used by tcp proxy mode of load balancer, relaying bytes with splice
+and through buffer.
+
+Each of concurrent clients sends given amount of data through relay to sink which reads it
+and discards it, then half-closes its connection. Reported per way bytes are moved: total
+throughput in MB/s and CPU time of benchmark process (relay thread, clients and sinks all
+run in it, so it is only comparable between ways).
+
+Usage (from repository root):
+    python -m tests.benchmarks.bench_tcp_relay --megabytes 256 --connections 4
+"""
+import os
+import time
+import socket
+import argparse
+import threading
+from typing import Dict, Any
+
+from implementations.tcp_relay import TcpRelay
+from constants.app_constants import TCP_RELAY_BUFFER_SIZE
+from tests.test_tcp_relay import connected_pair
+
+
+def run_transfer(use_splice: bool, megabytes: int, connections: int, buffer_size: int) -> Dict[str, Any]:
+    relay = TcpRelay(buffer_size=buffer_size, use_splice=use_splice)
+    relay.start()
+    per_connection = megabytes * 1024 * 1024 // connections
+    chunk = os.urandom(256 * 1024)
+    closed = threading.Semaphore(0)
+    threads = []
+
+    def send(sock: socket.socket) -> None:
+        with sock:
+            remaining = per_connection
+            while remaining > 0:
+                sent = sock.send(chunk[:remaining])
+                remaining -= sent
+            sock.shutdown(socket.SHUT_WR)
+            sock.recv(1)
+
+    def sink(sock: socket.socket) -> None:
+        with sock:
+            buffer = bytearray(256 * 1024)
+            while sock.recv_into(buffer):
+                pass
+
+    start_time, start_cpu = time.perf_counter(), time.process_time()
+    for _ in range(connections):
+        client, relayed_client = connected_pair()
+        relayed_backend, backend = connected_pair()
+        relay.relay(relayed_client, relayed_backend, lambda success: closed.release())
+        threads.append(threading.Thread(target=send, args=(client,)))
+        threads.append(threading.Thread(target=sink, args=(backend,)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for _ in range(connections):
+        closed.acquire(timeout=10)
+    elapsed, cpu = time.perf_counter() - start_time, time.process_time() - start_cpu
+    relayed = relay.get_stats()["bytes_upstream"]
+    relay.stop()
+    return {"mb_per_sec": relayed / (1024 * 1024) / elapsed, "cpu_seconds": cpu, "relayed": relayed}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megabytes", type=int, default=256, help="total megabytes relayed in each way")
+    parser.add_argument("--connections", type=int, default=4, help="number of concurrent relayed connections")
+    parser.add_argument("--buffer-size", type=int, default=TCP_RELAY_BUFFER_SIZE, help="bytes buffered per direction of relayed connection")
+    args = parser.parse_args()
+
+    ways = [("splice", True), ("buffer", False)] if hasattr(os, "splice") else [("buffer", False)]
+    print(f"{'way':<8} {'MB relayed':>11} {'MB/s':>9} {'cpu s':>7}")
+    for name, use_splice in ways:
+        result = run_transfer(use_splice, args.megabytes, args.connections, args.buffer_size)
+        print(f"{name:<8} {result['relayed'] / (1024 * 1024):>11.1f} {result['mb_per_sec']:>9.1f} {result['cpu_seconds']:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Benchmark of TLS termination by LoadBalancer, with self-signed certificate generated for the run.
+
+Clients send GET requests over TLS in three ways:
+  - full       - every request on new connection with full handshake
+  - resumed    - every request on new connection resuming session of client's previous one
+  - keep-alive - all requests of client on single connection, so handshake cost is paid once
+
+Reported per server mode and way: requests per second, p50/p99 latency in milliseconds,
+errors, and handshakes and resumption ratio load balancer itself counted (read from its
+admin server).
+
+Usage (from repository root):
+    python -m tests.benchmarks.bench_tls --requests 2000 --concurrency 20
+"""
+import ssl
+import json
+import time
+import socket
+import logging
+import argparse
+import tempfile
+import threading
+import urllib.request
+import multiprocessing
+from typing import List, Dict, Any, Tuple
+
+from constants.app_constants import SERVER_MODE_THREADED, SERVER_MODE_ASYNCIO
+from implementations.load_balancer import LoadBalancer
+from implementations.lb_algorithms.round_robin_algorithm import RoundRobinAlgorithm
+from tests.stub_backend import StubBackend, get_free_port, generate_self_signed_cert
+from tests.benchmarks.load_generator import percentile
+
+CLIENT_MODES = ["full", "resumed", "keep-alive"]
+
+
+def run_stub_backends(ports: List[int], latency: float) -> None:
+    for port in ports:
+        StubBackend(latency=latency, port=port).start()
+    threading.Event().wait()
+
+
+def run_load_balancer(server_mode: str, port: int, admin_port: int, backend_ports: List[int], cert_file: str, key_file: str, ready) -> None:
+    logging.basicConfig(level=logging.WARNING)
+    config = [{"url": f"http://localhost:{backend_port}", "health_check_url": None} for backend_port in backend_ports]
+    lb = LoadBalancer(config, RoundRobinAlgorithm(), server_mode=server_mode, address=("localhost", port), admin_address=("localhost", admin_port),
+                      tls_cert_file=cert_file, tls_key_file=key_file)
+    threading.Thread(target=lambda: lb.ready.wait() and ready.set(), daemon=True).start()
+    lb.start()
+
+
+def read_response(tls_sock: ssl.SSLSocket) -> bytes:
+    """
+    Reads single response with Content-Length body from connection.
+    """
+    data = b""
+    while b"\r\n\r\n" not in data:
+        chunk = tls_sock.recv(65536)
+        if not chunk:
+            raise ConnectionError("Load balancer closed connection")
+        data += chunk
+    head, _, body = data.partition(b"\r\n\r\n")
+    length = next(int(line.split(b":", 1)[1]) for line in head.split(b"\r\n") if line.lower().startswith(b"content-length:"))
+    while len(body) < length:
+        chunk = tls_sock.recv(65536)
+        if not chunk:
+            raise ConnectionError("Load balancer closed connection")
+        body += chunk
+    return head
+
+
+def generate_tls_load(port: int, context: ssl.SSLContext, total_requests: int, concurrency: int, client_mode: str) -> Dict[str, Any]:
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    per_thread = total_requests // concurrency
+    request = b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n"
+
+    def connect(session) -> Tuple[socket.socket, ssl.SSLSocket]:
+        sock = socket.create_connection(("localhost", port), timeout=10)
+        return sock, context.wrap_socket(sock, server_hostname="localhost", session=session)
+
+    def client() -> None:
+        thread_latencies = []
+        thread_errors = 0
+        session = None
+        tls_sock = None
+        for _ in range(per_thread):
+            start_time = time.perf_counter()
+            try:
+                if tls_sock is None:
+                    _, tls_sock = connect(session if client_mode == "resumed" else None)
+                tls_sock.sendall(request)
+                if not read_response(tls_sock).startswith(b"HTTP/1.1 200"):
+                    thread_errors += 1
+                session = tls_sock.session
+                if client_mode != "keep-alive":
+                    tls_sock.close()
+                    tls_sock = None
+            except (OSError, ValueError, StopIteration):
+                thread_errors += 1
+                if tls_sock is not None:
+                    tls_sock.close()
+                tls_sock = None
+                continue
+            thread_latencies.append(time.perf_counter() - start_time)
+        if tls_sock is not None:
+            tls_sock.close()
+        with lock:
+            latencies.extend(thread_latencies)
+            errors[0] += thread_errors
+
+    start_time = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start_time
+
+    latencies.sort()
+    return {
+        "requests": per_thread * concurrency,
+        "errors": errors[0],
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def get_tls_stats(admin_port: int) -> Dict[str, Any]:
+    with urllib.request.urlopen(f"http://localhost:{admin_port}/tls", timeout=5) as response:
+        return json.load(response)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000, help="total requests sent in each way to each server mode")
+    parser.add_argument("--concurrency", type=int, default=20, help="number of concurrent clients")
+    parser.add_argument("--backends", type=int, default=2, help="number of stub backends")
+    parser.add_argument("--backend-latency", type=float, default=0.0, help="seconds each stub backend request takes")
+    parser.add_argument("--modes", nargs="+", default=[SERVER_MODE_THREADED, SERVER_MODE_ASYNCIO], choices=[SERVER_MODE_THREADED, SERVER_MODE_ASYNCIO])
+    args = parser.parse_args()
+
+    cert_dir = tempfile.TemporaryDirectory()
+    cert_file, key_file = generate_self_signed_cert(cert_dir.name)
+    context = ssl.create_default_context(cafile=cert_file)
+
+    backend_ports = [get_free_port() for _ in range(args.backends)]
+    backends = multiprocessing.Process(target=run_stub_backends, args=(backend_ports, args.backend_latency), daemon=True)
+    backends.start()
+
+    print(f"{'mode':<10} {'clients':<11} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'handshakes':>11} {'resumed %':>10}")
+    for server_mode in args.modes:
+        port, admin_port = get_free_port(), get_free_port()
+        ready = multiprocessing.Event()
+        lb = multiprocessing.Process(target=run_load_balancer, args=(server_mode, port, admin_port, backend_ports, cert_file, key_file, ready), daemon=True)
+        lb.start()
+        ready.wait(10)
+
+        for client_mode in CLIENT_MODES:
+            before = get_tls_stats(admin_port)
+            result = generate_tls_load(port, context, args.requests, args.concurrency, client_mode)
+            after = get_tls_stats(admin_port)
+            handshakes = after["handshakes"] - before["handshakes"]
+            resumed = after["resumed_handshakes"] - before["resumed_handshakes"]
+            print(f"{server_mode:<10} {client_mode:<11} {result['requests']:>9} {result['errors']:>7} {result['rps']:>9.1f} {result['p50_ms']:>8.2f} "
+                  f"{result['p99_ms']:>8.2f} {handshakes:>11} {(resumed / handshakes * 100 if handshakes else 0):>10.1f}")
+
+        lb.terminate()
+        lb.join()
+
+    backends.terminate()
+    cert_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
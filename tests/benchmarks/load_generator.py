@@ -0,0 +1,77 @@
+"""
+Concurrent HTTP load generator shared by benchmarks of load balancer.
+"""
+import time
+import threading
+import http.client
+from typing import List, Sequence
+
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def generate_load(port: int, total_requests: int, concurrency: int, keep_alive: bool = False, paths: Sequence[str] = ("/",)) -> dict:
+    """
+    Sends total_requests GET requests to load balancer from concurrency client threads.
+
+    With keep_alive each client thread sends all its requests over single connection,
+    which is opened again only if load balancer closed it. Requests cycle through paths,
+    so algorithms which hash request path see more than one key.
+
+    :return: dict with requests/sec, error count and latency percentiles in milliseconds.
+    """
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    per_thread = total_requests // concurrency
+
+    def client(client_index: int) -> None:
+        thread_latencies = []
+        thread_errors = 0
+        conn = None
+        for request_index in range(per_thread):
+            path = paths[(client_index + request_index * concurrency) % len(paths)]
+            start_time = time.perf_counter()
+            if conn is None:
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+            try:
+                conn.request("GET", path)
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    thread_errors += 1
+                if not keep_alive or response.will_close:
+                    conn.close()
+                    conn = None
+            except (OSError, http.client.HTTPException):
+                thread_errors += 1
+                conn.close()
+                conn = None
+            thread_latencies.append(time.perf_counter() - start_time)
+        if conn is not None:
+            conn.close()
+        with lock:
+            latencies.extend(thread_latencies)
+            errors[0] += thread_errors
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start_time
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
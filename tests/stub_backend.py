@@ -0,0 +1,320 @@
+import os
+import sys
+import time
+import random
+import socket
+import subprocess
+import threading
+from typing import Optional, Dict, Tuple, List, Union
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    """
+    Handles requests sent to StubBackend.
+
+    GET returns configured body (with chunked encoding on /chunked, and 500 on /error), POST and PUT echo request
+    body back and /health always returns 200. Other GET requests fail with 500 at configured
+    error rate. Connections are kept alive between requests, like production backend servers do.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path == "/health":
+            time.sleep(self.server.health_latency)
+            self._send(200, b"OK")
+            return
+        if self.path == "/error":
+            self._send(500, b"Internal Server Error")
+            return
+        with self.server.lock:
+            self.server.get_count += 1
+            self.server.last_headers = self.headers
+        time.sleep(self._get_latency())
+        if self.server.error_rate and random.random() < self.server.error_rate:
+            self._send(500, b"Internal Server Error")
+            return
+        if self.path == "/chunked":
+            self._send_chunked(200, self.server.body)
+            return
+        self._send(200, self.server.body)
+
+    def do_POST(self):
+        if "chunked" in self.headers.get("Transfer-Encoding", ""):
+            body = self._read_chunked_body()
+        else:
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self._get_latency())
+        self._send(200, body)
+
+    do_PUT = do_POST
+
+    def log_message(self, format, *args):
+        # stub backends are used in tests and benchmarks, so access log would only be noise
+        pass
+
+    def _get_latency(self) -> float:
+        return self.server.latency + random.uniform(0, self.server.latency_jitter)
+
+    def _send(self, status_code: int, body: bytes) -> None:
+        self.send_response(status_code)
+        self.send_header("Content-Type", "text/plain")
+        for key, value in self.server.headers:
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_chunked(self, status_code: int, body: bytes, chunk_size: int = 4096) -> None:
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        for key, value in self.server.headers:
+            self.send_header(key, value)
+        self.end_headers()
+        for start in range(0, len(body), chunk_size):
+            chunk = body[start:start + chunk_size]
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _read_chunked_body(self) -> bytes:
+        chunks = []
+        while True:
+            chunk_size = int(self.rfile.readline().split(b";", 1)[0], 16)
+            if chunk_size == 0:
+                self.rfile.readline()
+                return b"".join(chunks)
+            chunks.append(self.rfile.read(chunk_size))
+            self.rfile.readline()
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # clients (load balancer under test) may reset connections they pooled, which is not an error of stub
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StubBackend:
+    """
+    In-process HTTP backend server used by tests and benchmarks.
+
+    :param body: body returned for GET requests.
+    :param latency: seconds each non health check request is delayed by before responding.
+    :param port: port to listen on, any free port is used when 0.
+    :param latency_jitter: extra seconds up to which each non health check request is randomly delayed.
+    :param error_rate: fraction of GET requests answered with 500.
+    :param health_latency: seconds each health check request is delayed by.
+    :param headers: extra headers sent with every response, e.g. Cache-Control, as dict or as (name, value) pairs when header repeats.
+    """
+
+    def __init__(self, body: bytes = b"Hello from stub backend", latency: float = 0.0, port: int = 0,
+                 latency_jitter: float = 0.0, error_rate: float = 0.0, health_latency: float = 0.0,
+                 headers: Optional[Union[Dict[str, str], List[Tuple[str, str]]]] = None):
+        self.httpd = StubHTTPServer(("localhost", port), StubRequestHandler)
+        self.httpd.body = body
+        self.httpd.latency = latency
+        self.httpd.latency_jitter = latency_jitter
+        self.httpd.error_rate = error_rate
+        self.httpd.health_latency = health_latency
+        self.httpd.headers = list(headers.items()) if isinstance(headers, dict) else list(headers or [])
+        self.httpd.get_count = 0 # GET requests served, other than health checks and /error
+        self.httpd.last_headers = None # headers of last of those requests
+        self.httpd.lock = threading.Lock()
+        self.port = self.httpd.server_address[1]
+        self.url = f"http://localhost:{self.port}"
+        self.health_check_url = f"{self.url}/health"
+
+    def start(self) -> "StubBackend":
+        threading.Thread(target=self.httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class StubHttp2Backend:
+    """
+    In-process cleartext HTTP/2 backend server (prior knowledge) used by tests and benchmarks, built on h2.
+
+    Every request is answered after latency with body, POST and PUT requests with their own
+    body echoed back. Response bodies are sent as fast as flow control of client allows.
+    Counts connections and most streams it had open at once on single connection.
+
+    :param body: body returned for GET requests.
+    :param latency: seconds each request is delayed by before responding.
+    :param port: port to listen on, any free port is used when 0.
+    :param max_concurrent_streams: concurrency limit sent to clients in SETTINGS.
+    """
+
+    def __init__(self, body: bytes = b"Hello from HTTP/2 stub backend", latency: float = 0.0, port: int = 0, max_concurrent_streams: int = 100):
+        self.body = body
+        self.latency = latency
+        self.max_concurrent_streams = max_concurrent_streams
+        self.server_sock = socket.create_server(("localhost", port))
+        self.port = self.server_sock.getsockname()[1]
+        self.url = f"http://localhost:{self.port}"
+        self.connections = 0
+        self.requests = 0
+        self.max_active_streams = 0
+        self.lock = threading.Lock()
+
+    def start(self) -> "StubHttp2Backend":
+        threading.Thread(target=self._accept, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.server_sock.close()
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                sock, _ = self.server_sock.accept()
+            except OSError:
+                return
+            with self.lock:
+                self.connections += 1
+            threading.Thread(target=self._serve, args=(sock,), daemon=True).start()
+
+    def _serve(self, sock: socket.socket) -> None:
+        import h2.config
+        import h2.events
+        import h2.settings
+        import h2.exceptions
+        import h2.connection
+
+        conn = h2.connection.H2Connection(h2.config.H2Configuration(client_side=False, header_encoding="utf-8"))
+        conn.local_settings = h2.settings.Settings(client=False, initial_values={h2.settings.SettingCodes.MAX_CONCURRENT_STREAMS: self.max_concurrent_streams})
+        condition = threading.Condition()
+        request_bodies = {}
+        with condition:
+            conn.initiate_connection()
+            sock.sendall(conn.data_to_send())
+
+        def respond(stream_id: int, body: bytes) -> None:
+            time.sleep(self.latency)
+            with condition:
+                try:
+                    conn.send_headers(stream_id, [(":status", "200"), ("content-length", str(len(body))), ("x-stream-id", str(stream_id))])
+                    view = memoryview(body)
+                    while view:
+                        while conn.local_flow_control_window(stream_id) <= 0:
+                            condition.wait()
+                        size = min(len(view), conn.local_flow_control_window(stream_id), conn.max_outbound_frame_size)
+                        conn.send_data(stream_id, view[:size].tobytes())
+                        sock.sendall(conn.data_to_send())
+                        view = view[size:]
+                    conn.end_stream(stream_id)
+                    sock.sendall(conn.data_to_send())
+                except (OSError, h2.exceptions.ProtocolError):
+                    # client cancelled stream or went away
+                    pass
+
+        while True:
+            try:
+                data = sock.recv(65536)
+            except OSError:
+                data = b""
+            if not data:
+                sock.close()
+                return
+            with condition:
+                try:
+                    events = conn.receive_data(data)
+                except h2.exceptions.ProtocolError:
+                    sock.close()
+                    return
+                for event in events:
+                    if isinstance(event, h2.events.RequestReceived):
+                        request_bodies[event.stream_id] = (dict(event.headers)[":method"], [])
+                        with self.lock:
+                            self.requests += 1
+                            self.max_active_streams = max(self.max_active_streams, conn.open_inbound_streams)
+                    elif isinstance(event, h2.events.DataReceived):
+                        request_bodies[event.stream_id][1].append(event.data)
+                        conn.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+                    if isinstance(event, (h2.events.RequestReceived, h2.events.DataReceived)) and event.stream_ended is not None:
+                        method, pieces = request_bodies.pop(event.stream_id)
+                        body = b"".join(pieces) if method in ("POST", "PUT") else self.body
+                        threading.Thread(target=respond, args=(event.stream_id, body), daemon=True).start()
+                try:
+                    sock.sendall(conn.data_to_send())
+                except OSError:
+                    return
+                condition.notify_all()
+
+
+class StubTcpBackend:
+    """
+    In-process TCP backend server used by tests and benchmarks of tcp proxy mode.
+
+    Echoes bytes back as they arrive, and once client finished sending (half-closed its side
+    of connection) sends farewell and closes connection. Counts connections.
+
+    :param farewell: bytes sent after client finished sending.
+    :param port: port to listen on, any free port is used when 0.
+    """
+
+    def __init__(self, farewell: bytes = b"bye", port: int = 0):
+        self.farewell = farewell
+        self.server_sock = socket.create_server(("localhost", port))
+        self.port = self.server_sock.getsockname()[1]
+        self.url = f"http://localhost:{self.port}"
+        self.connections = 0
+        self.lock = threading.Lock()
+
+    def start(self) -> "StubTcpBackend":
+        threading.Thread(target=self._accept, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        try:
+            self.server_sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.server_sock.close()
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                sock, _ = self.server_sock.accept()
+            except OSError:
+                return
+            with self.lock:
+                self.connections += 1
+            threading.Thread(target=self._echo, args=(sock,), daemon=True).start()
+
+    def _echo(self, sock: socket.socket) -> None:
+        with sock:
+            try:
+                while data := sock.recv(65536):
+                    sock.sendall(data)
+                sock.sendall(self.farewell)
+            except OSError:
+                pass
+
+
+def get_free_port() -> int:
+    """
+    Returns TCP port on localhost which is currently not in use.
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("localhost", 0))
+        return sock.getsockname()[1]
+
+
+
+def generate_self_signed_cert(directory: str, hostname: str = "localhost") -> Tuple[str, str]:
+    """
+    Generates self-signed certificate for hostname with openssl command line tool.
+
+    :return: paths of PEM certificate and key files written to directory.
+    """
+    cert_file, key_file = os.path.join(directory, f"{hostname}.crt"), os.path.join(directory, f"{hostname}.key")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "ec", "-pkeyopt", "ec_paramgen_curve:prime256v1", "-nodes", "-days", "1",
+                    "-subj", f"/CN={hostname}", "-addext", f"subjectAltName=DNS:{hostname}", "-keyout", key_file, "-out", cert_file],
+                   check=True, capture_output=True)
+    return cert_file, key_file
@@ -0,0 +1,78 @@
+import time
+import unittest
+from implementations.backend_server import BackendServer
+from implementations.circuit_breaker import CircuitBreaker
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker(window_size=10, min_requests=4, error_rate=0.5, slow_request_time=1.0, slow_request_rate=0.5, open_time=5, half_open_requests=2)
+
+    def test_errors_open_circuit(self):
+        for success in [True, False, True]:
+            self.assertIsNone(self.breaker.record(success, 0.1))
+        self.assertEqual(self.breaker.record(False), CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow_request())
+
+    def test_slow_requests_open_circuit(self):
+        for _ in range(3):
+            self.breaker.record(True, 0.1)
+        self.assertIsNone(self.breaker.record(True, 2.0))
+        self.assertIsNone(self.breaker.record(True, 2.0))
+        self.assertEqual(self.breaker.record(True, 2.0), CircuitBreaker.OPEN)
+
+    def test_half_open_lets_limited_trials_through(self):
+        self.open_circuit()
+        self.assertIsNone(self.breaker.update(self.breaker.state_since + 1))
+        self.assertEqual(self.breaker.update(self.breaker.state_since + 5), CircuitBreaker.HALF_OPEN)
+        self.assertEqual([self.breaker.allow_request() for _ in range(3)], [True, True, False])
+        self.assertIsNone(self.breaker.record(True, 0.1))
+        self.assertEqual(self.breaker.record(True, 0.1), CircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_failed_trial_opens_circuit_again(self):
+        self.open_circuit()
+        self.breaker.update(self.breaker.state_since + 5)
+        self.assertTrue(self.breaker.allow_request())
+        self.assertEqual(self.breaker.record(False), CircuitBreaker.OPEN)
+        self.assertEqual(self.breaker.get_stats()['transitions'], {CircuitBreaker.OPEN: 2, CircuitBreaker.HALF_OPEN: 1, CircuitBreaker.CLOSED: 0})
+
+    def test_unfinished_trials_are_renewed(self):
+        self.open_circuit()
+        self.breaker.update(self.breaker.state_since + 5)
+        self.assertTrue(self.breaker.allow_request())
+        self.assertTrue(self.breaker.allow_request())
+        self.assertFalse(self.breaker.allow_request())
+        self.breaker.update(self.breaker.state_since + 5)
+        self.assertTrue(self.breaker.allow_request())
+
+    def open_circuit(self):
+        for _ in range(4):
+            self.breaker.record(False)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+
+class TestBackendServerCircuitBreaker(unittest.TestCase):
+    def test_open_circuit_makes_server_unavailable(self):
+        breaker = CircuitBreaker(min_requests=2, open_time=0.05, half_open_requests=1)
+        server = BackendServer("http://localhost:8000", health_check_url=None, circuit_breaker=breaker)
+        changes = []
+        server.add_state_listener(lambda server: changes.append(breaker.state))
+        server.record_outcome(False)
+        server.record_outcome(False)
+        self.assertFalse(server.is_available())
+
+        time.sleep(0.06)
+        server.update_circuit_breaker()
+        self.assertTrue(server.is_available())
+        self.assertTrue(server.start_request())
+        # only one trial request is let through
+        self.assertFalse(server.start_request())
+        server.record_outcome(True, 0.01)
+        server.finish_request()
+        self.assertEqual(changes, [CircuitBreaker.OPEN, CircuitBreaker.HALF_OPEN, CircuitBreaker.CLOSED])
+        self.assertLess(server.get_slow_start_factor(), 1.0)
+        self.assertEqual(server.get_stats()['circuit_breaker']['state'], CircuitBreaker.CLOSED)
+
+
+if __name__ == '__main__':
+    unittest.main()
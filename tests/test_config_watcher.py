@@ -0,0 +1,56 @@
+import os
+import json
+import tempfile
+import unittest
+from implementations.config_watcher import ConfigWatcher, load_backend_servers_config
+
+
+class TestLoadBackendServersConfig(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.dir.name, name)
+        with open(path, "w") as file:
+            file.write(content)
+        return path
+
+    def test_json_list_and_toml_tables_are_loaded(self):
+        servers = [{"url": "http://a", "health_check_url": "http://a/health", "weight": 2}]
+        self.assertEqual(load_backend_servers_config(self.write("servers.json", json.dumps(servers))), servers)
+        toml = '[[backend_servers]]\nurl = "http://a"\nhealth_check_url = "http://a/health"\nweight = 2\n'
+        self.assertEqual(load_backend_servers_config(self.write("servers.toml", toml)), servers)
+
+    def test_invalid_config_is_rejected(self):
+        for content in ['{"backend_servers": {}}', '[{"weight": 1}]', '[{"url": "http://a"}, {"url": "http://a"}]', '[{"url": "http://a", "weight": -1}]',
+                        '[{"url": "http://a", "http2": "yes"}]', '[']:
+            with self.assertRaises(ValueError):
+                load_backend_servers_config(self.write("servers.json", content))
+
+
+class TestConfigWatcher(unittest.TestCase):
+    def test_changed_file_is_reloaded_and_invalid_one_ignored(self):
+        with tempfile.TemporaryDirectory() as dir:
+            path = os.path.join(dir, "servers.json")
+            with open(path, "w") as file:
+                json.dump([{"url": "http://a"}], file)
+            loaded = []
+            watcher = ConfigWatcher(path, loaded.append)
+            self.assertFalse(watcher.check())
+
+            with open(path, "w") as file:
+                json.dump([{"url": "http://a"}, {"url": "http://b"}], file)
+            self.assertTrue(watcher.check())
+            self.assertEqual(loaded, [[{"url": "http://a"}, {"url": "http://b"}]])
+
+            with open(path, "w") as file:
+                file.write("[{")
+            self.assertFalse(watcher.check())
+            self.assertEqual(len(loaded), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+import time
+import socket
+import asyncio
+import unittest
+from implementations.backend_server import BackendServer
+from implementations.connection_pool import BackendConnectionPool
+from implementations.async_connection_pool import AsyncBackendConnectionPool
+from implementations.backend_communicator import BackendServerCommunicator
+from implementations.async_backend_communicator import AsyncBackendServerCommunicator
+from tests.stub_backend import StubBackend
+
+GET_REQUEST = {'method': 'GET', 'path': '/', 'headers': {'Host': 'localhost', 'Connection': 'close'}, 'request_data': None}
+
+class TestBackendConnectionPool(unittest.TestCase):
+    def setUp(self):
+        self.backend = StubBackend(body=b"pooled").start()
+        self.communicator = BackendServerCommunicator()
+
+    def tearDown(self):
+        self.backend.stop()
+
+    def request(self, server):
+        # Connection goes back to pool once response body is read and response closed
+        response = self.communicator.make_request(server, GET_REQUEST)
+        response.content
+        response.close()
+
+    def test_unread_response_discards_connection(self):
+        server = BackendServer(self.backend.url, health_check_url=None)
+        self.communicator.make_request(server, GET_REQUEST).close()
+        self.assertEqual(server.connection_pool.get_stats(), {"hits": 0, "misses": 1, "open": 0, "idle": 0})
+
+    def test_connection_is_reused(self):
+        server = BackendServer(self.backend.url, health_check_url=None)
+        for _ in range(3):
+            response = self.communicator.make_request(server, GET_REQUEST)
+            self.assertEqual(response.content, b"pooled")
+            response.close()
+
+        # Client's Connection: close is hop-by-hop, so it must not stop backend connection being reused
+        self.assertEqual(server.get_stats()["connection_pool"], {"hits": 2, "misses": 1, "open": 1, "idle": 1})
+
+    def test_idle_timeout_evicts_connection(self):
+        server = BackendServer(self.backend.url, health_check_url=None)
+        server.connection_pool = BackendConnectionPool(self.backend.url, idle_timeout=0.01)
+        self.request(server)
+        time.sleep(0.05)
+        self.request(server)
+        self.assertEqual(server.connection_pool.get_stats(), {"hits": 0, "misses": 2, "open": 1, "idle": 1})
+
+    def test_max_lifetime_closes_connection_on_release(self):
+        server = BackendServer(self.backend.url, health_check_url=None)
+        server.connection_pool = BackendConnectionPool(self.backend.url, max_lifetime=0)
+        self.request(server)
+        self.assertEqual(server.connection_pool.get_stats(), {"hits": 0, "misses": 1, "open": 0, "idle": 0})
+
+    def test_pool_size_bounds_idle_connections(self):
+        pool = BackendConnectionPool(self.backend.url, max_size=1)
+        connections = [pool.acquire() for _ in range(3)]
+        for pooled_conn in connections:
+            pool.release(pooled_conn)
+        self.assertEqual(pool.get_stats(), {"hits": 0, "misses": 3, "open": 1, "idle": 1})
+
+    def test_broken_connection_is_evicted(self):
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as listener:
+            listener.bind(("localhost", 0))
+            listener.listen()
+            pool = BackendConnectionPool(f"http://localhost:{listener.getsockname()[1]}")
+
+            pooled_conn = pool.acquire()
+            pooled_conn.connection.connect()
+            pool.release(pooled_conn)
+
+            # Peer closing idle connection must be noticed before connection is handed out again
+            accepted_sock, _ = listener.accept()
+            accepted_sock.close()
+            time.sleep(0.05)
+            self.assertIsNot(pool.acquire(), pooled_conn)
+            self.assertEqual(pool.get_stats(), {"hits": 0, "misses": 2, "open": 1, "idle": 0})
+
+    def test_closed_pool_does_not_keep_connections(self):
+        pool = BackendConnectionPool(self.backend.url)
+        pooled_conn = pool.acquire()
+        pool.close()
+        pool.release(pooled_conn)
+        self.assertEqual(pool.get_stats()["open"], 0)
+
+
+class TestAsyncBackendConnectionPool(unittest.TestCase):
+    def setUp(self):
+        self.backend = StubBackend(body=b"pooled").start()
+        self.communicator = AsyncBackendServerCommunicator()
+
+    def tearDown(self):
+        self.backend.stop()
+
+    async def request(self, server, read_body=True):
+        # Connection goes back to pool once response body is read and response closed
+        response = await self.communicator.make_request(server, dict(GET_REQUEST, protocol="HTTP/1.1", chunked=False))
+        body = b"".join([data async for data in response.raw]) if read_body else None
+        response.close()
+        return body
+
+    def test_connection_is_reused(self):
+        server = BackendServer(self.backend.url, health_check_url=None)
+
+        async def run():
+            return [await self.request(server) for _ in range(3)]
+
+        self.assertEqual(asyncio.run(run()), [b"pooled"] * 3)
+        self.assertEqual(server.get_stats()["async_connection_pool"], {"hits": 2, "misses": 1, "open": 1, "idle": 1})
+
+    def test_unread_response_discards_connection(self):
+        server = BackendServer(self.backend.url, health_check_url=None)
+        asyncio.run(self.request(server, read_body=False))
+        self.assertEqual(server.async_connection_pool.get_stats(), {"hits": 0, "misses": 1, "open": 0, "idle": 0})
+
+    def test_idle_timeout_evicts_connection(self):
+        server = BackendServer(self.backend.url, health_check_url=None)
+        server.async_connection_pool = AsyncBackendConnectionPool(self.backend.url, idle_timeout=0.01)
+
+        async def run():
+            await self.request(server)
+            await asyncio.sleep(0.05)
+            await self.request(server)
+
+        asyncio.run(run())
+        self.assertEqual(server.async_connection_pool.get_stats(), {"hits": 0, "misses": 2, "open": 1, "idle": 1})
+
+    def test_max_lifetime_closes_connection_on_release(self):
+        server = BackendServer(self.backend.url, health_check_url=None)
+        server.async_connection_pool = AsyncBackendConnectionPool(self.backend.url, max_lifetime=0)
+        asyncio.run(self.request(server))
+        self.assertEqual(server.async_connection_pool.get_stats(), {"hits": 0, "misses": 1, "open": 0, "idle": 0})
+
+    def test_pool_size_bounds_idle_connections(self):
+        pool = AsyncBackendConnectionPool(self.backend.url, max_size=1)
+
+        async def run():
+            connections = [await pool.acquire() for _ in range(3)]
+            for pooled_conn in connections:
+                pool.release(pooled_conn)
+            stats = pool.get_stats()
+            pool.close()
+            return stats
+
+        self.assertEqual(asyncio.run(run()), {"hits": 0, "misses": 3, "open": 1, "idle": 1})
+
+    def test_broken_connection_is_evicted(self):
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as listener:
+            listener.bind(("localhost", 0))
+            listener.listen()
+            pool = AsyncBackendConnectionPool(f"http://localhost:{listener.getsockname()[1]}")
+
+            async def run():
+                pooled_conn = await pool.acquire()
+                pool.release(pooled_conn)
+                # Peer closing idle connection must be noticed before connection is handed out again
+                accepted_sock, _ = listener.accept()
+                accepted_sock.close()
+                await asyncio.sleep(0.05)
+                self.assertIsNot(await pool.acquire(), pooled_conn)
+
+            asyncio.run(run())
+            self.assertEqual(pool.get_stats(), {"hits": 0, "misses": 2, "open": 1, "idle": 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+from requests.structures import CaseInsensitiveDict
+from implementations.backend_server import BackendServer
+from implementations.lb_algorithms.consistent_hash_algorithm import ConsistentHashAlgorithm
+
+def request_context(path="/", client_ip="10.0.0.1", headers=None):
+    return {"path": path, "client_ip": client_ip, "headers": CaseInsensitiveDict(headers or {})}
+
+class TestConsistentHashAlgorithm(unittest.TestCase):
+    def setUp(self):
+        self.servers = [BackendServer(f"http://localhost:800{i}", health_check_url=None) for i in range(5)]
+        self.algorithm = ConsistentHashAlgorithm("path")
+        self.paths = [f"/items/{i}" for i in range(2000)]
+
+    def assignments(self, servers):
+        return {path: self.algorithm.get_next_server(servers, request_context(path=path)) for path in self.paths}
+
+    def test_empty_server_list(self):
+        self.assertIsNone(self.algorithm.get_next_server([], request_context()))
+
+    def test_same_key_goes_to_same_server(self):
+        first = self.algorithm.get_next_server(self.servers, request_context(path="/a"))
+        for _ in range(10):
+            self.assertIs(self.algorithm.get_next_server(self.servers, request_context(path="/a")), first)
+
+    def test_keys_are_spread_across_servers(self):
+        counts = [list(self.assignments(self.servers).values()).count(server) for server in self.servers]
+        for count in counts:
+            self.assertGreater(count, 2000 / 5 * 0.6)
+
+    def test_removing_server_only_moves_its_keys(self):
+        before = self.assignments(self.servers)
+        after = self.assignments(self.servers[:2] + self.servers[3:])
+        moved = [path for path in self.paths if before[path] is not after[path]]
+        self.assertTrue(moved)
+        self.assertTrue(all(before[path] is self.servers[2] for path in moved))
+        # keys return to server once it is healthy again
+        self.assertEqual(self.assignments(self.servers), before)
+
+    def test_weight_increases_share(self):
+        self.servers[0].set_weight(3)
+        self.algorithm.on_servers_changed(self.servers)
+        counts = [list(self.assignments(self.servers).values()).count(server) for server in self.servers]
+        self.assertEqual(max(counts), counts[0])
+
+    def test_header_key_falls_back_to_client_ip(self):
+        algorithm = ConsistentHashAlgorithm("header:X-User-Id")
+        by_user = {algorithm.get_next_server(self.servers, request_context(client_ip=f"10.0.0.{i}", headers={"x-user-id": "42"})) for i in range(20)}
+        self.assertEqual(len(by_user), 1)
+        by_ip = {algorithm.get_next_server(self.servers, request_context(client_ip=f"10.0.0.{i}")) for i in range(20)}
+        self.assertGreater(len(by_ip), 1)
+
+    def test_unknown_hash_key(self):
+        with self.assertRaises(ValueError):
+            ConsistentHashAlgorithm("cookie")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+import time
+import socket
+import unittest
+import threading
+from implementations.backend_server import BackendServer
+from implementations.health_check_scheduler import HealthCheckScheduler
+from tests.stub_backend import StubBackend, get_free_port
+
+class FakeServer:
+    def __init__(self, period=0.05, check_time=0.0):
+        self.url = "http://fake"
+        self.health_check_period = period
+        self.check_time = check_time
+        self.checks = 0
+
+    def check_health(self):
+        time.sleep(self.check_time)
+        self.checks += 1
+
+    def get_health_check_interval(self):
+        return self.health_check_period
+
+class TestHealthCheckScheduler(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = HealthCheckScheduler(max_concurrency=4)
+
+    def tearDown(self):
+        self.scheduler.stop()
+
+    def wait_until(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    def test_servers_are_checked_periodically(self):
+        servers = [FakeServer() for _ in range(3)]
+        for server in servers:
+            self.scheduler.schedule(server)
+        self.wait_until(lambda: all(server.checks >= 3 for server in servers))
+
+    def test_cancel_stops_checks(self):
+        server = FakeServer()
+        self.scheduler.schedule(server)
+        self.wait_until(lambda: server.checks >= 1)
+        self.scheduler.cancel(server)
+        time.sleep(0.1)
+        checks = server.checks
+        time.sleep(0.2)
+        self.assertEqual(server.checks, checks)
+
+    def test_threads_are_bounded(self):
+        threads_before = threading.active_count()
+        servers = [FakeServer(period=0.01, check_time=0.02) for _ in range(100)]
+        for server in servers:
+            self.scheduler.schedule(server, delay=0)
+        self.wait_until(lambda: all(server.checks >= 1 for server in servers))
+        # scheduler thread plus at most max_concurrency probe threads
+        self.assertLessEqual(threading.active_count() - threads_before, 5)
+
+    def test_stop_ends_scheduler_thread(self):
+        self.scheduler.schedule(FakeServer())
+        thread = self.scheduler.thread
+        self.scheduler.stop()
+        self.assertFalse(thread.is_alive())
+
+
+class TestBackendServerHealthCheck(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = HealthCheckScheduler()
+
+    def tearDown(self):
+        self.scheduler.stop()
+
+    def wait_until(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    def test_unreachable_server_becomes_unhealthy(self):
+        port = get_free_port()
+        server = BackendServer(f"http://localhost:{port}", health_check_url=f"http://localhost:{port}/health",
+                               health_check_period=0.05, health_check_scheduler=self.scheduler)
+        self.wait_until(lambda: not server.is_healthy)
+
+    def test_hung_health_endpoint_times_out(self):
+        # listening socket which accepts connections but never answers
+        with socket.socket() as listener:
+            listener.bind(("localhost", 0))
+            listener.listen()
+            port = listener.getsockname()[1]
+            server = BackendServer(f"http://localhost:{port}", health_check_url=f"http://localhost:{port}/health",
+                                   health_check_period=0.05, health_check_scheduler=self.scheduler, health_check_timeout=0.2)
+            self.wait_until(lambda: not server.is_healthy, timeout=2)
+            server.stop_health_check()
+
+    def test_health_check_reuses_connection(self):
+        backend = StubBackend().start()
+        try:
+            server = BackendServer(backend.url, health_check_url=backend.health_check_url,
+                                   health_check_period=0.02, health_check_scheduler=self.scheduler)
+            server.is_healthy = False
+            self.wait_until(lambda: server.is_healthy)
+            connection = server.health_check_connection
+            self.wait_until(lambda: self.scheduler.get_stats()['checks_run'] >= 3)
+            self.assertIs(server.health_check_connection, connection)
+            server.stop_health_check()
+        finally:
+            backend.stop()
+
+    def test_unhealthy_server_is_rechecked_at_recheck_interval(self):
+        backend = StubBackend().start()
+        try:
+            server = BackendServer(backend.url, health_check_url=backend.health_check_url, health_check_period=0.02,
+                                   health_check_scheduler=self.scheduler, unhealthy_recheck_interval=0.3)
+            # checks are run by hand, so scheduled ones do not race with test
+            server.stop_health_check()
+            self.assertEqual(server.get_health_check_interval(), 0.02)
+            server.is_healthy = False
+            self.assertEqual(server.get_health_check_interval(), 0.3)
+            # recheck of unhealthy server actually probes it and brings it back
+            server._check_server_health()
+            self.assertTrue(server.is_healthy)
+        finally:
+            backend.stop()
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import time
+import unittest
+import threading
+import importlib.util
+from implementations.backend_server import BackendServer
+from implementations.http2_connection_pool import Http2ConnectionPool, Http2NotSupportedError
+from implementations.backend_communicator import BackendServerCommunicator
+from tests.stub_backend import StubBackend, StubHttp2Backend
+
+GET_REQUEST = {'method': 'GET', 'path': '/', 'headers': {'Host': 'localhost', 'Connection': 'close'}, 'request_data': None}
+
+@unittest.skipUnless(importlib.util.find_spec("h2"), "h2 is not installed")
+class TestHttp2ConnectionPool(unittest.TestCase):
+    def setUp(self):
+        self.communicator = BackendServerCommunicator()
+        self.backends = []
+
+    def tearDown(self):
+        for backend in self.backends:
+            backend.stop()
+
+    def start_backend(self, backend):
+        self.backends.append(backend.start())
+        return backend
+
+    def request_concurrently(self, server, count):
+        bodies = []
+        def request():
+            response = self.communicator.make_request(server, GET_REQUEST)
+            bodies.append(response.content)
+            response.close()
+        threads = [threading.Thread(target=request) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return bodies
+
+    def test_concurrent_requests_are_multiplexed_over_single_connection(self):
+        backend = self.start_backend(StubHttp2Backend(body=b"multiplexed", latency=0.3))
+        server = BackendServer(backend.url, health_check_url=None, http2=True)
+        start_time = time.monotonic()
+        self.assertEqual(self.request_concurrently(server, 10), [b"multiplexed"] * 10)
+
+        # requests waited for backend at same time, not one after another
+        self.assertLess(time.monotonic() - start_time, 1.5)
+        self.assertEqual(backend.connections, 1)
+        self.assertEqual(backend.max_active_streams, 10)
+        self.assertEqual(server.get_stats()["http2_pool"]["streams"], 10)
+        self.assertEqual(server.connection_pool.get_stats()["misses"], 0)
+
+    def test_concurrency_limit_of_backend_is_honoured(self):
+        backend = self.start_backend(StubHttp2Backend(latency=0.1, max_concurrent_streams=2))
+        server = BackendServer(backend.url, health_check_url=None)
+        server.http2_pool = Http2ConnectionPool(backend.url, max_connections=1)
+        self.assertEqual(len(self.request_concurrently(server, 6)), 6)
+        self.assertEqual(backend.max_active_streams, 2)
+        self.assertGreater(server.http2_pool.get_stats()["waits"], 0)
+
+    def test_body_larger_than_flow_control_window(self):
+        body = bytes(range(256)) * 8192 # 2 MB, several times window of single stream
+        backend = self.start_backend(StubHttp2Backend(body=body))
+        server = BackendServer(backend.url, health_check_url=None, http2=True)
+        response = self.communicator.make_request(server, GET_REQUEST)
+        self.assertEqual(response.raw.length, len(body))
+        self.assertEqual(response.content, body)
+        response.close()
+
+    def test_request_body_is_sent(self):
+        backend = self.start_backend(StubHttp2Backend())
+        server = BackendServer(backend.url, health_check_url=None, http2=True)
+        request = {'method': 'POST', 'path': '/echo', 'headers': {'Host': 'localhost', 'Content-Length': '10'}, 'request_data': iter([b"hello", b"world"])}
+        response = self.communicator.make_request(server, request)
+        self.assertEqual(response.content, b"helloworld")
+        response.close()
+
+    def test_falls_back_to_http1_for_backend_without_http2(self):
+        backend = self.start_backend(StubBackend(body=b"http/1.1"))
+        server = BackendServer(backend.url, health_check_url=None, http2=True)
+        for _ in range(2):
+            response = self.communicator.make_request(server, GET_REQUEST)
+            self.assertEqual(response.content, b"http/1.1")
+            response.close()
+        self.assertFalse(server.http2_pool.is_supported())
+        with self.assertRaises(Http2NotSupportedError):
+            server.http2_pool.request("GET", "/", {}, None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+from utils.http_parser import HttpRequestParser, HttpParseError, NEED_DATA, END_OF_MESSAGE
+
+GET_REQUEST = b"GET /items?id=1 HTTP/1.1\r\nHost: localhost\r\nAccept: */*\r\n\r\n"
+POST_REQUEST = b"POST /items HTTP/1.1\r\nHost: localhost\r\nContent-Length: 11\r\n\r\nhello world"
+CHUNKED_REQUEST = b"PUT /items HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n5\r\nhello\r\n6;ext=1\r\n world\r\n0\r\nX-Trailer: 1\r\n\r\n"
+
+class TestHttpRequestParser(unittest.TestCase):
+    def setUp(self):
+        self.parser = HttpRequestParser()
+
+    def parse_all(self):
+        # Collecting events until parser needs more data
+        events = []
+        while True:
+            event = self.parser.next_event()
+            if event is NEED_DATA:
+                return events
+            events.append(event)
+
+    def test_empty_parser_needs_data(self):
+        self.assertIs(self.parser.next_event(), NEED_DATA)
+        self.assertTrue(self.parser.is_idle())
+
+    def test_simple_get(self):
+        self.parser.feed(GET_REQUEST)
+        head = self.parser.next_event()
+        self.assertTrue(self.parser.is_idle())
+        end = self.parser.next_event()
+        self.assertEqual((head['method'], head['path'], head['protocol']), ("GET", "/items?id=1", "HTTP/1.1"))
+        self.assertEqual(head['headers']['host'], "localhost")
+        self.assertEqual(head['raw_request_data'], GET_REQUEST)
+        self.assertTrue(head['keep_alive'])
+        self.assertEqual(head['content_length'], 0)
+        self.assertIs(end, END_OF_MESSAGE)
+        self.assertTrue(self.parser.is_idle())
+
+    def test_byte_by_byte_feed(self):
+        # Parsing must resume across arbitrarily small reads
+        events = []
+        for i in range(len(POST_REQUEST)):
+            self.parser.feed(POST_REQUEST[i:i + 1])
+            events.extend(self.parse_all())
+        self.assertEqual(events[0]['method'], "POST")
+        self.assertEqual(b"".join(events[1:-1]), b"hello world")
+        self.assertIs(events[-1], END_OF_MESSAGE)
+
+    def test_pipelined_requests(self):
+        self.parser.feed(GET_REQUEST + POST_REQUEST + CHUNKED_REQUEST)
+        events = self.parse_all()
+        heads = [event for event in events if isinstance(event, dict)]
+        self.assertEqual([head['method'] for head in heads], ["GET", "POST", "PUT"])
+        self.assertEqual(events.count(END_OF_MESSAGE), 3)
+        self.assertEqual(b"".join(event for event in events if isinstance(event, bytes)), b"hello world" * 2)
+
+    def test_chunked_body_with_trailers(self):
+        self.parser.feed(CHUNKED_REQUEST)
+        events = self.parse_all()
+        self.assertTrue(events[0]['chunked'])
+        self.assertIsNone(events[0]['content_length'])
+        self.assertEqual(events[1:], [b"hello", b" world", END_OF_MESSAGE])
+
+    def test_body_pieces_are_bounded(self):
+        parser = HttpRequestParser(max_body_piece=4)
+        parser.feed(POST_REQUEST)
+        parser.next_event()
+        self.assertEqual([parser.next_event() for _ in range(3)], [b"hell", b"o wo", b"rld"])
+
+    def test_keep_alive_defaults(self):
+        self.parser.feed(b"GET / HTTP/1.0\r\n\r\nGET / HTTP/1.0\r\nConnection: keep-alive\r\n\r\nGET / HTTP/1.1\r\nConnection: close\r\n\r\n")
+        heads = [event for event in self.parse_all() if isinstance(event, dict)]
+        self.assertEqual([head['keep_alive'] for head in heads], [False, True, False])
+
+    def test_head_too_large(self):
+        parser = HttpRequestParser(max_head_size=64)
+        parser.feed(b"GET / HTTP/1.1\r\nX-Padding: " + b"a" * 100)
+        with self.assertRaises(HttpParseError):
+            parser.next_event()
+
+    def test_malformed_requests(self):
+        for data in [b"GET /\r\n\r\n",
+                     b"GET / HTTP/2.0\r\n\r\n",
+                     b"GET / HTTP/1.1\r\nNo colon\r\n\r\n",
+                     b"GET / HTTP/1.1\r\nHost : localhost\r\n\r\n",
+                     b"POST / HTTP/1.1\r\nContent-Length: -1\r\n\r\n",
+                     b"POST / HTTP/1.1\r\nContent-Length: 1\r\nTransfer-Encoding: chunked\r\n\r\n",
+                     b"POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\nzz\r\n",
+                     b"POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n-5\r\n"]:
+            parser = HttpRequestParser()
+            parser.feed(data)
+            with self.assertRaises(HttpParseError, msg=data):
+                while parser.next_event() is not NEED_DATA:
+                    pass
+
+
+if __name__ == '__main__':
+    unittest.main()
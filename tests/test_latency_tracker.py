@@ -0,0 +1,53 @@
+import unittest
+from implementations.backend_server import BackendServer
+from implementations.latency_tracker import LatencyTracker
+
+class TestLatencyTracker(unittest.TestCase):
+    def test_empty_tracker(self):
+        tracker = LatencyTracker()
+        self.assertEqual(tracker.get_ewma(), 0.0)
+        self.assertEqual(tracker.get_percentile(99), 0.0)
+        self.assertEqual(tracker.get_stats(), {"ewma": 0.0, "samples": 0, "p50": 0.0, "p95": 0.0, "p99": 0.0})
+
+    def test_ewma_follows_recent_latency(self):
+        tracker = LatencyTracker(alpha=0.5)
+        tracker.add(1.0)
+        self.assertEqual(tracker.get_ewma(), 1.0)
+        tracker.add(0.0)
+        self.assertEqual(tracker.get_ewma(), 0.5)
+        for _ in range(20):
+            tracker.add(0.1)
+        self.assertAlmostEqual(tracker.get_ewma(), 0.1, places=5)
+
+    def test_percentiles(self):
+        tracker = LatencyTracker(window_size=100)
+        for i in range(1, 101):
+            tracker.add(i / 1000)
+        self.assertEqual(tracker.get_percentile(50), 0.05)
+        self.assertEqual(tracker.get_percentile(99), 0.099)
+        stats = tracker.get_stats()
+        self.assertEqual((stats["p50"], stats["p95"], stats["p99"], stats["samples"]), (0.05, 0.095, 0.099, 100))
+
+    def test_window_forgets_old_samples(self):
+        tracker = LatencyTracker(window_size=10)
+        for _ in range(10):
+            tracker.add(5.0)
+        self.assertEqual(tracker.get_percentile(50), 5.0)
+        for _ in range(10):
+            tracker.add(0.01)
+        self.assertEqual(tracker.get_percentile(99), 0.01)
+
+    def test_invalid_alpha(self):
+        with self.assertRaises(ValueError):
+            LatencyTracker(alpha=0)
+
+    def test_backend_server_latency(self):
+        server = BackendServer("http://localhost:8000", health_check_url=None)
+        server.add_latency(0.2)
+        self.assertEqual(server.get_latency(), 0.2)
+        self.assertEqual(server.get_latency_percentile(95), 0.2)
+        self.assertEqual(server.get_stats()["latency"]["p99"], 0.2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+from implementations.backend_server import BackendServer
+from implementations.lb_algorithms.least_connections_algorithm import LeastConnectionsAlgorithm
+
+class TestLeastConnectionsAlgorithm(unittest.TestCase):
+    def setUp(self):
+        self.algorithm = LeastConnectionsAlgorithm()
+        self.servers = [BackendServer(f"http://localhost:800{i}", health_check_url=None, capacity=2) for i in range(3)]
+
+    def test_empty_server_list(self):
+        self.assertIsNone(self.algorithm.get_next_server([]))
+
+    def test_selects_server_with_fewest_active_requests(self):
+        self.servers[0].start_request()
+        self.servers[0].start_request()
+        self.servers[2].start_request()
+        self.assertIs(self.algorithm.get_next_server(self.servers), self.servers[1])
+
+    def test_follows_finished_requests(self):
+        self.algorithm.get_next_server(self.servers)
+        for server in self.servers:
+            server.start_request()
+        self.servers[0].start_request()
+        self.servers[2].finish_request()
+        self.assertIs(self.algorithm.get_next_server(self.servers), self.servers[2])
+
+    def test_spreads_requests_evenly(self):
+        for _ in range(6):
+            server = self.algorithm.get_next_server(self.servers)
+            self.assertTrue(server.start_request(self.algorithm.enforces_capacity))
+        self.assertEqual([server.get_active_requests() for server in self.servers], [2, 2, 2])
+
+    def test_servers_at_capacity_are_skipped(self):
+        self.servers[0].set_capacity(10)
+        for server in self.servers:
+            server.start_request()
+            server.start_request()
+        # server 0 handles as many requests as others, but only it has capacity left
+        self.assertIs(self.algorithm.get_next_server(self.servers), self.servers[0])
+        self.servers[0].set_capacity(2)
+        self.assertIsNone(self.algorithm.get_next_server(self.servers))
+
+    def test_only_given_servers_are_selected(self):
+        self.algorithm.get_next_server(self.servers)
+        self.servers[1].start_request()
+        self.assertIs(self.algorithm.get_next_server(self.servers[1:2]), self.servers[1])
+
+    def test_start_request_enforces_capacity(self):
+        server = BackendServer("http://localhost:8000", health_check_url=None, capacity=1)
+        self.assertTrue(server.start_request(enforce_capacity=True))
+        self.assertFalse(server.start_request(enforce_capacity=True))
+        self.assertTrue(server.start_request())
+        self.assertEqual(server.get_stats()['active_requests'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
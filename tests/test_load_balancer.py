@@ -0,0 +1,773 @@
+import os
+import ssl
+import json
+import time
+import tempfile
+import socket
+import logging
+import http.client
+import unittest
+import threading
+import importlib.util
+import requests
+from constants.app_constants import SERVER_MODE_THREADED, SERVER_MODE_ASYNCIO, PROXY_MODE_TCP, OUTLIER_CONSECUTIVE_ERRORS, OUTLIER_MIN_REQUESTS, OUTLIER_MAX_EJECTION_PERCENT, HEDGE_MIN_SAMPLES
+from implementations.load_balancer import LoadBalancer
+from implementations.retry_budget import RetryBudget
+from implementations.circuit_breaker import CircuitBreaker
+from implementations.lb_algorithms.round_robin_algorithm import RoundRobinAlgorithm
+from implementations.lb_algorithms.consistent_hash_algorithm import ConsistentHashAlgorithm
+from tests.stub_backend import StubBackend, StubHttp2Backend, StubTcpBackend, get_free_port, generate_self_signed_cert
+
+logging.basicConfig(level=logging.INFO)
+
+class TestLoadBalancer(unittest.TestCase):
+    server_mode = SERVER_MODE_THREADED
+
+    def setUp(self):
+        # Starting two stub backends and load balancer in front of them on free port
+        self.backends = [StubBackend(body=f"backend {i}".encode()).start() for i in range(2)]
+        config = [{"url": backend.url, "health_check_url": None} for backend in self.backends]
+        self.port = get_free_port()
+        self.admin_port = get_free_port()
+        self.lb = LoadBalancer(config, RoundRobinAlgorithm(), server_mode=self.server_mode, address=("localhost", self.port),
+                               admin_address=("localhost", self.admin_port))
+        self.lb_thread = threading.Thread(target=self.lb.start, daemon=True)
+        self.lb_thread.start()
+        self.assertTrue(self.lb.ready.wait(5))
+
+    def tearDown(self):
+        self.lb.stop()
+        self.lb_thread.join(5)
+        for backend in self.backends:
+            backend.stop()
+
+    def test_get_is_proxied_round_robin(self):
+        bodies = [requests.get(f"http://localhost:{self.port}/", timeout=5).text for _ in range(4)]
+        self.assertEqual(bodies, ["backend 0", "backend 1", "backend 0", "backend 1"])
+
+    def test_active_requests_are_released(self):
+        for _ in range(4):
+            requests.get(f"http://localhost:{self.port}/", timeout=5)
+        # response may reach client just before handler counts request as finished
+        deadline = time.monotonic() + 1
+        while any(server.get_active_requests() for server in self.lb.backend_servers) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual([server.get_active_requests() for server in self.lb.backend_servers], [0, 0])
+
+    def test_request_phases_are_timed_and_trace_is_propagated(self):
+        client_traceparent = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-00"
+        self.assertEqual(requests.get(f"http://localhost:{self.port}/", headers={"traceparent": client_traceparent}, timeout=5).status_code, 200)
+        # backend server is sent same trace, with load balancer's span as parent
+        forwarded = self.backends[0].httpd.last_headers["traceparent"]
+        self.assertRegex(forwarded, r"^00-4bf92f3577b34da6a3ce929d0e0e4736-[0-9a-f]{16}-00$")
+        self.assertNotEqual(forwarded, client_traceparent)
+        # trace is finished just after response reached client
+        deadline = time.monotonic() + 1
+        while self.lb.request_tracer.get_stats()["total"]["count"] < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        stats = self.lb.request_tracer.get_stats()
+        self.assertEqual([stats[phase]["count"] for phase in ("read", "select", "backend", "respond", "total")], [1, 1, 1, 1, 1])
+
+    def test_latency_is_recorded_only_for_successful_responses(self):
+        self.assertEqual(requests.get(f"http://localhost:{self.port}/error", timeout=5).status_code, 400)
+        self.assertEqual(requests.get(f"http://localhost:{self.port}/", timeout=5).status_code, 200)
+        samples = [server.get_stats()['latency']['samples'] for server in self.lb.backend_servers]
+        self.assertEqual(samples, [0, 1])
+
+    def test_algorithm_receives_request_context(self):
+        self.lb.algorithm = ConsistentHashAlgorithm("path")
+        for path in ["/a", "/b", "/c"]:
+            bodies = {requests.get(f"http://localhost:{self.port}{path}", timeout=5).text for _ in range(3)}
+            self.assertEqual(len(bodies), 1)
+
+    def test_metrics_endpoint(self):
+        requests.get(f"http://localhost:{self.port}/", timeout=5)
+        requests.get(f"http://localhost:{self.port}/error", timeout=5)
+        response = requests.get(f"http://localhost:{self.admin_port}/metrics", timeout=5)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["Content-Type"].startswith("text/plain; version=0.0.4"))
+        first, second = [f'{{backend="{backend.url}"}}' for backend in self.backends]
+        self.assertIn(f"lb_backend_requests_total{first} 1", response.text)
+        self.assertIn(f"lb_backend_errors_total{second} 1", response.text)
+        self.assertIn(f'lb_backend_request_duration_seconds_count{first} 1', response.text)
+        self.assertIn(f'lb_backend_circuit_state{{backend="{self.backends[0].url}",state="closed"}} 1', response.text)
+        self.assertEqual(requests.get(f"http://localhost:{self.admin_port}/other", timeout=5).status_code, 404)
+        # without admin token backend servers cannot be changed through admin server
+        self.assertEqual(requests.post(f"http://localhost:{self.admin_port}/backends", json={"url": "http://localhost:1"}, timeout=5).status_code, 405)
+
+    def test_post_body_is_forwarded(self):
+        body = b'{"driver_name": "heavydriver"}'
+        with socket.create_connection(("localhost", self.port), timeout=5) as sock:
+            sock.sendall(b"POST / HTTP/1.1\r\nHost: localhost\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body))
+            response = http.client.HTTPResponse(sock)
+            response.begin()
+            self.assertEqual(response.status, 200)
+            self.assertEqual(response.read(), body)
+
+    def test_backend_connections_are_reused(self):
+        for _ in range(4):
+            requests.get(f"http://localhost:{self.port}/", timeout=5)
+        pool = "async_connection_pool" if self.server_mode == SERVER_MODE_ASYNCIO else "connection_pool"
+        stats = [server.get_stats()[pool] for server in self.lb.backend_servers]
+        self.assertEqual([(pool_stats["hits"], pool_stats["misses"]) for pool_stats in stats], [(1, 1), (1, 1)])
+
+    def test_repeated_response_headers_are_relayed(self):
+        for backend in self.backends:
+            backend.httpd.headers = [("Set-Cookie", "a=1"), ("Set-Cookie", "b=2")]
+        with socket.create_connection(("localhost", self.port), timeout=5) as sock:
+            sock.sendall(b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n")
+            response = http.client.HTTPResponse(sock)
+            response.begin()
+            self.assertEqual(response.status, 200)
+            self.assertEqual(response.msg.get_all("Set-Cookie"), ["a=1", "b=2"])
+
+    def test_large_binary_body_is_relayed(self):
+        body = os.urandom(1024 * 1024)
+        for backend in self.backends:
+            backend.httpd.body = body
+        for path in ["/", "/chunked"]:
+            response = requests.get(f"http://localhost:{self.port}{path}", timeout=5)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.content, body)
+
+    def test_large_chunked_upload_is_relayed(self):
+        body = os.urandom(256 * 1024)
+        chunks = (body[start:start + 10000] for start in range(0, len(body), 10000))
+        response = requests.post(f"http://localhost:{self.port}/", data=chunks, timeout=5)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, body)
+
+    def test_keep_alive_connection_carries_many_requests(self):
+        conn = http.client.HTTPConnection("localhost", self.port, timeout=5)
+        bodies = []
+        for path in ["/", "/chunked", "/"]:
+            conn.request("GET", path)
+            response = conn.getresponse()
+            self.assertFalse(response.will_close)
+            bodies.append(response.read())
+        conn.close()
+        self.assertEqual(bodies, [b"backend 0", b"backend 1", b"backend 0"])
+
+    def test_pipelined_requests(self):
+        with socket.create_connection(("localhost", self.port), timeout=5) as sock:
+            sock.sendall(b"POST / HTTP/1.1\r\nContent-Length: 5\r\n\r\nfirstGET / HTTP/1.1\r\n\r\nGET / HTTP/1.1\r\nConnection: close\r\n\r\n")
+            bodies = []
+            for _ in range(3):
+                response = http.client.HTTPResponse(sock)
+                response.begin()
+                bodies.append(response.read())
+        self.assertEqual(bodies, [b"first", b"backend 1", b"backend 0"])
+
+    def test_http_1_0_client_gets_close_delimited_body(self):
+        with socket.create_connection(("localhost", self.port), timeout=5) as sock:
+            sock.sendall(b"GET /chunked HTTP/1.0\r\n\r\n")
+            response = sock.makefile("rb").read()
+        head, body = response.split(b"\r\n\r\n", 1)
+        self.assertNotIn(b"chunked", head)
+        self.assertIn(b"Connection: close", head)
+        self.assertEqual(body, b"backend 0")
+
+    def test_malformed_request(self):
+        with socket.create_connection(("localhost", self.port), timeout=5) as sock:
+            sock.sendall(b"GARBAGE\r\n\r\n")
+            response = sock.makefile("rb").read()
+        self.assertTrue(response.startswith(b"HTTP/1.1 400 Bad Request\r\n"))
+
+    def test_no_healthy_servers(self):
+        for server in self.lb.backend_servers:
+            server.is_healthy = False
+        response = requests.get(f"http://localhost:{self.port}/", timeout=5)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.text, "No healthy backend servers available")
+
+    def test_healthy_servers_snapshot_changes_only_on_transitions(self):
+        snapshot = self.lb.healthy_servers
+        self.lb.backend_servers[0].is_healthy = True
+        self.assertIs(self.lb.healthy_servers, snapshot)
+        self.lb.backend_servers[0].is_healthy = False
+        self.assertEqual(self.lb.healthy_servers.version, snapshot.version + 1)
+        self.assertEqual(self.lb.healthy_servers.servers, (self.lb.backend_servers[1],))
+        bodies = {requests.get(f"http://localhost:{self.port}/", timeout=5).text for _ in range(3)}
+        self.assertEqual(bodies, {"backend 1"})
+
+    def test_failing_server_is_ejected_from_live_traffic(self):
+        self.backends[1].stop()
+        for _ in range(2 * OUTLIER_CONSECUTIVE_ERRORS):
+            requests.get(f"http://localhost:{self.port}/", timeout=5)
+        self.assertTrue(self.lb.backend_servers[1].is_ejected())
+        bodies = [requests.get(f"http://localhost:{self.port}/", timeout=5).text for _ in range(4)]
+        self.assertEqual(bodies, ["backend 0"] * 4)
+
+    def test_ejected_server_is_readmitted(self):
+        server = self.lb.backend_servers[1]
+        server.eject("test")
+        self.assertNotIn(server, self.lb.healthy_servers.servers)
+        server.outlier_detector.ejected_until = time.monotonic()
+        self.lb.next_outlier_sweep = 0
+        requests.get(f"http://localhost:{self.port}/", timeout=5)
+        self.assertFalse(server.is_ejected())
+        self.assertIn(server, self.lb.healthy_servers.servers)
+
+    def test_failed_get_is_retried_on_other_server(self):
+        self.backends[1].stop()
+        responses = [requests.get(f"http://localhost:{self.port}/", timeout=5) for _ in range(4)]
+        self.assertEqual([response.text for response in responses], ["backend 0"] * 4)
+        self.assertGreaterEqual(self.lb.retry_budget.get_stats()['retries'], 1)
+
+    def test_request_with_body_is_not_retried(self):
+        self.backends[1].stop()
+        status_codes = [requests.post(f"http://localhost:{self.port}/", data=b"body", timeout=5).status_code for _ in range(2)]
+        self.assertEqual(sorted(status_codes), [200, 400])
+
+    def test_retries_are_limited_by_budget(self):
+        self.lb.retry_budget = RetryBudget(percent=0, min_per_second=0, max_tokens=0)
+        self.backends[1].stop()
+        status_codes = [requests.get(f"http://localhost:{self.port}/", timeout=5).status_code for _ in range(2)]
+        self.assertEqual(sorted(status_codes), [200, 400])
+        self.assertEqual(self.lb.retry_budget.get_stats()['refused'], 1)
+
+    def test_stop_ends_start(self):
+        self.lb.stop()
+        self.lb_thread.join(5)
+        self.assertFalse(self.lb_thread.is_alive())
+
+
+class TestLoadBalancerOverload(unittest.TestCase):
+    def setUp(self):
+        # Single worker and single queue slot in front of slow backend, so few clients overload it
+        self.backend = StubBackend(body=b"slow", latency=0.5).start()
+        self.port = get_free_port()
+        config = [{"url": self.backend.url, "health_check_url": None}]
+        self.lb = LoadBalancer(config, RoundRobinAlgorithm(), server_mode=SERVER_MODE_THREADED, address=("localhost", self.port),
+                               worker_pool_size=1, accept_queue_size=1, max_queue_wait=5, admin_address=None)
+        self.lb_thread = threading.Thread(target=self.lb.start, daemon=True)
+        self.lb_thread.start()
+        self.assertTrue(self.lb.ready.wait(5))
+
+    def tearDown(self):
+        self.lb.stop()
+        self.lb_thread.join(5)
+        self.backend.stop()
+
+    def test_excess_connections_are_shed_with_503(self):
+        status_codes = []
+        def client():
+            status_codes.append(requests.get(f"http://localhost:{self.port}/", timeout=5).status_code)
+        clients = [threading.Thread(target=client) for _ in range(4)]
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        # how many connections fit depends on how soon worker picks first one up
+        self.assertEqual(len(status_codes), 4)
+        self.assertIn(200, status_codes)
+        self.assertIn(503, status_codes)
+        self.assertEqual(self.lb.worker_pool.get_stats()['rejected_queue_full'], status_codes.count(503))
+
+    def test_idle_keep_alive_connection_frees_worker_for_queued_one(self):
+        idle_conn = http.client.HTTPConnection("localhost", self.port, timeout=5)
+        idle_conn.request("GET", "/")
+        self.assertEqual(idle_conn.getresponse().read(), b"slow")
+        # only worker now waits on idle connection, queued request still has to be served
+        response = requests.get(f"http://localhost:{self.port}/", timeout=5)
+        self.assertEqual(response.status_code, 200)
+        idle_conn.close()
+
+
+class TestHedgedRequests(unittest.TestCase):
+    server_mode = SERVER_MODE_THREADED
+
+    def setUp(self):
+        # first backend turns slow after its latency was recorded as fast
+        self.backends = [StubBackend(body=b"slow", latency=0.5).start(), StubBackend(body=b"fast").start()]
+        config = [{"url": backend.url, "health_check_url": None} for backend in self.backends]
+        self.port = get_free_port()
+        self.lb = LoadBalancer(config, RoundRobinAlgorithm(), server_mode=self.server_mode, address=("localhost", self.port), hedge_requests=True,
+                               admin_address=None)
+        for server in self.lb.backend_servers:
+            for _ in range(HEDGE_MIN_SAMPLES):
+                server.add_latency(0.01)
+        self.lb_thread = threading.Thread(target=self.lb.start, daemon=True)
+        self.lb_thread.start()
+        self.assertTrue(self.lb.ready.wait(5))
+
+    def tearDown(self):
+        self.lb.stop()
+        self.lb_thread.join(5)
+        for backend in self.backends:
+            backend.stop()
+
+    def test_slow_request_is_hedged(self):
+        start = time.monotonic()
+        response = requests.get(f"http://localhost:{self.port}/", timeout=5)
+        self.assertEqual(response.text, "fast")
+        self.assertLess(time.monotonic() - start, 0.4)
+        self.assertEqual(self.lb.retry_budget.get_stats()['retries'], 1)
+        # losing attempt is released once it finishes or is cancelled, winning one just after its response reached client
+        deadline = time.monotonic() + 2
+        while any(server.get_active_requests() for server in self.lb.backend_servers) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual([server.get_active_requests() for server in self.lb.backend_servers], [0, 0])
+
+
+class TestAsyncioHedgedRequests(TestHedgedRequests):
+    server_mode = SERVER_MODE_ASYNCIO
+
+
+class TestOutlierDetection(unittest.TestCase):
+    def setUp(self):
+        config = [{"url": f"http://localhost:800{i}", "health_check_url": None} for i in range(4)]
+        self.lb = LoadBalancer(config, RoundRobinAlgorithm(), address=("localhost", get_free_port()))
+
+    def record_requests(self, server, latency, count=OUTLIER_MIN_REQUESTS):
+        for _ in range(count):
+            server.add_latency(latency)
+            server.record_outcome(True)
+
+    def test_latency_outlier_is_ejected(self):
+        for server in self.lb.backend_servers[:3]:
+            self.record_requests(server, 0.01)
+        self.record_requests(self.lb.backend_servers[3], 0.5)
+        self.lb.next_outlier_sweep = 0
+        self.lb._sweep_servers()
+        self.assertEqual([server.is_ejected() for server in self.lb.backend_servers], [False, False, False, True])
+
+    def test_servers_slow_together_are_not_ejected(self):
+        for server in self.lb.backend_servers:
+            self.record_requests(server, 0.5)
+        self.lb.next_outlier_sweep = 0
+        self.lb._sweep_servers()
+        self.assertFalse(any(server.is_ejected() for server in self.lb.backend_servers))
+
+    def test_ejections_are_capped(self):
+        for server in self.lb.backend_servers:
+            for _ in range(OUTLIER_CONSECUTIVE_ERRORS):
+                self.lb._record_outcome(server, False)
+        ejected = [server.is_ejected() for server in self.lb.backend_servers]
+        self.assertEqual(sum(ejected), len(ejected) * OUTLIER_MAX_EJECTION_PERCENT // 100)
+        self.assertEqual(len(self.lb.healthy_servers.servers), len(ejected) - sum(ejected))
+
+
+class TestServerSelection(unittest.TestCase):
+    def setUp(self):
+        # consistent hashing chooses same server for every attempt at same request
+        config = [{"url": f"http://localhost:800{i}", "health_check_url": None} for i in range(4)]
+        self.lb = LoadBalancer(config, ConsistentHashAlgorithm("path"), address=("localhost", get_free_port()), admin_address=None)
+        self.request = {"method": "GET", "path": "/key", "headers": {}, "client_ip": "10.0.0.1"}
+        self.servers = self.lb.healthy_servers.servers
+        self.target = self.lb.algorithm.get_next_server(self.servers, self.request)
+
+    def select(self):
+        backend_server = self.lb._start_request_on_next_server(self.servers, self.request)
+        if backend_server is not None:
+            backend_server.finish_request()
+        return backend_server
+
+    def test_half_open_target_falls_back_to_other_server(self):
+        breaker = self.target.circuit_breaker
+        breaker.state = CircuitBreaker.HALF_OPEN
+        breaker.trials_started = breaker.half_open_requests
+        selected = self.select()
+        self.assertIsNotNone(selected)
+        self.assertIsNot(selected, self.target)
+
+    def test_slow_start_moves_requests_to_other_servers(self):
+        self.target.slow_start_duration = 3600
+        self.target.start_slow_start()
+        selected = [self.select() for _ in range(400)]
+        self.assertNotIn(None, selected)
+        # target takes about its slow start factor of requests instead of all of them
+        self.assertLess(selected.count(self.target) / len(selected), self.target.get_slow_start_factor() + 0.1)
+
+
+class TestBackendReconfiguration(unittest.TestCase):
+    def setUp(self):
+        self.backends = [StubBackend(body=b"first", latency=0.3).start(), StubBackend(body=b"second").start()]
+        self.dir = tempfile.TemporaryDirectory()
+        self.config_file = os.path.join(self.dir.name, "servers.json")
+        self.write_config([{"url": self.backends[0].url}])
+        self.port = get_free_port()
+        admin_port = get_free_port()
+        self.admin_url = f"http://localhost:{admin_port}/backends"
+        self.lb = LoadBalancer([{"url": self.backends[0].url}], RoundRobinAlgorithm(), address=("localhost", self.port),
+                               admin_address=("localhost", admin_port), config_file=self.config_file, admin_token="secret")
+        self.admin_headers = {"Authorization": "Bearer secret"}
+        self.lb_thread = threading.Thread(target=self.lb.start, daemon=True)
+        self.lb_thread.start()
+        self.assertTrue(self.lb.ready.wait(5))
+
+    def tearDown(self):
+        self.lb.stop()
+        self.lb_thread.join(5)
+        for backend in self.backends:
+            backend.stop()
+        self.dir.cleanup()
+
+    def write_config(self, config):
+        with open(self.config_file, "w") as file:
+            json.dump(config, file)
+
+    def wait_until(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    def bodies(self, count):
+        return {requests.get(f"http://localhost:{self.port}/", timeout=5).text for _ in range(count)}
+
+    def test_changes_need_admin_token(self):
+        backend = self.backends[1]
+        for headers in [{}, {"Authorization": "Bearer wrong"}, {"Authorization": "secret"}]:
+            response = requests.post(self.admin_url, headers=headers, json={"url": backend.url}, timeout=5)
+            self.assertEqual(response.status_code, 401)
+            self.assertEqual(response.headers["WWW-Authenticate"], "Bearer")
+        self.assertEqual(requests.delete(self.admin_url, params={"url": self.backends[0].url}, timeout=5).status_code, 401)
+        self.assertEqual(len(self.lb.backend_servers), 1)
+        # reading stats needs no token
+        self.assertEqual(requests.get(self.admin_url, timeout=5).status_code, 200)
+
+    def test_added_server_gets_traffic_once_health_check_passes(self):
+        backend = self.backends[1]
+        response = requests.post(self.admin_url, headers=self.admin_headers, json={"url": backend.url, "health_check_url": backend.health_check_url}, timeout=5)
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(response.json()["is_healthy"])
+        self.wait_until(lambda: len(self.lb.healthy_servers.servers) == 2)
+        self.assertEqual(requests.post(self.admin_url, headers=self.admin_headers, json={"url": backend.url}, timeout=5).status_code, 400)
+
+    def test_removed_server_finishes_requests_in_flight(self):
+        self.lb.add_backend_server({"url": self.backends[1].url})
+        removed = self.lb.backend_servers[0]
+        in_flight = []
+        client = threading.Thread(target=lambda: in_flight.append(requests.get(f"http://localhost:{self.port}/", timeout=5).text))
+        client.start()
+        self.wait_until(lambda: removed.get_active_requests() == 1)
+
+        response = requests.delete(self.admin_url, headers=self.admin_headers, params={"url": removed.url}, timeout=5)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(self.bodies(4), {"second"})
+        client.join()
+        self.assertEqual(in_flight, ["first"])
+        self.wait_until(lambda: not self.lb.draining_servers)
+        self.assertEqual(requests.delete(self.admin_url, headers=self.admin_headers, params={"url": removed.url}, timeout=5).status_code, 404)
+
+    def test_server_is_drained_and_reweighted(self):
+        self.lb.add_backend_server({"url": self.backends[1].url})
+        url = self.backends[0].url
+        self.assertEqual(requests.patch(self.admin_url, headers=self.admin_headers, params={"url": url}, json={"draining": True}, timeout=5).status_code, 200)
+        self.assertEqual(self.bodies(3), {"second"})
+        self.assertEqual(requests.patch(self.admin_url, headers=self.admin_headers, params={"url": url}, json={"draining": False, "weight": 3}, timeout=5).json()["server_weight"], 3)
+        # added server is still in slow start, so undrained one takes most of requests
+        self.assertIn("first", self.bodies(2))
+        self.assertEqual(requests.patch(self.admin_url, headers=self.admin_headers, params={"url": url}, json={"weight": -1}, timeout=5).status_code, 400)
+
+    def test_config_file_changes_are_applied(self):
+        self.write_config([{"url": self.backends[1].url, "weight": 2}])
+        self.assertTrue(self.lb.config_watcher.check())
+        self.assertEqual([(server.url, server.get_weight()) for server in self.lb.backend_servers], [(self.backends[1].url, 2)])
+        self.assertEqual(self.bodies(2), {"second"})
+
+
+class TestResponseCaching(unittest.TestCase):
+    server_mode = SERVER_MODE_THREADED
+    caches_chunked_responses = True
+
+    def setUp(self):
+        self.backend = StubBackend(body=b"cached", latency=0.2, headers={"Cache-Control": "max-age=60"}).start()
+        self.port = get_free_port()
+        self.lb = LoadBalancer([{"url": self.backend.url, "health_check_url": None}], RoundRobinAlgorithm(), server_mode=self.server_mode,
+                               address=("localhost", self.port), admin_address=None, response_cache=True)
+        self.lb_thread = threading.Thread(target=self.lb.start, daemon=True)
+        self.lb_thread.start()
+        self.assertTrue(self.lb.ready.wait(5))
+
+    def tearDown(self):
+        self.lb.stop()
+        self.lb_thread.join(5)
+        self.backend.stop()
+
+    def test_concurrent_misses_are_collapsed_and_hits_served_from_cache(self):
+        responses = []
+        clients = [threading.Thread(target=lambda: responses.append(requests.get(f"http://localhost:{self.port}/", timeout=5))) for _ in range(4)]
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        self.assertEqual([response.text for response in responses], ["cached"] * 4)
+        self.assertEqual(self.backend.httpd.get_count, 1)
+
+        response = requests.get(f"http://localhost:{self.port}/", timeout=5)
+        self.assertEqual(response.text, "cached")
+        self.assertIn("Age", response.headers)
+        self.assertEqual(self.backend.httpd.get_count, 1)
+        self.assertEqual(self.lb.response_cache.get_stats()["collapsed"], 3)
+
+    def test_request_asking_for_fresh_response_bypasses_cache(self):
+        requests.get(f"http://localhost:{self.port}/", timeout=5)
+        requests.get(f"http://localhost:{self.port}/", headers={"Cache-Control": "no-cache"}, timeout=5)
+        self.assertEqual(self.backend.httpd.get_count, 2)
+
+    def test_chunked_response_caching(self):
+        for _ in range(2):
+            self.assertEqual(requests.get(f"http://localhost:{self.port}/chunked", timeout=5).text, "cached")
+        self.assertEqual(self.backend.httpd.get_count, 1 if self.caches_chunked_responses else 2)
+
+
+class TestAsyncioResponseCaching(TestResponseCaching):
+    server_mode = SERVER_MODE_ASYNCIO
+    # chunked responses keep their framing in asyncio server mode, so they are not cached
+    caches_chunked_responses = False
+
+
+class TestTlsTermination(unittest.TestCase):
+    server_mode = SERVER_MODE_THREADED
+    counts_failed_handshakes = True
+
+    def setUp(self):
+        self.cert_dir = tempfile.TemporaryDirectory()
+        self.cert_file, key_file = generate_self_signed_cert(self.cert_dir.name, "localhost")
+        self.sni_cert_file, sni_key_file = generate_self_signed_cert(self.cert_dir.name, "api.example")
+        self.backend = StubBackend(body=b"secure").start()
+        self.port = get_free_port()
+        self.lb = LoadBalancer([{"url": self.backend.url, "health_check_url": None}], RoundRobinAlgorithm(), server_mode=self.server_mode,
+                               address=("localhost", self.port), admin_address=None, tls_cert_file=self.cert_file, tls_key_file=key_file,
+                               tls_sni_certs={"api.example": (self.sni_cert_file, sni_key_file)})
+        self.lb_thread = threading.Thread(target=self.lb.start, daemon=True)
+        self.lb_thread.start()
+        self.assertTrue(self.lb.ready.wait(5))
+
+        self.client_context = ssl.create_default_context(cafile=self.cert_file)
+        self.client_context.load_verify_locations(self.sni_cert_file)
+
+    def tearDown(self):
+        self.lb.stop()
+        self.lb_thread.join(5)
+        self.backend.stop()
+        self.cert_dir.cleanup()
+
+    def _get(self, server_hostname="localhost", session=None):
+        """
+        Sends GET request over new TLS connection, returning response, TLS session and whether it was resumed.
+        """
+        with socket.create_connection(("localhost", self.port), timeout=5) as sock:
+            with self.client_context.wrap_socket(sock, server_hostname=server_hostname, session=session) as tls_sock:
+                tls_sock.sendall(f"GET / HTTP/1.1\r\nHost: {server_hostname}\r\nConnection: close\r\n\r\n".encode())
+                response = b""
+                while chunk := tls_sock.recv(65536):
+                    response += chunk
+                return response, tls_sock.session, tls_sock.session_reused
+
+    def test_request_is_proxied_over_tls(self):
+        response, _, _ = self._get()
+        self.assertTrue(response.startswith(b"HTTP/1.1 200"))
+        self.assertTrue(response.endswith(b"secure"))
+
+    def test_certificate_is_selected_by_sni(self):
+        # client verifies certificate against hostname it asked for, so handshake succeeds only with matching certificate
+        response, _, _ = self._get(server_hostname="api.example")
+        self.assertTrue(response.endswith(b"secure"))
+
+    def test_session_is_resumed(self):
+        _, session, reused = self._get()
+        self.assertFalse(reused)
+        _, _, reused = self._get(session=session)
+        self.assertTrue(reused)
+        stats = self.lb.tls_terminator.get_stats()
+        self.assertEqual((stats["full_handshakes"], stats["resumed_handshakes"]), (1, 1))
+        self.assertEqual(stats["resumption_ratio"], 0.5)
+
+    def test_plain_http_client_is_refused(self):
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            requests.get(f"http://localhost:{self.port}/", timeout=5)
+        # plain client must not stop load balancer from serving TLS ones
+        response, _, _ = self._get()
+        self.assertTrue(response.endswith(b"secure"))
+        if self.counts_failed_handshakes:
+            self.assertGreaterEqual(self.lb.tls_terminator.get_stats()["failed_handshakes"], 1)
+
+
+class TestAsyncioTlsTermination(TestTlsTermination):
+    server_mode = SERVER_MODE_ASYNCIO
+    # event loop drops failed handshakes before load balancer sees connection
+    counts_failed_handshakes = False
+
+
+@unittest.skipUnless(importlib.util.find_spec("h2"), "h2 is not installed")
+class TestHttp2Upstream(unittest.TestCase):
+    def setUp(self):
+        self.http2_backend = StubHttp2Backend(body=b"over http/2").start()
+        self.http1_backend = StubBackend(body=b"over http/1.1").start()
+        # both backend servers have http2 enabled, one of them falls back to HTTP/1.1
+        config = [{"url": backend.url, "health_check_url": None, "http2": True} for backend in (self.http2_backend, self.http1_backend)]
+        self.port = get_free_port()
+        self.lb = LoadBalancer(config, RoundRobinAlgorithm(), address=("localhost", self.port), admin_address=None)
+        self.lb_thread = threading.Thread(target=self.lb.start, daemon=True)
+        self.lb_thread.start()
+        self.assertTrue(self.lb.ready.wait(5))
+
+    def tearDown(self):
+        self.lb.stop()
+        self.lb_thread.join(5)
+        self.http2_backend.stop()
+        self.http1_backend.stop()
+
+    def test_requests_are_proxied_over_http2_with_fallback(self):
+        bodies = [requests.get(f"http://localhost:{self.port}/", timeout=5).text for _ in range(6)]
+        self.assertEqual(bodies, ["over http/2", "over http/1.1"] * 3)
+        self.assertEqual(self.http2_backend.connections, 1)
+        self.assertEqual(self.lb.backend_servers[0].get_stats()["http2_pool"]["streams"], 3)
+        self.assertFalse(self.lb.backend_servers[1].http2_pool.is_supported())
+
+
+class TestTcpProxyMode(unittest.TestCase):
+    server_mode = SERVER_MODE_THREADED
+
+    def setUp(self):
+        self.backends = [StubTcpBackend(farewell=f"bye from backend {i}".encode()).start() for i in range(2)]
+        config = [{"url": backend.url, "health_check_url": None} for backend in self.backends]
+        self.port = get_free_port()
+        self.lb = LoadBalancer(config, RoundRobinAlgorithm(), server_mode=self.server_mode, address=("localhost", self.port),
+                               admin_address=None, proxy_mode=PROXY_MODE_TCP)
+        self.lb_thread = threading.Thread(target=self.lb.start, daemon=True)
+        self.lb_thread.start()
+        self.assertTrue(self.lb.ready.wait(5))
+
+    def tearDown(self):
+        self.lb.stop()
+        self.lb_thread.join(5)
+        for backend in self.backends:
+            backend.stop()
+
+    def _exchange(self, payload):
+        """
+        Sends payload over new connection, finishes sending and returns everything received until load balancer closed connection.
+        """
+        with socket.create_connection(("localhost", self.port), timeout=5) as sock:
+            sender = threading.Thread(target=lambda: (sock.sendall(payload), sock.shutdown(socket.SHUT_WR)))
+            sender.start()
+            received = b""
+            while chunk := sock.recv(65536):
+                received += chunk
+            sender.join()
+            return received
+
+    def wait_until(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    def test_connections_are_relayed_round_robin(self):
+        # non-HTTP bytes are echoed by backend server, which answers half-close with its farewell
+        responses = [self._exchange(b"\x00opaque\xff") for _ in range(4)]
+        self.assertEqual(responses, [b"\x00opaque\xffbye from backend 0", b"\x00opaque\xffbye from backend 1"] * 2)
+        # connection is counted as successful just before it stops being in flight
+        self.wait_until(lambda: [server.success_count for server in self.lb.backend_servers] == [2, 2])
+        self.wait_until(lambda: [server.get_active_requests() for server in self.lb.backend_servers] == [0, 0])
+
+    def test_large_transfer_is_relayed(self):
+        payload = os.urandom(4 * 1024 * 1024)
+        self.assertEqual(self._exchange(payload), payload + b"bye from backend 0")
+
+    def test_connection_stays_in_flight_until_closed(self):
+        with socket.create_connection(("localhost", self.port), timeout=5) as sock:
+            sock.sendall(b"hello")
+            self.assertEqual(sock.recv(5), b"hello")
+            self.assertEqual(self.lb.backend_servers[0].get_active_requests(), 1)
+        self.wait_until(lambda: self.lb.backend_servers[0].get_active_requests() == 0)
+
+    def test_unreachable_server_is_skipped(self):
+        self.backends[0].stop()
+        self.assertEqual(self._exchange(b"retry"), b"retrybye from backend 1")
+        self.assertEqual(self.lb.backend_servers[0].error_count, 1)
+
+    def test_tls_termination_is_refused(self):
+        with self.assertRaises(ValueError):
+            LoadBalancer([], RoundRobinAlgorithm(), proxy_mode=PROXY_MODE_TCP, tls_cert_file="cert.pem", tls_key_file="key.pem")
+        with self.assertRaises(ValueError):
+            LoadBalancer([], RoundRobinAlgorithm(), proxy_mode="udp")
+
+
+class TestAsyncioTcpProxyMode(TestTcpProxyMode):
+    server_mode = SERVER_MODE_ASYNCIO
+
+
+class TestRateLimiting(unittest.TestCase):
+    server_mode = SERVER_MODE_THREADED
+
+    def setUp(self):
+        self.backend = StubBackend(body=b"allowed").start()
+        self.lbs = []
+
+    def tearDown(self):
+        for lb, lb_thread in self.lbs:
+            lb.stop()
+            lb_thread.join(5)
+        self.backend.stop()
+
+    def _start_lb(self, backend_url=None, **kwargs):
+        port = get_free_port()
+        # rate is so low that buckets do not refill during test
+        lb = LoadBalancer([{"url": backend_url or self.backend.url, "health_check_url": None}], RoundRobinAlgorithm(), server_mode=self.server_mode,
+                          address=("localhost", port), admin_address=None, rate_limit=0.001, rate_limit_burst=3, **kwargs)
+        lb_thread = threading.Thread(target=lb.start, daemon=True)
+        lb_thread.start()
+        self.assertTrue(lb.ready.wait(5))
+        self.lbs.append((lb, lb_thread))
+        return lb, port
+
+    def test_client_over_limit_gets_429_without_reaching_backend(self):
+        lb, port = self._start_lb()
+        responses = [requests.get(f"http://localhost:{port}/", timeout=5) for _ in range(5)]
+        self.assertEqual([response.status_code for response in responses], [200, 200, 200, 429, 429])
+        self.assertEqual(responses[3].headers["Retry-After"], "1000")
+        self.assertEqual(self.backend.httpd.get_count, 3)
+        # once bucket is empty new connections are refused right when accepted
+        self.assertEqual(lb.rate_limiter.get_stats()["throttled_connections"], 2)
+
+    def test_requests_on_keep_alive_connection_are_limited(self):
+        lb, port = self._start_lb()
+        with requests.Session() as session:
+            statuses = [session.get(f"http://localhost:{port}/", timeout=5).status_code for _ in range(4)]
+        self.assertEqual(statuses, [200, 200, 200, 429])
+        self.assertEqual(lb.rate_limiter.get_stats()["throttled_requests"], 1)
+
+    def test_clients_are_keyed_by_header(self):
+        lb, port = self._start_lb(rate_limit_key="header:X-Api-Key")
+        statuses = [requests.get(f"http://localhost:{port}/", headers={"X-Api-Key": key}, timeout=5).status_code for key in ["a"] * 4 + ["b"]]
+        self.assertEqual(statuses, [200, 200, 200, 429, 200])
+
+    def test_tcp_connections_over_limit_are_closed(self):
+        tcp_backend = StubTcpBackend(farewell=b"").start()
+        self.addCleanup(tcp_backend.stop)
+        lb, port = self._start_lb(tcp_backend.url, proxy_mode=PROXY_MODE_TCP)
+        echoed = []
+        for _ in range(4):
+            with socket.create_connection(("localhost", port), timeout=5) as sock:
+                try:
+                    sock.sendall(b"ping")
+                    sock.shutdown(socket.SHUT_WR)
+                    echoed.append(sock.recv(4))
+                except OSError:
+                    # connection refused by load balancer may already be gone
+                    echoed.append(b"")
+        self.assertEqual(echoed, [b"ping"] * 3 + [b""])
+        self.assertEqual(tcp_backend.connections, 3)
+        stats = lb.rate_limiter.get_stats()
+        self.assertEqual((stats["throttled_requests"], stats["throttled_connections"]), (0, 1))
+
+
+class TestAsyncioRateLimiting(TestRateLimiting):
+    server_mode = SERVER_MODE_ASYNCIO
+
+
+class TestAsyncioLoadBalancer(TestLoadBalancer):
+    server_mode = SERVER_MODE_ASYNCIO
+
+    def test_unknown_server_mode(self):
+        with self.assertRaises(ValueError):
+            LoadBalancer([], RoundRobinAlgorithm(), server_mode="forking")
+
+
+if __name__ == '__main__':
+    unittest.main()
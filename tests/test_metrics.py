@@ -0,0 +1,59 @@
+import unittest
+import threading
+from implementations.metrics import ShardedCounter, Histogram, MetricsRegistry, MetricFamily
+
+
+class TestShardedCounter(unittest.TestCase):
+    def test_concurrent_increments_are_not_lost(self):
+        counter = ShardedCounter()
+        def increment():
+            for _ in range(10000):
+                counter.add()
+        threads = [threading.Thread(target=increment) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(counter.get(), 80000)
+
+    def test_counts_of_finished_threads_are_kept(self):
+        counter = ShardedCounter()
+        counter.add(2)
+        thread = threading.Thread(target=counter.add, args=(3,))
+        thread.start()
+        thread.join()
+        self.assertEqual(counter.get(), 5)
+
+
+class TestHistogram(unittest.TestCase):
+    def test_buckets_are_cumulative(self):
+        histogram = Histogram(buckets=[0.1, 1])
+        for value in [0.05, 0.1, 0.5, 2]:
+            histogram.observe(value)
+        counts, total = histogram.get()
+        self.assertEqual(counts, [2, 3, 4])
+        self.assertAlmostEqual(total, 2.65)
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def test_render_prometheus_text_format(self):
+        registry = MetricsRegistry()
+        registry.register(lambda: [MetricFamily("lb_requests_total", "counter", "Requests.", [("", {"backend": 'a"b'}, 3)])])
+        histogram = Histogram(buckets=[1])
+        histogram.observe(0.5)
+        registry.register(lambda: [MetricFamily("lb_latency_seconds", "histogram", "Latency.", MetricsRegistry.histogram_samples(histogram, {}))])
+        self.assertEqual(registry.render(), "\n".join([
+            "# HELP lb_requests_total Requests.",
+            "# TYPE lb_requests_total counter",
+            'lb_requests_total{backend="a\\"b"} 3',
+            "# HELP lb_latency_seconds Latency.",
+            "# TYPE lb_latency_seconds histogram",
+            'lb_latency_seconds_bucket{le="1"} 1',
+            'lb_latency_seconds_bucket{le="+Inf"} 1',
+            "lb_latency_seconds_sum 0.5",
+            "lb_latency_seconds_count 1",
+        ]) + "\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import time
+import unittest
+from implementations.backend_server import BackendServer
+from implementations.outlier_detector import OutlierDetector
+
+class TestOutlierDetector(unittest.TestCase):
+    def setUp(self):
+        self.detector = OutlierDetector(consecutive_errors=3, error_rate=0.5, window_size=10, min_requests=6, base_ejection_time=10, max_ejection_time=60)
+
+    def test_consecutive_errors_eject(self):
+        self.assertIsNone(self.detector.record(False))
+        self.assertIsNone(self.detector.record(False))
+        self.assertIsNotNone(self.detector.record(False))
+
+    def test_success_resets_consecutive_errors(self):
+        for _ in range(4):
+            self.assertIsNone(self.detector.record(False))
+            self.assertIsNone(self.detector.record(True))
+            self.assertIsNone(self.detector.record(True))
+
+    def test_error_rate_ejects_once_window_has_enough_requests(self):
+        reasons = [self.detector.record(success) for success in [True, False, True, False, True, False]]
+        self.assertEqual(reasons[:5], [None] * 5)
+        self.assertIsNotNone(reasons[5])
+
+    def test_error_rate_is_computed_over_window(self):
+        for _ in range(10):
+            self.detector.record(False)
+            self.detector.record(True)
+            self.detector.record(True)
+        # failures older than window are forgotten
+        self.assertEqual(self.detector.failures, sum(1 for outcome in self.detector.outcomes if not outcome))
+
+    def test_ejection_time_doubles_up_to_maximum(self):
+        ejection_times = []
+        now = 0
+        for _ in range(5):
+            ejection_times.append(self.detector.eject(now))
+            now += ejection_times[-1]
+            self.detector.readmit(now)
+        self.assertEqual(ejection_times, [10, 20, 40, 60, 60])
+
+    def test_ejection_time_starts_over_after_time_in_service(self):
+        self.assertEqual(self.detector.eject(0), 10)
+        self.detector.readmit(10)
+        self.assertEqual(self.detector.eject(20), 20)
+        self.detector.readmit(40)
+        self.assertEqual(self.detector.eject(100), 10)
+
+    def test_readmission(self):
+        self.detector.eject(0)
+        self.assertTrue(self.detector.is_ejected())
+        self.assertFalse(self.detector.is_due_for_readmission(5))
+        self.assertTrue(self.detector.is_due_for_readmission(10))
+        self.detector.readmit(10)
+        self.assertFalse(self.detector.is_ejected())
+        self.assertFalse(self.detector.has_enough_requests())
+
+    def test_failures_while_ejected_do_not_eject_again(self):
+        self.detector.eject(0)
+        for _ in range(5):
+            self.assertIsNone(self.detector.record(False))
+
+
+class TestSlowStart(unittest.TestCase):
+    def test_readmitted_server_ramps_up(self):
+        server = BackendServer("http://localhost:8000", health_check_url=None, slow_start_duration=0.2)
+        self.assertEqual(server.get_slow_start_factor(), 1.0)
+        server.eject("test")
+        self.assertFalse(server.is_available())
+        server.readmit()
+        self.assertTrue(server.is_available())
+        self.assertLess(server.get_slow_start_factor(), 0.5)
+        time.sleep(0.25)
+        self.assertEqual(server.get_slow_start_factor(), 1.0)
+
+    def test_server_becoming_healthy_ramps_up(self):
+        server = BackendServer("http://localhost:8000", health_check_url=None, slow_start_duration=10)
+        server.is_healthy = False
+        server.is_healthy = True
+        self.assertLess(server.get_slow_start_factor(), 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import random
+import unittest
+from implementations.backend_server import BackendServer
+from implementations.lb_algorithms.power_of_two_choices_algorithm import PowerOfTwoChoicesAlgorithm
+
+class TestPowerOfTwoChoicesAlgorithm(unittest.TestCase):
+    def setUp(self):
+        self.algorithm = PowerOfTwoChoicesAlgorithm(random.Random(42))
+        self.servers = [BackendServer(f"http://localhost:800{i}", health_check_url=None, capacity=3) for i in range(4)]
+
+    def test_empty_server_list(self):
+        self.assertIsNone(self.algorithm.get_next_server([]))
+
+    def test_single_server(self):
+        self.assertIs(self.algorithm.get_next_server(self.servers[:1]), self.servers[0])
+
+    def test_less_loaded_of_pair_is_selected(self):
+        self.servers[0].start_request()
+        for _ in range(20):
+            self.assertIs(self.algorithm.get_next_server(self.servers[:2]), self.servers[1])
+
+    def test_load_stays_even(self):
+        for _ in range(8):
+            server = self.algorithm.get_next_server(self.servers)
+            server.start_request()
+        active_requests = [server.get_active_requests() for server in self.servers]
+        self.assertEqual(sum(active_requests), 8)
+        self.assertLessEqual(max(active_requests) - min(active_requests), 2)
+
+    def test_servers_at_capacity_are_never_selected(self):
+        for server in self.servers[:3]:
+            for _ in range(3):
+                server.start_request()
+        for _ in range(20):
+            self.assertIs(self.algorithm.get_next_server(self.servers), self.servers[3])
+        for _ in range(3):
+            self.servers[3].start_request()
+        self.assertIsNone(self.algorithm.get_next_server(self.servers))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import time
+import signal
+import unittest
+import threading
+import requests
+from implementations.process_supervisor import ProcessSupervisor
+from implementations.lb_algorithms.round_robin_algorithm import RoundRobinAlgorithm
+from tests.stub_backend import StubBackend, get_free_port
+
+class TestProcessSupervisor(unittest.TestCase):
+    def setUp(self):
+        self.backends = [StubBackend(body=f"backend {i}".encode()).start() for i in range(2)]
+        config = [{"url": backend.url, "health_check_url": backend.health_check_url} for backend in self.backends]
+        self.port = get_free_port()
+        self.admin_port = get_free_port()
+        self.supervisor = ProcessSupervisor(config, RoundRobinAlgorithm, processes=2, address=("localhost", self.port), admin_address=("localhost", self.admin_port))
+        self.supervisor_thread = threading.Thread(target=self.supervisor.start, daemon=True)
+        self.supervisor_thread.start()
+        self.assertTrue(self.supervisor.ready.wait(10))
+
+    def tearDown(self):
+        self.supervisor.stop()
+        self.supervisor_thread.join(10)
+        for backend in self.backends:
+            backend.stop()
+
+    def wait_until(self, condition, timeout=10):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertTrue(condition())
+
+    def get(self):
+        try:
+            return requests.get(f"http://localhost:{self.port}/", timeout=5).status_code
+        except requests.exceptions.ConnectionError:
+            return None
+
+    def total_requests(self):
+        return sum(server["request_count"] for server in self.supervisor.get_stats()["backend_servers"])
+
+    def test_workers_serve_requests_and_share_stats(self):
+        # worker processes take a moment to start listening
+        self.wait_until(lambda: self.get() == 200)
+        self.assertEqual(len(self.supervisor.get_stats()["workers"]), 2)
+        # counters are published by sweep, which runs on request path
+        self.wait_until(lambda: self.get() == 200 and self.total_requests() > 0)
+
+    def test_metrics_are_summed_over_workers(self):
+        self.wait_until(lambda: self.get() == 200 and self.total_requests() > 0)
+        metrics = requests.get(f"http://localhost:{self.admin_port}/metrics", timeout=5).text
+        self.assertIn("lb_worker_processes 2", metrics)
+        url = self.backends[0].url
+        self.assertIn(f'lb_backend_up{{backend="{url}"}} 1', metrics)
+        self.assertIn(f'lb_backend_requests_total{{backend="{url}"}}', metrics)
+
+    def test_dead_worker_is_restarted(self):
+        self.wait_until(lambda: len(self.supervisor.get_stats()["workers"]) == 2)
+        pid = self.supervisor.get_stats()["workers"][0]
+        os.kill(pid, signal.SIGKILL)
+        self.wait_until(lambda: self.supervisor.restarts == 1 and len(self.supervisor.get_stats()["workers"]) == 2)
+        self.assertNotIn(pid, self.supervisor.get_stats()["workers"])
+        self.wait_until(lambda: self.get() == 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
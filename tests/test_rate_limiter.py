@@ -0,0 +1,63 @@
+import time
+import unittest
+from requests.structures import CaseInsensitiveDict
+from implementations.rate_limiter import RateLimiter
+
+class TestRateLimiter(unittest.TestCase):
+    def test_client_gets_burst_then_is_throttled(self):
+        limiter = RateLimiter(rate=0.001, burst=5)
+        self.assertEqual(sum(limiter.try_acquire("10.0.0.1") for _ in range(8)), 5)
+        # other clients have buckets of their own
+        self.assertTrue(limiter.try_acquire("10.0.0.2"))
+        stats = limiter.get_stats()
+        self.assertEqual((stats["allowed"], stats["throttled_requests"], stats["clients"]), (6, 3, 2))
+
+    def test_bucket_refills_over_time(self):
+        limiter = RateLimiter(rate=100, burst=1)
+        self.assertTrue(limiter.try_acquire("client"))
+        self.assertFalse(limiter.try_acquire("client"))
+        self.assertEqual(limiter.get_retry_after("client"), 1)
+        time.sleep(0.05)
+        self.assertTrue(limiter.try_acquire("client"))
+
+    def test_is_throttled_does_not_take_tokens(self):
+        limiter = RateLimiter(rate=0.001, burst=1)
+        # unknown client is never throttled
+        self.assertFalse(limiter.is_throttled("client"))
+        self.assertTrue(limiter.try_acquire("client"))
+        self.assertTrue(limiter.is_throttled("client"))
+        self.assertEqual(limiter.get_stats()["throttled_connections"], 1)
+
+    def test_connection_over_limit_is_counted_as_throttled_connection(self):
+        limiter = RateLimiter(rate=0.001, burst=1)
+        self.assertTrue(limiter.try_acquire("client", connection=True))
+        self.assertFalse(limiter.try_acquire("client", connection=True))
+        stats = limiter.get_stats()
+        self.assertEqual((stats["allowed"], stats["throttled_requests"], stats["throttled_connections"]), (1, 0, 1))
+
+    def test_least_recently_seen_client_is_evicted(self):
+        limiter = RateLimiter(rate=0.001, burst=1, max_clients=2)
+        limiter.try_acquire("a")
+        limiter.try_acquire("b")
+        limiter.is_throttled("a")
+        limiter.try_acquire("c")
+        self.assertEqual(list(limiter.buckets), ["a", "c"])
+        self.assertEqual(limiter.get_stats()["evictions"], 1)
+        # forgotten client starts over with full bucket
+        self.assertTrue(limiter.try_acquire("b"))
+
+    def test_key_by_header_falls_back_to_client_ip(self):
+        limiter = RateLimiter(rate=1, burst=1, key="header:X-Api-Key")
+        self.assertFalse(limiter.keys_by_client_ip)
+        self.assertEqual(limiter.get_key("10.0.0.1", CaseInsensitiveDict({"x-api-key": "abc"})), "header:abc")
+        self.assertEqual(limiter.get_key("10.0.0.1", CaseInsensitiveDict()), "10.0.0.1")
+
+    def test_invalid_configuration(self):
+        with self.assertRaises(ValueError):
+            RateLimiter(rate=0)
+        with self.assertRaises(ValueError):
+            RateLimiter(rate=1, key="path")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import time
+import json
+import unittest
+from requests.structures import CaseInsensitiveDict
+from implementations.request_tracer import RequestTracer, OUTCOME_RELAYED, OUTCOME_ERROR
+
+CLIENT_TRACEPARENT = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+
+
+def make_request(headers=None):
+    return {'method': "GET", 'path': "/", 'client_ip': "10.0.0.1", 'headers': CaseInsensitiveDict(headers or {}), 'received_at': time.monotonic()}
+
+
+class TestRequestTracer(unittest.TestCase):
+    def test_phases_are_recorded_in_histograms(self):
+        tracer = RequestTracer(sample_rate=0)
+        incoming_req_details = make_request()
+        trace = tracer.start(incoming_req_details, queue_wait=0.5)
+        self.assertIs(incoming_req_details['trace'], trace)
+        trace.mark("select")
+        trace.mark("backend")
+        tracer.finish(trace, incoming_req_details)
+        self.assertEqual([phase for phase, _ in trace.phases], ["queue", "read", "select", "backend", "respond"])
+        stats = tracer.get_stats()
+        self.assertEqual({phase: stats[phase]["count"] for phase in stats}, {"queue": 1, "read": 1, "select": 1, "backend": 1, "respond": 1, "total": 1})
+        # total includes time connection waited in queue
+        self.assertGreaterEqual(stats["total"]["avg"], 0.5)
+
+    def test_client_trace_is_continued(self):
+        tracer = RequestTracer(sample_rate=0)
+        incoming_req_details = make_request({"TraceParent": CLIENT_TRACEPARENT})
+        trace = tracer.start(incoming_req_details)
+        self.assertEqual(trace.trace_id, "4bf92f3577b34da6a3ce929d0e0e4736")
+        self.assertTrue(trace.sampled)
+        # client's header is replaced by one naming load balancer's span as parent
+        forwarded = incoming_req_details['headers']['traceparent']
+        self.assertEqual(len(incoming_req_details['headers']), 1)
+        self.assertRegex(forwarded, r"^00-4bf92f3577b34da6a3ce929d0e0e4736-[0-9a-f]{16}-01$")
+        self.assertNotEqual(trace.span_id, "00f067aa0ba902b7")
+
+    def test_invalid_traceparent_starts_new_trace(self):
+        tracer = RequestTracer(sample_rate=0)
+        for value in ["garbage", "ff-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01",
+                      "00-00000000000000000000000000000000-00f067aa0ba902b7-01", CLIENT_TRACEPARENT + "-extra"]:
+            trace = tracer.start(make_request({"traceparent": value}))
+            self.assertNotEqual(trace.trace_id, "4bf92f3577b34da6a3ce929d0e0e4736")
+            self.assertRegex(trace.traceparent, r"^00-[0-9a-f]{32}-[0-9a-f]{16}-00$")
+        # later versions may add fields
+        trace = tracer.start(make_request({"traceparent": "01" + CLIENT_TRACEPARENT[2:] + "-extra"}))
+        self.assertEqual(trace.trace_id, "4bf92f3577b34da6a3ce929d0e0e4736")
+
+    def test_sampled_requests_are_written_to_access_log(self):
+        tracer = RequestTracer(sample_rate=1)
+        incoming_req_details = make_request()
+        trace = tracer.start(incoming_req_details)
+        trace.outcome, trace.status, trace.backend = OUTCOME_RELAYED, 200, "http://backend"
+        with self.assertLogs("lb.access", level="INFO") as logs:
+            tracer.finish(trace, incoming_req_details)
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual((entry["outcome"], entry["status"], entry["backend"], entry["trace_id"]), (OUTCOME_RELAYED, 200, "http://backend", trace.trace_id))
+        self.assertEqual(list(entry["phases_ms"]), ["read", "respond"])
+
+    def test_unsampled_requests_are_not_logged(self):
+        tracer = RequestTracer(sample_rate=0)
+        incoming_req_details = make_request()
+        trace = tracer.start(incoming_req_details)
+        self.assertEqual(trace.outcome, OUTCOME_ERROR)
+        with self.assertNoLogs("lb.access", level="INFO"):
+            tracer.finish(trace, incoming_req_details)
+
+
+if __name__ == '__main__':
+    unittest.main()
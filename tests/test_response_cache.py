@@ -0,0 +1,95 @@
+import time
+import unittest
+import threading
+from requests.structures import CaseInsensitiveDict
+from implementations.response_cache import ResponseCache, parse_cache_control
+from utils.utility import Utils
+
+
+def make_request(path="/", **headers):
+    return {"method": "GET", "path": path, "headers": CaseInsensitiveDict(headers), "request_data": None}
+
+
+def make_response(body=b"body", status_code=200, **headers):
+    return Utils.build_response("http://backend" , status_code, "OK", list(headers.items()), content=body)
+
+
+class TestResponseCache(unittest.TestCase):
+    def fetch(self, cache, request, response):
+        cached, fill = cache.lookup(request)
+        if cached is not None:
+            return cached
+        if fill is not None:
+            fill.add_chunk(response.content)
+            cache.store(fill, request, response)
+            cache.finish(fill)
+        return None
+
+    def test_fresh_response_is_served_from_cache(self):
+        cache = ResponseCache()
+        response = make_response(**{"Cache-Control": "public, max-age=60", "Age": "10"})
+        self.assertIsNone(self.fetch(cache, make_request(), response))
+        cached = self.fetch(cache, make_request(), response)
+        self.assertEqual(cached.body, b"body")
+        self.assertEqual(cached.get_age(time.monotonic()), 10)
+        self.assertEqual(cache.get_stats()["hits"], 1)
+        self.assertEqual(cache.get_stats()["bytes_saved"], 4)
+
+    def test_uncacheable_responses_are_not_stored(self):
+        cache = ResponseCache()
+        for headers in [{}, {"Cache-Control": "no-store, max-age=60"}, {"Cache-Control": "private, max-age=60"},
+                        {"Cache-Control": "max-age=60", "Set-Cookie": "a=b"}, {"Cache-Control": "max-age=60", "Vary": "*"},
+                        {"Expires": "Thu, 01 Jan 1970 00:00:00 GMT"}]:
+            self.fetch(cache, make_request(), make_response(**headers))
+            self.assertIsNone(self.fetch(cache, make_request(), make_response()), headers)
+        self.assertFalse(cache.is_cacheable_request(make_request(**{"Cache-Control": "no-cache"})))
+        self.assertFalse(cache.is_cacheable_request(make_request(Authorization="Basic x")))
+
+    def test_expires_header_gives_freshness(self):
+        cache = ResponseCache()
+        response = make_response(Date="Thu, 01 Jan 2026 00:00:00 GMT", Expires="Thu, 01 Jan 2026 00:01:00 GMT")
+        self.fetch(cache, make_request(), response)
+        self.assertIsNotNone(self.fetch(cache, make_request(), response))
+
+    def test_vary_header_separates_variants(self):
+        cache = ResponseCache()
+        gzip = make_response(b"gzip", **{"Cache-Control": "max-age=60", "Vary": "Accept-Encoding"})
+        plain = make_response(b"plain", **{"Cache-Control": "max-age=60", "Vary": "Accept-Encoding"})
+        self.fetch(cache, make_request(**{"Accept-Encoding": "gzip"}), gzip)
+        self.assertIsNone(self.fetch(cache, make_request(), plain))
+        self.assertEqual(self.fetch(cache, make_request(**{"Accept-Encoding": "gzip"}), gzip).body, b"gzip")
+        self.assertEqual(self.fetch(cache, make_request(), plain).body, b"plain")
+
+    def test_least_recently_used_response_is_evicted(self):
+        cache = ResponseCache(max_size=10, max_object_size=5)
+        for path in ["/a", "/b", "/a", "/c"]:
+            self.fetch(cache, make_request(path), make_response(b"12345", **{"Cache-Control": "max-age=60"}))
+        self.assertIsNotNone(self.fetch(cache, make_request("/a"), make_response()))
+        self.assertIsNone(self.fetch(cache, make_request("/b"), make_response()))
+        self.assertEqual(cache.get_stats()["evictions"], 1)
+        self.fetch(cache, make_request("/big"), make_response(b"123456", **{"Cache-Control": "max-age=60"}))
+        self.assertIsNone(self.fetch(cache, make_request("/big"), make_response()))
+
+    def test_concurrent_misses_wait_for_single_fetch(self):
+        cache = ResponseCache()
+        cached, fill = cache.lookup(make_request())
+        results = []
+        waiters = [threading.Thread(target=lambda: results.append(cache.lookup(make_request()))) for _ in range(3)]
+        for thread in waiters:
+            thread.start()
+        time.sleep(0.05)
+        fill.add_chunk(b"body")
+        cache.store(fill, make_request(), make_response(**{"Cache-Control": "max-age=60"}))
+        cache.finish(fill)
+        for thread in waiters:
+            thread.join()
+        self.assertEqual([(cached.body, fill) for cached, fill in results], [(b"body", None)] * 3)
+        self.assertEqual(cache.get_stats()["collapsed"], 3)
+        self.assertEqual(cache.get_stats()["misses"], 1)
+
+    def test_parse_cache_control(self):
+        self.assertEqual(parse_cache_control('public, Max-Age=60, no-cache="Set-Cookie"'), {"public": None, "max-age": "60", "no-cache": "Set-Cookie"})
+
+
+if __name__ == '__main__':
+    unittest.main()
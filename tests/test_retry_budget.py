@@ -0,0 +1,30 @@
+import time
+import unittest
+from implementations.retry_budget import RetryBudget
+
+class TestRetryBudget(unittest.TestCase):
+    def test_retries_are_percentage_of_requests(self):
+        budget = RetryBudget(percent=10, min_per_second=0, max_tokens=50)
+        # budget starts full
+        self.assertEqual(sum(budget.try_withdraw() for _ in range(60)), 50)
+        for _ in range(100):
+            budget.deposit()
+        self.assertEqual(sum(budget.try_withdraw() for _ in range(20)), 10)
+
+    def test_budget_saves_up_to_max_tokens(self):
+        budget = RetryBudget(percent=50, min_per_second=0, max_tokens=5)
+        for _ in range(100):
+            budget.deposit()
+        self.assertEqual(sum(budget.try_withdraw() for _ in range(20)), 5)
+        self.assertEqual(budget.get_stats()['refused'], 15)
+
+    def test_budget_refills_over_time(self):
+        budget = RetryBudget(percent=0, min_per_second=100, max_tokens=1)
+        self.assertTrue(budget.try_withdraw())
+        self.assertFalse(budget.try_withdraw())
+        time.sleep(0.05)
+        self.assertTrue(budget.try_withdraw())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -35,5 +35,16 @@ class TestRoundRobinAlgorithm(unittest.TestCase):
         next_server = self.algorithm.get_next_server(servers)
         self.assertEqual(next_server.url, "http://localhost:8000")
 
+    def test_rotation_continues_when_servers_change(self):
+        servers = [BackendServer(f"http://localhost:800{i}", health_check_url=None) for i in range(4)]
+        self.assertEqual(self.algorithm.get_next_server(servers).url, "http://localhost:8000")
+        self.assertEqual(self.algorithm.get_next_server(servers).url, "http://localhost:8001")
+
+        # server 0 leaves, rotation goes on with server after last selected one instead of skipping it
+        servers = servers[1:]
+        self.algorithm.on_servers_changed(servers)
+        self.assertEqual([self.algorithm.get_next_server(servers).url for _ in range(3)],
+                         ["http://localhost:8002", "http://localhost:8003", "http://localhost:8001"])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
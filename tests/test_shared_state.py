@@ -0,0 +1,63 @@
+import unittest
+from implementations.load_balancer import LoadBalancer
+from implementations.shared_state import SharedBackendState
+from implementations.lb_algorithms.round_robin_algorithm import RoundRobinAlgorithm
+from tests.stub_backend import get_free_port
+
+class TestSharedBackendState(unittest.TestCase):
+    def setUp(self):
+        self.state = SharedBackendState(backends=2, workers=3)
+
+    def test_version_changes_only_with_health(self):
+        self.assertEqual(self.state.get_health(), [True, True])
+        self.state.set_healthy(1, True)
+        self.assertEqual(self.state.get_version(), 0)
+        self.state.set_healthy(1, False)
+        self.assertEqual(self.state.get_version(), 1)
+        self.assertEqual(self.state.get_health(), [True, False])
+
+    def test_stats_are_summed_over_workers(self):
+        self.state.publish_stats(0, 1, [10, 8, 2, 0.5, 1])
+        self.state.publish_stats(2, 1, [5, 5, 0, 0.25, 0])
+        stats = self.state.get_backend_stats(1)
+        self.assertEqual(stats["request_count"], 15)
+        self.assertEqual(stats["error_count"], 2)
+        self.assertAlmostEqual(stats["total_latency"], 0.75)
+        self.assertEqual(stats["active_requests"], 1)
+        self.assertEqual(self.state.get_backend_stats(0)["request_count"], 0)
+
+
+class TestLoadBalancerWithSharedState(unittest.TestCase):
+    def setUp(self):
+        self.state = SharedBackendState(backends=2, workers=2)
+        self.config = [{"url": f"http://localhost:800{i}", "health_check_url": f"http://localhost:800{i}/health"} for i in range(2)]
+
+    def create_lb(self):
+        return LoadBalancer(self.config, RoundRobinAlgorithm(), address=("localhost", get_free_port()), shared_state=self.state, worker_index=1)
+
+    def test_health_comes_from_shared_state(self):
+        self.state.set_healthy(0, False)
+        lb = self.create_lb()
+        self.assertEqual([server.url for server in lb.healthy_servers.servers], ["http://localhost:8001"])
+        # worker runs no health checks of its own
+        self.assertEqual(lb.health_check_scheduler.get_stats()["scheduled_servers"], 0)
+
+        self.state.set_healthy(0, True)
+        lb.next_outlier_sweep = 0
+        lb._sweep_servers()
+        self.assertEqual(len(lb.healthy_servers.servers), 2)
+
+    def test_restarted_worker_carries_on_counters(self):
+        self.state.publish_stats(1, 0, [7, 6, 1, 0.5, 3])
+        lb = self.create_lb()
+        lb.backend_servers[0].increment_request_count()
+        lb.next_outlier_sweep = 0
+        lb._sweep_servers()
+        stats = self.state.read_stats(1, 0)
+        self.assertEqual(stats["request_count"], 8)
+        # requests in flight of dead worker are gone with it
+        self.assertEqual(stats["active_requests"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
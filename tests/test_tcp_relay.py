@@ -0,0 +1,97 @@
+import os
+import time
+import socket
+import struct
+import unittest
+import threading
+from implementations.tcp_relay import TcpRelay
+
+
+def connected_pair():
+    """
+    Returns two ends of TCP connection over localhost.
+    """
+    with socket.create_server(("localhost", 0)) as server_sock:
+        client_sock = socket.create_connection(server_sock.getsockname())
+        accepted_sock, _ = server_sock.accept()
+    return client_sock, accepted_sock
+
+
+class TestTcpRelay(unittest.TestCase):
+    use_splice = False
+
+    def setUp(self):
+        self.relay = TcpRelay(buffer_size=4096, use_splice=self.use_splice)
+        self.relay.start()
+        self.outcomes = []
+        # client <-> relayed client end, relayed backend end <-> backend
+        self.client, relayed_client = connected_pair()
+        relayed_backend, self.backend = connected_pair()
+        for sock in (self.client, self.backend):
+            sock.settimeout(5)
+        self.relay.relay(relayed_client, relayed_backend, self.outcomes.append)
+
+    def tearDown(self):
+        self.relay.stop()
+        self.client.close()
+        self.backend.close()
+
+    def wait_until(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    @staticmethod
+    def read_until_eof(sock):
+        data = b""
+        while chunk := sock.recv(65536):
+            data += chunk
+        return data
+
+    def test_bytes_are_relayed_both_ways_with_half_close(self):
+        self.client.sendall(b"ping")
+        self.assertEqual(self.backend.recv(4), b"ping")
+        self.backend.sendall(b"pong")
+        self.assertEqual(self.client.recv(4), b"pong")
+
+        # client finishing sending still lets it read response
+        self.client.shutdown(socket.SHUT_WR)
+        self.assertEqual(self.backend.recv(4), b"")
+        self.backend.sendall(b"response after half-close")
+        self.backend.shutdown(socket.SHUT_WR)
+        self.assertEqual(self.read_until_eof(self.client), b"response after half-close")
+        self.wait_until(lambda: self.outcomes == [True])
+        stats = self.relay.get_stats()
+        self.assertEqual((stats["active_connections"], stats["total_connections"]), (0, 1))
+        self.assertEqual((stats["bytes_upstream"], stats["bytes_downstream"]), (4, 4 + len(b"response after half-close")))
+
+    def test_transfer_larger_than_buffer_is_relayed_in_order(self):
+        payload = os.urandom(2 * 1024 * 1024)
+        sender = threading.Thread(target=lambda: (self.client.sendall(payload), self.client.shutdown(socket.SHUT_WR)))
+        sender.start()
+        received = self.read_until_eof(self.backend)
+        sender.join()
+        self.assertEqual(received, payload)
+        self.assertEqual(self.relay.get_stats()["bytes_upstream"], len(payload))
+
+    def test_reset_closes_connection_as_failed(self):
+        # closing with zero linger time resets connection instead of finishing it
+        self.backend.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+        self.backend.close()
+        self.wait_until(lambda: self.outcomes == [False])
+        self.assertEqual(self.read_until_eof(self.client), b"")
+
+    def test_stop_closes_relayed_connections(self):
+        self.relay.stop()
+        self.assertEqual(self.outcomes, [False])
+        self.assertEqual(self.read_until_eof(self.client), b"")
+
+
+@unittest.skipUnless(hasattr(os, "splice"), "os.splice is not available")
+class TestTcpRelayWithSplice(TestTcpRelay):
+    use_splice = True
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -12,8 +12,8 @@ class TestWeightedResponseTimeAlgorithm(unittest.TestCase):
         self.servers = []
         for i in range(random.randint(5, 10)):
             server = BackendServer(f"http://localhost:800{i+1}", health_check_url=None, capacity=random.randint(1, 100))
-            server.total_latency = random.uniform(0.1, 0.9)
-            server.success_count = random.randint(0, 10)
+            for _ in range(random.randint(0, 10)):
+                server.add_latency(random.uniform(0.1, 0.9))
             self.servers.append(server)
 
         # Created instance of the WeightedResponseTimeAlgorithm
@@ -39,6 +39,26 @@ class TestWeightedResponseTimeAlgorithm(unittest.TestCase):
         # Asserting that the url attribute of the selected server is the same as that of the expected server
         self.assertEqual(selected_server.url, expected_server.url)
 
+    def test_selection_follows_latency_updates(self):
+        fast = BackendServer("http://localhost:8001", health_check_url=None, capacity=10)
+        slow = BackendServer("http://localhost:8002", health_check_url=None, capacity=10)
+        fast.add_latency(0.1)
+        slow.add_latency(0.5)
+        servers = [fast, slow]
+        self.assertIs(self.algorithm.get_next_server(servers), fast)
+
+        # latency of fast server grows above that of slow one
+        for _ in range(20):
+            fast.add_latency(2.0)
+        self.assertIs(self.algorithm.get_next_server(servers), slow)
+
+        # capacity makes up for latency
+        slow.set_capacity(1)
+        self.assertIs(self.algorithm.get_next_server(servers), fast)
+
+        # server which is no longer available is not selected
+        self.assertIs(self.algorithm.get_next_server([slow]), slow)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,3 +1,4 @@
+import time
 import random
 import logging
 import unittest
@@ -43,3 +44,63 @@ class TestWeightedRoundRobinAlgorithm(unittest.TestCase):
         # Verifying that weights for each server match expected weights
         for server in self.servers:
             self.assertAlmostEqual(weights[server.url], server.get_capacity() / total_capacity, delta=0.001)
+
+
+class TestSmoothWeightedRoundRobin(unittest.TestCase):
+    def setUp(self):
+        self.algorithm = WeightedRoundRobinAlgorithm()
+
+    def make_servers(self, weights):
+        return [BackendServer(f"http://localhost:800{i}", health_check_url=None, weight=weight) for i, weight in enumerate(weights)]
+
+    def pick(self, servers, count):
+        return [servers.index(self.algorithm.get_next_server(servers)) for _ in range(count)]
+
+    def test_picks_are_spread_smoothly(self):
+        servers = self.make_servers([5, 1, 1])
+        self.assertEqual(self.pick(servers, 14), [0, 0, 1, 0, 2, 0, 0] * 2)
+
+    def test_traffic_is_proportional_to_weights(self):
+        servers = self.make_servers([30, 20, 10])
+        picks = self.pick(servers, 600)
+        self.assertEqual([picks.count(i) for i in range(3)], [300, 200, 100])
+
+    def test_zero_weight_server_is_skipped(self):
+        servers = self.make_servers([0, 2])
+        self.assertEqual(self.pick(servers, 3), [1, 1, 1])
+        self.assertIsNone(self.algorithm.get_next_server(servers[:1]))
+
+    def test_schedule_follows_weight_and_membership_changes(self):
+        servers = self.make_servers([1, 1])
+        self.assertEqual(self.pick(servers, 2), [0, 1])
+        servers[1].set_weight(3)
+        self.algorithm.on_servers_changed(servers)
+        self.assertEqual(self.pick(servers, 4), [1, 0, 1, 1])
+        self.assertEqual(self.pick(servers[1:], 2), [0, 0])
+
+    def test_position_in_cycle_is_kept_when_servers_change(self):
+        servers = self.make_servers([2, 1])
+        picks = []
+        for _ in range(6):
+            picks += self.pick(servers, 1)
+            # e.g. another server flapping between healthy and unhealthy, which rebuilds snapshot every time
+            servers = list(servers)
+            self.algorithm.on_servers_changed(servers)
+        self.assertEqual(picks, [0, 1, 0] * 2)
+
+    def test_large_weights_need_no_precomputed_cycle(self):
+        servers = self.make_servers([1000 + i for i in range(200)])
+        start = time.perf_counter()
+        self.algorithm.on_servers_changed(servers)
+        picks = self.pick(servers, 200)
+        # cycle is sum of weights (over 200000 picks) long, yet first picks go to heaviest servers right away
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertEqual(picks[:3], [199, 198, 197])
+
+    def test_invalid_weight(self):
+        with self.assertRaises(ValueError):
+            BackendServer("http://localhost:8000", health_check_url=None, weight=-1)
+
+
+if __name__ == '__main__':
+    unittest.main()
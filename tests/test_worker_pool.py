@@ -0,0 +1,83 @@
+import time
+import socket
+import unittest
+import threading
+from implementations.worker_pool import WorkerPool
+
+class TestWorkerPool(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.handled = []
+        self.rejected = []
+
+    def tearDown(self):
+        self.release.set()
+
+    def handler(self, client_sock):
+        self.handled.append(client_sock)
+        self.release.wait(5)
+
+    def reject(self, client_sock, reason):
+        self.rejected.append((client_sock, reason))
+
+    def wait_until(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    def test_connections_are_handled_by_workers(self):
+        self.release.set()
+        pool = WorkerPool(self.handler, self.reject, size=2, queue_size=10)
+        pool.start()
+        for i in range(5):
+            self.assertTrue(pool.submit(f"client {i}"))
+        self.wait_until(lambda: len(self.handled) == 5)
+        self.assertEqual(pool.get_stats()['admitted'], 5)
+        self.assertEqual(self.rejected, [])
+        pool.stop()
+
+    def test_full_queue_sheds_connection(self):
+        pool = WorkerPool(self.handler, self.reject, size=1, queue_size=1)
+        pool.start()
+        self.assertTrue(pool.submit("busy"))
+        self.wait_until(lambda: self.handled == ["busy"])
+        self.assertTrue(pool.submit("queued"))
+        self.assertTrue(pool.has_backlog())
+        self.assertFalse(pool.submit("shed"))
+        self.assertEqual(self.rejected, [("shed", "Accept queue is full")])
+        self.assertEqual(pool.get_stats()['rejected_queue_full'], 1)
+        self.release.set()
+        self.wait_until(lambda: self.handled == ["busy", "queued"])
+        pool.stop()
+
+    def test_connection_waiting_past_deadline_is_shed(self):
+        pool = WorkerPool(self.handler, self.reject, size=1, queue_size=5, max_queue_wait=0.05)
+        pool.start()
+        pool.submit("busy")
+        self.wait_until(lambda: self.handled == ["busy"])
+        pool.submit("late")
+        time.sleep(0.1)
+        self.release.set()
+        self.wait_until(lambda: len(self.rejected) == 1)
+        self.assertEqual(self.rejected[0][0], "late")
+        self.assertEqual(self.handled, ["busy"])
+        self.assertEqual(pool.get_stats()['rejected_deadline'], 1)
+        pool.stop()
+
+    def test_stop_sheds_queued_connections(self):
+        pool = WorkerPool(self.handler, self.reject, size=1, queue_size=5)
+        pool.start()
+        pool.submit("busy")
+        self.wait_until(lambda: self.handled == ["busy"])
+        pool.submit("queued")
+        pool.stop()
+        self.assertEqual(self.rejected, [("queued", "Load balancer is shutting down")])
+
+    def test_invalid_size(self):
+        with self.assertRaises(ValueError):
+            WorkerPool(self.handler, self.reject, size=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,207 @@
+from typing import Dict, Any, Union
+from requests.structures import CaseInsensitiveDict
+
+from constants.app_constants import MAX_REQUEST_HEAD_SIZE, RELAY_CHUNK_SIZE
+
+# events returned by HttpRequestParser.next_event() besides request heads and body data
+NEED_DATA = "NEED_DATA" # more bytes have to be fed before next event can be parsed
+END_OF_MESSAGE = "END_OF_MESSAGE" # body of current request is complete
+
+MAX_CHUNK_SIZE_LINE = 1024 # maximum length (in bytes) of chunk size line, including extensions
+
+
+class HttpParseError(ValueError):
+    """
+    Raised when client sent data which is not valid HTTP/1.1 request.
+    """
+    pass
+
+
+class HttpRequestParser:
+    """
+    Incremental HTTP/1.1 request parser which does not do any I/O itself.
+
+    Bytes received from client are passed to feed() in whatever pieces they arrive, and
+    next_event() returns parsed events one at a time: dict with details of request head,
+    bytes of request body, END_OF_MESSAGE once request is complete, or NEED_DATA when more
+    bytes have to be fed first. Parsing resumes where it stopped, so requests split across
+    many reads and several pipelined requests in single read are both handled.
+
+    :param max_head_size: maximum size (in bytes) of request line plus headers.
+    :param max_body_piece: maximum size (in bytes) of single body data event.
+    """
+
+    # parser states
+    HEAD = "HEAD"
+    BODY = "BODY"
+    CHUNK_SIZE = "CHUNK_SIZE"
+    CHUNK_DATA = "CHUNK_DATA"
+    CHUNK_END = "CHUNK_END"
+    TRAILERS = "TRAILERS"
+    DONE = "DONE"
+
+    def __init__(self, max_head_size: int = MAX_REQUEST_HEAD_SIZE, max_body_piece: int = RELAY_CHUNK_SIZE):
+        self.max_head_size = max_head_size
+        self.max_body_piece = max_body_piece
+        self.buffer = bytearray()
+        self.state = self.HEAD
+        self.remaining = 0 # bytes left of current body or chunk
+        self.scanned = 0 # bytes of buffer already searched for end of head, so search resumes there
+
+    def feed(self, data: bytes) -> None:
+        """
+        Adds bytes received from client to parser.
+        """
+        self.buffer += data
+
+    def is_idle(self) -> bool:
+        """
+        Returns True when no part of next request has been received yet.
+        """
+        # DONE only waits for END_OF_MESSAGE to be returned, request itself is complete
+        return self.state in (self.HEAD, self.DONE) and not self.buffer
+
+    def next_event(self) -> Union[Dict[str, Any], bytes, str]:
+        """
+        Parses next event from bytes fed so far.
+
+        :return: dict with request details, bytes of request body, END_OF_MESSAGE or NEED_DATA.
+        :raises HttpParseError: if request is malformed or exceeds size limits.
+        """
+        while True:
+            if self.state == self.HEAD:
+                return self._parse_head()
+            if self.state == self.BODY:
+                return self._take_body_data(self.DONE)
+            if self.state == self.CHUNK_SIZE:
+                if not self._parse_chunk_size():
+                    return NEED_DATA
+            elif self.state == self.CHUNK_DATA:
+                return self._take_body_data(self.CHUNK_END)
+            elif self.state == self.CHUNK_END:
+                if len(self.buffer) < 2:
+                    return NEED_DATA
+                if self.buffer[:2] != b"\r\n":
+                    raise HttpParseError("Chunk not terminated by CRLF")
+                del self.buffer[:2]
+                self.state = self.CHUNK_SIZE
+            elif self.state == self.TRAILERS:
+                if not self._skip_trailers():
+                    return NEED_DATA
+            elif self.state == self.DONE:
+                self.state = self.HEAD
+                return END_OF_MESSAGE
+
+
+    # Private methods from here
+
+    def _parse_head(self) -> Union[Dict[str, Any], str]:
+        # empty lines before request line must be ignored (RFC 9112 section 2.2)
+        while self.buffer[:2] == b"\r\n":
+            del self.buffer[:2]
+        head_end = self.buffer.find(b"\r\n\r\n", max(0, self.scanned - 3))
+        if head_end == -1:
+            if len(self.buffer) > self.max_head_size:
+                raise HttpParseError("Request head too large")
+            self.scanned = len(self.buffer)
+            return NEED_DATA
+        if head_end + 4 > self.max_head_size:
+            raise HttpParseError("Request head too large")
+
+        raw_head = bytes(memoryview(self.buffer)[:head_end + 4])
+        del self.buffer[:head_end + 4]
+        self.scanned = 0
+
+        lines = raw_head[:-4].split(b"\r\n")
+        try:
+            method, path, protocol = lines[0].decode("ascii").split(" ")
+        except (UnicodeDecodeError, ValueError):
+            raise HttpParseError("Malformed request line")
+        if not protocol.startswith("HTTP/1."):
+            raise HttpParseError(f"Unsupported protocol {protocol}")
+
+        headers = CaseInsensitiveDict()
+        for line in lines[1:]:
+            key, sep, value = line.partition(b":")
+            if not sep or not key or key != key.strip() or line[:1] in (b" ", b"\t"):
+                raise HttpParseError("Malformed header line")
+            headers[key.decode("latin-1")] = value.strip().decode("latin-1")
+
+        chunked = False
+        content_length = 0
+        if "Transfer-Encoding" in headers:
+            if "Content-Length" in headers:
+                # both framings at once is classic request smuggling vector, so it is refused
+                raise HttpParseError("Request has both Transfer-Encoding and Content-Length")
+            if headers["Transfer-Encoding"].lower().rsplit(",", 1)[-1].strip() != "chunked":
+                raise HttpParseError("Unsupported Transfer-Encoding")
+            chunked = True
+            self.state = self.CHUNK_SIZE
+        elif "Content-Length" in headers:
+            if not headers["Content-Length"].isdigit():
+                raise HttpParseError("Invalid Content-Length")
+            content_length = int(headers["Content-Length"])
+            self.remaining = content_length
+            self.state = self.BODY if content_length > 0 else self.DONE
+        else:
+            self.state = self.DONE
+
+        connection = headers.get("Connection", "").lower()
+        keep_alive = "keep-alive" in connection if protocol == "HTTP/1.0" else "close" not in connection
+        return {
+            'raw_request_data': raw_head,
+            'method': method,
+            'protocol': protocol,
+            'path' : path,
+            'headers' : headers,
+            'chunked': chunked,
+            'content_length': None if chunked else content_length,
+            'keep_alive': keep_alive
+        }
+
+    def _take_body_data(self, next_state: str) -> Union[bytes, str]:
+        """
+        Returns as much of current body or chunk as is buffered, up to max_body_piece bytes.
+        """
+        if self.remaining == 0:
+            self.state = next_state
+            return self.next_event()
+        if not self.buffer:
+            return NEED_DATA
+        size = min(self.remaining, len(self.buffer), self.max_body_piece)
+        data = bytes(memoryview(self.buffer)[:size])
+        del self.buffer[:size]
+        self.remaining -= size
+        if self.remaining == 0:
+            self.state = next_state
+        return data
+
+    def _parse_chunk_size(self) -> bool:
+        line_end = self.buffer.find(b"\r\n", 0, MAX_CHUNK_SIZE_LINE)
+        if line_end == -1:
+            if len(self.buffer) >= MAX_CHUNK_SIZE_LINE:
+                raise HttpParseError("Chunk size line too long")
+            return False
+        size_field = bytes(self.buffer[:line_end]).split(b";", 1)[0].strip()
+        del self.buffer[:line_end + 2]
+        # int() alone would also accept signs, underscores and "0x" prefix
+        if not size_field or size_field.strip(b"0123456789abcdefABCDEF"):
+            raise HttpParseError("Invalid chunk size")
+        self.remaining = int(size_field, 16)
+        self.state = self.CHUNK_DATA if self.remaining > 0 else self.TRAILERS
+        return True
+
+    def _skip_trailers(self) -> bool:
+        """
+        Discards trailer headers following last chunk, up to and including empty line ending body.
+        """
+        while True:
+            line_end = self.buffer.find(b"\r\n")
+            if line_end == -1:
+                if len(self.buffer) > self.max_head_size:
+                    raise HttpParseError("Trailers too large")
+                return False
+            del self.buffer[:line_end + 2]
+            if line_end == 0:
+                self.state = self.DONE
+                return True
@@ -1,14 +1,97 @@
+import requests
+from typing import List, Tuple, Optional, Any, Dict
+from urllib3 import HTTPHeaderDict
+
+from constants.app_constants import HOP_BY_HOP_HEADERS
+
+
 class Utils:
 
     @staticmethod
-    def generate_response_string(response):
+    def generate_response_head(response: requests.Response, keep_alive: bool, chunked: bool) -> bytes:
         """
-        Generate response string from the given response object.
+        Generate status line and headers sent to client for the given response object.
+
+        Hop-by-hop headers of backend server connection are dropped, and framing and
+        connection headers of client connection are added instead. Repeated headers, like
+        Set-Cookie, are written as line each, as values of some of them cannot be joined.
 
         :param response: The response object returned by the backend server.
-        :return: string representing the response
+        :param keep_alive: whether client connection stays open after response.
+        :param chunked: whether body is sent to client with chunked transfer encoding.
+        :return: bytes representing status line and headers, ending with empty line
+        """
+        response_lines = [f"HTTP/1.1 {response.status_code} {response.reason}"]
+        for key, value in response.headers.items():
+            if key.lower() not in HOP_BY_HOP_HEADERS:
+                response_lines.append(f"{key}: {value}")
+        if chunked:
+            response_lines.append("Transfer-Encoding: chunked")
+        response_lines.append("Connection: keep-alive" if keep_alive else "Connection: close")
+        return ("\r\n".join(response_lines) + "\r\n\r\n").encode("latin-1")
+
+    @staticmethod
+    def generate_error_response(reason: str, message: str, status_code: int = 400, headers: Optional[Dict[str, str]] = None) -> bytes:
+        """
+        Generate error response sent to client, after which client connection is closed.
+
+        :param reason: reason for error.
+        :param message: message explaining error, sent as body.
+        :param status_code: HTTP status code of response.
+        :param headers: extra headers of response, e.g. Retry-After.
+        :return: bytes representing complete response
+        """
+        body = message.encode()
+        extra_headers = "".join(f"{key}: {value}\r\n" for key, value in headers.items()) if headers else ""
+        return f"HTTP/1.1 {status_code} {reason}\r\nContent-Length: {len(body)}\r\n{extra_headers}Connection: close\r\n\r\n".encode() + body
+
+    @staticmethod
+    def generate_cached_response(cached: Any, keep_alive: bool, age: int) -> bytes:
+        """
+        Generate complete response sent to client from response stored in cache.
+
+        :param cached: CachedResponse taken from response cache.
+        :param keep_alive: whether client connection stays open after response.
+        :param age: seconds since response was generated by backend server, sent in Age header.
+        :return: bytes representing status line, headers and body
+        """
+        response = Utils.build_response("", cached.status_code, cached.reason, cached.headers + [("Age", str(age))], content=cached.body)
+        return Utils.generate_response_head(response, keep_alive, chunked=False) + cached.body
+
+    @staticmethod
+    def is_chunked(headers: HTTPHeaderDict) -> bool:
+        """
+        Checks whether message with given headers has chunked body.
+        """
+        return "chunked" in headers.get("Transfer-Encoding", "").lower()
+
+    @staticmethod
+    def build_response(url: str, status_code: int, reason: str, headers: List[Tuple[str, str]], content: Optional[bytes] = None, raw: Any = None) -> requests.Response:
+        """
+        Build response object from response read from backend server.
+
+        Response either carries complete body, which is expected to be already de-chunked
+        so Transfer-Encoding header is replaced by Content-Length matching body, or raw
+        stream body is read from lazily, like requests does for streamed responses.
+
+        :param url: URL request was sent to.
+        :param status_code: HTTP status code of response.
+        :param reason: reason phrase of response.
+        :param headers: response headers as (name, value) pairs, names may repeat.
+        :param content: complete response body, or None if body is streamed from raw.
+        :param raw: file-like object body is read from, when content is None.
+        :return: response object as returned by requests library.
         """
-        response_str = f"HTTP/1.1 {response.status_code} {response.reason}\r\n"
-        response_str += "\r\n".join([f"{k}: {v}" for k, v in response.headers.items()])
-        response_str += "\r\n\r\n" + response.content.decode()
-        return response_str
\ No newline at end of file
+        response = requests.Response()
+        response.url = url
+        response.status_code = status_code
+        response.reason = reason
+        # unlike CaseInsensitiveDict, HTTPHeaderDict keeps every value of repeated header
+        response.headers = HTTPHeaderDict(headers)
+        if content is not None:
+            response.headers.pop("Transfer-Encoding", None)
+            response.headers["Content-Length"] = str(len(content))
+            response._content = content
+        else:
+            response.raw = raw
+        return response